@@ -11,26 +11,62 @@
 ################################################################################
 
 import serial
-import bglib
-from datetime import datetime, timedelta
+from . import bglib
 import time
-from Device import Device
-from utils import address2str, uuid2str
-from Queue import Queue, Empty
+import select
+from .Device import Device
+from .DeviceRegistry import DeviceRegistry
+from .AdvertisingData import Advertisement, parse_advertising_data
+from .ScanFilter import SCAN_POLICY_ALL, SCAN_POLICY_WHITELIST
+from .ScanBatch import ScanBatchCollector, SCAN_BATCH_SIZE
+from .ConnectionManager import ConnectionManager
+from .CommandQueue import CommandQueue, CommandFuture
+from .utils import uuid2str, monotonic, CommandTimeout
+try:
+    from Queue import Queue, Empty, Full
+except ImportError:
+    from queue import Queue, Empty, Full
 from threading import Thread
+import logging
+
+logger = logging.getLogger('BLEPython')
 
 class Adapter(object):
-    def __init__(self, port='/dev/ttyACM0'):
+    # Listener poll interval where the serial port can't be select()ed
+    POLL_INTERVAL = 0.01
+
+    # Seconds to wait for a command response unless the command says otherwise
+    CMD_RSP_TIMEOUT = 2.0
+
+    # Advertisements a scan_stream buffers for a slow consumer before dropping
+    SCAN_STREAM_QUEUE_SIZE = 1024
+
+    def __init__(self, port='/dev/ttyACM0', listener=True, device_ttl=None, max_devices=None, gatt_cache=None):
         '''
         Initializes the BLED112 adapter located at the specified path
 
         :param port: Path to the tty device for the dongle.  Default is /dev/ttyACM0
+        :param listener: Start the listener thread.  Pass False when something
+            else (e.g. an asyncio loop, see AsyncAdapter) calls check_activity
+            on the serial port and service_commands instead
+        :param device_ttl: Forget devices not seen for this many seconds
+        :param max_devices: Forget the least recently seen devices beyond this
+            many, see DeviceRegistry
+        :param gatt_cache: GattCache the devices restore their services from
+            on reconnect instead of running discovery
         :return:
         '''
 
-        self.devices = []
-        self.cmd_q = Queue()
-        self.cmd_rsp_q = Queue()
+        self.devices = DeviceRegistry(device_ttl, max_devices)
+        self.connections = {}   # connection handle -> Device
+        self.gatt_cache = gatt_cache
+        self.scan_filter = None
+        self.scan_engine = None
+        self.advertisement_callbacks = []
+        self.batch_collector = None
+        self.cmd_q = CommandQueue()
+        self.pending_cmd = None
+        self.pending_deadline = None
 
         # Open a serial port to the adapter
         self.serial = serial.Serial(port=port, baudrate=115200, timeout=1)
@@ -49,175 +85,286 @@ class Adapter(object):
         self.bglib.ble_evt_attclient_procedure_completed += self.attclient_procedure_complete_handler
         self.bglib.ble_evt_attclient_find_information_found += self.attclient_find_information_found_handler
         self.bglib.ble_evt_attclient_group_found += self.attclient_group_found_handler
+        self.bglib.ble_evt_attclient_attribute_found += self.attclient_attribute_found_handler
         self.bglib.ble_evt_attclient_attribute_value += self.attclient_attribute_value_handler
+        self.bglib.ble_evt_attclient_read_multiple_response += self.attclient_read_multiple_response_handler
 
-        # Install Response handlers
-        self.bglib.ble_rsp_system_reset += self.cmd_rsp_handler
-        self.bglib.ble_rsp_system_hello += self.cmd_rsp_handler
-        self.bglib.ble_rsp_system_address_get += self.cmd_rsp_handler
-        self.bglib.ble_rsp_system_reg_write += self.cmd_rsp_handler
-        self.bglib.ble_rsp_system_reg_read += self.cmd_rsp_handler
-        self.bglib.ble_rsp_system_get_counters += self.cmd_rsp_handler
-        self.bglib.ble_rsp_system_get_connections += self.cmd_rsp_handler
-        self.bglib.ble_rsp_system_read_memory += self.cmd_rsp_handler
-        self.bglib.ble_rsp_system_get_info += self.cmd_rsp_handler
-        self.bglib.ble_rsp_system_endpoint_tx += self.cmd_rsp_handler
-        self.bglib.ble_rsp_system_whitelist_append += self.cmd_rsp_handler
-        self.bglib.ble_rsp_system_whitelist_remove += self.cmd_rsp_handler
-        self.bglib.ble_rsp_system_whitelist_clear += self.cmd_rsp_handler
-        self.bglib.ble_rsp_system_endpoint_rx += self.cmd_rsp_handler
-        self.bglib.ble_rsp_system_endpoint_set_watermarks += self.cmd_rsp_handler
-        self.bglib.ble_rsp_flash_ps_defrag += self.cmd_rsp_handler
-        self.bglib.ble_rsp_flash_ps_dump += self.cmd_rsp_handler
-        self.bglib.ble_rsp_flash_ps_erase_all += self.cmd_rsp_handler
-        self.bglib.ble_rsp_flash_ps_save += self.cmd_rsp_handler
-        self.bglib.ble_rsp_flash_ps_load += self.cmd_rsp_handler
-        self.bglib.ble_rsp_flash_ps_erase += self.cmd_rsp_handler
-        self.bglib.ble_rsp_flash_erase_page += self.cmd_rsp_handler
-        self.bglib.ble_rsp_flash_write_words += self.cmd_rsp_handler
-        self.bglib.ble_rsp_attributes_write += self.cmd_rsp_handler
-        self.bglib.ble_rsp_attributes_read += self.cmd_rsp_handler
-        self.bglib.ble_rsp_attributes_read_type += self.cmd_rsp_handler
-        self.bglib.ble_rsp_attributes_user_read_response += self.cmd_rsp_handler
-        self.bglib.ble_rsp_attributes_user_write_response += self.cmd_rsp_handler
-        self.bglib.ble_rsp_connection_disconnect += self.cmd_rsp_handler
-        self.bglib.ble_rsp_connection_get_rssi += self.cmd_rsp_handler
-        self.bglib.ble_rsp_connection_update += self.cmd_rsp_handler
-        self.bglib.ble_rsp_connection_version_update += self.cmd_rsp_handler
-        self.bglib.ble_rsp_connection_channel_map_get += self.cmd_rsp_handler
-        self.bglib.ble_rsp_connection_channel_map_set += self.cmd_rsp_handler
-        self.bglib.ble_rsp_connection_features_get += self.cmd_rsp_handler
-        self.bglib.ble_rsp_connection_get_status += self.cmd_rsp_handler
-        self.bglib.ble_rsp_connection_raw_tx += self.cmd_rsp_handler
-        self.bglib.ble_rsp_attclient_find_by_type_value += self.cmd_rsp_handler
-        self.bglib.ble_rsp_attclient_read_by_group_type += self.cmd_rsp_handler
-        self.bglib.ble_rsp_attclient_read_by_type += self.cmd_rsp_handler
-        self.bglib.ble_rsp_attclient_find_information += self.cmd_rsp_handler
-        self.bglib.ble_rsp_attclient_read_by_handle += self.cmd_rsp_handler
-        self.bglib.ble_rsp_attclient_attribute_write += self.cmd_rsp_handler
-        self.bglib.ble_rsp_attclient_write_command += self.cmd_rsp_handler
-        self.bglib.ble_rsp_attclient_indicate_confirm += self.cmd_rsp_handler
-        self.bglib.ble_rsp_attclient_read_long += self.cmd_rsp_handler
-        self.bglib.ble_rsp_attclient_prepare_write += self.cmd_rsp_handler
-        self.bglib.ble_rsp_attclient_execute_write += self.cmd_rsp_handler
-        self.bglib.ble_rsp_attclient_read_multiple += self.cmd_rsp_handler
-        self.bglib.ble_rsp_sm_encrypt_start += self.cmd_rsp_handler
-        self.bglib.ble_rsp_sm_set_bondable_mode += self.cmd_rsp_handler
-        self.bglib.ble_rsp_sm_delete_bonding += self.cmd_rsp_handler
-        self.bglib.ble_rsp_sm_set_parameters += self.cmd_rsp_handler
-        self.bglib.ble_rsp_sm_passkey_entry += self.cmd_rsp_handler
-        self.bglib.ble_rsp_sm_get_bonds += self.cmd_rsp_handler
-        self.bglib.ble_rsp_sm_set_oob_data += self.cmd_rsp_handler
-        self.bglib.ble_rsp_gap_set_privacy_flags += self.cmd_rsp_handler
-        self.bglib.ble_rsp_gap_set_mode += self.cmd_rsp_handler
-        self.bglib.ble_rsp_gap_discover += self.cmd_rsp_handler
-        self.bglib.ble_rsp_gap_connect_direct += self.cmd_rsp_handler
-        self.bglib.ble_rsp_gap_end_procedure += self.cmd_rsp_handler
-        self.bglib.ble_rsp_gap_connect_selective += self.cmd_rsp_handler
-        self.bglib.ble_rsp_gap_set_filtering += self.cmd_rsp_handler
-        self.bglib.ble_rsp_gap_set_scan_parameters += self.cmd_rsp_handler
-        self.bglib.ble_rsp_gap_set_adv_parameters += self.cmd_rsp_handler
-        self.bglib.ble_rsp_gap_set_adv_data += self.cmd_rsp_handler
-        self.bglib.ble_rsp_gap_set_directed_connectable_mode += self.cmd_rsp_handler
-        self.bglib.ble_rsp_hardware_io_port_config_irq += self.cmd_rsp_handler
-        self.bglib.ble_rsp_hardware_set_soft_timer += self.cmd_rsp_handler
-        self.bglib.ble_rsp_hardware_adc_read += self.cmd_rsp_handler
-        self.bglib.ble_rsp_hardware_io_port_config_direction += self.cmd_rsp_handler
-        self.bglib.ble_rsp_hardware_io_port_config_function += self.cmd_rsp_handler
-        self.bglib.ble_rsp_hardware_io_port_config_pull += self.cmd_rsp_handler
-        self.bglib.ble_rsp_hardware_io_port_write += self.cmd_rsp_handler
-        self.bglib.ble_rsp_hardware_io_port_read += self.cmd_rsp_handler
-        self.bglib.ble_rsp_hardware_spi_config += self.cmd_rsp_handler
-        self.bglib.ble_rsp_hardware_spi_transfer += self.cmd_rsp_handler
-        self.bglib.ble_rsp_hardware_i2c_read += self.cmd_rsp_handler
-        self.bglib.ble_rsp_hardware_i2c_write += self.cmd_rsp_handler
-        self.bglib.ble_rsp_hardware_set_txpower += self.cmd_rsp_handler
-        self.bglib.ble_rsp_hardware_timer_comparator += self.cmd_rsp_handler
-        self.bglib.ble_rsp_test_phy_tx += self.cmd_rsp_handler
-        self.bglib.ble_rsp_test_phy_rx += self.cmd_rsp_handler
-        self.bglib.ble_rsp_test_phy_end += self.cmd_rsp_handler
-        self.bglib.ble_rsp_test_phy_reset += self.cmd_rsp_handler
-        self.bglib.ble_rsp_test_get_channel_map += self.cmd_rsp_handler
-        self.bglib.ble_rsp_test_debug += self.cmd_rsp_handler
-
-        self.listener_thread = Thread(name='BLEPythonListener', target=self._listener_thread)
-        self.listener_thread.daemon = True
-        self.listener_thread.start()
-
-    def cmd_rsp_handler(self, sender, args):
-        self.cmd_rsp_q.put(args)
+        # All command responses go through one hook that completes the pending command
+        self.bglib.on_response += self.cmd_rsp_handler
+
+        self.listener_thread = None
+        if listener:
+            self.listener_thread = Thread(name='BLEPythonListener', target=self._listener_thread)
+            self.listener_thread.daemon = True
+            self.listener_thread.start()
+
+    def send(self, cmd, timeout=None):
+        '''
+        Queue a command packet for the dongle
+
+        :param cmd: Packet built by one of the bglib ble_cmd_* methods
+        :param timeout: Seconds to wait for the response, CMD_RSP_TIMEOUT if None
+        :return: CommandFuture resolving to the decoded response dict
+        '''
+        return self.cmd_q.send(cmd, timeout)
+
+    def cmd_rsp_handler(self, sender, response):
+        # Runs on the listener thread, the next command can go out afterwards
+        cmd = self.pending_cmd
+        if cmd and cmd.matches(response['packet_class'], response['packet_command']):
+            self.pending_cmd = None
+            cmd.set_response(response['args'])
+        else:
+            logger.warning('Unexpected response %s', response['name'])
 
     def connection_status_handler(self, sender, args):
-        d = self.find_device(args['address'])
+        d = self.find_device(args['address'], args['address_type'])
         if d:
+            self.connections[args['connection']] = d
             d.connection_status_handler(args)
 
     def connection_disconnected_handler(self, sender, args):
-        for d in self.devices:
-            if d.connection_handle == args['connection']:
-                d.connection_disconnected_handler(args)
+        d = self.connections.pop(args['connection'], None)
+        if d:
+            d.connection_disconnected_handler(args)
 
     def attclient_procedure_complete_handler(self, sender, args):
-        for d in self.devices:
-            if d.connection_handle == args['connection']:
-                d.procedure_complete_handler(args)
+        d = self.connections.get(args['connection'])
+        if d:
+            d.procedure_complete_handler(args)
 
     def attclient_find_information_found_handler(self, sender, args):
-        for d in self.devices:
-            if d.connection_handle == args['connection']:
-                d.find_information_found_handler(args)
+        d = self.connections.get(args['connection'])
+        if d:
+            d.find_information_found_handler(args)
 
     def attclient_group_found_handler(self, sender, args):
-        for d in self.devices:
-            if d.connection_handle == args['connection']:
-                d.add_service(args['uuid'], args['start'], args['end'])
+        d = self.connections.get(args['connection'])
+        if d:
+            d.group_found_handler(args)
+
+    def attclient_attribute_found_handler(self, sender, args):
+        d = self.connections.get(args['connection'])
+        if d:
+            d.attribute_found_handler(args)
 
     def attclient_attribute_value_handler(self, sender, args):
-        for d in self.devices:
-            if d.connection_handle == args['connection']:
-                d.attclient_attribute_value_handler(args)
+        d = self.connections.get(args['connection'])
+        if d:
+            d.attclient_attribute_value_handler(args)
+
+    def attclient_read_multiple_response_handler(self, sender, args):
+        d = self.connections.get(args['connection'])
+        if d:
+            d.read_multiple_response_handler(args)
+
+    def _send_next_command(self):
+        try:
+            cmd = self.cmd_q.get_nowait()
+        except Empty:
+            return
+        if not isinstance(cmd, CommandFuture):
+            cmd = CommandFuture(cmd)
+        timeout = cmd.timeout if cmd.timeout is not None else self.CMD_RSP_TIMEOUT
+        self.pending_cmd = cmd
+        self.pending_deadline = monotonic() + timeout
+        self.bglib.send_command(self.serial, cmd.packet)
+
+    def _check_command_timeout(self):
+        cmd = self.pending_cmd
+        if cmd and monotonic() >= self.pending_deadline:
+            logger.warning('No response to command %d/%d', cmd.packet_class, cmd.packet_command)
+            self.pending_cmd = None
+            cmd.set_exception(CommandTimeout())
+
+    def service_commands(self):
+        '''
+        Fail the pending command if its response is overdue and send the next
+        queued command once nothing is pending.  Must be called from the thread
+        that reads the serial port whenever data arrived or a command was queued.
+        '''
+        self._check_command_timeout()
+        if not self.pending_cmd:
+            self._send_next_command()
 
     def _listener_thread(self):
+        try:
+            serial_fd = self.serial.fileno()
+        except (AttributeError, NotImplementedError):
+            serial_fd = None
+        wakeup_fd = self.cmd_q.fileno()
+
         while True:
-            # Send any pending commands
-            if not self.cmd_q.empty():
-                cmd = self.cmd_q.get()
-                self.bglib.send_command(self.serial, cmd)
-
-                # Wait for the response
-                tmp = None
-                while not tmp:
-                    try:
-                        tmp = self.cmd_rsp_q.get(True, timeout=0.01)
-                    except Empty:
-                        self.bglib.check_activity(self.serial)
-
-            # Process data packets
-            self.bglib.check_activity(self.serial)
-            time.sleep(0.01)
-
-    def find_device(self, addr):
-        for device in self.devices:
-            if address2str(addr) == device.address:
-                return device
-        return None
+            # Send the next command once the previous one has been answered
+            self.service_commands()
+
+            if serial_fd is None or wakeup_fd is None:
+                self.bglib.check_activity(self.serial)
+                time.sleep(self.POLL_INTERVAL)
+                continue
+
+            # Sleep until the dongle sends something or, if a command can be
+            # sent, until one is queued
+            if self.pending_cmd:
+                timeout = max(0, self.pending_deadline - monotonic())
+                readable = select.select([serial_fd], [], [], timeout)[0]
+            else:
+                readable = select.select([serial_fd, wakeup_fd], [], [])[0]
+
+            if wakeup_fd in readable:
+                self.cmd_q.clear_wakeup()
+            if serial_fd in readable:
+                self.bglib.check_activity(self.serial)
+
+    def find_device(self, addr, address_type=None):
+        '''
+        :param addr: 6 byte address as bytes, bytearray or a list of ints
+        :param address_type: 0 (public) or 1 (random), None matches either
+        :return: Device or None
+        '''
+        return self.devices.get(addr, address_type)
 
     def reset(self):
         self.cmd_q.put(self.bglib.ble_cmd_connection_disconnect(0))
         self.cmd_q.put(self.bglib.ble_cmd_gap_end_procedure())
 
-    def do_scan(self, timeout):
-        self.start_scan()
-        start_time = datetime.now()
-        while datetime.now() < start_time + timedelta(seconds=timeout):
+    def do_scan(self, timeout, scan_filter=None, filter_duplicates=False):
+        self.start_scan(scan_filter, filter_duplicates)
+        end = monotonic() + timeout
+        while monotonic() < end:
             time.sleep(0.1)
         self.stop_scan()
 
-    def start_scan(self):
-        self.cmd_q.put(self.bglib.ble_cmd_gap_discover(1))
+    def start_scan(self, scan_filter=None, filter_duplicates=False, mode=1):
+        '''
+        Start discovering devices
+
+        :param scan_filter: Optional ScanFilter.  Its addresses replace the
+            dongle's whitelist and only whitelisted devices are scanned, its
+            other criteria are applied to the advertisements of new devices
+        :param filter_duplicates: Let the controller drop repeated
+            advertisements of a device, saves USB and host load at the cost of
+            RSSI/presence updates
+        :param mode: gap_discover mode, 1 (generic) reports general
+            discoverable devices, 2 (observation) everything
+        :return: CommandFuture for the response to the discover command
+        '''
+        self.scan_filter = scan_filter
+        whitelist = scan_filter.addresses if scan_filter else None
+        if whitelist is not None:
+            self.cmd_q.put(self.bglib.ble_cmd_system_whitelist_clear())
+            for address, address_type in whitelist:
+                self.cmd_q.put(self.bglib.ble_cmd_system_whitelist_append(address, address_type))
+        self.cmd_q.put(self.bglib.ble_cmd_gap_set_filtering(
+            SCAN_POLICY_WHITELIST if whitelist is not None else SCAN_POLICY_ALL,
+            0,
+            1 if filter_duplicates else 0))
+        return self.cmd_q.send(self.bglib.ble_cmd_gap_discover(mode))
 
     def stop_scan(self):
-        self.cmd_q.put(self.bglib.ble_cmd_gap_end_procedure())
+        return self.cmd_q.send(self.bglib.ble_cmd_gap_end_procedure())
+
+    def start_batch_scan(self, callback, batch_size=SCAN_BATCH_SIZE, scan_filter=None, filter_duplicates=False):
+        '''
+        Scan without creating any Python objects per advertisement
+
+        Scan responses are not decoded or dispatched, they are copied straight
+        from the receive buffer into columnar ScanBatches.  Every full batch is
+        passed to callback(batch) on the listener thread.  Devices are not
+        registered in this mode and only the controller side (whitelist) part
+        of scan_filter applies.
+
+        :return: CommandFuture for the response to the discover command
+        '''
+        self.batch_collector = ScanBatchCollector(callback, batch_size)
+        self.bglib.set_raw_handler('ble_evt_gap_scan_response', self.batch_collector.packet)
+        return self.start_scan(scan_filter, filter_duplicates)
+
+    def stop_batch_scan(self):
+        '''
+        Stop a batch scan, the last partial batch is passed to the callback
+        once the dongle has stopped scanning
+        '''
+        collector = self.batch_collector
+        future = self.stop_scan()
+
+        def stopped(f):
+            # Runs on the listener thread after the last scan response
+            self.bglib.set_raw_handler('ble_evt_gap_scan_response', None)
+            if self.batch_collector is collector:
+                self.batch_collector = None
+            if collector:
+                collector.flush()
+        future.add_done_callback(stopped)
+        return future
+
+    def connect_all(self, devices, **kwargs):
+        '''
+        Connect to and discover several devices in parallel, see
+        ConnectionManager for the keyword arguments
+
+        :return: Dict of Device -> ConnectionResult
+        '''
+        return ConnectionManager(self, **kwargs).connect_all(devices)
+
+    def add_advertisement_callback(self, callback):
+        '''
+        Call callback(advertisement) with an Advertisement for every
+        advertisement that passes the scan filter.  Runs on the listener
+        thread and must not block.
+        '''
+        # Replaced rather than modified, the listener iterates it unlocked
+        self.advertisement_callbacks = self.advertisement_callbacks + [callback]
+
+    def remove_advertisement_callback(self, callback):
+        callbacks = self.advertisement_callbacks[:]
+        callbacks.remove(callback)
+        self.advertisement_callbacks = callbacks
+
+    def scan_stream(self, timeout=None, scan_filter=None, filter_duplicates=False, engine=None):
+        '''
+        Scan and yield Advertisement records as they arrive
+
+        Scanning stops when timeout seconds have passed or the generator is
+        closed.  Advertisements are dropped (and counted in a warning) when
+        the consumer falls SCAN_STREAM_QUEUE_SIZE behind.
+
+        :param engine: Optional ScanEngine providing the scan parameters
+        '''
+        q = Queue(self.SCAN_STREAM_QUEUE_SIZE)
+        dropped = [0]
+
+        def callback(advertisement):
+            try:
+                q.put_nowait(advertisement)
+            except Full:
+                dropped[0] += 1
+
+        self.add_advertisement_callback(callback)
+        if engine:
+            engine.start(scan_filter, filter_duplicates)
+        else:
+            self.start_scan(scan_filter, filter_duplicates)
+        end = monotonic() + timeout if timeout is not None else None
+        try:
+            while True:
+                wait = None
+                if end is not None:
+                    wait = end - monotonic()
+                    if wait <= 0:
+                        return
+                try:
+                    yield q.get(True, wait)
+                except Empty:
+                    return
+        finally:
+            self.remove_advertisement_callback(callback)
+            if engine:
+                engine.stop()
+            else:
+                self.stop_scan()
+            if dropped[0]:
+                logger.warning('Scan stream dropped %d advertisements', dropped[0])
 
     def scan_response_handler(self, sender, args):
         '''
@@ -228,52 +375,33 @@ class Adapter(object):
         :return:
         '''
         addr = args['sender']
-        if not self.find_device(addr):
-            d = Device(self.bglib, self.cmd_q, addr)
-            self.devices.append(d)
-
-            ad_data = parse_scan_response_data(args['data'])
-            if 'name' in ad_data:
-                d.name = ad_data['name']
-
-
-def parse_scan_response_data(data):
-    '''
-    Parse the advertising data according to sections 11 & 18 of the Bluetooth 4.0 Spec
-    This is only partially implemented
-    '''
-    ad_data = {}
-
-    i = 0
-    while (i < len(data)):
-        ad_struct_len = data[i]
-        if ad_struct_len == 0:
-            break
-
-        i += 1
-
-        ad_struct_type = data[i]
-        ad_struct_data = data[i+1:i+ad_struct_len]
-        i+=ad_struct_len
-
-        if ad_struct_type == 0x09:
-            # <<Complete Local Name>>
-            name_string = ''
-            for x in ad_struct_data:
-                name_string += chr(x)
-
-            ad_data['name'] = name_string
-        elif ad_struct_type == 0x01:
-            # <<Flags>>
-            pass # I don't care about these
-        elif ad_struct_type == 0x02:
-            # <<Incomplete List of 16-bit Service Class UUIDs>>
-            for x in ad_struct_data:
-                print "%x" % x
-        elif ad_struct_type == 0x06:
-            # <<Incomplete List of 128-bit Services>>
-            ad_data['service_id'] = ad_struct_data
+        ad_data = parse_advertising_data(args['data'])
+        # Host side part of the scan filter, applies to every advertisement
+        scan_filter = self.scan_filter
+        matches = not (scan_filter and scan_filter.host_filtering) or scan_filter.matches(args['rssi'], ad_data)
+        d = self.devices.get(addr, args['address_type'])
+        new_device = not d
+        if new_device:
+            # Nothing is allocated for new devices that don't match
+            if not matches:
+                return
+            d = Device(self.bglib, self.cmd_q, addr, args['address_type'], self.gatt_cache)
+            self.devices.add(d)
+
+        now = monotonic()
+        d.advertisements.add(args['rssi'], args['packet_type'], now)
+        if self.scan_engine:
+            self.scan_engine.advertisement(new_device, now)
+        if args['packet_type'] == 4:
+            d.scan_response_data = ad_data
         else:
-            pass
+            d.advertising_data = ad_data
+        if ad_data.name:
+            d.name = ad_data.name
+
+        callbacks = self.advertisement_callbacks
+        if callbacks and matches:
+            advertisement = Advertisement(d, args['rssi'], args['packet_type'], ad_data, now)
+            for callback in callbacks:
+                callback(advertisement)
 
-    return ad_data
\ No newline at end of file
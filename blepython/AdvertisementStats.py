@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+################################################################################
+#
+# @brief Advertisement history and RSSI statistics of a device
+#
+# @date Created 2026/10/17
+#
+# @copyright Copyright &copy 2026 Ashton Instruments
+################################################################################
+
+from array import array
+from .utils import monotonic
+
+# Advertisements kept per device
+ADVERTISEMENT_HISTORY = 32
+
+# Weight of the newest sample in the RSSI and interval moving averages
+EWMA_ALPHA = 0.25
+
+# gap_scan_response packet type of scan responses, which follow an
+# advertisement immediately and are not counted for the interval
+SCAN_RESPONSE = 4
+
+
+class AdvertisementStats(object):
+    '''
+    Ring buffer of the last advertisements of a device with running
+    aggregates.
+
+    The ring is three fixed size arrays (timestamp, RSSI, packet type), so the
+    memory used per device is bounded and add() is O(1).  Timestamps are
+    monotonic() seconds.
+    '''
+    __slots__ = ('size', 'alpha', 'timestamps', 'rssis', 'packet_types', 'index', 'count',
+                 'rssi_sum', 'rssi_ewma', 'interval', 'first_seen', 'last_seen',
+                 'last_rssi', 'last_advertisement')
+
+    def __init__(self, size=ADVERTISEMENT_HISTORY, alpha=EWMA_ALPHA):
+        self.size = size
+        self.alpha = alpha
+        self.timestamps = array('d', [0.0]) * size
+        self.rssis = array('b', [0]) * size
+        self.packet_types = array('B', [0]) * size
+        # Next slot to write and total number of advertisements seen
+        self.index = 0
+        self.count = 0
+        # Sum of the RSSIs in the ring
+        self.rssi_sum = 0
+        self.rssi_ewma = None
+        # Moving average of the seconds between advertisements
+        self.interval = None
+        self.first_seen = None
+        self.last_seen = None
+        self.last_rssi = None
+        self.last_advertisement = None
+
+    def add(self, rssi, packet_type, timestamp=None):
+        if timestamp is None:
+            timestamp = monotonic()
+        i = self.index
+        if self.count >= self.size:
+            self.rssi_sum -= self.rssis[i]
+        self.timestamps[i] = timestamp
+        self.rssis[i] = rssi
+        self.packet_types[i] = packet_type
+        self.index = (i + 1) % self.size
+        self.count += 1
+        self.rssi_sum += rssi
+
+        alpha = self.alpha
+        if self.rssi_ewma is None:
+            self.rssi_ewma = float(rssi)
+            self.first_seen = timestamp
+        else:
+            self.rssi_ewma += alpha * (rssi - self.rssi_ewma)
+        self.last_seen = timestamp
+        self.last_rssi = rssi
+
+        if packet_type != SCAN_RESPONSE:
+            if self.last_advertisement is not None:
+                delta = timestamp - self.last_advertisement
+                if self.interval is None:
+                    self.interval = delta
+                else:
+                    self.interval += alpha * (delta - self.interval)
+            self.last_advertisement = timestamp
+
+    def __len__(self):
+        return min(self.count, self.size)
+
+    @property
+    def mean_rssi(self):
+        '''
+        Mean RSSI over the advertisements in the ring, None before the first
+        '''
+        n = len(self)
+        return float(self.rssi_sum) / n if n else None
+
+    def age(self, now=None):
+        '''
+        Seconds since the last advertisement, None if there was none
+        '''
+        if self.last_seen is None:
+            return None
+        return (now if now is not None else monotonic()) - self.last_seen
+
+    def history(self):
+        '''
+        List of (timestamp, rssi, packet type) in the ring, oldest first
+        '''
+        n = len(self)
+        start = (self.index - n) % self.size
+        return [(self.timestamps[j], self.rssis[j], self.packet_types[j])
+                for j in ((start + k) % self.size for k in range(n))]
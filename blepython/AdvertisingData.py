@@ -0,0 +1,200 @@
+#!/usr/bin/env python
+################################################################################
+#
+# @brief Advertising / scan response data parser
+#
+# Parses the AD structures of sections 11 & 18 of the Bluetooth 4.0 Spec
+# (Core Specification Supplement part A for the data types).
+#
+# @date Created 2026/10/17
+#
+# @copyright Copyright &copy 2026 Ashton Instruments
+################################################################################
+
+import struct
+
+# AD types
+AD_FLAGS = 0x01
+AD_UUID16_INCOMPLETE = 0x02
+AD_UUID16_COMPLETE = 0x03
+AD_UUID32_INCOMPLETE = 0x04
+AD_UUID32_COMPLETE = 0x05
+AD_UUID128_INCOMPLETE = 0x06
+AD_UUID128_COMPLETE = 0x07
+AD_SHORT_NAME = 0x08
+AD_COMPLETE_NAME = 0x09
+AD_TX_POWER = 0x0A
+AD_SERVICE_DATA16 = 0x16
+AD_APPEARANCE = 0x19
+AD_SERVICE_DATA32 = 0x20
+AD_SERVICE_DATA128 = 0x21
+AD_MANUFACTURER_DATA = 0xFF
+
+# Number of distinct payloads parse_advertising_data remembers before starting over
+AD_CACHE_SIZE = 1024
+
+_uint16 = struct.Struct('<H')
+_uint32 = struct.Struct('<I')
+
+_cache = {}
+
+
+def _text(data):
+    # Names stay byte strings on Python 2, like everywhere else in BGLib
+    if isinstance(data, str):
+        return data
+    return data.decode('utf-8', 'replace')
+
+
+class AdvertisingData(object):
+    '''
+    Parsed content of one advertising or scan response payload.
+
+    Records are cached and shared between all devices sending the same
+    payload, treat them as read-only.
+
+    UUIDs are ints for the 16 and 32-bit forms and 16 byte strings (little
+    endian, as sent over the air) for 128-bit ones.  Incomplete and complete
+    lists are merged, uuids_complete tells whether any list was complete.
+    '''
+    __slots__ = ('raw', 'flags', 'name', 'name_complete', 'tx_power', 'appearance',
+                 'uuid16', 'uuid32', 'uuid128', 'uuids_complete',
+                 'manufacturer_data', 'service_data', 'other')
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.flags = None
+        self.name = None
+        self.name_complete = False
+        self.tx_power = None
+        self.appearance = None
+        self.uuid16 = ()
+        self.uuid32 = ()
+        self.uuid128 = ()
+        self.uuids_complete = False
+        # Manufacturer specific data including the 2 byte company ID
+        self.manufacturer_data = None
+        # Service UUID -> data
+        self.service_data = {}
+        # (AD type, data) of every structure not covered above
+        self.other = ()
+
+    @property
+    def company_id(self):
+        if self.manufacturer_data is None or len(self.manufacturer_data) < 2:
+            return None
+        return _uint16.unpack_from(self.manufacturer_data)[0]
+
+    def __repr__(self):
+        fields = ['%s=%r' % (name, getattr(self, name)) for name in self.__slots__[1:]
+                  if getattr(self, name) is not None and getattr(self, name) is not False
+                  and getattr(self, name) != () and getattr(self, name) != {}]
+        return 'AdvertisingData(%s)' % ', '.join(fields)
+
+
+class Advertisement(object):
+    '''
+    One received advertisement or scan response as streamed by
+    Adapter.scan_stream
+    '''
+    __slots__ = ('device', 'rssi', 'packet_type', 'data', 'timestamp')
+
+    def __init__(self, device, rssi, packet_type, data, timestamp):
+        self.device = device
+        self.rssi = rssi
+        self.packet_type = packet_type
+        # AdvertisingData
+        self.data = data
+        # monotonic() seconds
+        self.timestamp = timestamp
+
+    @property
+    def address(self):
+        return self.device.address
+
+    @property
+    def address_type(self):
+        return self.device.address_type
+
+    def __repr__(self):
+        return 'Advertisement(%s, rssi=%d, packet_type=%d, %r)' % (self.device.address, self.rssi, self.packet_type, self.data)
+
+
+def parse_advertising_data(data):
+    '''
+    Parse advertising or scan response data
+
+    Identical payloads are only parsed once, see AD_CACHE_SIZE.
+
+    :param data: Payload as bytes, bytearray or a list of ints
+    :return: AdvertisingData
+    '''
+    # BGLib hands out payloads as lists, a tuple is a much cheaper key than
+    # converting them to bytes first
+    key = data if isinstance(data, bytes) else tuple(data)
+    try:
+        return _cache[key]
+    except KeyError:
+        pass
+    record = _parse(key if isinstance(key, bytes) else bytes(bytearray(key)))
+    if len(_cache) >= AD_CACHE_SIZE:
+        _cache.clear()
+    _cache[key] = record
+    return record
+
+
+def _parse(data):
+    record = AdvertisingData(data)
+    buf = bytearray(data)
+    size = len(buf)
+
+    i = 0
+    while i < size:
+        length = buf[i]
+        if length == 0:
+            # Zero padding up to the end of the payload
+            break
+        end = i + 1 + length
+        if end > size:
+            # Truncated structure
+            break
+        ad_type = buf[i + 1]
+        start = i + 2
+        i = end
+
+        if ad_type == AD_MANUFACTURER_DATA:
+            record.manufacturer_data = data[start:end]
+        elif ad_type == AD_FLAGS:
+            if end > start:
+                record.flags = buf[start]
+        elif ad_type == AD_COMPLETE_NAME or ad_type == AD_SHORT_NAME:
+            # Keep a complete name over a shortened one
+            if ad_type == AD_COMPLETE_NAME or not record.name_complete:
+                record.name = _text(data[start:end])
+                record.name_complete = ad_type == AD_COMPLETE_NAME
+        elif ad_type == AD_UUID16_INCOMPLETE or ad_type == AD_UUID16_COMPLETE:
+            count = (end - start) // 2
+            record.uuid16 += struct.unpack_from('<%dH' % count, data, start)
+            record.uuids_complete |= ad_type == AD_UUID16_COMPLETE
+        elif ad_type == AD_UUID32_INCOMPLETE or ad_type == AD_UUID32_COMPLETE:
+            count = (end - start) // 4
+            record.uuid32 += struct.unpack_from('<%dI' % count, data, start)
+            record.uuids_complete |= ad_type == AD_UUID32_COMPLETE
+        elif ad_type == AD_UUID128_INCOMPLETE or ad_type == AD_UUID128_COMPLETE:
+            record.uuid128 += tuple(data[j:j + 16] for j in range(start, end - 15, 16))
+            record.uuids_complete |= ad_type == AD_UUID128_COMPLETE
+        elif ad_type == AD_TX_POWER:
+            if end > start:
+                record.tx_power = buf[start] - 256 if buf[start] > 127 else buf[start]
+        elif ad_type == AD_SERVICE_DATA16 and end - start >= 2:
+            record.service_data[_uint16.unpack_from(data, start)[0]] = data[start + 2:end]
+        elif ad_type == AD_SERVICE_DATA32 and end - start >= 4:
+            record.service_data[_uint32.unpack_from(data, start)[0]] = data[start + 4:end]
+        elif ad_type == AD_SERVICE_DATA128 and end - start >= 16:
+            record.service_data[data[start:start + 16]] = data[start + 16:end]
+        elif ad_type == AD_APPEARANCE and end - start >= 2:
+            record.appearance = _uint16.unpack_from(data, start)[0]
+        else:
+            record.other += ((ad_type, data[start:end]),)
+
+    return record
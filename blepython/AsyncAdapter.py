@@ -0,0 +1,471 @@
+#!/usr/bin/env python
+################################################################################
+#
+# @brief asyncio front-end for the BLED112 adapter (Python 3.6+)
+#
+# The serial port and the command queue are watched by the event loop with
+# add_reader, so there is no listener thread and nothing blocks the loop:
+#
+#     adapter = AsyncAdapter('/dev/ttyACM0')
+#     for device in await adapter.scan(5):
+#         await device.connect()
+#         char = device.characteristic([0x19, 0x2a])
+#         print(await char.read())
+#         async for value in char.notifications():
+#             ...
+#
+# @date Created 2026/10/17
+#
+# @copyright Copyright &copy 2026 Ashton Instruments
+################################################################################
+
+import asyncio
+import logging
+import weakref
+from .Adapter import Adapter
+from .Service import Characteristic
+from .WriteStream import WriteStream, DEFAULT_CHUNK_SIZE, DEFAULT_RETRY_DELAY
+from .utils import monotonic, ConnectTimeout, CommandTimeout, NotConnected
+
+logger = logging.getLogger('BLEPython')
+
+
+def _copy_result(source, future):
+    if future.cancelled():
+        return
+    exception = source.exception(0)
+    if exception:
+        future.set_exception(exception)
+    else:
+        future.set_result(source.result(0))
+
+def _set_result(future, value):
+    if not future.done():
+        future.set_result(value)
+
+def _set_exception(future, exception):
+    if not future.done():
+        future.set_exception(exception)
+
+
+class AsyncAdapter(object):
+    '''
+    Runs an Adapter without its listener thread from an asyncio event loop
+    '''
+    def __init__(self, port='/dev/ttyACM0', loop=None):
+        self.loop = loop or asyncio.get_event_loop()
+        self.adapter = Adapter(port, listener=False)
+        self.bglib = self.adapter.bglib
+        # Wrappers live as long as the application holds them, so devices
+        # evicted from the adapter's registry can be freed
+        self._devices = weakref.WeakValueDictionary()
+        self._timer = None
+
+        self._serial_fd = self.adapter.serial.fileno()
+        self._wakeup_fd = self.adapter.cmd_q.fileno()
+        self.loop.add_reader(self._serial_fd, self._serial_readable)
+        self.loop.add_reader(self._wakeup_fd, self._command_queued)
+
+    def close(self):
+        self.loop.remove_reader(self._serial_fd)
+        self.loop.remove_reader(self._wakeup_fd)
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+        self.adapter.serial.close()
+
+    def _serial_readable(self):
+        self.bglib.check_activity(self.adapter.serial)
+        self._service_commands()
+
+    def _command_queued(self):
+        self.adapter.cmd_q.clear_wakeup()
+        self._service_commands()
+
+    def _service_commands(self):
+        adapter = self.adapter
+        adapter.service_commands()
+
+        # Come back when the pending command's response is overdue
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+        if adapter.pending_cmd:
+            delay = max(0, adapter.pending_deadline - monotonic())
+            self._timer = self.loop.call_later(delay, self._service_commands)
+
+    def wrap_future(self, command_future):
+        '''
+        Convert a CommandFuture into an asyncio future of this loop
+        '''
+        future = self.loop.create_future()
+        command_future.add_done_callback(
+            lambda f: self.loop.call_soon_threadsafe(_copy_result, f, future))
+        return future
+
+    async def send(self, cmd, timeout=None):
+        '''
+        Send a command packet and return its decoded response
+
+        Raises BGAPIError for a non-zero result and CommandTimeout when the
+        dongle does not answer.
+        '''
+        return await self.wrap_future(self.adapter.send(cmd, timeout))
+
+    @property
+    def devices(self):
+        return [self.device(d) for d in self.adapter.devices]
+
+    def device(self, device):
+        '''
+        The AsyncDevice wrapping one of the adapter's Device objects
+        '''
+        d = self._devices.get(id(device))
+        if d is None or d.device is not device:
+            d = self._devices[id(device)] = AsyncDevice(self, device)
+        return d
+
+    async def scan_stream(self, timeout=None, scan_filter=None, filter_duplicates=False, engine=None):
+        '''
+        Asynchronous iterator over Advertisement records while scanning, see
+        Adapter.scan_stream
+        '''
+        queue = asyncio.Queue(self.adapter.SCAN_STREAM_QUEUE_SIZE)
+        dropped = [0]
+
+        def callback(advertisement):
+            try:
+                queue.put_nowait(advertisement)
+            except asyncio.QueueFull:
+                dropped[0] += 1
+
+        self.adapter.add_advertisement_callback(callback)
+        try:
+            if engine:
+                await self.wrap_future(engine.start(scan_filter, filter_duplicates))
+            else:
+                await self.wrap_future(self.adapter.start_scan(scan_filter, filter_duplicates))
+            end = self.loop.time() + timeout if timeout is not None else None
+            while True:
+                if end is None:
+                    yield await queue.get()
+                    continue
+                try:
+                    yield await asyncio.wait_for(queue.get(), end - self.loop.time())
+                except asyncio.TimeoutError:
+                    return
+        finally:
+            self.adapter.remove_advertisement_callback(callback)
+            await self.wrap_future(engine.stop() if engine else self.adapter.stop_scan())
+            if dropped[0]:
+                logger.warning('Scan stream dropped %d advertisements', dropped[0])
+
+    async def scan(self, timeout=5, scan_filter=None, filter_duplicates=False, engine=None):
+        '''
+        Scan for timeout seconds and return all devices seen so far, see
+        Adapter.start_scan for the filter arguments
+
+        :param engine: Optional ScanEngine providing the scan parameters
+        '''
+        if engine:
+            await self.wrap_future(engine.start(scan_filter, filter_duplicates))
+        else:
+            await self.wrap_future(self.adapter.start_scan(scan_filter, filter_duplicates))
+        try:
+            if engine:
+                # Let the engine close its periods while nothing advertises
+                end = self.loop.time() + timeout
+                while self.loop.time() < end:
+                    await asyncio.sleep(min(engine.period, end - self.loop.time()))
+                    engine.tick()
+            else:
+                await asyncio.sleep(timeout)
+        finally:
+            await self.wrap_future(engine.stop() if engine else self.adapter.stop_scan())
+        return self.devices
+
+
+class AsyncDevice(object):
+    def __init__(self, adapter, device):
+        self.adapter = adapter
+        self.device = device
+        self._characteristics = {}
+
+    def __str__(self):
+        return str(self.device)
+
+    @property
+    def address(self):
+        return self.device.address
+
+    @property
+    def name(self):
+        return self.device.name
+
+    @property
+    def connected(self):
+        return self.device.connected
+
+    @property
+    def services(self):
+        return self.device.services
+
+    def _wait_connection(self, connected):
+        '''
+        Future that completes when the device's connected state becomes
+        connected, i.e. discovery finished or the link dropped
+        '''
+        loop = self.adapter.loop
+        future = loop.create_future()
+
+        def callback(device, state):
+            if state == connected:
+                loop.call_soon_threadsafe(_set_result, future, state)
+        self.device.add_connection_callback(callback)
+        future.add_done_callback(lambda f: self.device.remove_connection_callback(callback))
+        return future
+
+    async def connect(self, timeout=10, profile=None, services=None):
+        '''
+        Connect and discover services, raises ConnectTimeout
+
+        :param profile: ConnectionParameters or profile name, see Device.connect
+        :param services: Only discover these primary services.  The loop can't
+            block for on-demand discovery, so their attributes are discovered
+            before connect returns.
+        '''
+        d = self.device
+        if d.state == d.READY:
+            return
+        if d.state == d.DISCONNECTING:
+            # The dongle would refuse to connect while the link is going down
+            idle = self._wait_connection(False)
+            try:
+                if d.state == d.DISCONNECTING:
+                    await asyncio.wait_for(idle, timeout)
+            except asyncio.TimeoutError:
+                raise ConnectTimeout('Disconnect timed out')
+            finally:
+                idle.cancel()
+        # Wait for a connect in progress instead of sending another one
+        in_progress = d.state in (d.CONNECTING, d.DISCOVERING)
+        connected = self._wait_connection(True)
+        try:
+            if not in_progress:
+                logger.debug('Connecting to %s', self)
+                await self.adapter.wrap_future(d.start_connect(profile, services))
+            await asyncio.wait_for(connected, timeout)
+            for s in d.services:
+                await asyncio.wait_for(self.discover(s), timeout)
+        except asyncio.TimeoutError:
+            # Give up on the connection attempt if it is still running
+            if not in_progress:
+                d.cancel_connect()
+            raise ConnectTimeout
+        finally:
+            connected.cancel()
+
+    async def disconnect(self, timeout=10):
+        logger.debug('Disconnecting from %s', self)
+        if self.device.connection_handle is None:
+            self.device.cancel_connect()
+            return
+        disconnected = self._wait_connection(False)
+        try:
+            future = self.device.start_disconnect()
+            if future is not None:
+                await self.adapter.wrap_future(future)
+            await asyncio.wait_for(disconnected, timeout)
+        finally:
+            disconnected.cancel()
+
+    def discover(self, service):
+        '''
+        Future that completes once the attributes of a service found by
+        selective discovery are known
+        '''
+        loop = self.adapter.loop
+        future = loop.create_future()
+
+        def callback(s):
+            if s.discovered:
+                loop.call_soon_threadsafe(_set_result, future, s)
+            else:
+                loop.call_soon_threadsafe(_set_exception, future, NotConnected())
+        self.device.start_service_discovery(service, callback)
+        return future
+
+    async def update_connection(self, profile):
+        '''
+        Change the parameters of the current connection, see
+        Device.update_connection
+        '''
+        return await self.adapter.wrap_future(self.device.update_connection(profile))
+
+    def characteristic(self, uuid, service=None):
+        '''
+        Look up a characteristic by full or short UUID, optionally within the
+        service with the given UUID
+
+        :return: AsyncCharacteristic or None
+        '''
+        services = self.device.services
+        if service is not None:
+            services = [s for s in services if s.uuid == service or s.short_uuid == service]
+        for s in services:
+            c = s.get_characteristic_by_uuid(uuid)
+            if c:
+                return self.wrap_characteristic(c)
+        return None
+
+    def wrap_characteristic(self, characteristic):
+        c = self._characteristics.get(id(characteristic))
+        if c is None or c.characteristic is not characteristic:
+            c = self._characteristics[id(characteristic)] = AsyncCharacteristic(self, characteristic)
+        return c
+
+    async def read_many(self, characteristics, timeout=3):
+        '''
+        Read several AsyncCharacteristics, batched into read_multiple
+        requests where possible, see Device.read_many
+
+        :return: List of the values in the order of characteristics
+        '''
+        d = self.device
+        values = {}
+        for group in d.read_groups(list(dict((id(c.characteristic), c.characteristic) for c in characteristics).values())):
+            if len(group) == 1:
+                continue
+            future = self.adapter.loop.create_future()
+            d.start_read_multiple(group, lambda v: self.adapter.loop.call_soon_threadsafe(_set_result, future, v))
+            try:
+                values.update(await asyncio.wait_for(future, timeout) or {})
+            except asyncio.TimeoutError:
+                d._read_multiple_completed(None)
+                raise CommandTimeout
+        for c in characteristics:
+            if c.characteristic not in values:
+                values[c.characteristic] = await c.read(timeout)
+        return [values[c.characteristic] for c in characteristics]
+
+
+class AsyncCharacteristic(object):
+    def __init__(self, device, characteristic):
+        self.device = device
+        self.adapter = device.adapter
+        self.characteristic = characteristic
+
+    @property
+    def uuid(self):
+        return self.characteristic.uuid
+
+    @property
+    def handle(self):
+        return self.characteristic.handle
+
+    async def read(self, timeout=3):
+        '''
+        Read the characteristic value, raises CommandTimeout when no data arrives,
+        BGAPIError when the peripheral refuses the read and NotConnected without
+        a connection
+        '''
+        c = self.characteristic
+        if self.device.device.connection_handle is None:
+            raise NotConnected
+        value = self.adapter.loop.create_future()
+
+        def callback(data):
+            if isinstance(data, Exception):
+                self.adapter.loop.call_soon_threadsafe(_set_exception, value, data)
+            else:
+                self.adapter.loop.call_soon_threadsafe(_set_result, value, data)
+        c.read_callbacks.append(callback)
+        try:
+            await self.adapter.wrap_future(c.start_read())
+            return await asyncio.wait_for(value, timeout)
+        except asyncio.TimeoutError:
+            raise CommandTimeout
+        finally:
+            if callback in c.read_callbacks:
+                c.read_callbacks.remove(callback)
+
+    async def write(self, data, response=None):
+        '''
+        Write data to the characteristic and wait for the dongle's response
+        (for long values until the peripheral has committed them), see
+        Characteristic.write for response
+        '''
+        return await self.adapter.wrap_future(self.characteristic.write(data, response))
+
+    async def write_stream(self, data, chunk_size=DEFAULT_CHUNK_SIZE, retry_delay=DEFAULT_RETRY_DELAY, timeout=None):
+        '''
+        Stream data to the characteristic with write commands, see
+        Characteristic.write_stream
+
+        :return: The finished WriteStream with bytes_sent and bytes_per_sec
+        '''
+        c = self.characteristic
+        if not c.supports(Characteristic.WRITE_NO_RESPONSE):
+            raise ValueError('Handle %d does not support write without response' % c.handle)
+        loop = self.adapter.loop
+        changed = asyncio.Event()
+        stream = WriteStream(c, data, chunk_size, retry_delay,
+                             lambda stream: loop.call_soon_threadsafe(changed.set))
+        deadline = None if timeout is None else loop.time() + timeout
+        stream.start()
+        try:
+            while stream.state != WriteStream.DONE:
+                remaining = None if deadline is None else deadline - loop.time()
+                await asyncio.wait_for(changed.wait(), remaining)
+                changed.clear()
+                if stream.state == WriteStream.STALLED:
+                    await asyncio.sleep(retry_delay)
+                    stream.resume()
+        except asyncio.TimeoutError:
+            stream.cancel()
+            raise CommandTimeout
+        if stream.error:
+            raise stream.error
+        return stream
+
+    async def set_notifications(self, enable=True):
+        '''
+        Enable or disable notifications (or indications) through the
+        characteristic's CCCD, see Characteristic.set_notifications
+
+        :return: False if the characteristic has no CCCD
+        '''
+        c = self.characteristic
+        future = c.set_notifications(enable)
+        if future is None:
+            logger.warning('No CCCD for handle %d', c.handle)
+            return False
+        await self.adapter.wrap_future(future)
+        return True
+
+    async def notifications(self, enable=True):
+        '''
+        Asynchronous iterator over notified values
+
+        Notifications are enabled through the CCCD first unless enable is
+        False, and disabled again when the iterator is closed.  The
+        characteristic's notification_callback is taken over while iterating
+        and restored afterwards.
+        '''
+        c = self.characteristic
+        loop = self.adapter.loop
+        queue = asyncio.Queue()
+        previous = c.notification_callback
+        c.notification_callback = lambda short_uuid, value: loop.call_soon_threadsafe(queue.put_nowait, value)
+        try:
+            if enable:
+                await self.set_notifications(True)
+            while True:
+                yield await queue.get()
+        finally:
+            c.notification_callback = previous
+            if enable and self.device.device.connection_handle is not None:
+                try:
+                    await self.set_notifications(False)
+                except Exception as e:
+                    logger.warning('Could not disable notifications on handle %d: %r', c.handle, e)
@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+################################################################################
+#
+# @brief Command queue between the application threads and the listener thread
+#
+# @date Created 2026/10/17
+#
+# @copyright Copyright &copy 2026 Ashton Instruments
+################################################################################
+
+import errno
+import os
+from threading import Event, Lock
+from .utils import BGAPIError, CommandTimeout
+
+try:
+    from Queue import Queue
+except ImportError:
+    from queue import Queue
+
+try:
+    import fcntl
+except ImportError:
+    # No select() on pipes (Windows), the listener polls the queue instead
+    fcntl = None
+
+class CommandFuture(object):
+    '''
+    A command packet on its way to the dongle and, once it has been answered,
+    its decoded response.
+
+    The listener matches the response to the command by class/command ID.  A
+    non-zero 'result' in the response fails the future with BGAPIError, no
+    response within timeout seconds of sending (the adapter's default when
+    None) fails it with CommandTimeout.
+    '''
+    def __init__(self, packet, timeout=None):
+        header = bytearray(packet[:4])
+        self.packet = packet
+        self.packet_class = header[2]
+        self.packet_command = header[3]
+        self.timeout = timeout
+        self._response = None
+        self._exception = None
+        self._done = Event()
+        self._lock = Lock()
+        self._callbacks = []
+
+    def matches(self, packet_class, packet_command):
+        return self.packet_class == packet_class and self.packet_command == packet_command
+
+    def done(self):
+        return self._done.is_set()
+
+    def result(self, timeout=None):
+        '''
+        Wait for the response and return its argument dict
+
+        :param timeout: Seconds to wait, raises CommandTimeout when exceeded
+        '''
+        if not self._done.wait(timeout):
+            raise CommandTimeout
+        if self._exception:
+            raise self._exception
+        return self._response
+
+    def exception(self, timeout=None):
+        if not self._done.wait(timeout):
+            raise CommandTimeout
+        return self._exception
+
+    def add_done_callback(self, fn):
+        '''
+        Call fn(future) once the future is done.  Callbacks run on the listener
+        thread and must not block.
+        '''
+        with self._lock:
+            if not self._done.is_set():
+                self._callbacks.append(fn)
+                return
+        fn(self)
+
+    def set_response(self, args):
+        result = args.get('result', 0)
+        if result:
+            self.set_exception(BGAPIError(result, args))
+        else:
+            self._response = args
+            self._finish()
+
+    def set_exception(self, exception):
+        self._exception = exception
+        self._finish()
+
+    def _finish(self):
+        with self._lock:
+            self._done.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for fn in callbacks:
+            fn(self)
+
+
+class CommandQueue(Queue):
+    '''
+    Queue of BGAPI command packets waiting to be sent to the dongle.
+
+    Every put also writes a byte to a pipe, so the listener thread can select()
+    on fileno() next to the serial port and wake up as soon as a command is
+    queued instead of polling the queue.  fileno() is None where that is not
+    supported.
+    '''
+    def __init__(self):
+        Queue.__init__(self)
+        self.wakeup_r = self.wakeup_w = None
+        if fcntl:
+            self.wakeup_r, self.wakeup_w = os.pipe()
+            for fd in (self.wakeup_r, self.wakeup_w):
+                fcntl.fcntl(fd, fcntl.F_SETFL, fcntl.fcntl(fd, fcntl.F_GETFL) | os.O_NONBLOCK)
+
+    def _put(self, item):
+        Queue._put(self, item)
+        if self.wakeup_w is None:
+            return
+        try:
+            os.write(self.wakeup_w, b'\x00')
+        except OSError as e:
+            # A full pipe already guarantees a wake up
+            if e.errno != errno.EAGAIN:
+                raise
+
+    def send(self, packet, timeout=None):
+        '''
+        Queue a command packet and return a CommandFuture for its response
+        '''
+        future = CommandFuture(packet, timeout)
+        self.put(future)
+        return future
+
+    def fileno(self):
+        return self.wakeup_r
+
+    def clear_wakeup(self):
+        '''
+        Drain the wake up pipe, call before checking the queue for new commands
+        '''
+        if self.wakeup_r is None:
+            return
+        try:
+            while os.read(self.wakeup_r, 4096):
+                pass
+        except OSError as e:
+            if e.errno != errno.EAGAIN:
+                raise
@@ -0,0 +1,283 @@
+#!/usr/bin/env python
+################################################################################
+#
+# @brief Connects to many devices at once, keeping every connection slot busy
+#
+# @date Created 2026/10/17
+#
+# @copyright Copyright &copy 2026 Ashton Instruments
+################################################################################
+
+from collections import deque
+from threading import Condition
+import logging
+from .Device import Device
+from .utils import monotonic, ConnectTimeout
+
+logger = logging.getLogger('BLEPython')
+
+# Connection slots of a BLED112 with the stock firmware
+DEFAULT_MAX_CONNECTIONS = 3
+
+
+class NoFreeSlot(Exception):
+    pass
+
+
+class ConnectionResult(object):
+    '''
+    Outcome of connecting to one target of a ConnectionManager
+    '''
+    def __init__(self, device):
+        self.device = device
+        self.connected = False
+        self.attempts = 0
+        # Seconds from the start of connect_all until service discovery
+        # finished, and for the successful attempt alone
+        self.time_to_connected = None
+        self.attempt_time = None
+        self.error = None
+
+    def __repr__(self):
+        if self.connected:
+            return '<%s connected after %.3fs, %d attempts>' % (self.device, self.time_to_connected, self.attempts)
+        return '<%s failed after %d attempts: %r>' % (self.device, self.attempts, self.error)
+
+
+class _Attempt(object):
+    ESTABLISHING = 1    # gap_connect_direct sent, waiting for connection_status
+    DISCOVERING = 2     # link up, waiting for service discovery to finish
+
+    def __init__(self, device, now, timeout):
+        self.device = device
+        self.state = _Attempt.ESTABLISHING
+        self.started = now
+        self.deadline = now + timeout
+
+
+class ConnectionManager(object):
+    '''
+    Connects to a list of devices keeping every free connection slot busy.
+
+    The dongle establishes one connection at a time, so the next
+    gap_connect_direct goes out as soon as the previous link is up while
+    service discovery on the established links carries on in parallel.
+
+    Each attempt (link establishment plus discovery) has timeout seconds, a
+    failed attempt is retried up to retries times, waiting backoff seconds
+    doubled for every further retry and until the link of the failed attempt
+    is down.  Events are tagged with the attempt they belong to, so a late
+    event of a failed attempt can't fail the retry.
+
+    With disconnect=True every device is disconnected once it is connected
+    and on_connected(device) has returned, freeing its slot for the next
+    target.  Otherwise devices stay connected and targets left over once all
+    slots are taken fail with NoFreeSlot.
+
+    profile is the connection profile used for every target, by default each
+    device's connection_profile, and services limits discovery as for
+    Device.connect.
+    '''
+    def __init__(self, adapter, max_connections=None, timeout=10, retries=2, backoff=0.5,
+                 on_connected=None, disconnect=False, profile=None, services=None):
+        self.adapter = adapter
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.on_connected = on_connected
+        self.disconnect = disconnect
+        self.profile = profile
+        self.services = services
+        self._cond = Condition()
+        self._establishing = None
+        self._attempts = {}
+        # Device -> the attempt whose link is up
+        self._links = {}
+        self._events = deque()
+        # Connected devices waiting for on_connected/disconnect
+        self._connected = deque()
+
+    def _query_max_connections(self):
+        try:
+            return self.adapter.send(self.adapter.bglib.ble_cmd_system_get_connections()).result()['maxconn']
+        except Exception as e:
+            logger.warning('Could not read the number of connections: %r', e)
+            return DEFAULT_MAX_CONNECTIONS
+
+    def connect_all(self, devices):
+        '''
+        Connect to (and discover) all devices, blocks until every device is
+        connected or has failed
+
+        :return: Dict of Device -> ConnectionResult
+        '''
+        if self.max_connections is None:
+            self.max_connections = self._query_max_connections()
+
+        start = monotonic()
+        results = dict((d, ConnectionResult(d)) for d in devices)
+        # (not before, device) in the order the targets were given
+        waiting = deque((start, d) for d in devices if d.state != Device.READY)
+        for d in devices:
+            if d.state == Device.READY:
+                results[d].connected = True
+                results[d].time_to_connected = 0
+                self._connected.append(d)
+
+        bglib = self.adapter.bglib
+        bglib.ble_evt_connection_status += self._connection_status
+        for d in devices:
+            d.add_connection_callback(self._connection_changed)
+        try:
+            done = False
+            while not done:
+                with self._cond:
+                    now = monotonic()
+                    self._process_events(now, results, waiting, start)
+                    self._check_deadlines(now, results, waiting)
+                    self._start_next(now, results, waiting)
+                    done = not (waiting or self._attempts)
+                    if not done:
+                        self._cond.wait(self._next_wakeup(now, waiting))
+                # Outside the lock, on_connected may take a while
+                self._finish_connected(results)
+        finally:
+            bglib.ble_evt_connection_status -= self._connection_status
+            for d in devices:
+                d.remove_connection_callback(self._connection_changed)
+        return results
+
+    # Listener thread side, only records what happened
+
+    def _connection_status(self, sender, args):
+        with self._cond:
+            attempt = self._establishing
+            if attempt and (args['flags'] & 0x05) == 0x05 and\
+                    list(args['address']) == list(bytearray(attempt.device.addr)):
+                self._links[attempt.device] = attempt
+                self._events.append(('link', attempt))
+                self._cond.notify()
+
+    def _connection_changed(self, device, connected):
+        with self._cond:
+            if connected:
+                attempt = self._links.get(device)
+            else:
+                attempt = self._links.pop(device, None)
+            self._events.append(('connected' if connected else 'disconnected', attempt))
+            self._cond.notify()
+
+    def _command_failed(self, attempt):
+        def callback(future):
+            if future.exception(0):
+                with self._cond:
+                    self._events.append(('refused', attempt, future.exception(0)))
+                    self._cond.notify()
+        return callback
+
+    # Manager thread side
+
+    def _process_events(self, now, results, waiting, start):
+        while self._events:
+            event = self._events.popleft()
+            kind, attempt = event[0], event[1]
+            # Waking up is all a device's disconnect does once its attempt
+            # is over, a retry may be waiting for it to become idle
+            if attempt is None or self._attempts.get(attempt.device) is not attempt:
+                continue
+            device = attempt.device
+            if kind == 'link' and attempt.state == _Attempt.ESTABLISHING:
+                attempt.state = _Attempt.DISCOVERING
+                self._establishing = None
+            elif kind == 'connected':
+                result = results[device]
+                result.connected = True
+                result.time_to_connected = now - start
+                result.attempt_time = now - attempt.started
+                result.error = None
+                del self._attempts[device]
+                if attempt is self._establishing:
+                    self._establishing = None
+                self._connected.append(device)
+            elif kind == 'disconnected':
+                self._failed(attempt, now, results, waiting, ConnectTimeout('Disconnected during discovery'))
+            elif kind == 'refused':
+                self._failed(attempt, now, results, waiting, event[2])
+
+    def _failed(self, attempt, now, results, waiting, error):
+        device = attempt.device
+        del self._attempts[device]
+        if attempt is self._establishing:
+            self._establishing = None
+        result = results[device]
+        result.error = error
+        if result.attempts <= self.retries:
+            delay = self.backoff * (2 ** (result.attempts - 1))
+            logger.debug('Connecting to %s failed (%r), retrying in %.1fs', device, error, delay)
+            waiting.append((now + delay, device))
+        else:
+            logger.debug('Giving up on %s: %r', device, error)
+
+    def _check_deadlines(self, now, results, waiting):
+        for attempt in list(self._attempts.values()):
+            if now < attempt.deadline:
+                continue
+            # Cancels the connect if the link is not up yet, the link may have
+            # come up since the last events were processed
+            attempt.device.start_disconnect()
+            self._failed(attempt, now, results, waiting, ConnectTimeout())
+
+    def _free_slots(self):
+        used = len(self.adapter.connections)
+        if self._establishing:
+            used += 1
+        return self.max_connections - used
+
+    def _start_next(self, now, results, waiting):
+        if self._establishing or not waiting:
+            return
+        if self._free_slots() <= 0:
+            # Nothing will free a slot, the remaining targets can't connect.
+            # The link of a failed attempt frees one once it is down.
+            if not self._attempts and not self._connected and not self.disconnect and\
+                    all(device.state == Device.IDLE for _, device in waiting):
+                for _, device in waiting:
+                    results[device].error = NoFreeSlot()
+                waiting.clear()
+            return
+        # First target whose backoff has passed and, after a failed attempt,
+        # whose link is down again
+        for i, (not_before, device) in enumerate(waiting):
+            if not_before <= now and device.state == Device.IDLE:
+                del waiting[i]
+                break
+        else:
+            return
+        attempt = _Attempt(device, now, self.timeout)
+        self._attempts[device] = attempt
+        self._establishing = attempt
+        results[device].attempts += 1
+        logger.debug('Connecting to %s (attempt %d)', device, results[device].attempts)
+        device.start_connect(self.profile, self.services).add_done_callback(self._command_failed(attempt))
+
+    def _next_wakeup(self, now, waiting):
+        if self._connected:
+            return 0
+        deadlines = [a.deadline for a in self._attempts.values()]
+        deadlines += [not_before for not_before, _ in waiting if not_before > now]
+        if not deadlines:
+            return None
+        return max(0, min(deadlines) - now)
+
+    def _finish_connected(self, results):
+        while self._connected:
+            device = self._connected.popleft()
+            if self.on_connected:
+                try:
+                    self.on_connected(device)
+                except Exception:
+                    logger.exception('on_connected failed for %s', device)
+            if self.disconnect:
+                # The slot counts as free once the disconnected event arrives
+                device.start_disconnect()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+################################################################################
+#
+# @brief Connection parameters and named connection profiles
+#
+# @date Created 2026/10/17
+#
+# @copyright Copyright &copy 2026 Ashton Instruments
+################################################################################
+
+# Connection intervals are programmed in units of 1.25 ms, supervision
+# timeouts in units of 10 ms
+INTERVAL_UNIT_MS = 1.25
+INTERVAL_MIN = 6        # 7.5 ms
+INTERVAL_MAX = 3200     # 4 s
+TIMEOUT_UNIT_MS = 10
+TIMEOUT_MIN = 10        # 100 ms
+TIMEOUT_MAX = 3200      # 32 s
+LATENCY_MAX = 500
+
+
+class ConnectionParameters(object):
+    '''
+    Connection interval range, slave latency and supervision timeout used
+    for gap_connect_direct and connection_update.
+
+    Intervals and the timeout are in milliseconds, latency is the number of
+    connection events the peripheral may skip.  Short intervals give low
+    latency and high throughput, long intervals and latency save power.
+    '''
+    def __init__(self, interval_min, interval_max, latency=0, timeout=1000, name=None):
+        self.interval_min = interval_min
+        self.interval_max = interval_max
+        self.latency = latency
+        self.timeout = timeout
+        self.name = name
+
+        # Validates the parameters
+        self.units()
+
+    def units(self):
+        '''
+        :return: (interval_min, interval_max, latency, timeout) in BGAPI units
+        '''
+        interval_min = int(round(self.interval_min / INTERVAL_UNIT_MS))
+        interval_max = int(round(self.interval_max / INTERVAL_UNIT_MS))
+        timeout = int(round(float(self.timeout) / TIMEOUT_UNIT_MS))
+        if not INTERVAL_MIN <= interval_min <= interval_max <= INTERVAL_MAX:
+            raise ValueError('Connection interval %.2f-%.2f ms out of range' % (self.interval_min, self.interval_max))
+        if not 0 <= self.latency <= LATENCY_MAX:
+            raise ValueError('Slave latency %d out of range' % self.latency)
+        if not TIMEOUT_MIN <= timeout <= TIMEOUT_MAX:
+            raise ValueError('Supervision timeout %d ms out of range' % self.timeout)
+        # The link must survive the peripheral skipping latency events
+        if self.timeout <= (1 + self.latency) * self.interval_max * 2:
+            raise ValueError('Supervision timeout %d ms too short for the interval and latency' % self.timeout)
+        return interval_min, interval_max, self.latency, timeout
+
+    def __repr__(self):
+        return '<ConnectionParameters %s%.2f-%.2f ms, latency %d, timeout %d ms>' % (
+            self.name + ': ' if self.name else '', self.interval_min, self.interval_max, self.latency, self.timeout)
+
+
+LOW_LATENCY = ConnectionParameters(7.5, 15, 0, 1000, 'low-latency')
+HIGH_THROUGHPUT = ConnectionParameters(7.5, 10, 0, 2000, 'high-throughput')
+LOW_POWER = ConnectionParameters(100, 125, 4, 4000, 'low-power')
+
+PROFILES = dict((p.name, p) for p in (LOW_LATENCY, HIGH_THROUGHPUT, LOW_POWER))
+
+# What Device.connect always used
+DEFAULT_PROFILE = LOW_LATENCY
+
+
+def connection_profile(profile):
+    '''
+    :param profile: ConnectionParameters or the name of one of PROFILES
+    :return: ConnectionParameters
+    '''
+    if isinstance(profile, ConnectionParameters):
+        return profile
+    try:
+        return PROFILES[profile]
+    except KeyError:
+        raise ValueError('Unknown connection profile %r' % (profile,))
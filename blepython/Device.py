@@ -10,68 +10,308 @@
 # @copyright Copyright &copy 2015 Ashton Instruments
 ################################################################################
 
-from utils import address2str, uuid2str, ConnectTimeout
+from .utils import address2str, uuid2str, monotonic, CommandTimeout, ConnectTimeout, NotConnected
 import logging
-from Service import Service, BatteryService,\
+import struct
+from .Service import Characteristic, Service, BatteryService,\
     DeviceInformationService, GenericAccessService,\
-    GenericAttributeService
-from datetime import datetime, timedelta
-import time
+    GenericAttributeService, READ_VALUE_MAX
+from .AdvertisementStats import AdvertisementStats
+from .GattCache import LAYOUT_VERSION
+from .ConnectionParameters import DEFAULT_PROFILE, INTERVAL_UNIT_MS, TIMEOUT_UNIT_MS, connection_profile
+from bisect import bisect_right
+from collections import deque
+from threading import Condition, Event, Lock
 
 logger = logging.getLogger('BLEPython')
 
+# Primary Service declaration, the attribute type find_by_type_value matches
+PRIMARY_SERVICE_UUID = 0x2800
+
+# Characteristic declaration, the attribute type read_by_type looks for
+CHARACTERISTIC_UUID = [0x03, 0x28]
+
+# Service, include and characteristic declarations, none of them descriptors
+DECLARATION_UUIDS = ([0x00, 0x28], [0x01, 0x28], [0x02, 0x28], [0x03, 0x28])
+
+
+def uuid2list(uuid):
+    '''
+    A 16-bit UUID as an int, or a UUID as bytes or list of ints (little
+    endian), to the list of ints BGAPI events carry
+    '''
+    if isinstance(uuid, int):
+        return [uuid & 0xFF, uuid >> 8]
+    return list(bytearray(uuid))
+
+
 class Device(object):
+    # Connection states
+    IDLE = 0            # not connected
+    CONNECTING = 1      # gap_connect_direct sent, waiting for the link
+    DISCOVERING = 2     # link up, service discovery running
+    READY = 3           # discovery completed
+    DISCONNECTING = 4   # disconnect sent, waiting for the link to drop
+
+    STATE_NAMES = ('idle', 'connecting', 'discovering', 'ready', 'disconnecting')
+
     FINDING_PRIMARY_SERVICES = 1
     FINDING_SECONDARY_SERVICES = 2
     FINDING_CHARACTERISTICS = 3
+    VERIFYING_CACHE = 4
+    READING_HASH = 5
+    FINDING_SERVICES_BY_UUID = 6
+    FINDING_DESCRIPTORS = 7
+
+    # BGAPI result for the ATT Invalid Handle error
+    ATT_INVALID_HANDLE = 0x0401
 
     BATTERY_SERVICE_UUID = 0x180F
     DEVICE_INFORMATION_UUID = 0x180A
     GENERIC_ACCESS_SERVICE_UUID = 0x1800
     GENERIC_ATTRIBUTE_SERVICE_UUID = 0x1801
 
-    def __init__(self, bglib, cmd_q, address):
+    def __init__(self, bglib, cmd_q, address, address_type=0, gatt_cache=None):
         self.address = address2str(address)
         self.addr = address
+        self.address_type = address_type
         self.name = ''
+        # Latest parsed advertisement and scan response (AdvertisingData)
+        self.advertising_data = None
+        self.scan_response_data = None
+        self.advertisements = AdvertisementStats()
         self.cmd_q = cmd_q
         self.bglib = bglib
         self.connection_handle = None
-        self.connected = False
+        # Parameters for the next connect, and those of the current link in
+        # ms as reported by the dongle
+        self.connection_profile = DEFAULT_PROFILE
+        self.connection_interval = None
+        self.connection_latency = None
+        self.supervision_timeout = None
+        self.state = Device.IDLE
+        # Notified on every state change
+        self.state_changed = Condition()
+        self.state_callbacks = []
         self.services = []
+        # Services sorted by start handle for range lookups, and every
+        # discovered attribute by handle
+        self.service_starts = []
+        self.service_ranges = []
+        self.handles = {}
         self.current_procedure = None
         self.custom_services = []
+        self.connection_callbacks = []
+        # GattCache to skip discovery with, and whether the current services
+        # came from it
+        self.gatt_cache = gatt_cache
+        self.from_cache = False
+        # (characteristic, read callback) of the hash read in progress
+        self._hash_read = None
+        # Service UUIDs for selective discovery (None discovers everything),
+        # those still to be searched for, and the services waiting for
+        # on-demand attribute discovery with their callbacks
+        self.discovery_services = None
+        self._finding = []
+        self._discovery_lock = Lock()
+        self._service_queue = deque()
+        # Characteristic discovery in progress: its handle range, what to do
+        # once done, the descriptor ranges left and the value handles found
+        self._range = None
+        self._range_callback = None
+        self._descriptor_ranges = []
+        self._value_handles = []
+        # Called with the response to the read_multiple in progress, None if
+        # it failed
+        self._read_multiple_callback = None
 
     def __str__(self):
         return '%s (%s)' % (self.address, self.name)
 
-    def connect(self, timeout=10):
-        logger.debug('Connecting to %s', self)
-        self.cmd_q.put(self.bglib.ble_cmd_gap_connect_direct(
+    @property
+    def connected(self):
+        return self.state == Device.READY
+
+    def connect(self, timeout=10, profile=None, services=None):
+        '''
+        Connect and discover services, raises ConnectTimeout
+
+        :param profile: ConnectionParameters or profile name ('low-latency',
+            'high-throughput', 'low-power'), defaults to connection_profile
+        :param services: Only look for these primary services (16-bit ints or
+            UUID lists), their attributes are discovered the first time the
+            application uses them, see Service.discover.  None discovers
+            everything up front.
+        '''
+        if self.state == Device.READY:
+            return
+        if self.state == Device.DISCONNECTING and not self.wait_for_state(Device.IDLE, timeout):
+            raise ConnectTimeout('Disconnect timed out')
+        # If another connect is in progress the dongle would refuse a second
+        # one, wait for that instead
+        in_progress = self.state in (Device.CONNECTING, Device.DISCOVERING)
+        if in_progress:
+            logger.debug('Waiting for the connection to %s in progress', self)
+        else:
+            logger.debug('Connecting to %s', self)
+            # Raises BGAPIError right away if the dongle refuses to connect
+            self.start_connect(profile, services).result()
+
+        if not self.wait_for_state((Device.READY, Device.IDLE), timeout):
+            if not in_progress:
+                self.cancel_connect()
+            raise ConnectTimeout
+        if self.state == Device.IDLE:
+            raise ConnectTimeout('Disconnected during discovery')
+
+    def start_connect(self, profile=None, services=None):
+        '''
+        Send the connect command without waiting for the connection.  Only
+        an idle device can connect, raises RuntimeError otherwise.
+
+        :return: CommandFuture for the response to gap_connect_direct
+        '''
+        command = self.connect_command(profile)
+        if not self._set_state(Device.CONNECTING, (Device.IDLE,)):
+            raise RuntimeError('%s is %s, not idle' % (self, Device.STATE_NAMES[self.state]))
+        self.discovery_services = None if services is None else [uuid2list(uuid) for uuid in services]
+        future = self.cmd_q.send(command)
+        future.add_done_callback(self._connect_response)
+        return future
+
+    def _connect_response(self, future):
+        if future.exception(0):
+            self._set_state(Device.IDLE, (Device.CONNECTING,))
+
+    def cancel_connect(self):
+        '''
+        Give up on a connection attempt whose link is not up yet
+        '''
+        if self._set_state(Device.IDLE, (Device.CONNECTING,)):
+            self.cmd_q.put(self.bglib.ble_cmd_gap_end_procedure())
+
+    def connect_command(self, profile=None):
+        if profile is None:
+            profile = self.connection_profile
+        interval_min, interval_max, latency, timeout = connection_profile(profile).units()
+        return self.bglib.ble_cmd_gap_connect_direct(
             self.addr,
-            1,
-            6,
-            12,
-            100,
-            0))
-
-        start_time = datetime.now()
-        while not self.connected:
-            if datetime.now() > start_time + timedelta(seconds=timeout):
-                raise ConnectTimeout
-            else:
-                time.sleep(0.1)
+            self.address_type,
+            interval_min,
+            interval_max,
+            timeout,
+            latency)
+
+    def update_connection(self, profile):
+        '''
+        Change the parameters of the current connection, e.g. to a short
+        interval for a bulk transfer and back afterwards.  The new parameters
+        are in connection_interval etc. once the dongle reports them.
+
+        :param profile: ConnectionParameters or profile name
+        :return: CommandFuture for the response to connection_update
+        '''
+        if self.connection_handle is None:
+            raise NotConnected
+        interval_min, interval_max, latency, timeout = connection_profile(profile).units()
+        return self.cmd_q.send(self.bglib.ble_cmd_connection_update(
+            self.connection_handle, interval_min, interval_max, latency, timeout))
+
+    def add_connection_callback(self, callback):
+        '''
+        Call callback(device, connected) once discovery has completed after a
+        connect and when the device disconnects.  Runs on the listener thread.
+        '''
+        self.connection_callbacks.append(callback)
+
+    def remove_connection_callback(self, callback):
+        self.connection_callbacks.remove(callback)
+
+    def _connection_changed(self):
+        for callback in self.connection_callbacks[:]:
+            callback(self, self.connected)
+
+    def add_state_callback(self, callback):
+        '''
+        Call callback(device, old_state, new_state) on every state change.
+        Runs on the thread that caused the change, usually the listener.
+        '''
+        self.state_callbacks.append(callback)
 
-    def disconnect(self):
+    def remove_state_callback(self, callback):
+        self.state_callbacks.remove(callback)
+
+    def _set_state(self, state, from_states=None):
+        '''
+        Move to state, only if currently in one of from_states when given
+
+        :return: True if the state changed
+        '''
+        with self.state_changed:
+            old = self.state
+            if old == state or (from_states is not None and old not in from_states):
+                return False
+            self.state = state
+            self.state_changed.notify_all()
+        logger.debug('%s: %s -> %s', self, Device.STATE_NAMES[old], Device.STATE_NAMES[state])
+        for callback in self.state_callbacks[:]:
+            callback(self, old, state)
+        return True
+
+    def wait_for_state(self, states, timeout=None):
+        '''
+        Block until the device is in one of states
+
+        :param states: A state or a tuple of states
+        :param timeout: Seconds to wait at most, None waits forever
+        :return: False if timeout expired first
+        '''
+        if not isinstance(states, tuple):
+            states = (states,)
+        deadline = None if timeout is None else monotonic() + timeout
+        with self.state_changed:
+            while self.state not in states:
+                if deadline is None:
+                    self.state_changed.wait()
+                else:
+                    remaining = deadline - monotonic()
+                    if remaining <= 0:
+                        return False
+                    self.state_changed.wait(remaining)
+            return True
+
+    def disconnect(self, timeout=10):
+        '''
+        Disconnect and wait for the link to drop, raises ConnectTimeout
+        '''
         logger.debug('Disconnecting from %s', self)
-        self.cmd_q.put(self.bglib.ble_cmd_connection_disconnect(self.connection_handle))
-        while self.connected:
-            pass
+        self.start_disconnect()
+        if not self.wait_for_state(Device.IDLE, timeout):
+            raise ConnectTimeout('Disconnect timed out')
+
+    def start_disconnect(self):
+        '''
+        Send the disconnect command without waiting for the link to drop, a
+        connection attempt that has no link yet is cancelled instead
+
+        :return: CommandFuture for the response, None if nothing was sent
+        '''
+        handle = self.connection_handle
+        if handle is None:
+            self.cancel_connect()
+            return None
+        if not self._set_state(Device.DISCONNECTING, (Device.DISCOVERING, Device.READY)):
+            return None
+        return self.cmd_q.send(self.bglib.ble_cmd_connection_disconnect(handle))
 
     def register_custom_service_type(self, short_uuid, class_type):
         self.custom_services.append((short_uuid, class_type))
 
     def add_service(self, uuid, start, end):
+        '''
+        :return: The new Service, None if one with this UUID exists already
+        '''
+        s = None
         if not self.find_service(uuid):
             logger.debug('Adding service UUID: %s (%d:%d)', uuid2str(uuid), start, end)
 
@@ -102,14 +342,26 @@ class Device(object):
             if not s:
                 s = Service(self.bglib, self.connection_handle, self.cmd_q, uuid, start, end)
 
+            s.reader = self.read_many
             self.services.append(s)
+            i = bisect_right(self.service_starts, start)
+            self.service_starts.insert(i, start)
+            self.service_ranges.insert(i, s)
+        return s
 
     def remove_service(self, uuid):
         logger.debug('Removing service %s', uuid2str(uuid))
         s = self.find_service(uuid)
         if s:
+            for handle in [h for h in self.handles if s.start <= h <= s.end]:
+                del self.handles[handle]
+            s.discoverer = None
+            s.reader = None
             s.disconnect_handler()
             self.services.remove(s)
+            i = self.service_ranges.index(s)
+            del self.service_starts[i]
+            del self.service_ranges[i]
 
     def find_service(self, uuid):
         for s in self.services:
@@ -117,6 +369,17 @@ class Device(object):
                 return s
         return None
 
+    def find_service_by_handle(self, handle):
+        i = bisect_right(self.service_starts, handle) - 1
+        if i >= 0:
+            s = self.service_ranges[i]
+            if handle <= s.end:
+                return s
+        return None
+
+    def get_characteristic_by_handle(self, handle):
+        return self.handles.get(handle)
+
     def find_service_by_name(self, name):
         for s in self.services:
             if s.name == name:
@@ -124,47 +387,448 @@ class Device(object):
         return None
 
     def connection_status_handler(self, args):
-        logger.debug('Connected to %s', self)
-        if not self.connected and not self.connection_handle:
+        self.connection_interval = args['conn_interval'] * INTERVAL_UNIT_MS
+        self.connection_latency = args['latency']
+        self.supervision_timeout = args['timeout'] * TIMEOUT_UNIT_MS
+        if self.connection_handle is None and self.state in (Device.IDLE, Device.CONNECTING):
+            logger.debug('Connected to %s', self)
             self.connection_handle = args['connection']
+            self._set_state(Device.DISCOVERING)
 
-            # Start primary service discovery
-            self.cmd_q.put(self.bglib.ble_cmd_attclient_read_by_group_type(self.connection_handle, 1, 0xFFFF, [0x00, 0x28]))
-            self.current_procedure = Device.FINDING_PRIMARY_SERVICES
+            layout = self.gatt_cache.get(self) if self.gatt_cache else None
+            if layout is not None:
+                self._restore_layout(layout)
+            else:
+                self._discover()
+        else:
+            logger.debug('%s connection parameters: %.2f ms interval, latency %d, timeout %d ms', self,
+                         self.connection_interval, self.connection_latency, self.supervision_timeout)
 
     def connection_disconnected_handler(self, args):
         logger.debug('Disconnected from %s', self)
-        self.connected = False
         self.connection_handle = None
+        self.connection_interval = None
+        self.connection_latency = None
+        self.supervision_timeout = None
+        self.current_procedure = None
+        self._read_multiple_completed(None)
+        for c in list(self.handles.values()):
+            c.fail_pending(NotConnected())
+        with self._discovery_lock:
+            waiting, self._service_queue = self._service_queue, deque()
+        self._clear_services()
+
+        self._set_state(Device.IDLE)
+        self._connection_changed()
+        # Services still undiscovered, the callbacks see discovered False
+        for service, callback in waiting:
+            if callback:
+                callback(service)
 
+    def _clear_services(self):
         for s in self.services[:]:
             self.remove_service(s.uuid)
 
+    def _discover(self):
+        self._clear_services()
+        self.from_cache = False
+
+        if self.discovery_services is not None:
+            self._finding = list(self.discovery_services)
+            self._find_next_service()
+            return
+
+        # Start primary service discovery
+        self.cmd_q.put(self.bglib.ble_cmd_attclient_read_by_group_type(self.connection_handle, 1, 0xFFFF, [0x00, 0x28]))
+        self.current_procedure = Device.FINDING_PRIMARY_SERVICES
+
+    def _find_next_service(self):
+        if self._finding:
+            self.current_procedure = Device.FINDING_SERVICES_BY_UUID
+            self.cmd_q.put(self.bglib.ble_cmd_attclient_find_by_type_value(
+                self.connection_handle, 1, 0xFFFF, PRIMARY_SERVICE_UUID, self._finding[0]))
+        else:
+            logger.debug('Selective Service Discovery Completed')
+            self._discovery_completed()
+
+    def group_found_handler(self, args):
+        uuid = args['uuid']
+        selective = self.current_procedure == Device.FINDING_SERVICES_BY_UUID
+        if selective and not uuid:
+            # find_by_type_value results only carry the handle range
+            uuid = self._finding[0]
+        s = self.add_service(uuid, args['start'], args['end'])
+        if s is not None and selective:
+            s.discovered = False
+            s.discoverer = self.start_service_discovery
+
+    def start_service_discovery(self, service, callback=None):
+        '''
+        Discover the attributes of a service found by selective discovery
+        without blocking.  callback(service) is called on the listener thread
+        once they are known (service.discovered is True) or the link dropped.
+        '''
+        with self._discovery_lock:
+            pending = not service.discovered and service.discoverer is not None
+            if pending:
+                self._service_queue.append((service, callback))
+                first = len(self._service_queue) == 1
+        if not pending:
+            if callback:
+                callback(service)
+        elif first:
+            self._find_service_attributes(service)
+
+    def _find_service_attributes(self, service):
+        logger.debug('Discovering the attributes of %s (%d:%d)', service, service.start, service.end)
+        self._find_characteristics(service.start, service.end, self._service_attributes_found)
+
+    def _find_characteristics(self, start, end, callback):
+        '''
+        Discover the characteristic declarations in start..end, then the
+        descriptors after their values, then call callback()
+        '''
+        self._range = (start, end)
+        self._range_callback = callback
+        self.current_procedure = Device.FINDING_CHARACTERISTICS
+        self.cmd_q.put(self.bglib.ble_cmd_attclient_read_by_type(self.connection_handle, start, end, CHARACTERISTIC_UUID))
+
+    def _characteristics_found(self):
+        start, end = self._range
+        self._descriptor_ranges = []
+        for s in self.service_ranges:
+            if s.start <= end and s.end >= start:
+                self._descriptor_ranges += s.resolve_descriptors(start, end)
+        self._value_handles = sorted(handle for handle, c in self.handles.items()
+                                     if c.declaration_handle is not None and start <= handle <= end)
+        self._find_next_descriptors()
+
+    def _find_next_descriptors(self):
+        if self._descriptor_ranges:
+            first, last = self._descriptor_ranges.pop(0)
+            self.current_procedure = Device.FINDING_DESCRIPTORS
+            self.cmd_q.put(self.bglib.ble_cmd_attclient_find_information(self.connection_handle, first, last))
+        else:
+            callback, self._range_callback = self._range_callback, None
+            self._value_handles = []
+            callback()
+
+    def attribute_found_handler(self, args):
+        s = self.find_service_by_handle(args['chrdecl'])
+        if s:
+            self.handles[args['value']] = s.add_characteristic(args['uuid'], args['value'], args['properties'], args['chrdecl'])
+
+    def _descriptor_found(self, uuid, handle):
+        # Merged ranges also return known declarations and values
+        if handle in self.handles or uuid in DECLARATION_UUIDS:
+            return
+        i = bisect_right(self._value_handles, handle) - 1
+        s = self.find_service_by_handle(handle)
+        if i >= 0 and s and self._value_handles[i] >= s.start:
+            self.handles[self._value_handles[i]].add_descriptor(uuid, handle)
+
+    def _service_attributes_found(self):
+        with self._discovery_lock:
+            if not self._service_queue:
+                return
+            service = self._service_queue[0][0]
+            service.discovered = True
+            callbacks = [callback for s, callback in self._service_queue if s is service]
+            self._service_queue = deque((s, callback) for s, callback in self._service_queue if s is not service)
+            next_service = self._service_queue[0][0] if self._service_queue else None
+        self.current_procedure = None
+        for callback in callbacks:
+            if callback:
+                callback(service)
+        if next_service is not None:
+            self._find_service_attributes(next_service)
+
+    def _discovery_completed(self):
+        self.current_procedure = None
+        if self._set_state(Device.READY, (Device.DISCOVERING,)):
+            self._connection_changed()
+
+    def _layout(self, hash_value):
+        services = []
+        for s in self.service_ranges:
+            services.append([s.uuid, s.start, s.end, [
+                [c.uuid, c.handle, c.properties, c.declaration_handle, sorted([h, uuid] for h, uuid in c.descriptors.items())]
+                for c in s.characteristics]])
+        return {'version': LAYOUT_VERSION, 'services': services, 'hash': hash_value}
+
+    def _hash_characteristic(self):
+        hash_uuid = self.gatt_cache.hash_uuid
+        for c in self.handles.values():
+            if c.uuid == hash_uuid:
+                return c
+        return None
+
+    def _read_hash(self, procedure, callback):
+        '''
+        Read the cache's hash characteristic, if the device has one
+
+        :return: False if it has none
+        '''
+        c = self._hash_characteristic()
+        if c is None:
+            return False
+        def read(value):
+            # Failures complete the procedure, or end the connection
+            if not isinstance(value, Exception):
+                callback(value)
+        c.read_callbacks.append(read)
+        self._hash_read = (c, read)
+        self.current_procedure = procedure
+        self.cmd_q.put(self.bglib.ble_cmd_attclient_read_by_handle(self.connection_handle, c.handle))
+        return True
+
+    def _hash_read_failed(self):
+        # The callback must not take the value of a later read
+        c, read = self._hash_read
+        self._hash_read = None
+        if read in c.read_callbacks:
+            c.read_callbacks.remove(read)
+
+    def _restore_layout(self, layout):
+        logger.debug('Restoring the GATT layout of %s from the cache', self)
+        self.from_cache = True
+        for uuid, start, end, characteristics in layout['services']:
+            s = self.add_service(uuid, start, end)
+            if s is None:
+                continue
+            for c_uuid, handle, properties, declaration_handle, descriptors in characteristics:
+                c = self.handles[handle] = s.add_characteristic(c_uuid, handle, properties, declaration_handle)
+                for descriptor_handle, descriptor_uuid in descriptors:
+                    c.add_descriptor(descriptor_uuid, descriptor_handle)
+
+        # One read instead of a full discovery tells whether the layout changed
+        expected = layout['hash']
+        if expected is None or not self._read_hash(Device.VERIFYING_CACHE,
+                                                   lambda value: self._verify_hash(expected, value)):
+            self._discovery_completed()
+
+    def _verify_hash(self, expected, value):
+        if self.current_procedure != Device.VERIFYING_CACHE:
+            return
+        if list(value) == expected:
+            self._discovery_completed()
+        else:
+            logger.debug('GATT database of %s changed', self)
+            self.gatt_cache.invalidate(self)
+            self._discover()
+
+    def _store_layout(self, hash_value):
+        self.gatt_cache.put(self, self._layout(hash_value))
+        self._discovery_completed()
+
+    def invalidate_gatt_cache(self):
+        '''
+        Forget the cached GATT layout.  If the current services came from the
+        cache they are thrown away and discovered again.
+        '''
+        if self.gatt_cache:
+            self.gatt_cache.invalidate(self)
+        if self.from_cache and self.connection_handle is not None:
+            self._set_state(Device.DISCOVERING)
+            self._discover()
+
     def procedure_complete_handler(self, args):
-        if self.current_procedure == Device.FINDING_PRIMARY_SERVICES:
+        if self.current_procedure is None and self._read_multiple_callback:
+            # read_multiple only completes like this when it fails
+            logger.debug('read_multiple failed: 0x%04X', args['result'])
+            self._read_multiple_completed(None)
+        elif self.current_procedure is None:
+            c = self.handles.get(args['chrhandle'])
+            if c is None or c.procedure_callback is None:
+                # Not every procedure completes with the characteristic's
+                # handle (execute write), there is one at a time
+                c = next((c for c in self.handles.values() if c.procedure_callback), None)
+            if c:
+                c.procedure_completed_handler(args)
+            if args['result'] == Device.ATT_INVALID_HANDLE and self.from_cache:
+                # A cached handle does not exist, the cached layout is stale
+                self.invalidate_gatt_cache()
+        elif self.current_procedure == Device.VERIFYING_CACHE:
+            # Reading the hash failed, it is not where the cache says
+            self._hash_read_failed()
+            self.gatt_cache.invalidate(self)
+            self._discover()
+        elif self.current_procedure == Device.READING_HASH:
+            self._hash_read_failed()
+            self._store_layout(None)
+        elif self.current_procedure == Device.FINDING_SERVICES_BY_UUID:
+            # Completes with an error when the service does not exist
+            self._finding.pop(0)
+            self._find_next_service()
+        elif self.current_procedure == Device.FINDING_CHARACTERISTICS:
+            # Completes with an error when there are no characteristics
+            self._characteristics_found()
+        elif self.current_procedure == Device.FINDING_DESCRIPTORS:
+            self._find_next_descriptors()
+        elif self.current_procedure == Device.FINDING_PRIMARY_SERVICES:
             logger.debug('Primary Service Discovery Completed')
             self.cmd_q.put(self.bglib.ble_cmd_attclient_read_by_group_type(self.connection_handle, 1, 0xFFFF, [0x01, 0x28]))
             self.current_procedure = Device.FINDING_SECONDARY_SERVICES
         elif self.current_procedure == Device.FINDING_SECONDARY_SERVICES:
             logger.debug('Secondary Service Discovery Completed')
-            self.cmd_q.put(self.bglib.ble_cmd_attclient_find_information(self.connection_handle, 1, 0xFFFF))
-            self.current_procedure = Device.FINDING_CHARACTERISTICS
-        elif self.current_procedure == Device.FINDING_CHARACTERISTICS:
-            logger.debug('Characteristic Discovery Completed')
-            self.current_procedure = None
-            self.connected = True
+            self._find_characteristics(1, 0xFFFF, self._all_characteristics_found)
+
+    def _all_characteristics_found(self):
+        logger.debug('Characteristic Discovery Completed')
+        if not self.gatt_cache:
+            self._discovery_completed()
+        elif not self._read_hash(Device.READING_HASH, self._store_layout):
+            self._store_layout(None)
+
+    def _add_attribute(self, uuid, handle):
+        s = self.find_service_by_handle(handle)
+        if s:
+            self.handles[handle] = s.add_characteristic(uuid, handle)
 
     def find_information_found_handler(self, args):
-        chrhandle = args['chrhandle']
-        for s in self.services:
-            if chrhandle in range(s.start, s.end + 1):
-                s.add_characteristic(args['uuid'], chrhandle)
+        if self.current_procedure == Device.FINDING_DESCRIPTORS:
+            self._descriptor_found(args['uuid'], args['chrhandle'])
+        else:
+            self._add_attribute(args['uuid'], args['chrhandle'])
 
     def attclient_attribute_value_handler(self, args):
-        atthandle = args['atthandle']
-        for s in self.services:
-            c = s.get_characteristic_by_handle(atthandle)
-            if c:
-                c.attclient_attribute_value_handler(args)
+        c = self.handles.get(args['atthandle'])
+        if c:
+            c.attclient_attribute_value_handler(args)
+
+    def read_multiple_response_handler(self, args):
+        self._read_multiple_completed(args['handles'])
+
+    def _read_multiple_completed(self, value):
+        callback, self._read_multiple_callback = self._read_multiple_callback, None
+        if callback:
+            callback(value)
+
+    @staticmethod
+    def read_groups(characteristics):
+        '''
+        Group characteristics into read_multiple requests.  The response
+        holds the values back to back without their lengths and is cut at
+        READ_VALUE_MAX, so a group holds characteristics whose value_length
+        is known plus at most one variable-length one, last.
+
+        :return: List of groups (lists of characteristics), a group of one
+            is read on its own
+        '''
+        groups = []     # [used bytes, characteristics]
+        closed = []
+        variable = []
+        for c in characteristics:
+            if not c.supports(Characteristic.READ) or (c.value_length or 0) > READ_VALUE_MAX:
+                closed.append([c])
+            elif c.value_length is None:
+                variable.append(c)
+            else:
+                for group in groups:
+                    if group[0] + c.value_length <= READ_VALUE_MAX:
+                        group[0] += c.value_length
+                        group[1].append(c)
+                        break
+                else:
+                    groups.append([c.value_length, [c]])
+        for c in variable:
+            # Where the most room is left, the value is least likely cut off
+            room = [g for g in groups if g[0] < READ_VALUE_MAX]
+            if room:
+                group = min(room, key=lambda g: g[0])
+                groups.remove(group)
+                closed.append(group[1] + [c])
+            else:
+                closed.append([c])
+        return [g[1] for g in groups] + closed
+
+    @staticmethod
+    def split_read_multiple(group, value):
+        '''
+        Split a read_multiple response for group (see read_groups) into the
+        values of its characteristics
+
+        :return: Dict of characteristic -> value, without the variable-length
+            value if the response may have cut it off.  None if the length
+            does not add up.
+        '''
+        values = {}
+        offset = 0
+        for c in group:
+            if c.value_length is None:
+                if offset > len(value):
+                    return None
+                if len(value) < READ_VALUE_MAX:
+                    values[c] = value[offset:]
+                offset = len(value)
+            else:
+                values[c] = value[offset:offset + c.value_length]
+                offset += c.value_length
+        if offset != len(value):
+            return None
+        return values
+
+    def start_read_multiple(self, group, callback):
+        '''
+        Read the characteristics in group with one read_multiple request
+
+        :param callback: Called with the dict split_read_multiple() returns,
+            None if the request failed.  Runs on the listener thread.
+        :return: CommandFuture for the dongle's response
+        '''
+        if self.connection_handle is None:
+            raise NotConnected
+
+        def completed(value):
+            values = None if value is None else Device.split_read_multiple(group, value)
+            if value is not None and values is None:
+                logger.debug('read_multiple response of %d bytes does not match the value lengths', len(value))
+            callback(values)
+
+        def refused(future):
+            if future.exception(0) and self._read_multiple_callback == completed:
+                self._read_multiple_completed(None)
+
+        logger.debug('Reading handles %s with read_multiple', ', '.join(str(c.handle) for c in group))
+        self._read_multiple_callback = completed
+        handles = struct.pack('<%dH' % len(group), *[c.handle for c in group])
+        future = self.cmd_q.send(self.bglib.ble_cmd_attclient_read_multiple(self.connection_handle, handles))
+        future.add_done_callback(refused)
+        return future
+
+    def read_many(self, characteristics, timeout=3):
+        '''
+        Read several characteristics, batching those with a known
+        value_length into read_multiple requests (see read_groups).  The
+        others, and the members of requests that fail or whose response does
+        not add up, are read one by one with Characteristic.read.
+
+        Blocks, so it must not be called from the listener thread.
+
+        :return: List of the values in the order of characteristics
+        '''
+        unique = []
+        for c in characteristics:
+            if c not in unique:
+                unique.append(c)
+        values = {}
+        for group in Device.read_groups(unique):
+            if len(group) == 1:
+                continue
+            done = Event()
+            result = []
+
+            def callback(group_values):
+                result.append(group_values)
+                done.set()
+            self.start_read_multiple(group, callback)
+            if not done.wait(timeout):
+                self._read_multiple_completed(None)
+                raise CommandTimeout
+            values.update(result[0] or {})
+        for c in characteristics:
+            if c not in values:
+                values[c] = c.read(timeout)
+        return [values[c] for c in characteristics]
 
 
@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+################################################################################
+#
+# @brief Index of the devices seen by an adapter
+#
+# @date Created 2026/10/17
+#
+# @copyright Copyright &copy 2026 Ashton Instruments
+################################################################################
+
+from collections import OrderedDict
+from threading import Lock
+import heapq
+import logging
+from .Device import Device
+from .utils import address2key, monotonic
+
+logger = logging.getLogger('BLEPython')
+
+
+class DeviceRegistry(object):
+    '''
+    Devices keyed by their binary address and address type.
+
+    Lookups are a dict access, so ingesting advertisements does not slow down
+    as more devices are collected.  Only the listener thread inserts, any
+    thread may iterate: iteration works on an immutable snapshot that is
+    rebuilt only after devices were added or removed.
+
+    Devices not seen for ttl seconds are evicted, and once there are more
+    than capacity devices the least recently seen ones are, so that rotating
+    random addresses don't grow the registry forever.  Evictions happen in
+    batches as devices are added (or from expire()); devices that are not
+    idle (connecting, connected or disconnecting) are never evicted.  Both
+    limits are off by default.
+    '''
+    def __init__(self, ttl=None, capacity=None):
+        self.ttl = ttl
+        self.capacity = capacity
+        self._lock = Lock()
+        self._devices = OrderedDict()   # (address key, address type) -> Device, in discovery order
+        self._by_address = {}           # address key -> Device
+        self._snapshot = ()
+        self._next_expiry = None
+        self.evicted = 0
+
+    def get(self, address, address_type=None):
+        '''
+        Find a device by address
+
+        :param address: 6 byte address as bytes, bytearray or a list of ints
+            (little endian, as in BGAPI packets)
+        :param address_type: 0 (public) or 1 (random), None matches either
+        :return: Device or None
+        '''
+        key = address2key(address)
+        if address_type is None:
+            return self._by_address.get(key)
+        return self._devices.get((key, address_type))
+
+    def add(self, device):
+        key = address2key(device.addr)
+        with self._lock:
+            self._devices[(key, device.address_type)] = device
+            self._by_address[key] = device
+            self._snapshot = None
+        if self.capacity is not None and len(self._devices) > self.capacity:
+            self.expire()
+        elif self.ttl is not None:
+            now = monotonic()
+            if self._next_expiry is None:
+                self._next_expiry = now + self.ttl
+            elif now >= self._next_expiry:
+                self.expire(now)
+
+    def remove(self, device):
+        key = address2key(device.addr)
+        with self._lock:
+            if self._devices.get((key, device.address_type)) is device:
+                del self._devices[(key, device.address_type)]
+                self._snapshot = None
+            if self._by_address.get(key) is device:
+                # The same address may be known with the other address type
+                other = self._devices.get((key, 1 - device.address_type))
+                if other is None:
+                    del self._by_address[key]
+                else:
+                    self._by_address[key] = other
+
+    def expire(self, now=None):
+        '''
+        Evict the devices that are past the TTL and, when over capacity, the
+        least recently seen ones down to 90% of the capacity
+
+        :return: Number of devices evicted
+        '''
+        if now is None:
+            now = monotonic()
+        # A device that is connecting still needs its entry for the
+        # connection_status to land on
+        candidates = [d for d in self.snapshot() if d.state == Device.IDLE]
+        evict = []
+        if self.ttl is not None:
+            limit = now - self.ttl
+            evict = [d for d in candidates if (d.advertisements.last_seen or now) < limit]
+            # Sweep again once the oldest survivor could have expired
+            self._next_expiry = now + self.ttl
+        if self.capacity is not None:
+            excess = len(self._devices) - len(evict) - self.capacity
+            if excess > 0:
+                excess += self.capacity // 10
+                evicted = set(map(id, evict))
+                evict += heapq.nsmallest(excess, (d for d in candidates if id(d) not in evicted),
+                                         key=lambda d: d.advertisements.last_seen or now)
+        for d in evict:
+            self.remove(d)
+        if evict:
+            self.evicted += len(evict)
+            logger.debug('Evicted %d devices, %d left', len(evict), len(self._devices))
+        return len(evict)
+
+    def snapshot(self):
+        '''
+        Tuple of all devices in discovery order, safe to keep and iterate
+        '''
+        snapshot = self._snapshot
+        if snapshot is None:
+            with self._lock:
+                snapshot = self._snapshot = tuple(self._devices.values())
+        return snapshot
+
+    def __iter__(self):
+        return iter(self.snapshot())
+
+    def __len__(self):
+        return len(self._devices)
+
+    def __getitem__(self, index):
+        return self.snapshot()[index]
+
+    def __contains__(self, device):
+        return self.get(device.addr, device.address_type) is device
+
+    def __repr__(self):
+        return repr(list(self.snapshot()))
@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+################################################################################
+#
+# @brief Cache of discovered GATT databases, to skip discovery on reconnect
+#
+# @date Created 2026/10/17
+#
+# @copyright Copyright &copy 2026 Ashton Instruments
+################################################################################
+
+from threading import Lock
+import json
+import logging
+import os
+from .utils import address2str
+
+logger = logging.getLogger('BLEPython')
+
+# Database Hash characteristic (Generic Attribute service)
+DATABASE_HASH_UUID = [0x2A, 0x2B]
+
+# Layouts stored in another format are ignored
+LAYOUT_VERSION = 1
+
+
+class GattCache(object):
+    '''
+    GATT layouts (services and the attributes in them) of devices, keyed by
+    address and address type.
+
+    Layouts are kept in memory and, when path is given, in one JSON file per
+    device in that directory so they survive restarts.
+
+    If the device has a characteristic with hash_uuid its value is stored
+    with the layout and read back on every reconnect: a different value
+    means the layout changed and the device is discovered again.  The default
+    is the Database Hash, any characteristic whose value changes with the
+    layout (e.g. a firmware revision) works as well.  Without one the layout
+    is trusted until Device.invalidate_gatt_cache() is called, which also
+    happens when a cached handle turns out not to exist.
+
+    A layout is a dict:
+        'version': LAYOUT_VERSION
+        'services': [[uuid, start, end, characteristics], ...]
+        'hash': value of the hash characteristic or None
+    with characteristics a list of
+        [uuid, value handle, properties, declaration handle, [[handle, uuid], ...]]
+    the last being the descriptors.
+    '''
+    def __init__(self, path=None, hash_uuid=DATABASE_HASH_UUID):
+        self.path = path
+        self.hash_uuid = hash_uuid
+        self._lock = Lock()
+        self._layouts = {}
+        if path is not None and not os.path.isdir(path):
+            os.makedirs(path)
+
+    @staticmethod
+    def key(device):
+        return '%s_%d' % (address2str(bytearray(device.addr)), device.address_type)
+
+    def _filename(self, key):
+        return os.path.join(self.path, key + '.json')
+
+    def get(self, device):
+        '''
+        :return: The cached layout of device or None
+        '''
+        key = GattCache.key(device)
+        with self._lock:
+            layout = self._layouts.get(key)
+        if layout is None and self.path is not None:
+            layout = self._load(key)
+            if layout is not None:
+                with self._lock:
+                    self._layouts[key] = layout
+        return layout
+
+    def put(self, device, layout):
+        key = GattCache.key(device)
+        with self._lock:
+            self._layouts[key] = layout
+        if self.path is not None:
+            try:
+                with open(self._filename(key), 'w') as f:
+                    json.dump(layout, f)
+            except (IOError, OSError) as e:
+                logger.warning('Could not store the GATT layout of %s: %r', device, e)
+
+    def invalidate(self, device):
+        key = GattCache.key(device)
+        logger.debug('Invalidating the cached GATT layout of %s', device)
+        with self._lock:
+            self._layouts.pop(key, None)
+        if self.path is not None:
+            try:
+                os.remove(self._filename(key))
+            except OSError:
+                pass
+
+    def _load(self, key):
+        try:
+            with open(self._filename(key)) as f:
+                layout = json.load(f)
+            if 'services' not in layout or 'hash' not in layout:
+                raise ValueError('Not a GATT layout')
+            if layout.get('version') != LAYOUT_VERSION:
+                logger.debug('Ignoring GATT cache file %s in an old format', self._filename(key))
+                return None
+            return layout
+        except (IOError, OSError):
+            return None
+        except (ValueError, KeyError, TypeError) as e:
+            logger.warning('Ignoring corrupt GATT cache file %s: %r', self._filename(key), e)
+            return None
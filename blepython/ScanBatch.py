@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+################################################################################
+#
+# @brief Columnar batches of raw scan responses
+#
+# @date Created 2026/10/17
+#
+# @copyright Copyright &copy 2026 Ashton Instruments
+################################################################################
+
+from array import array
+from .utils import monotonic
+
+# Advertisements per batch unless the caller says otherwise
+SCAN_BATCH_SIZE = 1024
+
+# Advertising and scan response data are at most 31 bytes
+MAX_AD_LENGTH = 31
+
+# Offsets into a ble_evt_gap_scan_response packet (4 byte header included):
+# rssi, packet_type, sender[6], address_type, bond, data length, data
+_RSSI = 4
+_PACKET_TYPE = 5
+_SENDER = 6
+_ADDRESS_TYPE = 12
+_DATA_LENGTH = 14
+_DATA = 15
+
+
+class ScanBatch(object):
+    '''
+    A preallocated batch of scan responses stored column by column.
+
+    Row i of the batch is:
+        timestamps[i]          monotonic() seconds when the packet was framed
+        addresses[6*i:6*i+6]   sender address, little endian as in BGAPI
+        address_types[i]       0 public, 1 random
+        rssis[i]               signed RSSI
+        packet_types[i]        gap_scan_response packet type
+        payload[payload_offsets[i]:payload_offsets[i] + payload_lengths[i]]
+                               the raw advertising data
+
+    Only the first count rows are valid.
+    '''
+    def __init__(self, size=SCAN_BATCH_SIZE):
+        self.size = size
+        self.count = 0
+        self.timestamps = array('d', [0.0]) * size
+        self.addresses = bytearray(6 * size)
+        self.address_types = array('B', [0]) * size
+        self.rssis = array('b', [0]) * size
+        self.packet_types = array('B', [0]) * size
+        self.payload_offsets = array('I', [0]) * size
+        self.payload_lengths = array('B', [0]) * size
+        self.payload = bytearray(MAX_AD_LENGTH * size)
+        self.payload_used = 0
+
+    def __len__(self):
+        return self.count
+
+    def full(self):
+        return self.count >= self.size
+
+    def clear(self):
+        self.count = 0
+        self.payload_used = 0
+
+    def address(self, i):
+        return bytes(self.addresses[6 * i:6 * i + 6])
+
+    def data(self, i):
+        offset = self.payload_offsets[i]
+        return bytes(self.payload[offset:offset + self.payload_lengths[i]])
+
+    def row(self, i):
+        '''
+        Row i as a tuple (timestamp, address, address type, rssi, packet type,
+        data), for inspection rather than bulk processing
+        '''
+        return (self.timestamps[i], self.address(i), self.address_types[i],
+                self.rssis[i], self.packet_types[i], self.data(i))
+
+
+class ScanBatchCollector(object):
+    '''
+    Raw BGLib handler for ble_evt_gap_scan_response that appends packets to
+    ScanBatches and hands each full batch to callback(batch).
+
+    The callback owns the batch it is given, the collector continues with a
+    new one.  Runs on the listener thread.
+    '''
+    def __init__(self, callback, batch_size=SCAN_BATCH_SIZE):
+        self.callback = callback
+        self.batch_size = batch_size
+        self.batch = ScanBatch(batch_size)
+        self.dropped = 0
+
+    def packet(self, buf, offset, length):
+        batch = self.batch
+        i = batch.count
+        data_length = buf[offset + _DATA_LENGTH] if length >= _DATA else 0
+        if length < _DATA + data_length or data_length > MAX_AD_LENGTH:
+            # Malformed, the decoder would have dropped it as well
+            self.dropped += 1
+            return
+
+        batch.timestamps[i] = monotonic()
+        sender = offset + _SENDER
+        batch.addresses[6 * i:6 * i + 6] = buf[sender:sender + 6]
+        batch.address_types[i] = buf[offset + _ADDRESS_TYPE]
+        rssi = buf[offset + _RSSI]
+        batch.rssis[i] = rssi - 256 if rssi & 0x80 else rssi
+        batch.packet_types[i] = buf[offset + _PACKET_TYPE]
+        used = batch.payload_used
+        data = offset + _DATA
+        batch.payload[used:used + data_length] = buf[data:data + data_length]
+        batch.payload_offsets[i] = used
+        batch.payload_lengths[i] = data_length
+        batch.payload_used = used + data_length
+        batch.count = i + 1
+
+        if batch.count >= batch.size:
+            self.batch = ScanBatch(self.batch_size)
+            self.callback(batch)
+
+    def flush(self):
+        '''
+        Hand the current partial batch to the callback, if it has any rows
+        '''
+        batch = self.batch
+        if batch.count:
+            self.batch = ScanBatch(self.batch_size)
+            self.callback(batch)
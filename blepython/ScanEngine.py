@@ -0,0 +1,206 @@
+#!/usr/bin/env python
+################################################################################
+#
+# @brief Scan engine with explicit scan parameters and an adaptive duty cycle
+#
+# @date Created 2026/10/17
+#
+# @copyright Copyright &copy 2026 Ashton Instruments
+################################################################################
+
+from threading import Lock
+import logging
+import time
+from .utils import monotonic
+
+logger = logging.getLogger('BLEPython')
+
+# Scan interval and window are programmed in units of 0.625 ms
+SCAN_UNIT_MS = 0.625
+SCAN_TIME_MIN = 4       # 2.5 ms
+SCAN_TIME_MAX = 16384   # 10.24 s
+
+# gap_discover modes
+DISCOVER_LIMITED = 0
+DISCOVER_GENERIC = 1
+DISCOVER_OBSERVATION = 2
+
+
+def ms2units(ms):
+    units = int(round(ms / SCAN_UNIT_MS))
+    if not SCAN_TIME_MIN <= units <= SCAN_TIME_MAX:
+        raise ValueError('Scan interval/window %.1f ms out of range' % ms)
+    return units
+
+
+class ScanEngine(object):
+    '''
+    Runs discovery on an Adapter with explicit scan parameters.
+
+    interval and window are in milliseconds, the radio listens for window ms
+    out of every interval ms.  active sends scan requests (and gets scan
+    responses), passive only listens.
+
+    With adaptive=True the window is re-evaluated every period seconds: it
+    is doubled (up to the interval) when new devices were discovered during
+    the period and halved (down to min_window) after stable_periods periods
+    without a new device.  Changing the window restarts the scan.
+
+    Evaluation happens from tick(), which is called for every advertisement
+    and by scan(); call it periodically when scanning with start()/stop()
+    and nothing is in range.
+    '''
+    def __init__(self, adapter, interval=100, window=50, active=True, adaptive=False,
+                 min_window=10, period=2.0, stable_periods=3, mode=DISCOVER_GENERIC):
+        self.adapter = adapter
+        self.interval = interval
+        self.window = window
+        self.active = active
+        self.adaptive = adaptive
+        self.min_window = min_window
+        self.period = period
+        self.stable_periods = stable_periods
+        self.mode = mode
+        self.scan_filter = None
+        self.filter_duplicates = False
+        self.scanning = False
+        self._lock = Lock()
+
+        # Validates the parameters
+        self._parameters()
+        self._reset_metrics(monotonic())
+
+    def _parameters(self):
+        window = min(self.window, self.interval)
+        return ms2units(self.interval), ms2units(window), 1 if self.active else 0
+
+    def _reset_metrics(self, now):
+        self.started = now
+        self.advertisements = 0
+        self.discovered = 0
+        self.discovery_latency_sum = 0.0
+        self.discovery_latency_max = 0.0
+        self.restarts = 0
+        self.period_start = now
+        self.period_advertisements = 0
+        self.period_discovered = 0
+        self.stable_count = 0
+        self.advertisements_per_sec = 0.0
+
+    @property
+    def duty_cycle(self):
+        return float(min(self.window, self.interval)) / self.interval
+
+    def start(self, scan_filter=None, filter_duplicates=False):
+        '''
+        Program the scan parameters and start discovery, see Adapter.start_scan
+
+        :return: CommandFuture for the response to the discover command
+        '''
+        with self._lock:
+            self.scan_filter = scan_filter
+            self.filter_duplicates = filter_duplicates
+            self._reset_metrics(monotonic())
+            self.scanning = True
+            self.adapter.scan_engine = self
+            self.adapter.cmd_q.put(self.adapter.bglib.ble_cmd_gap_set_scan_parameters(*self._parameters()))
+            return self.adapter.start_scan(scan_filter, filter_duplicates, self.mode)
+
+    def stop(self):
+        with self._lock:
+            self.scanning = False
+            if self.adapter.scan_engine is self:
+                self.adapter.scan_engine = None
+            return self.adapter.stop_scan()
+
+    def scan(self, timeout, scan_filter=None, filter_duplicates=False):
+        '''
+        Scan for timeout seconds, blocking
+        '''
+        self.start(scan_filter, filter_duplicates)
+        end = monotonic() + timeout
+        try:
+            while monotonic() < end:
+                time.sleep(min(0.1, self.period))
+                self.tick()
+        finally:
+            self.stop().result()
+
+    def advertisement(self, new_device, now):
+        '''
+        Account for one advertisement, called by the adapter's listener
+        '''
+        self.advertisements += 1
+        self.period_advertisements += 1
+        if new_device:
+            latency = now - self.started
+            self.discovered += 1
+            self.period_discovered += 1
+            self.discovery_latency_sum += latency
+            if latency > self.discovery_latency_max:
+                self.discovery_latency_max = latency
+        if now - self.period_start >= self.period:
+            self.tick(now)
+
+    def tick(self, now=None):
+        '''
+        Close the current period once it has elapsed and, in adaptive mode,
+        adjust the window
+        '''
+        if now is None:
+            now = monotonic()
+        with self._lock:
+            elapsed = now - self.period_start
+            if not self.scanning or elapsed < self.period:
+                return
+            self.advertisements_per_sec = self.period_advertisements / elapsed
+            discovered = self.period_discovered
+            self.period_start = now
+            self.period_advertisements = 0
+            self.period_discovered = 0
+
+            if not self.adaptive:
+                return
+            window = self.window
+            if discovered:
+                self.stable_count = 0
+                window = min(self.interval, window * 2)
+            else:
+                self.stable_count += 1
+                if self.stable_count >= self.stable_periods:
+                    self.stable_count = 0
+                    window = max(self.min_window, window / 2.0)
+            if window != self.window:
+                logger.debug('Scan window %.1f -> %.1f ms', self.window, window)
+                self.window = window
+                self._restart()
+
+    def _restart(self):
+        # Scan parameters only take effect when discovery is (re)started
+        bglib = self.adapter.bglib
+        self.restarts += 1
+        self.adapter.cmd_q.put(bglib.ble_cmd_gap_end_procedure())
+        self.adapter.cmd_q.put(bglib.ble_cmd_gap_set_scan_parameters(*self._parameters()))
+        self.adapter.cmd_q.put(bglib.ble_cmd_gap_discover(self.mode))
+
+    def metrics(self, now=None):
+        '''
+        Snapshot of the scan metrics as a dict
+        '''
+        if now is None:
+            now = monotonic()
+        elapsed = now - self.started
+        return {
+            'interval_ms': self.interval,
+            'window_ms': min(self.window, self.interval),
+            'duty_cycle': self.duty_cycle,
+            'active': self.active,
+            'elapsed': elapsed,
+            'advertisements': self.advertisements,
+            'advertisements_per_sec': self.advertisements_per_sec,
+            'mean_advertisements_per_sec': self.advertisements / elapsed if elapsed > 0 else 0.0,
+            'devices_discovered': self.discovered,
+            'mean_discovery_latency': self.discovery_latency_sum / self.discovered if self.discovered else None,
+            'max_discovery_latency': self.discovery_latency_max if self.discovered else None,
+            'restarts': self.restarts,
+        }
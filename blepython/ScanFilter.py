@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+################################################################################
+#
+# @brief Scan filter for Adapter.start_scan
+#
+# @date Created 2026/10/17
+#
+# @copyright Copyright &copy 2026 Ashton Instruments
+################################################################################
+
+from .utils import address2key
+
+# gap_set_filtering scan policies
+SCAN_POLICY_ALL = 0
+SCAN_POLICY_WHITELIST = 1
+
+
+def _uuid_key(uuid):
+    '''
+    Normalize a UUID to the form AdvertisingData uses: an int for 16 and
+    32-bit UUIDs, 16 little endian bytes for 128-bit ones
+    '''
+    if isinstance(uuid, int):
+        return uuid
+    data = bytearray(uuid)
+    if len(data) == 2:
+        return data[0] | data[1] << 8
+    if len(data) == 4:
+        return data[0] | data[1] << 8 | data[2] << 16 | data[3] << 24
+    return bytes(data)
+
+
+class ScanFilter(object):
+    '''
+    Which advertisers a scan should report.
+
+    addresses is programmed into the dongle's whitelist, so advertisements
+    from other devices are dropped by the controller and never reach the
+    host.  The remaining criteria cannot be expressed in the controller and
+    are checked by the adapter on the parsed advertising data of every
+    advertisement: no Device is created for a new device that does not
+    match, and advertisements that do not match are not passed to
+    advertisement callbacks (scan_stream).  Known devices still record them
+    in their statistics.
+
+    :param addresses: Addresses to scan for, each a 6 byte address (bytes,
+        bytearray or list of ints, little endian) or an (address, address
+        type) tuple, the type defaults to public (0)
+    :param name_prefix: Only devices whose advertised name starts with this
+    :param service_uuids: Only devices advertising one of these service UUIDs
+        in a UUID list or as service data, 16/32-bit ints or UUID lists as used
+        by Service
+    :param min_rssi: Only advertisements at least this strong
+    '''
+    def __init__(self, addresses=None, name_prefix=None, service_uuids=None, min_rssi=None):
+        self.addresses = None
+        if addresses is not None:
+            self.addresses = []
+            for entry in addresses:
+                if isinstance(entry, tuple):
+                    address, address_type = entry
+                else:
+                    address, address_type = entry, 0
+                self.addresses.append((address2key(address), address_type))
+        self.name_prefix = name_prefix
+        self.service_uuids = None
+        if service_uuids is not None:
+            self.service_uuids = frozenset(_uuid_key(uuid) for uuid in service_uuids)
+        self.min_rssi = min_rssi
+
+    @property
+    def host_filtering(self):
+        return self.name_prefix is not None or self.service_uuids is not None or self.min_rssi is not None
+
+    def matches(self, rssi, ad_data):
+        '''
+        Check the host side criteria against one advertisement
+
+        :param rssi: RSSI of the advertisement
+        :param ad_data: Its AdvertisingData
+        '''
+        if self.min_rssi is not None and rssi < self.min_rssi:
+            return False
+        if self.name_prefix is not None:
+            if ad_data.name is None or not ad_data.name.startswith(self.name_prefix):
+                return False
+        if self.service_uuids is not None:
+            uuids = self.service_uuids
+            if uuids.isdisjoint(ad_data.uuid16) and uuids.isdisjoint(ad_data.uuid32) and\
+                    uuids.isdisjoint(ad_data.uuid128) and uuids.isdisjoint(ad_data.service_data):
+                return False
+        return True
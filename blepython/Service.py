@@ -10,13 +10,69 @@
 # @copyright Copyright &copy 2015 Ashton Instruments
 ################################################################################
 
-from utils import uuid2str, bytearray2str
+from .utils import uuid2str, bytearray2str, BGAPIError, CommandTimeout, NotConnected
+from .CommandQueue import CommandFuture
+from .WriteStream import WriteStream, DEFAULT_CHUNK_SIZE, DEFAULT_RETRY_DELAY
+from bisect import bisect_right
+from threading import Event, Timer
 import logging
-from Queue import Queue, Empty
+try:
+    from Queue import Queue, Empty
+except ImportError:
+    from queue import Queue, Empty
 logger = logging.getLogger('BLEPython')
 
+# Client Characteristic Configuration descriptor
+CCCD_UUID = [0x02, 0x29]
+
+# Handles one find_information response holds at the default MTU
+DESCRIPTOR_RANGE_GAP = 5
+
+# Longest value one write request and one prepare write request carry at the
+# default ATT MTU of 23, and the longest attribute value there is
+WRITE_VALUE_MAX = 20
+PREPARE_WRITE_VALUE_MAX = 18
+ATT_VALUE_MAX = 512
+
+# Seconds write_long waits for the peripheral to commit a value, about one
+# connection event per part at the longest connection interval
+WRITE_LONG_TIMEOUT = 10
+
+# Longest value in one read (or read multiple) response at the default MTU
+READ_VALUE_MAX = 22
+
+# Value lengths of the fixed-length SIG characteristics, by 16-bit UUID
+FIXED_VALUE_LENGTHS = {
+    0x2A01: 2,      # Appearance
+    0x2A04: 8,      # Peripheral Preferred Connection Parameters
+    0x2A07: 1,      # Tx Power Level
+    0x2A19: 1,      # Battery Level
+    0x2A23: 8,      # System ID
+    0x2A50: 7,      # PnP ID
+    0x2AA6: 1,      # Central Address Resolution
+    0x2B2A: 16,     # Database Hash
+}
+
 class Characteristic(object):
-    def __init__(self, bglib, connection_handle, cmd_q, uuid, handle):
+    # Characteristic properties from the declaration
+    BROADCAST = 0x01
+    READ = 0x02
+    WRITE_NO_RESPONSE = 0x04
+    WRITE = 0x08
+    NOTIFY = 0x10
+    INDICATE = 0x20
+    SIGNED_WRITE = 0x40
+    EXTENDED_PROPERTIES = 0x80
+
+    # attclient_attribute_value types
+    VALUE_READ = 0x00
+    VALUE_NOTIFY = 0x01
+    VALUE_INDICATE = 0x02
+    VALUE_READ_BY_TYPE = 0x03
+    VALUE_READ_BLOB = 0x04
+    VALUE_INDICATE_RSP_REQ = 0x05
+
+    def __init__(self, bglib, connection_handle, cmd_q, uuid, handle, properties=None, declaration_handle=None):
         self.bglib = bglib
         self.cmd_q = cmd_q
         self.uuid = uuid
@@ -27,10 +83,43 @@ class Characteristic(object):
             self.short_uuid = uuid[0:2]
 
         self.handle = handle
+        # Length of the value if it never changes, lets read_many batch the
+        # characteristic with others.  None for variable-length values.
+        self.value_length = None
+        if len(uuid) == 2:
+            self.value_length = FIXED_VALUE_LENGTHS.get((uuid[1] << 8) | uuid[0])
+        # Known when discovered from the characteristic declaration, None for
+        # attributes only seen by find_information
+        self.properties = properties
+        self.declaration_handle = declaration_handle
+        self.descriptors = {}   # handle -> UUID
+        self.cccd_handle = None
         self.name = 'Unknown'
         self.connection_handle = connection_handle
         self.rx_q = Queue()
         self.notification_callback = None
+        # One shot callbacks taking read data ahead of rx_q, oldest first.  A
+        # read that failed delivers the exception instead of the data.
+        self.read_callbacks = []
+        # One shot callback(args, error) for the procedure_completed event of
+        # the ATT procedure this characteristic has in progress, error is set
+        # instead of args when the procedure can't complete
+        self.procedure_callback = None
+        # Fragments of the value while read_long is in progress
+        self._long_value = None
+
+    def supports(self, properties):
+        '''
+        True if the characteristic has all of the given property bits, or
+        its properties are not known
+        '''
+        return self.properties is None or self.properties & properties == properties
+
+    def add_descriptor(self, uuid, handle):
+        logger.debug('Adding Descriptor UUID: %s Handle: %d to %d', uuid2str(uuid), handle, self.handle)
+        self.descriptors[handle] = uuid
+        if uuid == CCCD_UUID:
+            self.cccd_handle = handle
 
     def is_data_available(self):
         return not self.rx_q.empty()
@@ -40,33 +129,244 @@ class Characteristic(object):
             return self.rx_q.get()
         return None
 
-    def read(self):
+    def start_read(self):
+        '''
+        Read the value with read_long: a plain read that the dongle follows
+        with read blob requests only when the value fills the response.  The
+        fragments are joined and the whole value goes to read_callbacks or
+        rx_q once the procedure completes, a BGAPIError if the peripheral
+        refused the read.
+
+        :return: CommandFuture for the dongle's response to read_long
+        '''
         logger.debug('Reading handle %d (%s)', self.handle, uuid2str(self.short_uuid))
-        self.cmd_q.put(self.bglib.ble_cmd_attclient_read_by_handle(self.connection_handle, self.handle))
+        self._long_value = bytearray()
+        self.procedure_callback = self._long_read_completed
+        future = self.cmd_q.send(self.bglib.ble_cmd_attclient_read_long(self.connection_handle, self.handle))
+        future.add_done_callback(self._read_refused)
+        return future
+
+    def _read_refused(self, future):
+        if future.exception(0) and self.procedure_callback == self._long_read_completed:
+            self.procedure_callback = None
+            self._long_read_completed(None, future.exception(0))
+
+    def _long_read_completed(self, args, error):
+        value, self._long_value = self._long_value, None
+        if error is None and args['result']:
+            error = BGAPIError(args['result'], args)
+        if error is not None:
+            logger.debug('Reading handle %d failed: %r', self.handle, error)
+            self._value_read(error)
+        else:
+            self._value_read(list(value))
+
+    def read(self, timeout=3):
+        '''
+        Read the value, see start_read
+
+        :raises BGAPIError: The peripheral refused the read
+        :raises NotConnected: The connection was lost during the read
+        :raises CommandTimeout: No value within timeout seconds
+        '''
+        # Whatever is queued was left by reads that timed out
+        try:
+            while True:
+                self.rx_q.get_nowait()
+        except Empty:
+            pass
+        self.start_read()
 
         try:
-            data = self.rx_q.get(True, 3)
-        except Empty as e:
-            raise e
+            data = self.rx_q.get(True, timeout)
+        except Empty:
+            if self.procedure_callback == self._long_read_completed:
+                self.procedure_callback = None
+                self._long_value = None
+            raise CommandTimeout
 
+        if isinstance(data, Exception):
+            raise data
         return data
 
-    def write(self, data):
-        logger.debug('Writing handle %d (%s)', self.handle, uuid2str(self.short_uuid))
-        self.cmd_q.put(self.bglib.ble_cmd_attclient_attribute_write(self.connection_handle, self.handle, data))
+    def write(self, data, response=None):
+        '''
+        Write data to the characteristic
+
+        :param response: True sends a write request the peripheral
+            acknowledges, False a write command without response.  None picks
+            the write command when the characteristic supports it, it needs
+            no ATT round trip.  Values longer than WRITE_VALUE_MAX are always
+            written with write_long.
+        :return: CommandFuture for the dongle's response to the write command,
+            see write_long for long values
+        '''
+        if len(data) > WRITE_VALUE_MAX:
+            if response is False:
+                raise ValueError('%d bytes do not fit one write command' % len(data))
+            return self.write_long(data)
+        if response is None:
+            response = self.properties is None or not self.properties & Characteristic.WRITE_NO_RESPONSE
+        logger.debug('Writing handle %d (%s)%s', self.handle, uuid2str(self.short_uuid), '' if response else ' without response')
+        if response:
+            return self.cmd_q.send(self.bglib.ble_cmd_attclient_attribute_write(self.connection_handle, self.handle, data))
+        return self.cmd_q.send(self.bglib.ble_cmd_attclient_write_command(self.connection_handle, self.handle, data))
+
+    def write_long(self, data, timeout=WRITE_LONG_TIMEOUT):
+        '''
+        Write a value longer than one write request as a reliable write: the
+        peripheral queues the parts sent with prepare write requests and an
+        execute write commits them at once.  If any part is refused the queue
+        is cancelled and the value is left unchanged.
+
+        Each prepare write goes out from the listener thread as soon as the
+        previous one completes, the dongle runs one ATT procedure at a time.
+
+        :param timeout: Seconds for the whole write.  When they run out the
+            write fails with CommandTimeout and the parts still to send are
+            cancelled.
+        :return: CommandFuture that completes once the peripheral has
+            committed the value, failing with BGAPIError if it refused and
+            NotConnected if the connection was lost
+        '''
+        data = bytearray(data)
+        if len(data) > ATT_VALUE_MAX:
+            raise ValueError('%d bytes exceed the longest attribute value' % len(data))
+        logger.debug('Writing %d bytes to handle %d (%s) with prepare writes', len(data), self.handle, uuid2str(self.short_uuid))
+        written = CommandFuture(self.bglib.ble_cmd_attclient_execute_write(self.connection_handle, 1))
+
+        def fail(error):
+            if not written.done():
+                written.set_exception(error)
+
+        def refused(future):
+            if future.exception(0):
+                cancel(future.exception(0))
+
+        def cancel(error):
+            # The write fails once the cancel has completed too, so the next
+            # procedure can't take its completion
+            def cancelled(args, lost):
+                fail(lost or error)
+
+            def cancel_refused(future):
+                if future.exception(0) and self.procedure_callback == cancelled:
+                    self.procedure_callback = None
+                    fail(error)
+
+            self.procedure_callback = cancelled
+            self.cmd_q.send(self.bglib.ble_cmd_attclient_execute_write(self.connection_handle, 0))\
+                .add_done_callback(cancel_refused)
+
+        def prepare(offset):
+            chunk = data[offset:offset + PREPARE_WRITE_VALUE_MAX]
+            self.procedure_callback = lambda args, error: prepared(offset + len(chunk), args, error)
+            self.cmd_q.send(self.bglib.ble_cmd_attclient_prepare_write(self.connection_handle, self.handle, offset, chunk))\
+                .add_done_callback(refused)
+
+        def prepared(offset, args, error):
+            if error:
+                fail(error)
+            elif args['result']:
+                cancel(BGAPIError(args['result'], args))
+            elif written.done():
+                # Timed out, drop the parts the peripheral has queued
+                cancel(None)
+            elif offset < len(data):
+                prepare(offset)
+            else:
+                self.procedure_callback = executed
+                self.cmd_q.send(written.packet).add_done_callback(refused)
+
+        def executed(args, error):
+            if error:
+                fail(error)
+            elif not written.done():
+                written.set_response(args)
+
+        timer = Timer(timeout, fail, [CommandTimeout()])
+        timer.daemon = True
+        written.add_done_callback(lambda future: timer.cancel())
+        prepare(0)
+        timer.start()
+        return written
+
+    def write_stream(self, data, chunk_size=DEFAULT_CHUNK_SIZE, retry_delay=DEFAULT_RETRY_DELAY, timeout=None):
+        '''
+        Stream data to the characteristic with write commands, as fast as
+        the dongle's TX buffers drain.  Blocks, so it must not be called from
+        the listener thread.
+
+        :param data: A buffer or an iterable of buffers, see WriteStream.chunks
+        :param chunk_size: Bytes per write command, at most the ATT MTU - 3
+        :param timeout: Seconds for the whole stream
+        :return: The finished WriteStream with bytes_sent and bytes_per_sec
+        '''
+        if not self.supports(Characteristic.WRITE_NO_RESPONSE):
+            raise ValueError('Handle %d does not support write without response' % self.handle)
+        return WriteStream(self, data, chunk_size, retry_delay).run(timeout)
+
+    def set_notifications(self, enable=True):
+        '''
+        Subscribe through the CCCD, to notifications if the characteristic
+        supports them (they need no confirmation) and to indications
+        otherwise
+
+        :return: CommandFuture for the CCCD write, None if there is no CCCD
+        '''
+        if self.cccd_handle is None:
+            return None
+        value = 0x0000
+        if enable:
+            value = 0x0002 if self.properties is not None and not self.properties & Characteristic.NOTIFY and\
+                self.properties & Characteristic.INDICATE else 0x0001
+        logger.debug('Setting CCCD %d of handle %d to 0x%04X', self.cccd_handle, self.handle, value)
+        return self.cmd_q.send(self.bglib.ble_cmd_attclient_attribute_write(
+            self.connection_handle, self.cccd_handle, [value & 0xFF, value >> 8]))
 
     def attclient_attribute_value_handler(self, args):
-        if args['type'] == 0x01:
+        value_type = args['type']
+        if value_type == Characteristic.VALUE_INDICATE_RSP_REQ:
+            # The peripheral waits for the confirmation before indicating again
+            self.cmd_q.put(self.bglib.ble_cmd_attclient_indicate_confirm(self.connection_handle))
+        if value_type in (Characteristic.VALUE_NOTIFY, Characteristic.VALUE_INDICATE, Characteristic.VALUE_INDICATE_RSP_REQ):
             if self.notification_callback:
                 # This is a notification event
                 logger.debug('Calling notification callback for handle %d (%s)', self.handle, uuid2str(self.short_uuid))
                 self.notification_callback(self.short_uuid, args['value'])
             else:
                 logger.warn('No notification callback for handle %d (%s)', self.handle, uuid2str(self.short_uuid))
-        elif args['type'] == 0x00:
+        elif self._long_value is not None and value_type in (Characteristic.VALUE_READ, Characteristic.VALUE_READ_BLOB):
+            # A fragment of a long read, the value is complete with the procedure
+            self._long_value.extend(args['value'])
+        elif value_type == Characteristic.VALUE_READ:
             # This is read data
+            self._value_read(args['value'])
+
+    def _value_read(self, value):
+        if self.read_callbacks:
+            self.read_callbacks.pop(0)(value)
+        else:
             logger.debug('Placing data onto RX Queue for handle %d (%s)', self.handle, uuid2str(self.short_uuid))
-            self.rx_q.put(args['value'])
+            self.rx_q.put(value)
+
+    def procedure_completed_handler(self, args):
+        callback, self.procedure_callback = self.procedure_callback, None
+        if callback:
+            callback(args, None)
+
+    def fail_pending(self, error):
+        '''
+        Fail the procedure in progress and the reads waiting for data with
+        error, e.g. NotConnected when the connection is lost
+        '''
+        callback, self.procedure_callback = self.procedure_callback, None
+        if callback:
+            callback(None, error)
+        self._long_value = None
+        callbacks, self.read_callbacks = self.read_callbacks, []
+        for callback in callbacks:
+            callback(error)
 
 class Service(object):
     def __init__(self, bglib, connection_handle, cmd_q, uuid, start, end):
@@ -83,19 +383,63 @@ class Service(object):
 
         self.start = start
         self.end = end
-        self.characteristics = []
+        self._characteristics = []
+        # False for services found by selective discovery until their
+        # attributes have been discovered, see discover()
+        self.discovered = True
+        self.discoverer = None
+        # Device.read_many of the device the service belongs to
+        self.reader = None
+
+    @property
+    def characteristics(self):
+        '''
+        The attributes of the service, discovered on first use if the device
+        connected with selective discovery
+        '''
+        if not self.discovered:
+            self.discover()
+        return self._characteristics
+
+    def discover(self, timeout=10):
+        '''
+        Discover the attributes in start..end if that has not happened yet.
+        Blocks, so it must not be called from the listener thread (i.e. from
+        callbacks).
+        '''
+        if self.discovered or self.discoverer is None:
+            return
+        done = Event()
+        self.discoverer(self, lambda service: done.set())
+        if not done.wait(timeout):
+            raise CommandTimeout
+        if not self.discovered:
+            raise NotConnected
+
+    def read_many(self, characteristics, timeout=3):
+        '''
+        Read several characteristics, batched into read multiple requests
+        where possible, see Device.read_many
+
+        :return: List of the values in the order of characteristics
+        '''
+        if self.reader is None:
+            return [c.read(timeout) for c in characteristics]
+        return self.reader(characteristics, timeout)
 
     def disconnect_handler(self):
-        for c in self.characteristics[:]:
+        for c in self._characteristics[:]:
             logger.debug('Removing Characteristic UUID: %s Handle: %d', uuid2str(c.uuid), c.handle)
-            self.characteristics.remove(c)
+            self._characteristics.remove(c)
 
     def __str__(self):
         return '%s -- %s' % (self.name, uuid2str(self.short_uuid))
 
-    def add_characteristic(self, uuid, handle):
+    def add_characteristic(self, uuid, handle, properties=None, declaration_handle=None):
         logger.debug('Adding Characteristic UUID: %s Handle: %d', uuid2str(uuid), handle)
-        self.characteristics.append(Characteristic(self.bglib, self.connection_handle, self.cmd_q, uuid, handle))
+        c = Characteristic(self.bglib, self.connection_handle, self.cmd_q, uuid, handle, properties, declaration_handle)
+        self._characteristics.append(c)
+        return c
 
     def get_handle_by_uuid(self, uuid):
         for c in self.characteristics:
@@ -114,6 +458,34 @@ class Service(object):
                 return c
         return None
 
+    def resolve_descriptors(self, start, end):
+        '''
+        Find the handle ranges within start..end that can hold descriptors:
+        between a characteristic value and the next declaration (or the end
+        of the service).
+
+        A characteristic that notifies or indicates must have a CCCD, so when
+        its range is a single handle that is the CCCD and it is added right
+        away.  The other ranges are returned for find_information, merged when
+        closer than one find_information response apart: fetching a few known
+        handles is cheaper than another procedure.
+        '''
+        declarations = sorted(c.declaration_handle for c in self._characteristics if c.declaration_handle is not None)
+        ranges = []
+        for c in sorted(self._characteristics, key=lambda c: c.handle):
+            if c.declaration_handle is None or not start <= c.handle <= end:
+                continue
+            i = bisect_right(declarations, c.handle)
+            last = min(end, self.end, declarations[i] - 1 if i < len(declarations) else self.end)
+            if c.handle + 1 == last and c.properties & (Characteristic.NOTIFY | Characteristic.INDICATE):
+                c.add_descriptor(CCCD_UUID, last)
+            elif c.handle < last:
+                if ranges and c.handle + 1 - ranges[-1][1] <= DESCRIPTOR_RANGE_GAP:
+                    ranges[-1][1] = last
+                else:
+                    ranges.append([c.handle + 1, last])
+        return ranges
+
 class GenericAttributeService(Service):
     def __init__(self, bglib, connection_handle, cmd_q, uuid, start, end):
         super(GenericAttributeService, self).__init__(bglib, connection_handle, cmd_q, uuid, start, end)
@@ -126,6 +498,8 @@ class GenericAccessService(Service):
         self.name = 'GenericAccessService'
         logger.debug('Created a GenericAccessService')
 
+    # The getters for one value do a single read, read_many has nothing to
+    # batch it with.  Use get_name_and_appearance() for both.
     def get_device_name(self):
         c = self.get_characteristic_by_uuid([0x00, 0x2a])
         return bytearray2str(c.read())
@@ -135,6 +509,21 @@ class GenericAccessService(Service):
         data = c.read()
         return (data[1] << 8) | data[0]
 
+    def get_name_and_appearance(self):
+        '''
+        Read the device name and the appearance with one request
+
+        :return: (name, appearance), None for a characteristic the service
+            does not have
+        '''
+        name_c = self.get_characteristic_by_uuid([0x00, 0x2a])
+        appearance_c = self.get_characteristic_by_uuid([0x01, 0x2a])
+        found = [c for c in (name_c, appearance_c) if c]
+        values = dict(zip(found, self.read_many(found)))
+        name = bytearray2str(values[name_c]) if name_c else None
+        appearance = (values[appearance_c][1] << 8) | values[appearance_c][0] if appearance_c else None
+        return name, appearance
+
 class BatteryService(Service):
     def __init__(self, bglib, connection_handle, cmd_q, uuid, start, end):
         super(BatteryService, self).__init__(bglib, connection_handle, cmd_q, uuid, start, end)
@@ -151,6 +540,8 @@ class DeviceInformationService(Service):
         self.name = 'DeviceInformationService'
         logger.debug('Created a DeviceInformationService')
 
+    # The getters for one string do a single read, read_many has nothing to
+    # batch it with.  Use get_device_information() for several.
     def get_manufacturer_name(self):
         c = self.get_characteristic_by_uuid([0x29, 0x2a])
         if c:
@@ -170,3 +561,46 @@ class DeviceInformationService(Service):
         c = self.get_characteristic_by_uuid([0x27, 0x2a])
         if c:
             return bytearray2str(c.read())
+
+    # Strings get_device_information() reads, by name
+    INFORMATION_STRINGS = (
+        ('manufacturer_name', [0x29, 0x2a]),
+        ('model_number', [0x24, 0x2a]),
+        ('serial_number', [0x25, 0x2a]),
+        ('hardware_revision', [0x27, 0x2a]),
+        ('firmware_revision', [0x26, 0x2a]),
+        ('software_revision', [0x28, 0x2a]),
+    )
+
+    # Fixed-length values get_device_information() reads along, by name
+    INFORMATION_VALUES = (
+        ('system_id', [0x23, 0x2a]),
+        ('pnp_id', [0x50, 0x2a]),
+    )
+
+    def get_device_information(self):
+        '''
+        Read all the information strings and the System ID and PnP ID the
+        device has with read_many
+
+        The strings have no fixed length, so read_multiple can't carry two of
+        them: the values in its response are not delimited.  The first string
+        goes into one request with the System ID and PnP ID (15 bytes), and
+        comes back with them if it is no longer than the 7 bytes left in the
+        response, otherwise it is read again on its own.  Every other string
+        takes a read of its own.  Their lengths are not learned from a first
+        read: a peripheral may change a string (e.g. the firmware revision
+        after an update) and a wrong length would split the batched response
+        at the wrong bytes.
+
+        :return: Dict of name -> value, e.g. 'manufacturer_name'.  The
+            strings are strings, 'system_id' and 'pnp_id' lists of ints.
+        '''
+        found = [(name, self.get_characteristic_by_uuid(uuid)) for name, uuid in
+                 DeviceInformationService.INFORMATION_VALUES + DeviceInformationService.INFORMATION_STRINGS]
+        found = [(name, c) for name, c in found if c]
+        values = self.read_many([c for _, c in found])
+        info = {}
+        for (name, c), value in zip(found, values):
+            info[name] = list(value) if c.value_length else bytearray2str(value)
+        return info
@@ -0,0 +1,205 @@
+#!/usr/bin/env python
+################################################################################
+#
+# @brief Streams data to a characteristic with write commands (no response)
+#
+# @date Created 2026/10/17
+#
+# @copyright Copyright &copy 2026 Ashton Instruments
+################################################################################
+
+from threading import Condition
+import logging
+import time
+from .utils import monotonic, BGAPIError, CommandTimeout
+
+logger = logging.getLogger('BLEPython')
+
+# Payload of one write command at the default ATT MTU of 23
+DEFAULT_CHUNK_SIZE = 20
+
+# The dongle answers a write command with this result while all of its TX
+# buffers hold packets for the link.  They drain at the next connection
+# events, so the stream waits about one (short) connection interval.
+OUT_OF_MEMORY = 0x0182
+DEFAULT_RETRY_DELAY = 0.0075
+
+
+def chunks(data, chunk_size=DEFAULT_CHUNK_SIZE):
+    '''
+    Split data into bytearrays of chunk_size bytes, the last one may be
+    shorter
+
+    :param data: A buffer (bytes, bytearray, memoryview or a list of ints) or
+        an iterable of buffers, e.g. blocks read from a file.  Blocks are
+        joined so every chunk but the last is full.
+    '''
+    if chunk_size < 1:
+        raise ValueError('Chunk size %d out of range' % chunk_size)
+    if isinstance(data, (bytes, bytearray, memoryview)) or\
+            (isinstance(data, list) and (not data or isinstance(data[0], int))):
+        data = [data]
+    pending = bytearray()
+    for block in data:
+        pending += bytearray(block)
+        full = len(pending) - len(pending) % chunk_size
+        for i in range(0, full, chunk_size):
+            yield pending[i:i + chunk_size]
+        del pending[:full]
+    if pending:
+        yield pending
+
+
+class WriteStream(object):
+    '''
+    Writes data to a characteristic as a sequence of write commands.
+
+    Each write command goes out as soon as the dongle has taken the previous
+    one, from the listener thread as the response arrives, so the command
+    queue never runs dry while the dongle has TX buffers free.  When they are
+    full the dongle refuses the write with OUT_OF_MEMORY: the stream stalls
+    and run() (or another driver) calls resume() after retry_delay to send
+    the same chunk again.  Any other error ends the stream.
+
+    Write commands are unacknowledged, a chunk counts as sent once the
+    dongle has accepted it.  Chunks are sent in order, never more than one
+    is outstanding.
+
+    state_callback(stream) is called from the listener thread whenever the
+    stream stalls or finishes.
+    '''
+    RUNNING = 1
+    STALLED = 2
+    DONE = 3
+
+    def __init__(self, characteristic, data, chunk_size=DEFAULT_CHUNK_SIZE, retry_delay=DEFAULT_RETRY_DELAY,
+                 state_callback=None):
+        self.characteristic = characteristic
+        self.retry_delay = retry_delay
+        self.state_callback = state_callback
+        self._chunks = chunks(data, chunk_size)
+        self._chunk = None
+        self._cancelled = False
+        self._cond = Condition()
+        self.state = None
+        self.error = None
+
+        self.bytes_sent = 0
+        self.chunks_sent = 0
+        self.retries = 0
+        self.started = None
+        self.finished = None
+
+    @property
+    def elapsed(self):
+        if self.started is None:
+            return 0
+        return (self.finished if self.finished is not None else monotonic()) - self.started
+
+    @property
+    def bytes_per_sec(self):
+        elapsed = self.elapsed
+        return self.bytes_sent / elapsed if elapsed else 0
+
+    def start(self):
+        self.started = monotonic()
+        self.state = WriteStream.RUNNING
+        self._next_chunk()
+
+    def resume(self):
+        '''
+        Send the chunk the dongle refused again
+        '''
+        with self._cond:
+            if self.state != WriteStream.STALLED:
+                return
+            self.state = WriteStream.RUNNING
+        self._send()
+
+    def cancel(self):
+        '''
+        Stop after the outstanding write command
+        '''
+        self._cancelled = True
+        if self.state == WriteStream.STALLED:
+            self._finish()
+
+    def run(self, timeout=None):
+        '''
+        Start the stream and block until all data has been sent.  Must not
+        be called from the listener thread.
+
+        :param timeout: Seconds for the whole stream, raises CommandTimeout
+            when exceeded
+        :return: self, see bytes_sent, elapsed and bytes_per_sec
+        '''
+        deadline = None if timeout is None else monotonic() + timeout
+        self.start()
+        while True:
+            with self._cond:
+                while self.state == WriteStream.RUNNING:
+                    remaining = None if deadline is None else deadline - monotonic()
+                    if remaining is not None and remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                state = self.state
+            if state == WriteStream.DONE:
+                break
+            if deadline is not None and monotonic() >= deadline:
+                self.cancel()
+                raise CommandTimeout
+            time.sleep(self.retry_delay)
+            self.resume()
+        if self.error:
+            raise self.error
+        return self
+
+    def _next_chunk(self):
+        try:
+            self._chunk = next(self._chunks) if not self._cancelled else None
+        except StopIteration:
+            self._chunk = None
+        if self._chunk is None:
+            self._finish()
+        else:
+            self._send()
+
+    def _send(self):
+        c = self.characteristic
+        c.cmd_q.send(c.bglib.ble_cmd_attclient_write_command(c.connection_handle, c.handle, self._chunk))\
+            .add_done_callback(self._sent)
+
+    def _sent(self, future):
+        error = future.exception(0)
+        if error is None:
+            self.bytes_sent += len(self._chunk)
+            self.chunks_sent += 1
+            self._next_chunk()
+        elif isinstance(error, BGAPIError) and error.result == OUT_OF_MEMORY and not self._cancelled:
+            self.retries += 1
+            with self._cond:
+                self.state = WriteStream.STALLED
+                self._cond.notify_all()
+            if self.state_callback:
+                self.state_callback(self)
+        else:
+            logger.debug('Write stream to handle %d failed after %d bytes: %r',
+                         self.characteristic.handle, self.bytes_sent, error)
+            self.error = error
+            self._finish()
+
+    def _finish(self):
+        with self._cond:
+            if self.state == WriteStream.DONE:
+                return
+            self.finished = monotonic()
+            self.state = WriteStream.DONE
+            self._cond.notify_all()
+        logger.debug('Wrote %d bytes to handle %d in %.3fs (%.0f bytes/s, %d retries)', self.bytes_sent,
+                     self.characteristic.handle, self.elapsed, self.bytes_per_sec, self.retries)
+        if self.state_callback:
+            self.state_callback(self)
+
+    def __repr__(self):
+        return '<WriteStream %d bytes in %.3fs, %.0f bytes/s, %d retries>' % (
+            self.bytes_sent, self.elapsed, self.bytes_per_sec, self.retries)
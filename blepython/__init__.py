@@ -1,7 +1,19 @@
-import bglib
-from Adapter import Adapter
+from . import bglib
+from .Adapter import Adapter
+from .AdvertisingData import Advertisement, AdvertisingData, parse_advertising_data
+from .ScanFilter import ScanFilter
+from .ScanEngine import ScanEngine
+from .ScanBatch import ScanBatch
+from .ConnectionManager import ConnectionManager, NoFreeSlot
+from .GattCache import GattCache
+from .WriteStream import WriteStream
+from .ConnectionParameters import ConnectionParameters, LOW_LATENCY, HIGH_THROUGHPUT, LOW_POWER
 import logging
-from utils import ConnectTimeout
+from .utils import ConnectTimeout, CommandTimeout, NotConnected, BGAPIError
+import sys
+
+if sys.version_info >= (3, 6):
+    from .AsyncAdapter import AsyncAdapter, AsyncDevice, AsyncCharacteristic
 
 logging.basicConfig(format='%(asctime)s:%(threadName)s:%(levelname)s:%(name)s:%(module)s:%(message)s', level=logging.DEBUG)
 logger = logging.getLogger('BLEPython')
@@ -46,8 +46,9 @@ __license__ = "MIT"
 __version__ = "2013-05-04"
 __email__ = "jeff@rowberg.net"
 
+import functools
+import re
 import struct
-import inspect
 
 # thanks to Masaaki Shibata for Python event handler code
 # http://www.emptypage.jp/notes/pyevent.en.html
@@ -56,11 +57,20 @@ class BGAPIEvent(object):
 
     def __init__(self, doc=None):
         self.__doc__ = doc
+        self.name = None
 
     def __get__(self, obj, objtype=None):
         if obj is None:
             return self
-        return BGAPIEventHandler(self, obj)
+        # One handler object per instance and event, created on first access
+        try:
+            return obj.__eventhandler__[self]
+        except AttributeError:
+            obj.__eventhandler__ = {}
+        except KeyError:
+            pass
+        handler = obj.__eventhandler__[self] = BGAPIEventHandler(self, obj)
+        return handler
 
     def __set__(self, obj, value):
         pass
@@ -73,15 +83,9 @@ class BGAPIEventHandler(object):
         self.event = event
         self.obj = obj
 
-    def _getfunctionlist(self):
-
-        """(internal use) """
-
-        try:
-            eventhandler = self.obj.__eventhandler__
-        except AttributeError:
-            eventhandler = self.obj.__eventhandler__ = {}
-        return eventhandler.setdefault(self.event, [])
+        # Replaced, never mutated, so firing needs no copy or lock even while
+        # another thread adds or removes handlers
+        self.handlers = ()
 
     def add(self, func):
 
@@ -91,7 +95,7 @@ class BGAPIEventHandler(object):
         You can add handler also by using '+=' operator.
         """
 
-        self._getfunctionlist().append(func)
+        self.handlers += (func,)
         return self
 
     def remove(self, func):
@@ -101,7 +105,9 @@ class BGAPIEventHandler(object):
         You can remove handler also by using '-=' operator.
         """
 
-        self._getfunctionlist().remove(func)
+        handlers = list(self.handlers)
+        handlers.remove(func)
+        self.handlers = tuple(handlers)
         return self
 
     def fire(self, earg=None):
@@ -110,14 +116,16 @@ class BGAPIEventHandler(object):
 
         You can call EventHandler object itself like e(earg) instead of
         e.fire(earg).
+
+        If the owner has an event_trace callable it is called first with the
+        event name and argument, for debugging.
         """
 
-        debug_output = inspect.stack()[1][4][0].rstrip().lstrip()
-        if 'ble_' in debug_output:
-            #print debug_output
-            pass
+        trace = getattr(self.obj, 'event_trace', None)
+        if trace is not None:
+            trace(self.event.name, earg)
 
-        for func in self._getfunctionlist():
+        for func in self.handlers:
             func(self.obj, earg)
 
     __iadd__ = add
@@ -125,6 +133,204 @@ class BGAPIEventHandler(object):
     __call__ = fire
 
 
+class BGAPIFramer(object):
+
+    """Splits the raw byte stream from the dongle into BGAPI packets
+
+    BGAPI packet structure (as of 2012-11-07):
+        Byte 0:
+              [7] - 1 bit, Message Type (MT)         0 = Command/Response, 1 = Event
+            [6:3] - 4 bits, Technology Type (TT)     0000 = Bluetooth 4.0 single mode, 0001 = Wi-Fi
+            [2:0] - 3 bits, Length High (LH)         Payload length (high bits)
+        Byte 1:     8 bits, Length Low (LL)          Payload length (low bits)
+        Byte 2:     8 bits, Class ID (CID)           Command class ID
+        Byte 3:     8 bits, Command ID (CMD)         Command ID
+        Bytes 4-n:  0 - 2048 Bytes, Payload (PL)     Up to 2048 bytes of payload
+
+    Received data is appended to one reusable bytearray and complete packets
+    are handed out as (offset, length) pairs into that buffer, so nothing is
+    copied until the decoder picks the fields out.  A partial packet at the
+    end of a chunk stays in the buffer until the next chunk arrives.
+    """
+
+    HEADER_LENGTH = 4
+
+    # Highest class ID defined for BLE (0..8) and Wi-Fi (0..9)
+    MAX_CLASS_ID = 9
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.offset = 0
+        self.discarded = 0
+
+    def reset(self):
+
+        """Drop any buffered (partial) packet data."""
+
+        del self.buffer[:]
+        self.offset = 0
+
+    def feed(self, data):
+
+        """Append a chunk of received bytes to the buffer.
+
+        Packets returned by next_packet() before this call are no longer valid
+        afterwards, because the consumed part of the buffer is reclaimed here.
+        """
+
+        if self.offset:
+            del self.buffer[:self.offset]
+            self.offset = 0
+        self.buffer += data
+
+    def next_packet(self):
+
+        """Return (offset, length) of the next complete packet, or None.
+
+        Bytes that cannot start a packet header (unknown technology type or
+        class ID) are skipped one at a time until the stream is back in sync.
+        """
+
+        buf = self.buffer
+        end = len(buf)
+        pos = self.offset
+        while end - pos >= self.HEADER_LENGTH:
+            b0 = buf[pos]
+            if b0 & 0x70 or buf[pos + 2] > self.MAX_CLASS_ID:
+                # Garbage or lost sync, resynchronize on the next byte
+                pos += 1
+                self.discarded += 1
+                continue
+            length = self.HEADER_LENGTH + (((b0 & 0x07) << 8) | buf[pos + 1])
+            if end - pos < length:
+                break
+            self.offset = pos + length
+            return pos, length
+        self.offset = pos
+        return None
+
+
+class BGAPIPacketDecoder(object):
+
+    """Decodes the payload of one BGAPI packet type into its event arguments
+
+    The fixed part of the payload is unpacked with a precompiled struct.  '6s'
+    fields are bd_addr values; they and the trailing uint8array (if any) are
+    returned as lists of ints, as the event handlers have always received them.
+    """
+
+    __slots__ = ('event', 'key', 'name', 'struct', 'fields', 'addresses',
+                 'array', 'array_offset', 'min_length', 'idle')
+
+    def __init__(self, event, message_type, packet_class, packet_command, name, fmt, fields, array=None):
+        self.event = event
+        self.key = (message_type << 16) | (packet_class << 8) | packet_command
+        self.name = name
+        self.fields = []
+        self.addresses = []
+        self.array = array
+        self.idle = False
+
+        # bd_addr fields are skipped by the struct and sliced out of the buffer
+        compiled = fmt[0]
+        field_offset = 0
+        for field, code in zip(fields, re.findall(r'\d*[a-zA-Z]', fmt[1:])):
+            if code == '6s':
+                self.addresses.append((field, field_offset))
+                code = '6x'
+            else:
+                self.fields.append(field)
+            compiled += code
+            field_offset += struct.calcsize('<' + code)
+        self.struct = struct.Struct(compiled)
+
+        # A uint8array is a length byte followed by the data
+        self.array_offset = self.struct.size + 1
+        self.min_length = self.array_offset if array else self.struct.size
+
+    def decode(self, buf, offset, end):
+
+        """Decode the payload in buf[offset:end], None if it is too short."""
+
+        if end - offset < self.min_length:
+            return None
+        args = dict(zip(self.fields, self.struct.unpack_from(buf, offset)))
+        for field, field_offset in self.addresses:
+            field_offset += offset
+            args[field] = list(buf[field_offset:field_offset + 6])
+        if self.array is not None:
+            args[self.array] = list(buf[offset + self.array_offset:end])
+        return args
+
+
+def uint8array(data):
+
+    """Return a uint8array/bd_addr command argument as a byte string.
+
+    bytes, bytearray and memoryview are used as they are, lists of ints (the
+    original BGLib argument type) are still accepted.
+    """
+
+    if isinstance(data, bytes):
+        return data
+    if isinstance(data, memoryview):
+        return data.tobytes()
+    return bytes(bytearray(data))
+
+
+# Number of packets each cached_command builder remembers before starting over
+COMMAND_CACHE_SIZE = 256
+
+def cached_command(builder):
+
+    """Memoize a command builder that only takes integer arguments.
+
+    Polling commands (read_by_handle on the same handle, get_rssi, ...) are
+    then built once and the same immutable packet is returned afterwards.
+    """
+
+    cache = {}
+
+    @functools.wraps(builder)
+    def cached_builder(self, *args, **kwargs):
+        if kwargs:
+            return builder(self, *args, **kwargs)
+        try:
+            return cache[args]
+        except KeyError:
+            if len(cache) >= COMMAND_CACHE_SIZE:
+                cache.clear()
+            packet = cache[args] = builder(self, *args)
+            return packet
+    return cached_builder
+
+
+# Precompiled fixed part of the commands that carry a uint8array or bd_addr
+_ble_cmd_system_endpoint_tx = struct.Struct('<4BBB')
+_ble_cmd_system_whitelist_append = struct.Struct('<4B6sB')
+_ble_cmd_system_whitelist_remove = struct.Struct('<4B6sB')
+_ble_cmd_flash_ps_save = struct.Struct('<4BHB')
+_ble_cmd_flash_write_words = struct.Struct('<4BHB')
+_ble_cmd_attributes_write = struct.Struct('<4BHBB')
+_ble_cmd_attributes_user_read_response = struct.Struct('<4BBBB')
+_ble_cmd_connection_channel_map_set = struct.Struct('<4BBB')
+_ble_cmd_connection_raw_tx = struct.Struct('<4BBB')
+_ble_cmd_attclient_find_by_type_value = struct.Struct('<4BBHHHB')
+_ble_cmd_attclient_read_by_group_type = struct.Struct('<4BBHHB')
+_ble_cmd_attclient_read_by_type = struct.Struct('<4BBHHB')
+_ble_cmd_attclient_attribute_write = struct.Struct('<4BBHB')
+_ble_cmd_attclient_write_command = struct.Struct('<4BBHB')
+_ble_cmd_attclient_prepare_write = struct.Struct('<4BBHHB')
+_ble_cmd_attclient_read_multiple = struct.Struct('<4BBB')
+_ble_cmd_sm_set_oob_data = struct.Struct('<4BB')
+_ble_cmd_gap_connect_direct = struct.Struct('<4B6sBHHHH')
+_ble_cmd_gap_set_adv_data = struct.Struct('<4BBB')
+_ble_cmd_gap_set_directed_connectable_mode = struct.Struct('<4B6sB')
+_ble_cmd_hardware_spi_transfer = struct.Struct('<4BBB')
+_ble_cmd_hardware_i2c_write = struct.Struct('<4BBBB')
+_ble_cmd_test_debug = struct.Struct('<4BB')
+
+
 class BGLib(object):
 
     def ble_cmd_system_reset(self, boot_in_dfu):
@@ -146,11 +352,14 @@ class BGLib(object):
     def ble_cmd_system_get_info(self):
         return struct.pack('<4B', 0, 0, 0, 8)
     def ble_cmd_system_endpoint_tx(self, endpoint, data):
-        return struct.pack('<4BBB' + str(len(data)) + 's', 0, 2 + len(data), 0, 9, endpoint, len(data), b''.join(chr(i) for i in data))
+        data = uint8array(data)
+        return _ble_cmd_system_endpoint_tx.pack(0, 2 + len(data), 0, 9, endpoint, len(data)) + data
     def ble_cmd_system_whitelist_append(self, address, address_type):
-        return struct.pack('<4B6sB', 0, 7, 0, 10, b''.join(chr(i) for i in address), address_type)
+        address = uint8array(address)
+        return _ble_cmd_system_whitelist_append.pack(0, 7, 0, 10, address, address_type)
     def ble_cmd_system_whitelist_remove(self, address, address_type):
-        return struct.pack('<4B6sB', 0, 7, 0, 11, b''.join(chr(i) for i in address), address_type)
+        address = uint8array(address)
+        return _ble_cmd_system_whitelist_remove.pack(0, 7, 0, 11, address, address_type)
     def ble_cmd_system_whitelist_clear(self):
         return struct.pack('<4B', 0, 0, 0, 12)
     def ble_cmd_system_endpoint_rx(self, endpoint, size):
@@ -164,7 +373,8 @@ class BGLib(object):
     def ble_cmd_flash_ps_erase_all(self):
         return struct.pack('<4B', 0, 0, 1, 2)
     def ble_cmd_flash_ps_save(self, key, value):
-        return struct.pack('<4BHB' + str(len(value)) + 's', 0, 3 + len(value), 1, 3, key, len(value), b''.join(chr(i) for i in value))
+        value = uint8array(value)
+        return _ble_cmd_flash_ps_save.pack(0, 3 + len(value), 1, 3, key, len(value)) + value
     def ble_cmd_flash_ps_load(self, key):
         return struct.pack('<4BH', 0, 2, 1, 4, key)
     def ble_cmd_flash_ps_erase(self, key):
@@ -172,19 +382,23 @@ class BGLib(object):
     def ble_cmd_flash_erase_page(self, page):
         return struct.pack('<4BB', 0, 1, 1, 6, page)
     def ble_cmd_flash_write_words(self, address, words):
-        return struct.pack('<4BHB' + str(len(words)) + 's', 0, 3 + len(words), 1, 7, address, len(words), b''.join(chr(i) for i in words))
+        words = uint8array(words)
+        return _ble_cmd_flash_write_words.pack(0, 3 + len(words), 1, 7, address, len(words)) + words
     def ble_cmd_attributes_write(self, handle, offset, value):
-        return struct.pack('<4BHBB' + str(len(value)) + 's', 0, 4 + len(value), 2, 0, handle, offset, len(value), b''.join(chr(i) for i in value))
+        value = uint8array(value)
+        return _ble_cmd_attributes_write.pack(0, 4 + len(value), 2, 0, handle, offset, len(value)) + value
     def ble_cmd_attributes_read(self, handle, offset):
         return struct.pack('<4BHH', 0, 4, 2, 1, handle, offset)
     def ble_cmd_attributes_read_type(self, handle):
         return struct.pack('<4BH', 0, 2, 2, 2, handle)
     def ble_cmd_attributes_user_read_response(self, connection, att_error, value):
-        return struct.pack('<4BBBB' + str(len(value)) + 's', 0, 3 + len(value), 2, 3, connection, att_error, len(value), b''.join(chr(i) for i in value))
+        value = uint8array(value)
+        return _ble_cmd_attributes_user_read_response.pack(0, 3 + len(value), 2, 3, connection, att_error, len(value)) + value
     def ble_cmd_attributes_user_write_response(self, connection, att_error):
         return struct.pack('<4BBB', 0, 2, 2, 4, connection, att_error)
     def ble_cmd_connection_disconnect(self, connection):
         return struct.pack('<4BB', 0, 1, 3, 0, connection)
+    @cached_command
     def ble_cmd_connection_get_rssi(self, connection):
         return struct.pack('<4BB', 0, 1, 3, 1, connection)
     def ble_cmd_connection_update(self, connection, interval_min, interval_max, latency, timeout):
@@ -194,37 +408,51 @@ class BGLib(object):
     def ble_cmd_connection_channel_map_get(self, connection):
         return struct.pack('<4BB', 0, 1, 3, 4, connection)
     def ble_cmd_connection_channel_map_set(self, connection, map):
-        return struct.pack('<4BBB' + str(len(map)) + 's', 0, 2 + len(map), 3, 5, connection, len(map), b''.join(chr(i) for i in map))
+        map = uint8array(map)
+        return _ble_cmd_connection_channel_map_set.pack(0, 2 + len(map), 3, 5, connection, len(map)) + map
     def ble_cmd_connection_features_get(self, connection):
         return struct.pack('<4BB', 0, 1, 3, 6, connection)
+    @cached_command
     def ble_cmd_connection_get_status(self, connection):
         return struct.pack('<4BB', 0, 1, 3, 7, connection)
     def ble_cmd_connection_raw_tx(self, connection, data):
-        return struct.pack('<4BBB' + str(len(data)) + 's', 0, 2 + len(data), 3, 8, connection, len(data), b''.join(chr(i) for i in data))
+        data = uint8array(data)
+        return _ble_cmd_connection_raw_tx.pack(0, 2 + len(data), 3, 8, connection, len(data)) + data
     def ble_cmd_attclient_find_by_type_value(self, connection, start, end, uuid, value):
-        return struct.pack('<4BBHHHB' + str(len(value)) + 's', 0, 8 + len(value), 4, 0, connection, start, end, uuid, len(value), b''.join(chr(i) for i in value))
+        value = uint8array(value)
+        return _ble_cmd_attclient_find_by_type_value.pack(0, 8 + len(value), 4, 0, connection, start, end, uuid, len(value)) + value
     def ble_cmd_attclient_read_by_group_type(self, connection, start, end, uuid):
-        return struct.pack('<4BBHHB' + str(len(uuid)) + 's', 0, 6 + len(uuid), 4, 1, connection, start, end, len(uuid), b''.join(chr(i) for i in uuid))
+        uuid = uint8array(uuid)
+        return _ble_cmd_attclient_read_by_group_type.pack(0, 6 + len(uuid), 4, 1, connection, start, end, len(uuid)) + uuid
     def ble_cmd_attclient_read_by_type(self, connection, start, end, uuid):
-        return struct.pack('<4BBHHB' + str(len(uuid)) + 's', 0, 6 + len(uuid), 4, 2, connection, start, end, len(uuid), b''.join(chr(i) for i in uuid))
+        uuid = uint8array(uuid)
+        return _ble_cmd_attclient_read_by_type.pack(0, 6 + len(uuid), 4, 2, connection, start, end, len(uuid)) + uuid
     def ble_cmd_attclient_find_information(self, connection, start, end):
         return struct.pack('<4BBHH', 0, 5, 4, 3, connection, start, end)
+    @cached_command
     def ble_cmd_attclient_read_by_handle(self, connection, chrhandle):
         return struct.pack('<4BBH', 0, 3, 4, 4, connection, chrhandle)
     def ble_cmd_attclient_attribute_write(self, connection, atthandle, data):
-        return struct.pack('<4BBHB' + str(len(data)) + 's', 0, 4 + len(data), 4, 5, connection, atthandle, len(data), b''.join(chr(i) for i in data))
+        data = uint8array(data)
+        return _ble_cmd_attclient_attribute_write.pack(0, 4 + len(data), 4, 5, connection, atthandle, len(data)) + data
     def ble_cmd_attclient_write_command(self, connection, atthandle, data):
-        return struct.pack('<4BBHB' + str(len(data)) + 's', 0, 4 + len(data), 4, 6, connection, atthandle, len(data), b''.join(chr(i) for i in data))
+        data = uint8array(data)
+        return _ble_cmd_attclient_write_command.pack(0, 4 + len(data), 4, 6, connection, atthandle, len(data)) + data
+    @cached_command
     def ble_cmd_attclient_indicate_confirm(self, connection):
         return struct.pack('<4BB', 0, 1, 4, 7, connection)
+    @cached_command
     def ble_cmd_attclient_read_long(self, connection, chrhandle):
         return struct.pack('<4BBH', 0, 3, 4, 8, connection, chrhandle)
     def ble_cmd_attclient_prepare_write(self, connection, atthandle, offset, data):
-        return struct.pack('<4BBHHB' + str(len(data)) + 's', 0, 6 + len(data), 4, 9, connection, atthandle, offset, len(data), b''.join(chr(i) for i in data))
+        data = uint8array(data)
+        return _ble_cmd_attclient_prepare_write.pack(0, 6 + len(data), 4, 9, connection, atthandle, offset, len(data)) + data
+    @cached_command
     def ble_cmd_attclient_execute_write(self, connection, commit):
         return struct.pack('<4BBB', 0, 2, 4, 10, connection, commit)
     def ble_cmd_attclient_read_multiple(self, connection, handles):
-        return struct.pack('<4BBB' + str(len(handles)) + 's', 0, 2 + len(handles), 4, 11, connection, len(handles), b''.join(chr(i) for i in handles))
+        handles = uint8array(handles)
+        return _ble_cmd_attclient_read_multiple.pack(0, 2 + len(handles), 4, 11, connection, len(handles)) + handles
     def ble_cmd_sm_encrypt_start(self, handle, bonding):
         return struct.pack('<4BBB', 0, 2, 5, 0, handle, bonding)
     def ble_cmd_sm_set_bondable_mode(self, bondable):
@@ -238,7 +466,8 @@ class BGLib(object):
     def ble_cmd_sm_get_bonds(self):
         return struct.pack('<4B', 0, 0, 5, 5)
     def ble_cmd_sm_set_oob_data(self, oob):
-        return struct.pack('<4BB' + str(len(oob)) + 's', 0, 1 + len(oob), 5, 6, len(oob), b''.join(chr(i) for i in oob))
+        oob = uint8array(oob)
+        return _ble_cmd_sm_set_oob_data.pack(0, 1 + len(oob), 5, 6, len(oob)) + oob
     def ble_cmd_gap_set_privacy_flags(self, peripheral_privacy, central_privacy):
         return struct.pack('<4BBB', 0, 2, 6, 0, peripheral_privacy, central_privacy)
     def ble_cmd_gap_set_mode(self, discover, connect):
@@ -246,7 +475,8 @@ class BGLib(object):
     def ble_cmd_gap_discover(self, mode):
         return struct.pack('<4BB', 0, 1, 6, 2, mode)
     def ble_cmd_gap_connect_direct(self, address, addr_type, conn_interval_min, conn_interval_max, timeout, latency):
-        return struct.pack('<4B6sBHHHH', 0, 15, 6, 3, b''.join(chr(i) for i in address), addr_type, conn_interval_min, conn_interval_max, timeout, latency)
+        address = uint8array(address)
+        return _ble_cmd_gap_connect_direct.pack(0, 15, 6, 3, address, addr_type, conn_interval_min, conn_interval_max, timeout, latency)
     def ble_cmd_gap_end_procedure(self):
         return struct.pack('<4B', 0, 0, 6, 4)
     def ble_cmd_gap_connect_selective(self, conn_interval_min, conn_interval_max, timeout, latency):
@@ -258,13 +488,16 @@ class BGLib(object):
     def ble_cmd_gap_set_adv_parameters(self, adv_interval_min, adv_interval_max, adv_channels):
         return struct.pack('<4BHHB', 0, 5, 6, 8, adv_interval_min, adv_interval_max, adv_channels)
     def ble_cmd_gap_set_adv_data(self, set_scanrsp, adv_data):
-        return struct.pack('<4BBB' + str(len(adv_data)) + 's', 0, 2 + len(adv_data), 6, 9, set_scanrsp, len(adv_data), b''.join(chr(i) for i in adv_data))
+        adv_data = uint8array(adv_data)
+        return _ble_cmd_gap_set_adv_data.pack(0, 2 + len(adv_data), 6, 9, set_scanrsp, len(adv_data)) + adv_data
     def ble_cmd_gap_set_directed_connectable_mode(self, address, addr_type):
-        return struct.pack('<4B6sB', 0, 7, 6, 10, b''.join(chr(i) for i in address), addr_type)
+        address = uint8array(address)
+        return _ble_cmd_gap_set_directed_connectable_mode.pack(0, 7, 6, 10, address, addr_type)
     def ble_cmd_hardware_io_port_config_irq(self, port, enable_bits, falling_edge):
         return struct.pack('<4BBBB', 0, 3, 7, 0, port, enable_bits, falling_edge)
     def ble_cmd_hardware_set_soft_timer(self, time, handle, single_shot):
         return struct.pack('<4BIBB', 0, 6, 7, 1, time, handle, single_shot)
+    @cached_command
     def ble_cmd_hardware_adc_read(self, input, decimation, reference_selection):
         return struct.pack('<4BBBB', 0, 3, 7, 2, input, decimation, reference_selection)
     def ble_cmd_hardware_io_port_config_direction(self, port, direction):
@@ -275,16 +508,19 @@ class BGLib(object):
         return struct.pack('<4BBBB', 0, 3, 7, 5, port, tristate_mask, pull_up)
     def ble_cmd_hardware_io_port_write(self, port, mask, data):
         return struct.pack('<4BBBB', 0, 3, 7, 6, port, mask, data)
+    @cached_command
     def ble_cmd_hardware_io_port_read(self, port, mask):
         return struct.pack('<4BBB', 0, 2, 7, 7, port, mask)
     def ble_cmd_hardware_spi_config(self, channel, polarity, phase, bit_order, baud_e, baud_m):
         return struct.pack('<4BBBBBBB', 0, 6, 7, 8, channel, polarity, phase, bit_order, baud_e, baud_m)
     def ble_cmd_hardware_spi_transfer(self, channel, data):
-        return struct.pack('<4BBB' + str(len(data)) + 's', 0, 2 + len(data), 7, 9, channel, len(data), b''.join(chr(i) for i in data))
+        data = uint8array(data)
+        return _ble_cmd_hardware_spi_transfer.pack(0, 2 + len(data), 7, 9, channel, len(data)) + data
     def ble_cmd_hardware_i2c_read(self, address, stop, length):
         return struct.pack('<4BBBB', 0, 3, 7, 10, address, stop, length)
     def ble_cmd_hardware_i2c_write(self, address, stop, data):
-        return struct.pack('<4BBBB' + str(len(data)) + 's', 0, 3 + len(data), 7, 11, address, stop, len(data), b''.join(chr(i) for i in data))
+        data = uint8array(data)
+        return _ble_cmd_hardware_i2c_write.pack(0, 3 + len(data), 7, 11, address, stop, len(data)) + data
     def ble_cmd_hardware_set_txpower(self, power):
         return struct.pack('<4BB', 0, 1, 7, 12, power)
     def ble_cmd_hardware_timer_comparator(self, timer, channel, mode, comparator_value):
@@ -300,7 +536,8 @@ class BGLib(object):
     def ble_cmd_test_get_channel_map(self):
         return struct.pack('<4B', 0, 0, 8, 4)
     def ble_cmd_test_debug(self, input):
-        return struct.pack('<4BB' + str(len(input)) + 's', 0, 1 + len(input), 8, 5, len(input), b''.join(chr(i) for i in input))
+        input = uint8array(input)
+        return _ble_cmd_test_debug.pack(0, 1 + len(input), 8, 5, len(input)) + input
 
     ble_rsp_system_reset = BGAPIEvent()
     ble_rsp_system_hello = BGAPIEvent()
@@ -633,19 +870,47 @@ class BGLib(object):
     on_before_tx_command = BGAPIEvent()
     on_tx_command_complete = BGAPIEvent()
 
-    bgapi_rx_buffer = []
-    bgapi_rx_expected_length = 0
+    # Fired for every response packet after its own ble_rsp_*/wifi_rsp_* event
+    on_response = BGAPIEvent()
+
     busy = False
     packet_mode = False
     debug = False
 
+    # Optional func(event_name, args) called for every event fired, for debugging
+    event_trace = None
+
+    def __init__(self):
+        self.__eventhandler__ = {}
+        self.framer = BGAPIFramer()
+        self.raw_handlers = {}
+
+    def set_raw_handler(self, name, handler):
+
+        """Hand the packets of one event/response to handler undecoded.
+
+        handler(buf, offset, length) is called with the framer's buffer and the
+        position of the whole packet (header included) instead of decoding it
+        and firing the event.  buf is only valid during the call.  A handler of
+        None restores normal decoding.
+        """
+
+        for key, decoder in self.decoders.items():
+            if decoder.name == name:
+                break
+        else:
+            raise ValueError('Unknown BGAPI packet %s' % name)
+        if handler is None:
+            self.raw_handlers.pop(key, None)
+        else:
+            self.raw_handlers[key] = handler
+
     def send_command(self, ser, packet):
-        if self.packet_mode: packet = chr(len(packet) & 0xFF) + packet
-        if self.debug: print '=>[ ' + ' '.join(['%02X' % ord(b) for b in packet ]) + ' ]'
+        if self.packet_mode: packet = bytes(bytearray((len(packet) & 0xFF,))) + packet
+        if self.debug: print('=>[ ' + ' '.join(['%02X' % b for b in bytearray(packet)]) + ' ]')
         self.on_before_tx_command()
         self.busy = True
         self.on_busy()
-        #print inspect.stack()[1][4][0].rstrip()
         ser.write(packet)
         self.on_tx_command_complete()
 
@@ -653,736 +918,300 @@ class BGLib(object):
         if timeout > 0:
             ser.timeout = timeout
             while 1:
-                x = ser.read()
+                x = ser.read(max(1, ser.inWaiting()))
                 if len(x) > 0:
-                    self.parse(ord(x))
+                    self.feed(x)
                 else: # timeout
+                    # Anything still buffered is the start of a packet that will never complete
+                    self.framer.reset()
                     self.busy = False
                     self.on_idle()
                     self.on_timeout()
                 if not self.busy: # finished
                     break
         else:
-            while ser.inWaiting(): self.parse(ord(ser.read()))
+            waiting = ser.inWaiting()
+            while waiting:
+                self.feed(ser.read(waiting))
+                waiting = ser.inWaiting()
         return self.busy
 
     def parse(self, b):
-        if len(self.bgapi_rx_buffer) == 0 and (b == 0x00 or b == 0x80 or b == 0x08 or b == 0x88):
-            self.bgapi_rx_buffer.append(b)
-        elif len(self.bgapi_rx_buffer) == 1:
-            self.bgapi_rx_buffer.append(b)
-            self.bgapi_rx_expected_length = 4 + (self.bgapi_rx_buffer[0] & 0x07) + self.bgapi_rx_buffer[1]
-        elif len(self.bgapi_rx_buffer) > 1:
-            self.bgapi_rx_buffer.append(b)
+        """Process a single received byte (kept for byte-at-a-time callers)"""
+        self.feed(bytearray((b,)))
 
-        """
-        BGAPI packet structure (as of 2012-11-07):
-            Byte 0:
-                  [7] - 1 bit, Message Type (MT)         0 = Command/Response, 1 = Event
-                [6:3] - 4 bits, Technology Type (TT)     0000 = Bluetooth 4.0 single mode, 0001 = Wi-Fi
-                [2:0] - 3 bits, Length High (LH)         Payload length (high bits)
-            Byte 1:     8 bits, Length Low (LL)          Payload length (low bits)
-            Byte 2:     8 bits, Class ID (CID)           Command class ID
-            Byte 3:     8 bits, Command ID (CMD)         Command ID
-            Bytes 4-n:  0 - 2048 Bytes, Payload (PL)     Up to 2048 bytes of payload
-        """
+    def feed(self, data):
+        """Process a chunk of bytes received from the dongle
 
-        #print '%02X: %d, %d' % (b, len(self.bgapi_rx_buffer), self.bgapi_rx_expected_length)
-        if self.bgapi_rx_expected_length > 0 and len(self.bgapi_rx_buffer) == self.bgapi_rx_expected_length:
-            if self.debug: print '<=[ ' + ' '.join(['%02X' % b for b in self.bgapi_rx_buffer ]) + ' ]'
-            packet_type, payload_length, packet_class, packet_command = self.bgapi_rx_buffer[:4]
-            self.bgapi_rx_payload = b''.join(chr(i) for i in self.bgapi_rx_buffer[4:])
-            self.bgapi_rx_buffer = []
-            if packet_type & 0x88 == 0x00:
-                # 0x00 = BLE response packet
-                if packet_class == 0:
-                    if packet_command == 0: # ble_rsp_system_reset
-                        self.ble_rsp_system_reset({  })
-                        self.busy = False
-                        self.on_idle()
-                    elif packet_command == 1: # ble_rsp_system_hello
-                        self.ble_rsp_system_hello({  })
-                    elif packet_command == 2: # ble_rsp_system_address_get
-                        address = struct.unpack('<6s', self.bgapi_rx_payload[:6])[0]
-                        address = [ord(b) for b in address]
-                        self.ble_rsp_system_address_get({ 'address': address })
-                    elif packet_command == 3: # ble_rsp_system_reg_write
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.ble_rsp_system_reg_write({ 'result': result })
-                    elif packet_command == 4: # ble_rsp_system_reg_read
-                        address, value = struct.unpack('<HB', self.bgapi_rx_payload[:3])
-                        self.ble_rsp_system_reg_read({ 'address': address, 'value': value })
-                    elif packet_command == 5: # ble_rsp_system_get_counters
-                        txok, txretry, rxok, rxfail, mbuf = struct.unpack('<BBBBB', self.bgapi_rx_payload[:5])
-                        self.ble_rsp_system_get_counters({ 'txok': txok, 'txretry': txretry, 'rxok': rxok, 'rxfail': rxfail, 'mbuf': mbuf })
-                    elif packet_command == 6: # ble_rsp_system_get_connections
-                        maxconn = struct.unpack('<B', self.bgapi_rx_payload[:1])[0]
-                        self.ble_rsp_system_get_connections({ 'maxconn': maxconn })
-                    elif packet_command == 7: # ble_rsp_system_read_memory
-                        address, data_len = struct.unpack('<IB', self.bgapi_rx_payload[:5])
-                        data_data = [ord(b) for b in self.bgapi_rx_payload[5:]]
-                        self.ble_rsp_system_read_memory({ 'address': address, 'data': data_data })
-                    elif packet_command == 8: # ble_rsp_system_get_info
-                        major, minor, patch, build, ll_version, protocol_version, hw = struct.unpack('<HHHHHBB', self.bgapi_rx_payload[:12])
-                        self.ble_rsp_system_get_info({ 'major': major, 'minor': minor, 'patch': patch, 'build': build, 'll_version': ll_version, 'protocol_version': protocol_version, 'hw': hw })
-                    elif packet_command == 9: # ble_rsp_system_endpoint_tx
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.ble_rsp_system_endpoint_tx({ 'result': result })
-                    elif packet_command == 10: # ble_rsp_system_whitelist_append
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.ble_rsp_system_whitelist_append({ 'result': result })
-                    elif packet_command == 11: # ble_rsp_system_whitelist_remove
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.ble_rsp_system_whitelist_remove({ 'result': result })
-                    elif packet_command == 12: # ble_rsp_system_whitelist_clear
-                        self.ble_rsp_system_whitelist_clear({  })
-                    elif packet_command == 13: # ble_rsp_system_endpoint_rx
-                        result, data_len = struct.unpack('<HB', self.bgapi_rx_payload[:3])
-                        data_data = [ord(b) for b in self.bgapi_rx_payload[3:]]
-                        self.ble_rsp_system_endpoint_rx({ 'result': result, 'data': data_data })
-                    elif packet_command == 14: # ble_rsp_system_endpoint_set_watermarks
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.ble_rsp_system_endpoint_set_watermarks({ 'result': result })
-                elif packet_class == 1:
-                    if packet_command == 0: # ble_rsp_flash_ps_defrag
-                        self.ble_rsp_flash_ps_defrag({  })
-                    elif packet_command == 1: # ble_rsp_flash_ps_dump
-                        self.ble_rsp_flash_ps_dump({  })
-                    elif packet_command == 2: # ble_rsp_flash_ps_erase_all
-                        self.ble_rsp_flash_ps_erase_all({  })
-                    elif packet_command == 3: # ble_rsp_flash_ps_save
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.ble_rsp_flash_ps_save({ 'result': result })
-                    elif packet_command == 4: # ble_rsp_flash_ps_load
-                        result, value_len = struct.unpack('<HB', self.bgapi_rx_payload[:3])
-                        value_data = [ord(b) for b in self.bgapi_rx_payload[3:]]
-                        self.ble_rsp_flash_ps_load({ 'result': result, 'value': value_data })
-                    elif packet_command == 5: # ble_rsp_flash_ps_erase
-                        self.ble_rsp_flash_ps_erase({  })
-                    elif packet_command == 6: # ble_rsp_flash_erase_page
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.ble_rsp_flash_erase_page({ 'result': result })
-                    elif packet_command == 7: # ble_rsp_flash_write_words
-                        self.ble_rsp_flash_write_words({  })
-                elif packet_class == 2:
-                    if packet_command == 0: # ble_rsp_attributes_write
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.ble_rsp_attributes_write({ 'result': result })
-                    elif packet_command == 1: # ble_rsp_attributes_read
-                        handle, offset, result, value_len = struct.unpack('<HHHB', self.bgapi_rx_payload[:7])
-                        value_data = [ord(b) for b in self.bgapi_rx_payload[7:]]
-                        self.ble_rsp_attributes_read({ 'handle': handle, 'offset': offset, 'result': result, 'value': value_data })
-                    elif packet_command == 2: # ble_rsp_attributes_read_type
-                        handle, result, value_len = struct.unpack('<HHB', self.bgapi_rx_payload[:5])
-                        value_data = [ord(b) for b in self.bgapi_rx_payload[5:]]
-                        self.ble_rsp_attributes_read_type({ 'handle': handle, 'result': result, 'value': value_data })
-                    elif packet_command == 3: # ble_rsp_attributes_user_read_response
-                        self.ble_rsp_attributes_user_read_response({  })
-                    elif packet_command == 4: # ble_rsp_attributes_user_write_response
-                        self.ble_rsp_attributes_user_write_response({  })
-                elif packet_class == 3:
-                    if packet_command == 0: # ble_rsp_connection_disconnect
-                        connection, result = struct.unpack('<BH', self.bgapi_rx_payload[:3])
-                        self.ble_rsp_connection_disconnect({ 'connection': connection, 'result': result })
-                    elif packet_command == 1: # ble_rsp_connection_get_rssi
-                        connection, rssi = struct.unpack('<Bb', self.bgapi_rx_payload[:2])
-                        self.ble_rsp_connection_get_rssi({ 'connection': connection, 'rssi': rssi })
-                    elif packet_command == 2: # ble_rsp_connection_update
-                        connection, result = struct.unpack('<BH', self.bgapi_rx_payload[:3])
-                        self.ble_rsp_connection_update({ 'connection': connection, 'result': result })
-                    elif packet_command == 3: # ble_rsp_connection_version_update
-                        connection, result = struct.unpack('<BH', self.bgapi_rx_payload[:3])
-                        self.ble_rsp_connection_version_update({ 'connection': connection, 'result': result })
-                    elif packet_command == 4: # ble_rsp_connection_channel_map_get
-                        connection, map_len = struct.unpack('<BB', self.bgapi_rx_payload[:2])
-                        map_data = [ord(b) for b in self.bgapi_rx_payload[2:]]
-                        self.ble_rsp_connection_channel_map_get({ 'connection': connection, 'map': map_data })
-                    elif packet_command == 5: # ble_rsp_connection_channel_map_set
-                        connection, result = struct.unpack('<BH', self.bgapi_rx_payload[:3])
-                        self.ble_rsp_connection_channel_map_set({ 'connection': connection, 'result': result })
-                    elif packet_command == 6: # ble_rsp_connection_features_get
-                        connection, result = struct.unpack('<BH', self.bgapi_rx_payload[:3])
-                        self.ble_rsp_connection_features_get({ 'connection': connection, 'result': result })
-                    elif packet_command == 7: # ble_rsp_connection_get_status
-                        connection = struct.unpack('<B', self.bgapi_rx_payload[:1])[0]
-                        self.ble_rsp_connection_get_status({ 'connection': connection })
-                    elif packet_command == 8: # ble_rsp_connection_raw_tx
-                        connection = struct.unpack('<B', self.bgapi_rx_payload[:1])[0]
-                        self.ble_rsp_connection_raw_tx({ 'connection': connection })
-                elif packet_class == 4:
-                    if packet_command == 0: # ble_rsp_attclient_find_by_type_value
-                        connection, result = struct.unpack('<BH', self.bgapi_rx_payload[:3])
-                        self.ble_rsp_attclient_find_by_type_value({ 'connection': connection, 'result': result })
-                    elif packet_command == 1: # ble_rsp_attclient_read_by_group_type
-                        connection, result = struct.unpack('<BH', self.bgapi_rx_payload[:3])
-                        self.ble_rsp_attclient_read_by_group_type({ 'connection': connection, 'result': result })
-                    elif packet_command == 2: # ble_rsp_attclient_read_by_type
-                        connection, result = struct.unpack('<BH', self.bgapi_rx_payload[:3])
-                        self.ble_rsp_attclient_read_by_type({ 'connection': connection, 'result': result })
-                    elif packet_command == 3: # ble_rsp_attclient_find_information
-                        connection, result = struct.unpack('<BH', self.bgapi_rx_payload[:3])
-                        self.ble_rsp_attclient_find_information({ 'connection': connection, 'result': result })
-                    elif packet_command == 4: # ble_rsp_attclient_read_by_handle
-                        connection, result = struct.unpack('<BH', self.bgapi_rx_payload[:3])
-                        self.ble_rsp_attclient_read_by_handle({ 'connection': connection, 'result': result })
-                    elif packet_command == 5: # ble_rsp_attclient_attribute_write
-                        connection, result = struct.unpack('<BH', self.bgapi_rx_payload[:3])
-                        self.ble_rsp_attclient_attribute_write({ 'connection': connection, 'result': result })
-                    elif packet_command == 6: # ble_rsp_attclient_write_command
-                        connection, result = struct.unpack('<BH', self.bgapi_rx_payload[:3])
-                        self.ble_rsp_attclient_write_command({ 'connection': connection, 'result': result })
-                    elif packet_command == 7: # ble_rsp_attclient_indicate_confirm
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.ble_rsp_attclient_indicate_confirm({ 'result': result })
-                    elif packet_command == 8: # ble_rsp_attclient_read_long
-                        connection, result = struct.unpack('<BH', self.bgapi_rx_payload[:3])
-                        self.ble_rsp_attclient_read_long({ 'connection': connection, 'result': result })
-                    elif packet_command == 9: # ble_rsp_attclient_prepare_write
-                        connection, result = struct.unpack('<BH', self.bgapi_rx_payload[:3])
-                        self.ble_rsp_attclient_prepare_write({ 'connection': connection, 'result': result })
-                    elif packet_command == 10: # ble_rsp_attclient_execute_write
-                        connection, result = struct.unpack('<BH', self.bgapi_rx_payload[:3])
-                        self.ble_rsp_attclient_execute_write({ 'connection': connection, 'result': result })
-                    elif packet_command == 11: # ble_rsp_attclient_read_multiple
-                        connection, result = struct.unpack('<BH', self.bgapi_rx_payload[:3])
-                        self.ble_rsp_attclient_read_multiple({ 'connection': connection, 'result': result })
-                elif packet_class == 5:
-                    if packet_command == 0: # ble_rsp_sm_encrypt_start
-                        handle, result = struct.unpack('<BH', self.bgapi_rx_payload[:3])
-                        self.ble_rsp_sm_encrypt_start({ 'handle': handle, 'result': result })
-                    elif packet_command == 1: # ble_rsp_sm_set_bondable_mode
-                        self.ble_rsp_sm_set_bondable_mode({  })
-                    elif packet_command == 2: # ble_rsp_sm_delete_bonding
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.ble_rsp_sm_delete_bonding({ 'result': result })
-                    elif packet_command == 3: # ble_rsp_sm_set_parameters
-                        self.ble_rsp_sm_set_parameters({  })
-                    elif packet_command == 4: # ble_rsp_sm_passkey_entry
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.ble_rsp_sm_passkey_entry({ 'result': result })
-                    elif packet_command == 5: # ble_rsp_sm_get_bonds
-                        bonds = struct.unpack('<B', self.bgapi_rx_payload[:1])[0]
-                        self.ble_rsp_sm_get_bonds({ 'bonds': bonds })
-                    elif packet_command == 6: # ble_rsp_sm_set_oob_data
-                        self.ble_rsp_sm_set_oob_data({  })
-                elif packet_class == 6:
-                    if packet_command == 0: # ble_rsp_gap_set_privacy_flags
-                        self.ble_rsp_gap_set_privacy_flags({  })
-                    elif packet_command == 1: # ble_rsp_gap_set_mode
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.ble_rsp_gap_set_mode({ 'result': result })
-                    elif packet_command == 2: # ble_rsp_gap_discover
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.ble_rsp_gap_discover({ 'result': result })
-                    elif packet_command == 3: # ble_rsp_gap_connect_direct
-                        result, connection_handle = struct.unpack('<HB', self.bgapi_rx_payload[:3])
-                        self.ble_rsp_gap_connect_direct({ 'result': result, 'connection_handle': connection_handle })
-                    elif packet_command == 4: # ble_rsp_gap_end_procedure
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.ble_rsp_gap_end_procedure({ 'result': result })
-                    elif packet_command == 5: # ble_rsp_gap_connect_selective
-                        result, connection_handle = struct.unpack('<HB', self.bgapi_rx_payload[:3])
-                        self.ble_rsp_gap_connect_selective({ 'result': result, 'connection_handle': connection_handle })
-                    elif packet_command == 6: # ble_rsp_gap_set_filtering
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.ble_rsp_gap_set_filtering({ 'result': result })
-                    elif packet_command == 7: # ble_rsp_gap_set_scan_parameters
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.ble_rsp_gap_set_scan_parameters({ 'result': result })
-                    elif packet_command == 8: # ble_rsp_gap_set_adv_parameters
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.ble_rsp_gap_set_adv_parameters({ 'result': result })
-                    elif packet_command == 9: # ble_rsp_gap_set_adv_data
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.ble_rsp_gap_set_adv_data({ 'result': result })
-                    elif packet_command == 10: # ble_rsp_gap_set_directed_connectable_mode
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.ble_rsp_gap_set_directed_connectable_mode({ 'result': result })
-                elif packet_class == 7:
-                    if packet_command == 0: # ble_rsp_hardware_io_port_config_irq
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.ble_rsp_hardware_io_port_config_irq({ 'result': result })
-                    elif packet_command == 1: # ble_rsp_hardware_set_soft_timer
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.ble_rsp_hardware_set_soft_timer({ 'result': result })
-                    elif packet_command == 2: # ble_rsp_hardware_adc_read
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.ble_rsp_hardware_adc_read({ 'result': result })
-                    elif packet_command == 3: # ble_rsp_hardware_io_port_config_direction
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.ble_rsp_hardware_io_port_config_direction({ 'result': result })
-                    elif packet_command == 4: # ble_rsp_hardware_io_port_config_function
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.ble_rsp_hardware_io_port_config_function({ 'result': result })
-                    elif packet_command == 5: # ble_rsp_hardware_io_port_config_pull
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.ble_rsp_hardware_io_port_config_pull({ 'result': result })
-                    elif packet_command == 6: # ble_rsp_hardware_io_port_write
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.ble_rsp_hardware_io_port_write({ 'result': result })
-                    elif packet_command == 7: # ble_rsp_hardware_io_port_read
-                        result, port, data = struct.unpack('<HBB', self.bgapi_rx_payload[:4])
-                        self.ble_rsp_hardware_io_port_read({ 'result': result, 'port': port, 'data': data })
-                    elif packet_command == 8: # ble_rsp_hardware_spi_config
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.ble_rsp_hardware_spi_config({ 'result': result })
-                    elif packet_command == 9: # ble_rsp_hardware_spi_transfer
-                        result, channel, data_len = struct.unpack('<HBB', self.bgapi_rx_payload[:4])
-                        data_data = [ord(b) for b in self.bgapi_rx_payload[4:]]
-                        self.ble_rsp_hardware_spi_transfer({ 'result': result, 'channel': channel, 'data': data_data })
-                    elif packet_command == 10: # ble_rsp_hardware_i2c_read
-                        result, data_len = struct.unpack('<HB', self.bgapi_rx_payload[:3])
-                        data_data = [ord(b) for b in self.bgapi_rx_payload[3:]]
-                        self.ble_rsp_hardware_i2c_read({ 'result': result, 'data': data_data })
-                    elif packet_command == 11: # ble_rsp_hardware_i2c_write
-                        written = struct.unpack('<B', self.bgapi_rx_payload[:1])[0]
-                        self.ble_rsp_hardware_i2c_write({ 'written': written })
-                    elif packet_command == 12: # ble_rsp_hardware_set_txpower
-                        self.ble_rsp_hardware_set_txpower({  })
-                    elif packet_command == 13: # ble_rsp_hardware_timer_comparator
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.ble_rsp_hardware_timer_comparator({ 'result': result })
-                elif packet_class == 8:
-                    if packet_command == 0: # ble_rsp_test_phy_tx
-                        self.ble_rsp_test_phy_tx({  })
-                    elif packet_command == 1: # ble_rsp_test_phy_rx
-                        self.ble_rsp_test_phy_rx({  })
-                    elif packet_command == 2: # ble_rsp_test_phy_end
-                        counter = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.ble_rsp_test_phy_end({ 'counter': counter })
-                    elif packet_command == 3: # ble_rsp_test_phy_reset
-                        self.ble_rsp_test_phy_reset({  })
-                    elif packet_command == 4: # ble_rsp_test_get_channel_map
-                        channel_map_len = struct.unpack('<B', self.bgapi_rx_payload[:1])[0]
-                        channel_map_data = [ord(b) for b in self.bgapi_rx_payload[1:]]
-                        self.ble_rsp_test_get_channel_map({ 'channel_map': channel_map_data })
-                    elif packet_command == 5: # ble_rsp_test_debug
-                        output_len = struct.unpack('<B', self.bgapi_rx_payload[:1])[0]
-                        output_data = [ord(b) for b in self.bgapi_rx_payload[1:]]
-                        self.ble_rsp_test_debug({ 'output': output_data })
-                self.busy = False
-                self.on_idle()
-            elif packet_type & 0x88 == 0x80:
-                # 0x80 = BLE event packet
-                if packet_class == 0:
-                    if packet_command == 0: # ble_evt_system_boot
-                        major, minor, patch, build, ll_version, protocol_version, hw = struct.unpack('<HHHHHBB', self.bgapi_rx_payload[:12])
-                        self.ble_evt_system_boot({ 'major': major, 'minor': minor, 'patch': patch, 'build': build, 'll_version': ll_version, 'protocol_version': protocol_version, 'hw': hw })
-                        self.busy = False
-                        self.on_idle()
-                    elif packet_command == 1: # ble_evt_system_debug
-                        data_len = struct.unpack('<B', self.bgapi_rx_payload[:1])[0]
-                        data_data = [ord(b) for b in self.bgapi_rx_payload[1:]]
-                        self.ble_evt_system_debug({ 'data': data_data })
-                    elif packet_command == 2: # ble_evt_system_endpoint_watermark_rx
-                        endpoint, data = struct.unpack('<BB', self.bgapi_rx_payload[:2])
-                        self.ble_evt_system_endpoint_watermark_rx({ 'endpoint': endpoint, 'data': data })
-                    elif packet_command == 3: # ble_evt_system_endpoint_watermark_tx
-                        endpoint, data = struct.unpack('<BB', self.bgapi_rx_payload[:2])
-                        self.ble_evt_system_endpoint_watermark_tx({ 'endpoint': endpoint, 'data': data })
-                    elif packet_command == 4: # ble_evt_system_script_failure
-                        address, reason = struct.unpack('<HH', self.bgapi_rx_payload[:4])
-                        self.ble_evt_system_script_failure({ 'address': address, 'reason': reason })
-                    elif packet_command == 5: # ble_evt_system_no_license_key
-                        self.ble_evt_system_no_license_key({  })
-                    elif packet_command == 6: # ble_evt_system_protocol_error
-                        self.ble_evt_system_protocol_error({  })
-                elif packet_class == 1:
-                    if packet_command == 0: # ble_evt_flash_ps_key
-                        key, value_len = struct.unpack('<HB', self.bgapi_rx_payload[:3])
-                        value_data = [ord(b) for b in self.bgapi_rx_payload[3:]]
-                        self.ble_evt_flash_ps_key({ 'key': key, 'value': value_data })
-                elif packet_class == 2:
-                    if packet_command == 0: # ble_evt_attributes_value
-                        connection, reason, handle, offset, value_len = struct.unpack('<BBHHB', self.bgapi_rx_payload[:7])
-                        value_data = [ord(b) for b in self.bgapi_rx_payload[7:]]
-                        self.ble_evt_attributes_value({ 'connection': connection, 'reason': reason, 'handle': handle, 'offset': offset, 'value': value_data })
-                    elif packet_command == 1: # ble_evt_attributes_user_read_request
-                        connection, handle, offset, maxsize = struct.unpack('<BHHB', self.bgapi_rx_payload[:6])
-                        self.ble_evt_attributes_user_read_request({ 'connection': connection, 'handle': handle, 'offset': offset, 'maxsize': maxsize })
-                    elif packet_command == 2: # ble_evt_attributes_status
-                        handle, flags = struct.unpack('<HB', self.bgapi_rx_payload[:3])
-                        self.ble_evt_attributes_status({ 'handle': handle, 'flags': flags })
-                elif packet_class == 3:
-                    if packet_command == 0: # ble_evt_connection_status
-                        connection, flags, address, address_type, conn_interval, timeout, latency, bonding = struct.unpack('<BB6sBHHHB', self.bgapi_rx_payload[:16])
-                        address = [ord(b) for b in address]
-                        self.ble_evt_connection_status({ 'connection': connection, 'flags': flags, 'address': address, 'address_type': address_type, 'conn_interval': conn_interval, 'timeout': timeout, 'latency': latency, 'bonding': bonding })
-                    elif packet_command == 1: # ble_evt_connection_version_ind
-                        connection, vers_nr, comp_id, sub_vers_nr = struct.unpack('<BBHH', self.bgapi_rx_payload[:6])
-                        self.ble_evt_connection_version_ind({ 'connection': connection, 'vers_nr': vers_nr, 'comp_id': comp_id, 'sub_vers_nr': sub_vers_nr })
-                    elif packet_command == 2: # ble_evt_connection_feature_ind
-                        connection, features_len = struct.unpack('<BB', self.bgapi_rx_payload[:2])
-                        features_data = [ord(b) for b in self.bgapi_rx_payload[2:]]
-                        self.ble_evt_connection_feature_ind({ 'connection': connection, 'features': features_data })
-                    elif packet_command == 3: # ble_evt_connection_raw_rx
-                        connection, data_len = struct.unpack('<BB', self.bgapi_rx_payload[:2])
-                        data_data = [ord(b) for b in self.bgapi_rx_payload[2:]]
-                        self.ble_evt_connection_raw_rx({ 'connection': connection, 'data': data_data })
-                    elif packet_command == 4: # ble_evt_connection_disconnected
-                        connection, reason = struct.unpack('<BH', self.bgapi_rx_payload[:3])
-                        self.ble_evt_connection_disconnected({ 'connection': connection, 'reason': reason })
-                elif packet_class == 4:
-                    if packet_command == 0: # ble_evt_attclient_indicated
-                        connection, attrhandle = struct.unpack('<BH', self.bgapi_rx_payload[:3])
-                        self.ble_evt_attclient_indicated({ 'connection': connection, 'attrhandle': attrhandle })
-                    elif packet_command == 1: # ble_evt_attclient_procedure_completed
-                        connection, result, chrhandle = struct.unpack('<BHH', self.bgapi_rx_payload[:5])
-                        self.ble_evt_attclient_procedure_completed({ 'connection': connection, 'result': result, 'chrhandle': chrhandle })
-                    elif packet_command == 2: # ble_evt_attclient_group_found
-                        connection, start, end, uuid_len = struct.unpack('<BHHB', self.bgapi_rx_payload[:6])
-                        uuid_data = [ord(b) for b in self.bgapi_rx_payload[6:]]
-                        self.ble_evt_attclient_group_found({ 'connection': connection, 'start': start, 'end': end, 'uuid': uuid_data })
-                    elif packet_command == 3: # ble_evt_attclient_attribute_found
-                        connection, chrdecl, value, properties, uuid_len = struct.unpack('<BHHBB', self.bgapi_rx_payload[:7])
-                        uuid_data = [ord(b) for b in self.bgapi_rx_payload[7:]]
-                        self.ble_evt_attclient_attribute_found({ 'connection': connection, 'chrdecl': chrdecl, 'value': value, 'properties': properties, 'uuid': uuid_data })
-                    elif packet_command == 4: # ble_evt_attclient_find_information_found
-                        connection, chrhandle, uuid_len = struct.unpack('<BHB', self.bgapi_rx_payload[:4])
-                        uuid_data = [ord(b) for b in self.bgapi_rx_payload[4:]]
-                        self.ble_evt_attclient_find_information_found({ 'connection': connection, 'chrhandle': chrhandle, 'uuid': uuid_data })
-                    elif packet_command == 5: # ble_evt_attclient_attribute_value
-                        connection, atthandle, type, value_len = struct.unpack('<BHBB', self.bgapi_rx_payload[:5])
-                        value_data = [ord(b) for b in self.bgapi_rx_payload[5:]]
-                        self.ble_evt_attclient_attribute_value({ 'connection': connection, 'atthandle': atthandle, 'type': type, 'value': value_data })
-                    elif packet_command == 6: # ble_evt_attclient_read_multiple_response
-                        connection, handles_len = struct.unpack('<BB', self.bgapi_rx_payload[:2])
-                        handles_data = [ord(b) for b in self.bgapi_rx_payload[2:]]
-                        self.ble_evt_attclient_read_multiple_response({ 'connection': connection, 'handles': handles_data })
-                elif packet_class == 5:
-                    if packet_command == 0: # ble_evt_sm_smp_data
-                        handle, packet, data_len = struct.unpack('<BBB', self.bgapi_rx_payload[:3])
-                        data_data = [ord(b) for b in self.bgapi_rx_payload[3:]]
-                        self.ble_evt_sm_smp_data({ 'handle': handle, 'packet': packet, 'data': data_data })
-                    elif packet_command == 1: # ble_evt_sm_bonding_fail
-                        handle, result = struct.unpack('<BH', self.bgapi_rx_payload[:3])
-                        self.ble_evt_sm_bonding_fail({ 'handle': handle, 'result': result })
-                    elif packet_command == 2: # ble_evt_sm_passkey_display
-                        handle, passkey = struct.unpack('<BI', self.bgapi_rx_payload[:5])
-                        self.ble_evt_sm_passkey_display({ 'handle': handle, 'passkey': passkey })
-                    elif packet_command == 3: # ble_evt_sm_passkey_request
-                        handle = struct.unpack('<B', self.bgapi_rx_payload[:1])[0]
-                        self.ble_evt_sm_passkey_request({ 'handle': handle })
-                    elif packet_command == 4: # ble_evt_sm_bond_status
-                        bond, keysize, mitm, keys = struct.unpack('<BBBB', self.bgapi_rx_payload[:4])
-                        self.ble_evt_sm_bond_status({ 'bond': bond, 'keysize': keysize, 'mitm': mitm, 'keys': keys })
-                elif packet_class == 6:
-                    if packet_command == 0: # ble_evt_gap_scan_response
-                        rssi, packet_type, sender, address_type, bond, data_len = struct.unpack('<bB6sBBB', self.bgapi_rx_payload[:11])
-                        sender = [ord(b) for b in sender]
-                        data_data = [ord(b) for b in self.bgapi_rx_payload[11:]]
-                        self.ble_evt_gap_scan_response({ 'rssi': rssi, 'packet_type': packet_type, 'sender': sender, 'address_type': address_type, 'bond': bond, 'data': data_data })
-                    elif packet_command == 1: # ble_evt_gap_mode_changed
-                        discover, connect = struct.unpack('<BB', self.bgapi_rx_payload[:2])
-                        self.ble_evt_gap_mode_changed({ 'discover': discover, 'connect': connect })
-                elif packet_class == 7:
-                    if packet_command == 0: # ble_evt_hardware_io_port_status
-                        timestamp, port, irq, state = struct.unpack('<IBBB', self.bgapi_rx_payload[:7])
-                        self.ble_evt_hardware_io_port_status({ 'timestamp': timestamp, 'port': port, 'irq': irq, 'state': state })
-                    elif packet_command == 1: # ble_evt_hardware_soft_timer
-                        handle = struct.unpack('<B', self.bgapi_rx_payload[:1])[0]
-                        self.ble_evt_hardware_soft_timer({ 'handle': handle })
-                    elif packet_command == 2: # ble_evt_hardware_adc_result
-                        input, value = struct.unpack('<Bh', self.bgapi_rx_payload[:3])
-                        self.ble_evt_hardware_adc_result({ 'input': input, 'value': value })
-            elif packet_type & 0x88 == 0x08:
-                # 0x08 = wifi response packet
-                if packet_class == 0:
-                    if packet_command == 0: # wifi_rsp_dfu_reset
-                        self.wifi_rsp_dfu_reset({  })
-                        self.busy = False
-                        self.on_idle()
-                    elif packet_command == 1: # wifi_rsp_dfu_flash_set_address
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.wifi_rsp_dfu_flash_set_address({ 'result': result })
-                    elif packet_command == 2: # wifi_rsp_dfu_flash_upload
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.wifi_rsp_dfu_flash_upload({ 'result': result })
-                    elif packet_command == 3: # wifi_rsp_dfu_flash_upload_finish
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.wifi_rsp_dfu_flash_upload_finish({ 'result': result })
-                elif packet_class == 1:
-                    if packet_command == 0: # wifi_rsp_system_sync
-                        self.wifi_rsp_system_sync({  })
-                    elif packet_command == 1: # wifi_rsp_system_reset
-                        self.wifi_rsp_system_reset({  })
-                    elif packet_command == 2: # wifi_rsp_system_hello
-                        self.wifi_rsp_system_hello({  })
-                    elif packet_command == 3: # wifi_rsp_system_set_max_power_saving_state
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.wifi_rsp_system_set_max_power_saving_state({ 'result': result })
-                elif packet_class == 2:
-                    if packet_command == 0: # wifi_rsp_config_get_mac
-                        result, hw_interface = struct.unpack('<HB', self.bgapi_rx_payload[:3])
-                        self.wifi_rsp_config_get_mac({ 'result': result, 'hw_interface': hw_interface })
-                    elif packet_command == 1: # wifi_rsp_config_set_mac
-                        result, hw_interface = struct.unpack('<HB', self.bgapi_rx_payload[:3])
-                        self.wifi_rsp_config_set_mac({ 'result': result, 'hw_interface': hw_interface })
-                elif packet_class == 3:
-                    if packet_command == 0: # wifi_rsp_sme_wifi_on
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.wifi_rsp_sme_wifi_on({ 'result': result })
-                    elif packet_command == 1: # wifi_rsp_sme_wifi_off
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.wifi_rsp_sme_wifi_off({ 'result': result })
-                    elif packet_command == 2: # wifi_rsp_sme_power_on
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.wifi_rsp_sme_power_on({ 'result': result })
-                    elif packet_command == 3: # wifi_rsp_sme_start_scan
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.wifi_rsp_sme_start_scan({ 'result': result })
-                    elif packet_command == 4: # wifi_rsp_sme_stop_scan
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.wifi_rsp_sme_stop_scan({ 'result': result })
-                    elif packet_command == 5: # wifi_rsp_sme_set_password
-                        status = struct.unpack('<B', self.bgapi_rx_payload[:1])[0]
-                        self.wifi_rsp_sme_set_password({ 'status': status })
-                    elif packet_command == 6: # wifi_rsp_sme_connect_bssid
-                        result, hw_interface = struct.unpack('<HB', self.bgapi_rx_payload[:3])
-                        self.wifi_rsp_sme_connect_bssid({ 'result': result, 'hw_interface': hw_interface })
-                    elif packet_command == 7: # wifi_rsp_sme_connect_ssid
-                        result, hw_interface = struct.unpack('<HB', self.bgapi_rx_payload[:3])
-                        self.wifi_rsp_sme_connect_ssid({ 'result': result, 'hw_interface': hw_interface })
-                    elif packet_command == 8: # wifi_rsp_sme_disconnect
-                        result, hw_interface = struct.unpack('<HB', self.bgapi_rx_payload[:3])
-                        self.wifi_rsp_sme_disconnect({ 'result': result, 'hw_interface': hw_interface })
-                    elif packet_command == 9: # wifi_rsp_sme_set_scan_channels
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.wifi_rsp_sme_set_scan_channels({ 'result': result })
-                    elif packet_command == 10: # wifi_rsp_sme_set_operating_mode
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.wifi_rsp_sme_set_operating_mode({ 'result': result })
-                    elif packet_command == 11: # wifi_rsp_sme_start_ap_mode
-                        result, hw_interface = struct.unpack('<HB', self.bgapi_rx_payload[:3])
-                        self.wifi_rsp_sme_start_ap_mode({ 'result': result, 'hw_interface': hw_interface })
-                    elif packet_command == 12: # wifi_rsp_sme_stop_ap_mode
-                        result, hw_interface = struct.unpack('<HB', self.bgapi_rx_payload[:3])
-                        self.wifi_rsp_sme_stop_ap_mode({ 'result': result, 'hw_interface': hw_interface })
-                elif packet_class == 4:
-                    if packet_command == 0: # wifi_rsp_tcpip_start_tcp_server
-                        result, endpoint = struct.unpack('<HB', self.bgapi_rx_payload[:3])
-                        self.wifi_rsp_tcpip_start_tcp_server({ 'result': result, 'endpoint': endpoint })
-                    elif packet_command == 1: # wifi_rsp_tcpip_tcp_connect
-                        result, endpoint = struct.unpack('<HB', self.bgapi_rx_payload[:3])
-                        self.wifi_rsp_tcpip_tcp_connect({ 'result': result, 'endpoint': endpoint })
-                    elif packet_command == 2: # wifi_rsp_tcpip_start_udp_server
-                        result, endpoint = struct.unpack('<HB', self.bgapi_rx_payload[:3])
-                        self.wifi_rsp_tcpip_start_udp_server({ 'result': result, 'endpoint': endpoint })
-                    elif packet_command == 3: # wifi_rsp_tcpip_udp_connect
-                        result, endpoint = struct.unpack('<HB', self.bgapi_rx_payload[:3])
-                        self.wifi_rsp_tcpip_udp_connect({ 'result': result, 'endpoint': endpoint })
-                    elif packet_command == 4: # wifi_rsp_tcpip_configure
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.wifi_rsp_tcpip_configure({ 'result': result })
-                    elif packet_command == 5: # wifi_rsp_tcpip_dns_configure
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.wifi_rsp_tcpip_dns_configure({ 'result': result })
-                    elif packet_command == 6: # wifi_rsp_tcpip_dns_gethostbyname
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.wifi_rsp_tcpip_dns_gethostbyname({ 'result': result })
-                elif packet_class == 5:
-                    if packet_command == 0: # wifi_rsp_endpoint_send
-                        result, endpoint = struct.unpack('<HB', self.bgapi_rx_payload[:3])
-                        self.wifi_rsp_endpoint_send({ 'result': result, 'endpoint': endpoint })
-                    elif packet_command == 1: # wifi_rsp_endpoint_set_streaming
-                        result, endpoint = struct.unpack('<HB', self.bgapi_rx_payload[:3])
-                        self.wifi_rsp_endpoint_set_streaming({ 'result': result, 'endpoint': endpoint })
-                    elif packet_command == 2: # wifi_rsp_endpoint_set_active
-                        result, endpoint = struct.unpack('<HB', self.bgapi_rx_payload[:3])
-                        self.wifi_rsp_endpoint_set_active({ 'result': result, 'endpoint': endpoint })
-                    elif packet_command == 3: # wifi_rsp_endpoint_set_streaming_destination
-                        result, endpoint = struct.unpack('<HB', self.bgapi_rx_payload[:3])
-                        self.wifi_rsp_endpoint_set_streaming_destination({ 'result': result, 'endpoint': endpoint })
-                    elif packet_command == 4: # wifi_rsp_endpoint_close
-                        result, endpoint = struct.unpack('<HB', self.bgapi_rx_payload[:3])
-                        self.wifi_rsp_endpoint_close({ 'result': result, 'endpoint': endpoint })
-                elif packet_class == 6:
-                    if packet_command == 0: # wifi_rsp_hardware_set_soft_timer
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.wifi_rsp_hardware_set_soft_timer({ 'result': result })
-                    elif packet_command == 1: # wifi_rsp_hardware_external_interrupt_config
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.wifi_rsp_hardware_external_interrupt_config({ 'result': result })
-                    elif packet_command == 2: # wifi_rsp_hardware_change_notification_config
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.wifi_rsp_hardware_change_notification_config({ 'result': result })
-                    elif packet_command == 3: # wifi_rsp_hardware_change_notification_pullup
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.wifi_rsp_hardware_change_notification_pullup({ 'result': result })
-                    elif packet_command == 4: # wifi_rsp_hardware_io_port_config_direction
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.wifi_rsp_hardware_io_port_config_direction({ 'result': result })
-                    elif packet_command == 5: # wifi_rsp_hardware_io_port_config_open_drain
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.wifi_rsp_hardware_io_port_config_open_drain({ 'result': result })
-                    elif packet_command == 6: # wifi_rsp_hardware_io_port_write
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.wifi_rsp_hardware_io_port_write({ 'result': result })
-                    elif packet_command == 7: # wifi_rsp_hardware_io_port_read
-                        result, port, data = struct.unpack('<HBH', self.bgapi_rx_payload[:5])
-                        self.wifi_rsp_hardware_io_port_read({ 'result': result, 'port': port, 'data': data })
-                    elif packet_command == 8: # wifi_rsp_hardware_output_compare
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.wifi_rsp_hardware_output_compare({ 'result': result })
-                    elif packet_command == 9: # wifi_rsp_hardware_adc_read
-                        result, input, value = struct.unpack('<HBH', self.bgapi_rx_payload[:5])
-                        self.wifi_rsp_hardware_adc_read({ 'result': result, 'input': input, 'value': value })
-                elif packet_class == 7:
-                    if packet_command == 0: # wifi_rsp_flash_ps_defrag
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.wifi_rsp_flash_ps_defrag({ 'result': result })
-                    elif packet_command == 1: # wifi_rsp_flash_ps_dump
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.wifi_rsp_flash_ps_dump({ 'result': result })
-                    elif packet_command == 2: # wifi_rsp_flash_ps_erase_all
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.wifi_rsp_flash_ps_erase_all({ 'result': result })
-                    elif packet_command == 3: # wifi_rsp_flash_ps_save
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.wifi_rsp_flash_ps_save({ 'result': result })
-                    elif packet_command == 4: # wifi_rsp_flash_ps_load
-                        result, value_len = struct.unpack('<HB', self.bgapi_rx_payload[:3])
-                        value_data = [ord(b) for b in self.bgapi_rx_payload[3:]]
-                        self.wifi_rsp_flash_ps_load({ 'result': result, 'value': value_data })
-                    elif packet_command == 5: # wifi_rsp_flash_ps_erase
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.wifi_rsp_flash_ps_erase({ 'result': result })
-                elif packet_class == 8:
-                    if packet_command == 0: # wifi_rsp_i2c_start_read
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.wifi_rsp_i2c_start_read({ 'result': result })
-                    elif packet_command == 1: # wifi_rsp_i2c_start_write
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.wifi_rsp_i2c_start_write({ 'result': result })
-                    elif packet_command == 2: # wifi_rsp_i2c_stop
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.wifi_rsp_i2c_stop({ 'result': result })
-                elif packet_class == 9:
-                    if packet_command == 0: # wifi_rsp_https_enable
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.wifi_rsp_https_enable({ 'result': result })
+        Every complete packet in the chunk is dispatched immediately, a trailing
+        partial packet is kept by the framer until the rest of it arrives.
+        """
+        framer = self.framer
+        decoders = self.decoders
+        handlers = self.__eventhandler__
+        raw_handlers = self.raw_handlers
+        framer.feed(data)
+        packet = framer.next_packet()
+        while packet is not None:
+            offset, length = packet
+            buf = framer.buffer
+            if self.debug: print('<=[ ' + ' '.join(['%02X' % b for b in buf[offset:offset + length]]) + ' ]')
+            packet_type, packet_class, packet_command = buf[offset], buf[offset + 2], buf[offset + 3]
+            key = ((packet_type & 0x88) << 16) | (packet_class << 8) | packet_command
+            decoder = decoders.get(key)
+            if raw_handlers and key in raw_handlers:
+                raw_handlers[key](buf, offset, length)
+            elif decoder is not None:
+                # Packets nobody listens to are not even decoded
+                handler = handlers.get(decoder.event)
+                response = not packet_type & 0x80 and self.on_response.handlers
+                if (handler is not None and handler.handlers) or response or self.event_trace is not None:
+                    args = decoder.decode(buf, offset + 4, offset + length)
+                    if args is not None:
+                        if handler is None:
+                            handler = decoder.event.__get__(self)
+                        handler.fire(args)
+                        if response:
+                            self.on_response({ 'packet_class': packet_class, 'packet_command': packet_command, 'name': decoder.name, 'args': args })
+            if not packet_type & 0x80 or (decoder is not None and decoder.idle):
+                # Every response (and a boot event) ends the current command
                 self.busy = False
                 self.on_idle()
-            else:
-                # 0x88 = wifi event packet
-                if packet_class == 0:
-                    if packet_command == 0: # wifi_evt_dfu_boot
-                        version = struct.unpack('<I', self.bgapi_rx_payload[:4])[0]
-                        self.wifi_evt_dfu_boot({ 'version': version })
-                        self.busy = False
-                        self.on_idle()
-                elif packet_class == 1:
-                    if packet_command == 0: # wifi_evt_system_boot
-                        major, minor, patch, build, bootloader_version, tcpip_version, hw = struct.unpack('<HHHHHHH', self.bgapi_rx_payload[:14])
-                        self.wifi_evt_system_boot({ 'major': major, 'minor': minor, 'patch': patch, 'build': build, 'bootloader_version': bootloader_version, 'tcpip_version': tcpip_version, 'hw': hw })
-                    elif packet_command == 1: # wifi_evt_system_state
-                        state = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.wifi_evt_system_state({ 'state': state })
-                    elif packet_command == 2: # wifi_evt_system_sw_exception
-                        address, type = struct.unpack('<IB', self.bgapi_rx_payload[:5])
-                        self.wifi_evt_system_sw_exception({ 'address': address, 'type': type })
-                    elif packet_command == 3: # wifi_evt_system_power_saving_state
-                        state = struct.unpack('<B', self.bgapi_rx_payload[:1])[0]
-                        self.wifi_evt_system_power_saving_state({ 'state': state })
-                elif packet_class == 2:
-                    if packet_command == 0: # wifi_evt_config_mac_address
-                        hw_interface = struct.unpack('<B', self.bgapi_rx_payload[:1])[0]
-                        self.wifi_evt_config_mac_address({ 'hw_interface': hw_interface })
-                elif packet_class == 3:
-                    if packet_command == 0: # wifi_evt_sme_wifi_is_on
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.wifi_evt_sme_wifi_is_on({ 'result': result })
-                    elif packet_command == 1: # wifi_evt_sme_wifi_is_off
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.wifi_evt_sme_wifi_is_off({ 'result': result })
-                    elif packet_command == 2: # wifi_evt_sme_scan_result
-                        channel, rssi, snr, secure, ssid_len = struct.unpack('<bhbBB', self.bgapi_rx_payload[:6])
-                        ssid_data = [ord(b) for b in self.bgapi_rx_payload[6:]]
-                        self.wifi_evt_sme_scan_result({ 'channel': channel, 'rssi': rssi, 'snr': snr, 'secure': secure, 'ssid': ssid_data })
-                    elif packet_command == 3: # wifi_evt_sme_scan_result_drop
-                        self.wifi_evt_sme_scan_result_drop({  })
-                    elif packet_command == 4: # wifi_evt_sme_scanned
-                        status = struct.unpack('<b', self.bgapi_rx_payload[:1])[0]
-                        self.wifi_evt_sme_scanned({ 'status': status })
-                    elif packet_command == 5: # wifi_evt_sme_connected
-                        status, hw_interface = struct.unpack('<bB', self.bgapi_rx_payload[:2])
-                        self.wifi_evt_sme_connected({ 'status': status, 'hw_interface': hw_interface })
-                    elif packet_command == 6: # wifi_evt_sme_disconnected
-                        reason, hw_interface = struct.unpack('<HB', self.bgapi_rx_payload[:3])
-                        self.wifi_evt_sme_disconnected({ 'reason': reason, 'hw_interface': hw_interface })
-                    elif packet_command == 7: # wifi_evt_sme_interface_status
-                        hw_interface, status = struct.unpack('<BB', self.bgapi_rx_payload[:2])
-                        self.wifi_evt_sme_interface_status({ 'hw_interface': hw_interface, 'status': status })
-                    elif packet_command == 8: # wifi_evt_sme_connect_failed
-                        reason, hw_interface = struct.unpack('<HB', self.bgapi_rx_payload[:3])
-                        self.wifi_evt_sme_connect_failed({ 'reason': reason, 'hw_interface': hw_interface })
-                    elif packet_command == 9: # wifi_evt_sme_connect_retry
-                        hw_interface = struct.unpack('<B', self.bgapi_rx_payload[:1])[0]
-                        self.wifi_evt_sme_connect_retry({ 'hw_interface': hw_interface })
-                    elif packet_command == 10: # wifi_evt_sme_ap_mode_started
-                        hw_interface = struct.unpack('<B', self.bgapi_rx_payload[:1])[0]
-                        self.wifi_evt_sme_ap_mode_started({ 'hw_interface': hw_interface })
-                    elif packet_command == 11: # wifi_evt_sme_ap_mode_stopped
-                        hw_interface = struct.unpack('<B', self.bgapi_rx_payload[:1])[0]
-                        self.wifi_evt_sme_ap_mode_stopped({ 'hw_interface': hw_interface })
-                    elif packet_command == 12: # wifi_evt_sme_ap_mode_failed
-                        reason, hw_interface = struct.unpack('<HB', self.bgapi_rx_payload[:3])
-                        self.wifi_evt_sme_ap_mode_failed({ 'reason': reason, 'hw_interface': hw_interface })
-                    elif packet_command == 13: # wifi_evt_sme_ap_client_joined
-                        hw_interface = struct.unpack('<B', self.bgapi_rx_payload[:1])[0]
-                        self.wifi_evt_sme_ap_client_joined({ 'hw_interface': hw_interface })
-                    elif packet_command == 14: # wifi_evt_sme_ap_client_left
-                        hw_interface = struct.unpack('<B', self.bgapi_rx_payload[:1])[0]
-                        self.wifi_evt_sme_ap_client_left({ 'hw_interface': hw_interface })
-                elif packet_class == 4:
-                    if packet_command == 0: # wifi_evt_tcpip_configuration
-                        use_dhcp = struct.unpack('<B', self.bgapi_rx_payload[:1])[0]
-                        self.wifi_evt_tcpip_configuration({ 'use_dhcp': use_dhcp })
-                    elif packet_command == 1: # wifi_evt_tcpip_dns_configuration
-                        index = struct.unpack('<B', self.bgapi_rx_payload[:1])[0]
-                        self.wifi_evt_tcpip_dns_configuration({ 'index': index })
-                    elif packet_command == 2: # wifi_evt_tcpip_endpoint_status
-                        endpoint, local_port, remote_port = struct.unpack('<BHH', self.bgapi_rx_payload[:5])
-                        self.wifi_evt_tcpip_endpoint_status({ 'endpoint': endpoint, 'local_port': local_port, 'remote_port': remote_port })
-                    elif packet_command == 3: # wifi_evt_tcpip_dns_gethostbyname_result
-                        result, name_len = struct.unpack('<HB', self.bgapi_rx_payload[:3])
-                        name_data = [ord(b) for b in self.bgapi_rx_payload[3:]]
-                        self.wifi_evt_tcpip_dns_gethostbyname_result({ 'result': result, 'name': name_data })
-                elif packet_class == 5:
-                    if packet_command == 0: # wifi_evt_endpoint_syntax_error
-                        endpoint = struct.unpack('<B', self.bgapi_rx_payload[:1])[0]
-                        self.wifi_evt_endpoint_syntax_error({ 'endpoint': endpoint })
-                    elif packet_command == 1: # wifi_evt_endpoint_data
-                        endpoint, data_len = struct.unpack('<BB', self.bgapi_rx_payload[:2])
-                        data_data = [ord(b) for b in self.bgapi_rx_payload[2:]]
-                        self.wifi_evt_endpoint_data({ 'endpoint': endpoint, 'data': data_data })
-                    elif packet_command == 2: # wifi_evt_endpoint_status
-                        endpoint, type, streaming, destination, active = struct.unpack('<BIBbB', self.bgapi_rx_payload[:8])
-                        self.wifi_evt_endpoint_status({ 'endpoint': endpoint, 'type': type, 'streaming': streaming, 'destination': destination, 'active': active })
-                    elif packet_command == 3: # wifi_evt_endpoint_closing
-                        reason, endpoint = struct.unpack('<HB', self.bgapi_rx_payload[:3])
-                        self.wifi_evt_endpoint_closing({ 'reason': reason, 'endpoint': endpoint })
-                elif packet_class == 6:
-                    if packet_command == 0: # wifi_evt_hardware_soft_timer
-                        handle = struct.unpack('<B', self.bgapi_rx_payload[:1])[0]
-                        self.wifi_evt_hardware_soft_timer({ 'handle': handle })
-                    elif packet_command == 1: # wifi_evt_hardware_change_notification
-                        timestamp = struct.unpack('<I', self.bgapi_rx_payload[:4])[0]
-                        self.wifi_evt_hardware_change_notification({ 'timestamp': timestamp })
-                    elif packet_command == 2: # wifi_evt_hardware_external_interrupt
-                        irq, timestamp = struct.unpack('<BI', self.bgapi_rx_payload[:5])
-                        self.wifi_evt_hardware_external_interrupt({ 'irq': irq, 'timestamp': timestamp })
-                elif packet_class == 7:
-                    if packet_command == 0: # wifi_evt_flash_ps_key
-                        key, value_len = struct.unpack('<HB', self.bgapi_rx_payload[:3])
-                        value_data = [ord(b) for b in self.bgapi_rx_payload[3:]]
-                        self.wifi_evt_flash_ps_key({ 'key': key, 'value': value_data })
-                elif packet_class == 9:
-                    if packet_command == 0: # wifi_evt_https_on_req
-                        service = struct.unpack('<B', self.bgapi_rx_payload[:1])[0]
-                        self.wifi_evt_https_on_req({ 'service': service })
-                    elif packet_command == 1: # wifi_evt_https_application_data_changed
-                        self.wifi_evt_https_application_data_changed({  })
+            packet = framer.next_packet()
+
+
+# BGAPI packets understood by BGLib:
+#     (message type, class, command, event name, payload format, fields[, uint8array field])
+# The message type is the first header byte masked with 0x88, i.e. the message
+# type and technology bits: 0x00 = BLE response, 0x80 = BLE event,
+# 0x08 = Wi-Fi response, 0x88 = Wi-Fi event.
+BGAPI_PACKETS = (
+    (0x00, 0, 0, 'ble_rsp_system_reset', '<', ()),
+    (0x00, 0, 1, 'ble_rsp_system_hello', '<', ()),
+    (0x00, 0, 2, 'ble_rsp_system_address_get', '<6s', ('address',)),
+    (0x00, 0, 3, 'ble_rsp_system_reg_write', '<H', ('result',)),
+    (0x00, 0, 4, 'ble_rsp_system_reg_read', '<HB', ('address', 'value')),
+    (0x00, 0, 5, 'ble_rsp_system_get_counters', '<BBBBB', ('txok', 'txretry', 'rxok', 'rxfail', 'mbuf')),
+    (0x00, 0, 6, 'ble_rsp_system_get_connections', '<B', ('maxconn',)),
+    (0x00, 0, 7, 'ble_rsp_system_read_memory', '<I', ('address',), 'data'),
+    (0x00, 0, 8, 'ble_rsp_system_get_info', '<HHHHHBB', ('major', 'minor', 'patch', 'build', 'll_version', 'protocol_version', 'hw')),
+    (0x00, 0, 9, 'ble_rsp_system_endpoint_tx', '<H', ('result',)),
+    (0x00, 0, 10, 'ble_rsp_system_whitelist_append', '<H', ('result',)),
+    (0x00, 0, 11, 'ble_rsp_system_whitelist_remove', '<H', ('result',)),
+    (0x00, 0, 12, 'ble_rsp_system_whitelist_clear', '<', ()),
+    (0x00, 0, 13, 'ble_rsp_system_endpoint_rx', '<H', ('result',), 'data'),
+    (0x00, 0, 14, 'ble_rsp_system_endpoint_set_watermarks', '<H', ('result',)),
+    (0x00, 1, 0, 'ble_rsp_flash_ps_defrag', '<', ()),
+    (0x00, 1, 1, 'ble_rsp_flash_ps_dump', '<', ()),
+    (0x00, 1, 2, 'ble_rsp_flash_ps_erase_all', '<', ()),
+    (0x00, 1, 3, 'ble_rsp_flash_ps_save', '<H', ('result',)),
+    (0x00, 1, 4, 'ble_rsp_flash_ps_load', '<H', ('result',), 'value'),
+    (0x00, 1, 5, 'ble_rsp_flash_ps_erase', '<', ()),
+    (0x00, 1, 6, 'ble_rsp_flash_erase_page', '<H', ('result',)),
+    (0x00, 1, 7, 'ble_rsp_flash_write_words', '<', ()),
+    (0x00, 2, 0, 'ble_rsp_attributes_write', '<H', ('result',)),
+    (0x00, 2, 1, 'ble_rsp_attributes_read', '<HHH', ('handle', 'offset', 'result'), 'value'),
+    (0x00, 2, 2, 'ble_rsp_attributes_read_type', '<HH', ('handle', 'result'), 'value'),
+    (0x00, 2, 3, 'ble_rsp_attributes_user_read_response', '<', ()),
+    (0x00, 2, 4, 'ble_rsp_attributes_user_write_response', '<', ()),
+    (0x00, 3, 0, 'ble_rsp_connection_disconnect', '<BH', ('connection', 'result')),
+    (0x00, 3, 1, 'ble_rsp_connection_get_rssi', '<Bb', ('connection', 'rssi')),
+    (0x00, 3, 2, 'ble_rsp_connection_update', '<BH', ('connection', 'result')),
+    (0x00, 3, 3, 'ble_rsp_connection_version_update', '<BH', ('connection', 'result')),
+    (0x00, 3, 4, 'ble_rsp_connection_channel_map_get', '<B', ('connection',), 'map'),
+    (0x00, 3, 5, 'ble_rsp_connection_channel_map_set', '<BH', ('connection', 'result')),
+    (0x00, 3, 6, 'ble_rsp_connection_features_get', '<BH', ('connection', 'result')),
+    (0x00, 3, 7, 'ble_rsp_connection_get_status', '<B', ('connection',)),
+    (0x00, 3, 8, 'ble_rsp_connection_raw_tx', '<B', ('connection',)),
+    (0x00, 4, 0, 'ble_rsp_attclient_find_by_type_value', '<BH', ('connection', 'result')),
+    (0x00, 4, 1, 'ble_rsp_attclient_read_by_group_type', '<BH', ('connection', 'result')),
+    (0x00, 4, 2, 'ble_rsp_attclient_read_by_type', '<BH', ('connection', 'result')),
+    (0x00, 4, 3, 'ble_rsp_attclient_find_information', '<BH', ('connection', 'result')),
+    (0x00, 4, 4, 'ble_rsp_attclient_read_by_handle', '<BH', ('connection', 'result')),
+    (0x00, 4, 5, 'ble_rsp_attclient_attribute_write', '<BH', ('connection', 'result')),
+    (0x00, 4, 6, 'ble_rsp_attclient_write_command', '<BH', ('connection', 'result')),
+    (0x00, 4, 7, 'ble_rsp_attclient_indicate_confirm', '<H', ('result',)),
+    (0x00, 4, 8, 'ble_rsp_attclient_read_long', '<BH', ('connection', 'result')),
+    (0x00, 4, 9, 'ble_rsp_attclient_prepare_write', '<BH', ('connection', 'result')),
+    (0x00, 4, 10, 'ble_rsp_attclient_execute_write', '<BH', ('connection', 'result')),
+    (0x00, 4, 11, 'ble_rsp_attclient_read_multiple', '<BH', ('connection', 'result')),
+    (0x00, 5, 0, 'ble_rsp_sm_encrypt_start', '<BH', ('handle', 'result')),
+    (0x00, 5, 1, 'ble_rsp_sm_set_bondable_mode', '<', ()),
+    (0x00, 5, 2, 'ble_rsp_sm_delete_bonding', '<H', ('result',)),
+    (0x00, 5, 3, 'ble_rsp_sm_set_parameters', '<', ()),
+    (0x00, 5, 4, 'ble_rsp_sm_passkey_entry', '<H', ('result',)),
+    (0x00, 5, 5, 'ble_rsp_sm_get_bonds', '<B', ('bonds',)),
+    (0x00, 5, 6, 'ble_rsp_sm_set_oob_data', '<', ()),
+    (0x00, 6, 0, 'ble_rsp_gap_set_privacy_flags', '<', ()),
+    (0x00, 6, 1, 'ble_rsp_gap_set_mode', '<H', ('result',)),
+    (0x00, 6, 2, 'ble_rsp_gap_discover', '<H', ('result',)),
+    (0x00, 6, 3, 'ble_rsp_gap_connect_direct', '<HB', ('result', 'connection_handle')),
+    (0x00, 6, 4, 'ble_rsp_gap_end_procedure', '<H', ('result',)),
+    (0x00, 6, 5, 'ble_rsp_gap_connect_selective', '<HB', ('result', 'connection_handle')),
+    (0x00, 6, 6, 'ble_rsp_gap_set_filtering', '<H', ('result',)),
+    (0x00, 6, 7, 'ble_rsp_gap_set_scan_parameters', '<H', ('result',)),
+    (0x00, 6, 8, 'ble_rsp_gap_set_adv_parameters', '<H', ('result',)),
+    (0x00, 6, 9, 'ble_rsp_gap_set_adv_data', '<H', ('result',)),
+    (0x00, 6, 10, 'ble_rsp_gap_set_directed_connectable_mode', '<H', ('result',)),
+    (0x00, 7, 0, 'ble_rsp_hardware_io_port_config_irq', '<H', ('result',)),
+    (0x00, 7, 1, 'ble_rsp_hardware_set_soft_timer', '<H', ('result',)),
+    (0x00, 7, 2, 'ble_rsp_hardware_adc_read', '<H', ('result',)),
+    (0x00, 7, 3, 'ble_rsp_hardware_io_port_config_direction', '<H', ('result',)),
+    (0x00, 7, 4, 'ble_rsp_hardware_io_port_config_function', '<H', ('result',)),
+    (0x00, 7, 5, 'ble_rsp_hardware_io_port_config_pull', '<H', ('result',)),
+    (0x00, 7, 6, 'ble_rsp_hardware_io_port_write', '<H', ('result',)),
+    (0x00, 7, 7, 'ble_rsp_hardware_io_port_read', '<HBB', ('result', 'port', 'data')),
+    (0x00, 7, 8, 'ble_rsp_hardware_spi_config', '<H', ('result',)),
+    (0x00, 7, 9, 'ble_rsp_hardware_spi_transfer', '<HB', ('result', 'channel'), 'data'),
+    (0x00, 7, 10, 'ble_rsp_hardware_i2c_read', '<H', ('result',), 'data'),
+    (0x00, 7, 11, 'ble_rsp_hardware_i2c_write', '<B', ('written',)),
+    (0x00, 7, 12, 'ble_rsp_hardware_set_txpower', '<', ()),
+    (0x00, 7, 13, 'ble_rsp_hardware_timer_comparator', '<H', ('result',)),
+    (0x00, 8, 0, 'ble_rsp_test_phy_tx', '<', ()),
+    (0x00, 8, 1, 'ble_rsp_test_phy_rx', '<', ()),
+    (0x00, 8, 2, 'ble_rsp_test_phy_end', '<H', ('counter',)),
+    (0x00, 8, 3, 'ble_rsp_test_phy_reset', '<', ()),
+    (0x00, 8, 4, 'ble_rsp_test_get_channel_map', '<', (), 'channel_map'),
+    (0x00, 8, 5, 'ble_rsp_test_debug', '<', (), 'output'),
+    (0x80, 0, 0, 'ble_evt_system_boot', '<HHHHHBB', ('major', 'minor', 'patch', 'build', 'll_version', 'protocol_version', 'hw')),
+    (0x80, 0, 1, 'ble_evt_system_debug', '<', (), 'data'),
+    (0x80, 0, 2, 'ble_evt_system_endpoint_watermark_rx', '<BB', ('endpoint', 'data')),
+    (0x80, 0, 3, 'ble_evt_system_endpoint_watermark_tx', '<BB', ('endpoint', 'data')),
+    (0x80, 0, 4, 'ble_evt_system_script_failure', '<HH', ('address', 'reason')),
+    (0x80, 0, 5, 'ble_evt_system_no_license_key', '<', ()),
+    (0x80, 0, 6, 'ble_evt_system_protocol_error', '<', ()),
+    (0x80, 1, 0, 'ble_evt_flash_ps_key', '<H', ('key',), 'value'),
+    (0x80, 2, 0, 'ble_evt_attributes_value', '<BBHH', ('connection', 'reason', 'handle', 'offset'), 'value'),
+    (0x80, 2, 1, 'ble_evt_attributes_user_read_request', '<BHHB', ('connection', 'handle', 'offset', 'maxsize')),
+    (0x80, 2, 2, 'ble_evt_attributes_status', '<HB', ('handle', 'flags')),
+    (0x80, 3, 0, 'ble_evt_connection_status', '<BB6sBHHHB', ('connection', 'flags', 'address', 'address_type', 'conn_interval', 'timeout', 'latency', 'bonding')),
+    (0x80, 3, 1, 'ble_evt_connection_version_ind', '<BBHH', ('connection', 'vers_nr', 'comp_id', 'sub_vers_nr')),
+    (0x80, 3, 2, 'ble_evt_connection_feature_ind', '<B', ('connection',), 'features'),
+    (0x80, 3, 3, 'ble_evt_connection_raw_rx', '<B', ('connection',), 'data'),
+    (0x80, 3, 4, 'ble_evt_connection_disconnected', '<BH', ('connection', 'reason')),
+    (0x80, 4, 0, 'ble_evt_attclient_indicated', '<BH', ('connection', 'attrhandle')),
+    (0x80, 4, 1, 'ble_evt_attclient_procedure_completed', '<BHH', ('connection', 'result', 'chrhandle')),
+    (0x80, 4, 2, 'ble_evt_attclient_group_found', '<BHH', ('connection', 'start', 'end'), 'uuid'),
+    (0x80, 4, 3, 'ble_evt_attclient_attribute_found', '<BHHB', ('connection', 'chrdecl', 'value', 'properties'), 'uuid'),
+    (0x80, 4, 4, 'ble_evt_attclient_find_information_found', '<BH', ('connection', 'chrhandle'), 'uuid'),
+    (0x80, 4, 5, 'ble_evt_attclient_attribute_value', '<BHB', ('connection', 'atthandle', 'type'), 'value'),
+    (0x80, 4, 6, 'ble_evt_attclient_read_multiple_response', '<B', ('connection',), 'handles'),
+    (0x80, 5, 0, 'ble_evt_sm_smp_data', '<BB', ('handle', 'packet'), 'data'),
+    (0x80, 5, 1, 'ble_evt_sm_bonding_fail', '<BH', ('handle', 'result')),
+    (0x80, 5, 2, 'ble_evt_sm_passkey_display', '<BI', ('handle', 'passkey')),
+    (0x80, 5, 3, 'ble_evt_sm_passkey_request', '<B', ('handle',)),
+    (0x80, 5, 4, 'ble_evt_sm_bond_status', '<BBBB', ('bond', 'keysize', 'mitm', 'keys')),
+    (0x80, 6, 0, 'ble_evt_gap_scan_response', '<bB6sBB', ('rssi', 'packet_type', 'sender', 'address_type', 'bond'), 'data'),
+    (0x80, 6, 1, 'ble_evt_gap_mode_changed', '<BB', ('discover', 'connect')),
+    (0x80, 7, 0, 'ble_evt_hardware_io_port_status', '<IBBB', ('timestamp', 'port', 'irq', 'state')),
+    (0x80, 7, 1, 'ble_evt_hardware_soft_timer', '<B', ('handle',)),
+    (0x80, 7, 2, 'ble_evt_hardware_adc_result', '<Bh', ('input', 'value')),
+    (0x08, 0, 0, 'wifi_rsp_dfu_reset', '<', ()),
+    (0x08, 0, 1, 'wifi_rsp_dfu_flash_set_address', '<H', ('result',)),
+    (0x08, 0, 2, 'wifi_rsp_dfu_flash_upload', '<H', ('result',)),
+    (0x08, 0, 3, 'wifi_rsp_dfu_flash_upload_finish', '<H', ('result',)),
+    (0x08, 1, 0, 'wifi_rsp_system_sync', '<', ()),
+    (0x08, 1, 1, 'wifi_rsp_system_reset', '<', ()),
+    (0x08, 1, 2, 'wifi_rsp_system_hello', '<', ()),
+    (0x08, 1, 3, 'wifi_rsp_system_set_max_power_saving_state', '<H', ('result',)),
+    (0x08, 2, 0, 'wifi_rsp_config_get_mac', '<HB', ('result', 'hw_interface')),
+    (0x08, 2, 1, 'wifi_rsp_config_set_mac', '<HB', ('result', 'hw_interface')),
+    (0x08, 3, 0, 'wifi_rsp_sme_wifi_on', '<H', ('result',)),
+    (0x08, 3, 1, 'wifi_rsp_sme_wifi_off', '<H', ('result',)),
+    (0x08, 3, 2, 'wifi_rsp_sme_power_on', '<H', ('result',)),
+    (0x08, 3, 3, 'wifi_rsp_sme_start_scan', '<H', ('result',)),
+    (0x08, 3, 4, 'wifi_rsp_sme_stop_scan', '<H', ('result',)),
+    (0x08, 3, 5, 'wifi_rsp_sme_set_password', '<B', ('status',)),
+    (0x08, 3, 6, 'wifi_rsp_sme_connect_bssid', '<HB', ('result', 'hw_interface')),
+    (0x08, 3, 7, 'wifi_rsp_sme_connect_ssid', '<HB', ('result', 'hw_interface')),
+    (0x08, 3, 8, 'wifi_rsp_sme_disconnect', '<HB', ('result', 'hw_interface')),
+    (0x08, 3, 9, 'wifi_rsp_sme_set_scan_channels', '<H', ('result',)),
+    (0x08, 3, 10, 'wifi_rsp_sme_set_operating_mode', '<H', ('result',)),
+    (0x08, 3, 11, 'wifi_rsp_sme_start_ap_mode', '<HB', ('result', 'hw_interface')),
+    (0x08, 3, 12, 'wifi_rsp_sme_stop_ap_mode', '<HB', ('result', 'hw_interface')),
+    (0x08, 4, 0, 'wifi_rsp_tcpip_start_tcp_server', '<HB', ('result', 'endpoint')),
+    (0x08, 4, 1, 'wifi_rsp_tcpip_tcp_connect', '<HB', ('result', 'endpoint')),
+    (0x08, 4, 2, 'wifi_rsp_tcpip_start_udp_server', '<HB', ('result', 'endpoint')),
+    (0x08, 4, 3, 'wifi_rsp_tcpip_udp_connect', '<HB', ('result', 'endpoint')),
+    (0x08, 4, 4, 'wifi_rsp_tcpip_configure', '<H', ('result',)),
+    (0x08, 4, 5, 'wifi_rsp_tcpip_dns_configure', '<H', ('result',)),
+    (0x08, 4, 6, 'wifi_rsp_tcpip_dns_gethostbyname', '<H', ('result',)),
+    (0x08, 5, 0, 'wifi_rsp_endpoint_send', '<HB', ('result', 'endpoint')),
+    (0x08, 5, 1, 'wifi_rsp_endpoint_set_streaming', '<HB', ('result', 'endpoint')),
+    (0x08, 5, 2, 'wifi_rsp_endpoint_set_active', '<HB', ('result', 'endpoint')),
+    (0x08, 5, 3, 'wifi_rsp_endpoint_set_streaming_destination', '<HB', ('result', 'endpoint')),
+    (0x08, 5, 4, 'wifi_rsp_endpoint_close', '<HB', ('result', 'endpoint')),
+    (0x08, 6, 0, 'wifi_rsp_hardware_set_soft_timer', '<H', ('result',)),
+    (0x08, 6, 1, 'wifi_rsp_hardware_external_interrupt_config', '<H', ('result',)),
+    (0x08, 6, 2, 'wifi_rsp_hardware_change_notification_config', '<H', ('result',)),
+    (0x08, 6, 3, 'wifi_rsp_hardware_change_notification_pullup', '<H', ('result',)),
+    (0x08, 6, 4, 'wifi_rsp_hardware_io_port_config_direction', '<H', ('result',)),
+    (0x08, 6, 5, 'wifi_rsp_hardware_io_port_config_open_drain', '<H', ('result',)),
+    (0x08, 6, 6, 'wifi_rsp_hardware_io_port_write', '<H', ('result',)),
+    (0x08, 6, 7, 'wifi_rsp_hardware_io_port_read', '<HBH', ('result', 'port', 'data')),
+    (0x08, 6, 8, 'wifi_rsp_hardware_output_compare', '<H', ('result',)),
+    (0x08, 6, 9, 'wifi_rsp_hardware_adc_read', '<HBH', ('result', 'input', 'value')),
+    (0x08, 7, 0, 'wifi_rsp_flash_ps_defrag', '<H', ('result',)),
+    (0x08, 7, 1, 'wifi_rsp_flash_ps_dump', '<H', ('result',)),
+    (0x08, 7, 2, 'wifi_rsp_flash_ps_erase_all', '<H', ('result',)),
+    (0x08, 7, 3, 'wifi_rsp_flash_ps_save', '<H', ('result',)),
+    (0x08, 7, 4, 'wifi_rsp_flash_ps_load', '<H', ('result',), 'value'),
+    (0x08, 7, 5, 'wifi_rsp_flash_ps_erase', '<H', ('result',)),
+    (0x08, 8, 0, 'wifi_rsp_i2c_start_read', '<H', ('result',)),
+    (0x08, 8, 1, 'wifi_rsp_i2c_start_write', '<H', ('result',)),
+    (0x08, 8, 2, 'wifi_rsp_i2c_stop', '<H', ('result',)),
+    (0x08, 9, 0, 'wifi_rsp_https_enable', '<H', ('result',)),
+    (0x88, 0, 0, 'wifi_evt_dfu_boot', '<I', ('version',)),
+    (0x88, 1, 0, 'wifi_evt_system_boot', '<HHHHHHH', ('major', 'minor', 'patch', 'build', 'bootloader_version', 'tcpip_version', 'hw')),
+    (0x88, 1, 1, 'wifi_evt_system_state', '<H', ('state',)),
+    (0x88, 1, 2, 'wifi_evt_system_sw_exception', '<IB', ('address', 'type')),
+    (0x88, 1, 3, 'wifi_evt_system_power_saving_state', '<B', ('state',)),
+    (0x88, 2, 0, 'wifi_evt_config_mac_address', '<B', ('hw_interface',)),
+    (0x88, 3, 0, 'wifi_evt_sme_wifi_is_on', '<H', ('result',)),
+    (0x88, 3, 1, 'wifi_evt_sme_wifi_is_off', '<H', ('result',)),
+    (0x88, 3, 2, 'wifi_evt_sme_scan_result', '<bhbB', ('channel', 'rssi', 'snr', 'secure'), 'ssid'),
+    (0x88, 3, 3, 'wifi_evt_sme_scan_result_drop', '<', ()),
+    (0x88, 3, 4, 'wifi_evt_sme_scanned', '<b', ('status',)),
+    (0x88, 3, 5, 'wifi_evt_sme_connected', '<bB', ('status', 'hw_interface')),
+    (0x88, 3, 6, 'wifi_evt_sme_disconnected', '<HB', ('reason', 'hw_interface')),
+    (0x88, 3, 7, 'wifi_evt_sme_interface_status', '<BB', ('hw_interface', 'status')),
+    (0x88, 3, 8, 'wifi_evt_sme_connect_failed', '<HB', ('reason', 'hw_interface')),
+    (0x88, 3, 9, 'wifi_evt_sme_connect_retry', '<B', ('hw_interface',)),
+    (0x88, 3, 10, 'wifi_evt_sme_ap_mode_started', '<B', ('hw_interface',)),
+    (0x88, 3, 11, 'wifi_evt_sme_ap_mode_stopped', '<B', ('hw_interface',)),
+    (0x88, 3, 12, 'wifi_evt_sme_ap_mode_failed', '<HB', ('reason', 'hw_interface')),
+    (0x88, 3, 13, 'wifi_evt_sme_ap_client_joined', '<B', ('hw_interface',)),
+    (0x88, 3, 14, 'wifi_evt_sme_ap_client_left', '<B', ('hw_interface',)),
+    (0x88, 4, 0, 'wifi_evt_tcpip_configuration', '<B', ('use_dhcp',)),
+    (0x88, 4, 1, 'wifi_evt_tcpip_dns_configuration', '<B', ('index',)),
+    (0x88, 4, 2, 'wifi_evt_tcpip_endpoint_status', '<BHH', ('endpoint', 'local_port', 'remote_port')),
+    (0x88, 4, 3, 'wifi_evt_tcpip_dns_gethostbyname_result', '<H', ('result',), 'name'),
+    (0x88, 5, 0, 'wifi_evt_endpoint_syntax_error', '<B', ('endpoint',)),
+    (0x88, 5, 1, 'wifi_evt_endpoint_data', '<B', ('endpoint',), 'data'),
+    (0x88, 5, 2, 'wifi_evt_endpoint_status', '<BIBbB', ('endpoint', 'type', 'streaming', 'destination', 'active')),
+    (0x88, 5, 3, 'wifi_evt_endpoint_closing', '<HB', ('reason', 'endpoint')),
+    (0x88, 6, 0, 'wifi_evt_hardware_soft_timer', '<B', ('handle',)),
+    (0x88, 6, 1, 'wifi_evt_hardware_change_notification', '<I', ('timestamp',)),
+    (0x88, 6, 2, 'wifi_evt_hardware_external_interrupt', '<BI', ('irq', 'timestamp')),
+    (0x88, 7, 0, 'wifi_evt_flash_ps_key', '<H', ('key',), 'value'),
+    (0x88, 9, 0, 'wifi_evt_https_on_req', '<B', ('service',)),
+    (0x88, 9, 1, 'wifi_evt_https_application_data_changed', '<', ()),
+)
+
+# Events that also mean the dongle is idle again (it has just booted)
+BGAPI_IDLE_EVENTS = ('ble_evt_system_boot', 'wifi_evt_dfu_boot')
+
+for name, event in vars(BGLib).items():
+    if isinstance(event, BGAPIEvent):
+        event.name = name
+del name, event
+
+BGLib.decoders = {}
+for packet in BGAPI_PACKETS:
+    decoder = BGAPIPacketDecoder(getattr(BGLib, packet[3]), *packet)
+    decoder.idle = decoder.name in BGAPI_IDLE_EVENTS
+    BGLib.decoders[decoder.key] = decoder
+del packet, decoder
 
 # ================================================================
 
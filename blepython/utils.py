@@ -10,9 +10,92 @@
 # @copyright Copyright &copy 2015 Ashton Instruments
 ################################################################################
 
+from threading import Lock
+import ctypes
+import ctypes.util
+import os
+import time
+
+def _clock_gettime_monotonic():
+    # POSIX clock_gettime(CLOCK_MONOTONIC) for Python 2, None where missing
+    class timespec(ctypes.Structure):
+        _fields_ = [('tv_sec', ctypes.c_long), ('tv_nsec', ctypes.c_long)]
+    clock_id = 6 if os.uname()[0] == 'Darwin' else 1
+    for name in ('c', 'rt'):
+        path = ctypes.util.find_library(name)
+        if not path:
+            continue
+        try:
+            clock_gettime = ctypes.CDLL(path, use_errno=True).clock_gettime
+        except (OSError, AttributeError):
+            continue
+        clock_gettime.argtypes = [ctypes.c_int, ctypes.POINTER(timespec)]
+        t = timespec()
+
+        def monotonic():
+            if clock_gettime(clock_id, ctypes.byref(t)):
+                raise OSError(ctypes.get_errno(), 'clock_gettime failed')
+            return t.tv_sec + t.tv_nsec * 1e-9
+        try:
+            monotonic()
+        except OSError:
+            continue
+        return monotonic
+    return None
+
+def _monotonic_source():
+    if hasattr(time, 'monotonic'):
+        return time.monotonic
+    if os.name == 'nt':
+        tick_count = ctypes.windll.kernel32.GetTickCount64
+        tick_count.restype = ctypes.c_ulonglong
+        return lambda: tick_count() / 1000.0
+    source = _clock_gettime_monotonic()
+    if source:
+        return source
+
+    # Last resort: wall clock time that never goes backwards.  Steps forward
+    # (NTP, clock changes) still show up as elapsed time.
+    lock = Lock()
+    last = [time.time()]
+
+    def clamped():
+        with lock:
+            last[0] = max(last[0], time.time())
+            return last[0]
+    return clamped
+
+# Seconds from a clock that is not affected by system time changes, for
+# timeouts, deadlines and rates (time.monotonic on Python 3)
+monotonic = _monotonic_source()
+
 class ConnectTimeout(Exception):
     pass
 
+class CommandTimeout(Exception):
+    pass
+
+class NotConnected(Exception):
+    pass
+
+class BGAPIError(Exception):
+    '''
+    A command was answered with a non-zero result code
+    '''
+    def __init__(self, result, response=None):
+        super(BGAPIError, self).__init__('BGAPI error 0x%04X' % result)
+        self.result = result
+        self.response = response
+
+def address2key(address):
+    '''
+    Compact hashable form of a 6 byte address given as bytes, bytearray or a
+    list of ints
+    '''
+    if isinstance(address, bytes):
+        return address
+    return bytes(bytearray(address))
+
 def address2str(address):
     return "%s" % ''.join(['%02X' % b for b in address[::-1]])
 
@@ -0,0 +1,976 @@
+#!/usr/bin/env python
+################################################################################
+#
+# @brief Micro benchmarks for the BLEPython receive/transmit paths
+#
+# Runs entirely against in-memory fake serial ports, no dongle required.
+#
+# @date Created 2026/10/17
+#
+# @copyright Copyright &copy 2026 Ashton Instruments
+################################################################################
+
+from __future__ import print_function
+
+import logging
+import os
+import heapq
+import pty
+import random
+import resource
+import select
+import struct
+import sys
+import threading
+import time
+
+import blepython
+from blepython import bglib
+from blepython.AdvertisementStats import AdvertisementStats
+from blepython.AdvertisingData import parse_advertising_data, _parse
+from blepython.CommandQueue import CommandQueue
+from blepython.Device import Device
+
+
+def packet(msg_type, packet_class, packet_command, payload):
+    return struct.pack('<4B', msg_type, len(payload), packet_class, packet_command) + payload
+
+def scan_response(rssi, address, data):
+    return packet(0x80, 6, 0, struct.pack('<bB6sBBB', rssi, 0, address, 1, 0xFF, len(data)) + data)
+
+def attribute_value(connection, handle, value, value_type=1):
+    return packet(0x80, 4, 5, struct.pack('<BHBB', connection, handle, value_type, len(value)) + value)
+
+def procedure_completed(connection, handle, result=0):
+    return packet(0x80, 4, 1, struct.pack('<BHH', connection, result, handle))
+
+def command_response(packet_class, packet_command, connection):
+    return packet(0x00, packet_class, packet_command, struct.pack('<BH', connection, 0))
+
+def connection_status(connection, address, address_type=1, interval=12, timeout=100, latency=0, flags=0x05):
+    return packet(0x80, 3, 0, struct.pack('<BB6sBHHHB', connection, flags, address, address_type, interval, timeout, latency, 0xFF))
+
+def group_found(connection, start, end, uuid):
+    return packet(0x80, 4, 2, struct.pack('<BHHB', connection, start, end, len(uuid)) + uuid)
+
+def attribute_found(connection, declaration, value, properties, uuid):
+    return packet(0x80, 4, 3, struct.pack('<BHHBB', connection, declaration, value, properties, len(uuid)) + uuid)
+
+def find_information_found(connection, handle, uuid):
+    return packet(0x80, 4, 4, struct.pack('<BHB', connection, handle, len(uuid)) + uuid)
+
+def recorded_stream():
+    '''
+    A mixed stream resembling a busy gateway: advertisements from a few
+    hundred tags interleaved with notifications on several connections.
+    '''
+    adv = b'\x02\x01\x06\x0b\x09BLEPython\x00\x03\x03\x0f\x18\x07\xff\x4c\x00\x02\x15\x01\x02'
+    packets = []
+    for i in range(400):
+        address = struct.pack('<6B', i & 0xFF, i >> 8, 0x33, 0x44, 0x55, 0xC6)
+        packets.append(scan_response(-40 - (i % 50), address, adv))
+        packets.append(attribute_value(i % 4, 0x0010 + (i % 8), b'\x01\x02\x03\x04\x05\x06\x07\x08\x09\x0a\x0b\x0c\x0d\x0e\x0f\x10\x11\x12\x13\x14'))
+        if i % 10 == 0:
+            packets.append(procedure_completed(i % 4, 0x0010))
+            packets.append(command_response(4, 4, i % 4))
+        if i % 50 == 0:
+            packets.append(connection_status(i % 4, address))
+            packets.append(group_found(i % 4, 1, 7, b'\x00\x18'))
+            packets.append(find_information_found(i % 4, 3, b'\x00\x2a'))
+    return packets
+
+# Advertising payloads as commonly seen in the field
+AD_CORPUS = [bytes(bytearray.fromhex(h)) for h in (
+    # iBeacon
+    '0201061aff4c000215e2c56db5dffb48d2b060d0f5a71096e000010002c5',
+    # Eddystone-UID and Eddystone-URL
+    '0201060303aafe1716aafe00e800112233445566778899aabbccddeeff0000',
+    '0201060303aafe0d16aafe10eb03676f6f676c6507',
+    # Apple continuity (nearby info)
+    '02011a020a0c0bff4c001006191e3a7d9a48',
+    # Microsoft CDP beacon
+    '1eff060001092002a4f9e29c1b2ab47b5ae67e8feb27dbca0bd7ae6cec9a9e',
+    # Heart rate strap with name, service list and TX power
+    '0201060503 0d180f18 0d09 506f6c6172204837203341 42 020a04'.replace(' ', ''),
+    # Tile tracker service data
+    '02010603 03edfe0b16edfe020104123456789a'.replace(' ', ''),
+    # Xiaomi MiBeacon temperature/humidity sensor
+    '020106151695fe5020aa01b4a1b2c3d4e5f60d1004d800f201',
+    # RuuviTag data format 5
+    '0201061bff99040512fc5394c37c0004fffc040cac364200cdcbb8334c884f',
+    # 128-bit custom service with complete local name
+    '020106110770c2ba7b8b05fa89ad4a6c1f01000000080953656e736f7231',
+    # Scan response with name only
+    '0c094e6f726469632055415254020a00',
+)]
+
+def subscribe_all(lib, handler):
+    for name in dir(bglib.BGLib):
+        if name.startswith(('ble_rsp_', 'ble_evt_')):
+            getattr(lib, name).add(handler)
+
+
+class FakeSerial(object):
+    '''
+    Replays a byte string in USB sized chunks through the subset of the
+    pyserial API that BGLib uses.
+    '''
+    def __init__(self, data, chunk=4096):
+        self.data = data
+        self.chunk = chunk
+        self.pos = 0
+        self.timeout = 0
+
+    def inWaiting(self):
+        return min(self.chunk, len(self.data) - self.pos)
+
+    def read(self, size=1):
+        data = self.data[self.pos:self.pos + size]
+        self.pos += len(data)
+        return data
+
+    def write(self, data):
+        pass
+
+
+def bench_rx_throughput(repeat=25):
+    '''
+    Packets per second through BGLib.check_activity, including dispatch to a
+    subscriber on every event.
+    '''
+    packets = recorded_stream()
+    data = b''.join(packets) * repeat
+
+    lib = bglib.BGLib()
+    count = [0]
+    def handler(sender, args):
+        count[0] += 1
+    subscribe_all(lib, handler)
+
+    ser = FakeSerial(data)
+    start = time.time()
+    while ser.inWaiting():
+        lib.check_activity(ser)
+    elapsed = time.time() - start
+
+    total = len(packets) * repeat
+    assert count[0] == total, 'dispatched %d of %d packets' % (count[0], total)
+    print('rx: %d packets (%d bytes) in %.3fs, %.0f packets/sec' % (total, len(data), elapsed, total / elapsed))
+
+
+def bench_decode(repeat=25):
+    '''
+    Packets per second through BGLib.feed for the recorded mixed stream, once
+    with a subscriber on every event so that every packet is fully decoded and
+    dispatched, and once with no subscribers at all.
+    '''
+    packets = recorded_stream()
+    total = len(packets) * repeat
+
+    for subscribed in (True, False):
+        lib = bglib.BGLib()
+        count = [0]
+        def handler(sender, args):
+            count[0] += 1
+        if subscribed:
+            subscribe_all(lib, handler)
+
+        start = time.time()
+        for i in range(repeat):
+            for p in packets:
+                lib.feed(p)
+        elapsed = time.time() - start
+
+        assert count[0] == (total if subscribed else 0)
+        print('decode (%s): %d packets in %.3fs, %.0f packets/sec' % (
+            'subscribed' if subscribed else 'no subscribers', total, elapsed, total / elapsed))
+
+
+def bench_tx_encode(count=100000):
+    '''
+    Commands per second built by the ble_cmd_* builders on the write path:
+    a 20 byte write_command to many connections with the payload given as a
+    list of ints and as bytes, and read_by_handle polling.
+    '''
+    lib = bglib.BGLib()
+    payload_list = list(range(20))
+    payload_bytes = bytes(bytearray(payload_list))
+
+    for label, build in (
+            ('write_command (list)', lambda i: lib.ble_cmd_attclient_write_command(i & 7, 0x0010, payload_list)),
+            ('write_command (bytes)', lambda i: lib.ble_cmd_attclient_write_command(i & 7, 0x0010, payload_bytes)),
+            ('read_by_handle', lambda i: lib.ble_cmd_attclient_read_by_handle(i & 7, 0x0010))):
+        try:
+            build(0)
+        except Exception:
+            print('tx %s: not supported' % label)
+            continue
+        start = time.time()
+        for i in range(count):
+            build(i)
+        elapsed = time.time() - start
+        print('tx %s: %d commands in %.3fs, %.0f commands/sec' % (label, count, elapsed, count / elapsed))
+
+
+def fake_dongle(fd):
+    '''
+    Answers every command written to the master side of a pty with a generic
+    successful (connection, result) response for the same class/command.
+    '''
+    buf = bytearray()
+    while True:
+        buf += os.read(fd, 4096)
+        while len(buf) >= 4 and len(buf) >= 4 + buf[1]:
+            packet_class, packet_command = buf[2], buf[3]
+            del buf[:4 + buf[1]]
+            os.write(fd, packet(0x00, packet_class, packet_command, struct.pack('<BH', 0, 0)))
+
+def fake_gatt_dongle(fd, maxconn=3, link_delay=0.02, procedure_delay=0.03, disconnect_delay=0.002,
+                     database_hash=None, services=1, characteristics=1, descriptions=False,
+                     tx_buffers=0, tx_interval=0.0075, tx_per_event=4):
+    '''
+    Answers commands like a dongle with maxconn connection slots talking to
+    peripherals with the given number of primary services, each holding
+    characteristics characteristics with a value and a CCCD.  The first
+    service is the Battery Service (read and notify) and, when database_hash
+    is given, also holds a Database Hash characteristic.  The others can be
+    read, written with and without response and notify, and with
+    descriptions=True also have a User Description descriptor.
+
+    Links are up link_delay seconds after gap_connect_direct and drop
+    disconnect_delay seconds after connection_disconnect.  GATT procedures
+    take procedure_delay seconds per ATT response they need, at the default
+    MTU three services or five attributes fit one response.
+
+    With tx_buffers write commands take one of that many TX buffers, which
+    the link drains tx_per_event at a time every tx_interval seconds; a write
+    command finding them all taken is refused with 0x0182 (out of memory).
+
+    Values are 0x55 until written.  Reads return the first 22 bytes, read_long
+    the whole value in 22 byte fragments, read_multiple the values back to
+    back cut at 22 bytes.  Prepare writes are queued per
+    connection until an execute write commits or cancels them.
+    '''
+    primary = []        # (start, end, uuid)
+    attributes = []     # (handle, uuid)
+    declarations = []   # (declaration handle, value handle, properties, uuid)
+    hash_handle = None
+    handle = 1
+    for i in range(services):
+        start = handle
+        attributes.append((handle, b'\x00\x28'))
+        handle += 1
+        for j in range(characteristics):
+            value_uuid = b'\x19\x2a' if i == 0 and j == 0 else struct.pack('<H', 0xFF00 + j)
+            declarations.append((handle, handle + 1, 0x12 if i == 0 and j == 0 else 0x1E, value_uuid))
+            attributes += [(handle, b'\x03\x28'), (handle + 1, value_uuid), (handle + 2, b'\x02\x29')]
+            handle += 3
+            if descriptions and declarations[-1][2] == 0x1E:
+                attributes.append((handle, b'\x01\x29'))
+                handle += 1
+        if i == 0 and database_hash is not None:
+            hash_handle = handle + 1
+            declarations.append((handle, handle + 1, 0x02, b'\x2a\x2b'))
+            attributes += [(handle, b'\x03\x28'), (handle + 1, b'\x2a\x2b')]
+            handle += 2
+        primary.append((start, handle - 1, b'\x0f\x18' if i == 0 else struct.pack('<H', 0xFE00 + i)))
+    handles = set(h for h, _ in attributes)
+
+    buf = bytearray()
+    events = []     # heap of (due, sequence, packet)
+    slots = [None] * maxconn
+    sequence = [0]
+    tx_queued = [0] * maxconn
+    values = {}
+    prepared = [[] for _ in range(maxconn)]
+    tx_drained = [0.0] * maxconn
+
+    def later(delay, p):
+        sequence[0] += 1
+        heapq.heappush(events, (time.time() + delay, sequence[0], p))
+
+    def responses(count, per_response):
+        return procedure_delay * max(1, (count + per_response - 1) // per_response)
+
+    while True:
+        timeout = max(0, events[0][0] - time.time()) if events else None
+        if select.select([fd], [], [], timeout)[0]:
+            buf += os.read(fd, 4096)
+        while events and events[0][0] <= time.time():
+            os.write(fd, heapq.heappop(events)[2])
+        while len(buf) >= 4 and len(buf) >= 4 + buf[1]:
+            packet_class, packet_command = buf[2], buf[3]
+            payload = bytes(buf[4:4 + buf[1]])
+            del buf[:4 + buf[1]]
+            cmd = (packet_class, packet_command)
+            if cmd == (0, 6):
+                os.write(fd, packet(0x00, 0, 6, struct.pack('<B', maxconn)))
+            elif cmd == (6, 3):
+                if None in slots:
+                    connection = slots.index(None)
+                    slots[connection] = payload[:6]
+                    os.write(fd, packet(0x00, 6, 3, struct.pack('<HB', 0, connection)))
+                    address_type, _, interval, timeout, latency = struct.unpack('<BHHHH', payload[6:15])
+                    later(link_delay, connection_status(connection, payload[:6], address_type, interval, timeout, latency))
+                else:
+                    os.write(fd, packet(0x00, 6, 3, struct.pack('<HB', 0x0184, 0)))
+            elif cmd == (4, 0):
+                connection, first, last, _, _ = struct.unpack('<BHHHB', payload[:8])
+                os.write(fd, packet(0x00, 4, 0, struct.pack('<BH', connection, 0)))
+                found = [s for s in primary if first <= s[0] <= last and s[2] == payload[8:]]
+                later(procedure_delay, b''.join(group_found(connection, start, end, b'') for start, end, _ in found)
+                      + procedure_completed(connection, 0, 0 if found else 0x040A))
+            elif cmd == (4, 1):
+                connection, first, last = struct.unpack('<BHH', payload[:5])
+                os.write(fd, packet(0x00, 4, 1, struct.pack('<BH', connection, 0)))
+                found = [s for s in primary if first <= s[0] <= last] if payload[-2:] == b'\x00\x28' else []
+                later(responses(len(found), 3), b''.join(group_found(connection, start, end, uuid) for start, end, uuid in found)
+                      + procedure_completed(connection, 0))
+            elif cmd == (4, 2):
+                connection, first, last = struct.unpack('<BHH', payload[:5])
+                os.write(fd, packet(0x00, 4, 2, struct.pack('<BH', connection, 0)))
+                found = [d for d in declarations if first <= d[0] <= last] if payload[-2:] == b'\x03\x28' else []
+                later(responses(len(found), 3), b''.join(attribute_found(connection, *d) for d in found)
+                      + procedure_completed(connection, 0, 0 if found else 0x040A))
+            elif cmd == (4, 5):
+                connection, handle = struct.unpack('<BH', payload[:3])
+                os.write(fd, packet(0x00, 4, 5, struct.pack('<BH', connection, 0)))
+                if handle in handles:
+                    values[handle] = payload[4:]
+                later(procedure_delay, procedure_completed(connection, handle, 0 if handle in handles else 0x0401))
+            elif cmd == (4, 9):
+                connection, handle, offset = struct.unpack('<BHH', payload[:5])
+                os.write(fd, packet(0x00, 4, 9, struct.pack('<BH', connection, 0)))
+                if handle in handles:
+                    prepared[connection].append((handle, offset, payload[6:]))
+                later(procedure_delay, procedure_completed(connection, handle, 0 if handle in handles else 0x0401))
+            elif cmd == (4, 10):
+                connection, commit = struct.unpack('<BB', payload)
+                os.write(fd, packet(0x00, 4, 10, struct.pack('<BH', connection, 0)))
+                for handle, offset, data in prepared[connection] if commit else []:
+                    value = bytearray(values.get(handle, b'\x55'))[:offset]
+                    values[handle] = bytes(value + data)
+                prepared[connection] = []
+                later(procedure_delay, procedure_completed(connection, 0, 0))
+            elif cmd == (4, 11):
+                connection = bytearray(payload)[0]
+                requested = struct.unpack('<%dH' % (len(payload) // 2 - 1), payload[2:])
+                os.write(fd, packet(0x00, 4, 11, struct.pack('<BH', connection, 0)))
+                missing = [h for h in requested if h not in handles]
+                if missing:
+                    later(procedure_delay, procedure_completed(connection, missing[0], 0x0401))
+                else:
+                    value = b''.join(database_hash if h == hash_handle else values.get(h, b'\x55') for h in requested)[:22]
+                    later(procedure_delay, packet(0x80, 4, 6, struct.pack('<BB', connection, len(value)) + value))
+            elif cmd == (4, 8):
+                connection, handle = struct.unpack('<BH', payload)
+                os.write(fd, packet(0x00, 4, 8, struct.pack('<BH', connection, 0)))
+                if handle not in handles:
+                    later(procedure_delay, procedure_completed(connection, handle, 0x0401))
+                else:
+                    value = database_hash if handle == hash_handle else values.get(handle, b'\x55')
+                    # A further read blob only when the previous fragment was full
+                    fragments = [value[i:i + 22] for i in range(0, len(value) + 1, 22)]
+                    if len(fragments) > 1 and not fragments[-1]:
+                        fragments.pop()
+                    later(procedure_delay * len(fragments),
+                          b''.join(attribute_value(connection, handle, f, 0 if i == 0 else 4) for i, f in enumerate(fragments))
+                          + procedure_completed(connection, handle))
+            elif cmd == (4, 6):
+                connection, handle = struct.unpack('<BH', payload[:3])
+                result = 0 if handle in handles else 0x0401
+                if tx_buffers and not result:
+                    events_passed = int((time.time() - tx_drained[connection]) / tx_interval)
+                    if events_passed:
+                        tx_queued[connection] = max(0, tx_queued[connection] - events_passed * tx_per_event)
+                        tx_drained[connection] += events_passed * tx_interval
+                    if not tx_queued[connection]:
+                        tx_drained[connection] = time.time()
+                    if tx_queued[connection] < tx_buffers:
+                        tx_queued[connection] += 1
+                    else:
+                        result = 0x0182
+                if not result:
+                    values[handle] = payload[4:]
+                os.write(fd, packet(0x00, 4, 6, struct.pack('<BH', connection, result)))
+            elif cmd == (4, 3):
+                connection, first, last = struct.unpack('<BHH', payload)
+                os.write(fd, packet(0x00, 4, 3, struct.pack('<BH', connection, 0)))
+                found = [a for a in attributes if first <= a[0] <= last]
+                later(responses(len(found), 5), b''.join(find_information_found(connection, h, uuid) for h, uuid in found)
+                      + procedure_completed(connection, last))
+            elif cmd == (4, 4):
+                connection, handle = struct.unpack('<BH', payload)
+                os.write(fd, packet(0x00, 4, 4, struct.pack('<BH', connection, 0)))
+                if handle not in handles:
+                    later(procedure_delay, procedure_completed(connection, handle, 0x0401))
+                elif handle == hash_handle:
+                    later(procedure_delay, attribute_value(connection, handle, database_hash, 0))
+                else:
+                    later(procedure_delay, attribute_value(connection, handle, values.get(handle, b'\x55')[:22], 0))
+            elif cmd == (3, 2):
+                connection, _, interval, latency, timeout = struct.unpack('<BHHHH', payload)
+                os.write(fd, packet(0x00, 3, 2, struct.pack('<BH', connection, 0)))
+                later(link_delay, connection_status(connection, slots[connection], 0, interval, timeout, latency, 0x0D))
+            elif cmd == (3, 0):
+                connection = bytearray(payload)[0]
+                os.write(fd, packet(0x00, 3, 0, struct.pack('<BH', connection, 0)))
+                slots[connection] = None
+                later(disconnect_delay, packet(0x80, 3, 4, struct.pack('<BH', connection, 0x0216)))
+            else:
+                os.write(fd, packet(0x00, packet_class, packet_command, struct.pack('<BH', 0, 0)))
+
+def fake_dongle_adapter(**kwargs):
+    master, slave = pty.openpty()
+    dongle = threading.Thread(name='FakeDongle', target=fake_dongle, args=(master,))
+    dongle.daemon = True
+    dongle.start()
+    return blepython.Adapter(port=os.ttyname(slave), **kwargs)
+
+def fake_gatt_adapter(devices, gatt_cache=None, **kwargs):
+    '''
+    Adapter on a fake_gatt_dongle that has already seen devices peripherals
+    '''
+    master, slave = pty.openpty()
+    dongle = threading.Thread(name='FakeDongle', target=fake_gatt_dongle, args=(master,), kwargs=kwargs)
+    dongle.daemon = True
+    dongle.start()
+    adapter = blepython.Adapter(port=os.ttyname(slave), gatt_cache=gatt_cache)
+    adapter.bglib.feed(b''.join(scan_response(-60, struct.pack('<6B', i, 0, 0, 0x44, 0x55, 0xC6), b'\x02\x01\x06')
+                                for i in range(devices)))
+    return adapter
+
+def bench_cmd_latency(count=500):
+    '''
+    Command round trip latency through Adapter.cmd_q against a pty based
+    fake dongle, and the CPU the listener burns while idle.
+    '''
+    adapter = fake_dongle_adapter()
+    done = threading.Event()
+    def handler(sender, args):
+        done.set()
+    adapter.bglib.ble_rsp_attclient_read_by_handle += handler
+
+    samples = []
+    for i in range(count):
+        done.clear()
+        start = time.time()
+        adapter.cmd_q.put(adapter.bglib.ble_cmd_attclient_read_by_handle(0, 0x0010))
+        if not done.wait(5):
+            raise Exception('no response from the fake dongle')
+        samples.append(time.time() - start)
+    samples.sort()
+    print('cmd round trip: median %.3f ms, 99th percentile %.3f ms' % (
+        samples[len(samples) // 2] * 1000, samples[len(samples) * 99 // 100] * 1000))
+
+    cpu = sum(os.times()[:2])
+    time.sleep(2)
+    print('idle listener cpu: %.1f%%' % ((sum(os.times()[:2]) - cpu) / 2 * 100))
+
+
+def bench_async(count=100, size=4096):
+    '''
+    The asyncio front-end (Python 3.6+) against the fake GATT dongle:
+    connect, reads, a write_stream upload, read_many and disconnect, each
+    driven with run_until_complete so this file still runs on Python 2.
+    '''
+    if not hasattr(blepython, 'AsyncAdapter'):
+        print('async: needs Python 3.6+')
+        return
+    import asyncio
+    loop = asyncio.new_event_loop()
+    master, slave = pty.openpty()
+    dongle = threading.Thread(name='FakeDongle', target=fake_gatt_dongle, args=(master,),
+                              kwargs={'services': 2, 'characteristics': 4, 'tx_buffers': 8})
+    dongle.daemon = True
+    dongle.start()
+    adapter = blepython.AsyncAdapter(os.ttyname(slave), loop=loop)
+    adapter.bglib.feed(scan_response(-60, struct.pack('<6B', 0, 0, 0, 0x44, 0x55, 0xC6), b'\x02\x01\x06'))
+    d = adapter.devices[0]
+
+    start = time.time()
+    loop.run_until_complete(d.connect())
+    print('async connect: %.1f ms, %d services' % ((time.time() - start) * 1000, len(d.services)))
+
+    c = d.characteristic([0x00, 0xFF], [0x01, 0xFE])
+    start = time.time()
+    for _ in range(count):
+        loop.run_until_complete(c.read())
+    elapsed = time.time() - start
+    print('async read: %d in %.3fs, %.1f ms per read' % (count, elapsed, elapsed / count * 1000))
+
+    stream = loop.run_until_complete(c.write_stream(bytearray(size)))
+    print('async write_stream: %d bytes in %.3fs, %.0f bytes/sec, %d retries' % (
+        stream.bytes_sent, stream.elapsed, stream.bytes_per_sec, stream.retries))
+
+    # The first value is the last chunk streamed, the others one byte
+    chars = [d.wrap_characteristic(x) for x in d.device.find_service([0x01, 0xFE]).characteristics]
+    for x in chars[1:]:
+        x.characteristic.value_length = 1
+    start = time.time()
+    values = loop.run_until_complete(d.read_many(chars))
+    print('async read_many: %d values in %.1f ms' % (len(values), (time.time() - start) * 1000))
+
+    start = time.time()
+    loop.run_until_complete(d.disconnect())
+    print('async disconnect: %.1f ms' % ((time.time() - start) * 1000))
+    adapter.close()
+    loop.close()
+
+
+def bench_scan_ingest(advertisers=10000, rounds=5):
+    '''
+    Advertisements per second through Adapter.scan_response_handler for a
+    crowd of advertisers, i.e. the device lookup on every scan response.  The
+    first round inserts every device, later rounds only find them again.
+    '''
+    adapter = fake_dongle_adapter()
+    adv = b'\x02\x01\x06\x05\x09tag\x00'
+    addresses = [struct.pack('<6B', i & 0xFF, (i >> 8) & 0xFF, i >> 16, 0x44, 0x55, 0xC6) for i in range(advertisers)]
+    data = b''.join(scan_response(-60, address, adv) for address in addresses)
+
+    for round in range(rounds):
+        start = time.time()
+        adapter.bglib.feed(data)
+        elapsed = time.time() - start
+        print('scan ingest round %d (%d devices known): %d advertisements in %.3fs, %.0f advertisements/sec' % (
+            round, len(adapter.devices), advertisers, elapsed, advertisers / elapsed))
+    assert len(adapter.devices) == advertisers
+    assert all(d.advertisements.count == rounds for d in adapter.devices)
+
+
+def bench_notification_routing(advertisers=10000, connections=4, count=50000):
+    '''
+    Notifications per second routed from BGLib to their Device while the
+    adapter knows many devices, only a few of them connected.
+    '''
+    adapter = fake_dongle_adapter()
+    adv = b'\x02\x01\x06\x05\x09tag\x00'
+    addresses = [struct.pack('<6B', i & 0xFF, (i >> 8) & 0xFF, i >> 16, 0x44, 0x55, 0xC6) for i in range(advertisers)]
+    adapter.bglib.feed(b''.join(scan_response(-60, address, adv) for address in addresses))
+    adapter.bglib.feed(b''.join(connection_status(i, addresses[i * 97]) for i in range(connections)))
+
+    routed = [0]
+    for i in range(connections):
+        d = adapter.find_device(addresses[i * 97])
+        d.attclient_attribute_value_handler = lambda args: routed.__setitem__(0, routed[0] + 1)
+
+    data = b''.join(attribute_value(i % connections, 0x0010, b'\x01\x02\x03\x04') for i in range(count))
+    start = time.time()
+    adapter.bglib.feed(data)
+    elapsed = time.time() - start
+    assert routed[0] == count
+    print('notification routing (%d devices, %d connected): %d notifications in %.3fs, %.0f notifications/sec' % (
+        advertisers, connections, count, elapsed, count / elapsed))
+
+
+def bench_gatt_routing(services=200, attributes=20, count=50000):
+    '''
+    Attribute discovery and notification delivery inside one Device with a
+    large GATT table of services * attributes handles.
+    '''
+    lib = bglib.BGLib()
+    device = Device(lib, CommandQueue(), [1, 2, 3, 4, 5, 6])
+    device.connection_handle = 0
+    for i in range(services):
+        start = 1 + i * attributes
+        device.add_service([0x00, 0x00, 0xfb, 0x34, 0x9b, 0x5f, 0x80, 0x00, 0x00, 0x80, 0x00, 0x10, 0x00, 0x00, i & 0xFF, i >> 8],
+                           start, start + attributes - 1)
+    handles = services * attributes
+
+    delivered = [0]
+    start = time.time()
+    for handle in range(1, handles + 1):
+        device.find_information_found_handler({ 'connection': 0, 'chrhandle': handle, 'uuid': [0x00, 0x2a] })
+    elapsed = time.time() - start
+    print('gatt discovery: %d attributes in %.3fs, %.0f attributes/sec' % (handles, elapsed, handles / elapsed))
+
+    for s in device.services:
+        for c in s.characteristics:
+            c.notification_callback = lambda uuid, value: delivered.__setitem__(0, delivered[0] + 1)
+    args = [{ 'connection': 0, 'atthandle': 1 + (i * 7919) % handles, 'type': 1, 'value': [1, 2, 3, 4] } for i in range(count)]
+    start = time.time()
+    for a in args:
+        device.attclient_attribute_value_handler(a)
+    elapsed = time.time() - start
+    assert delivered[0] == count
+    print('gatt notification delivery (%d handles): %d notifications in %.3fs, %.0f notifications/sec' % (
+        handles, count, elapsed, count / elapsed))
+
+
+def bench_ad_parse(count=20000):
+    '''
+    Advertising payloads per second through parse_advertising_data for the
+    AD_CORPUS payloads, parsing each one every time and with the cache, for
+    bytes and for the lists of ints BGLib events carry.
+    '''
+    corpus_lists = [list(bytearray(p)) for p in AD_CORPUS]
+    for label, parse, corpus in (
+            ('uncached', _parse, AD_CORPUS),
+            ('cached', parse_advertising_data, AD_CORPUS),
+            ('cached, list payloads', parse_advertising_data, corpus_lists)):
+        start = time.time()
+        for i in range(count):
+            parse(corpus[i % len(corpus)])
+        elapsed = time.time() - start
+        print('ad parse (%s): %d payloads in %.3fs, %.0f payloads/sec' % (label, count, elapsed, count / elapsed))
+
+
+def bench_scan_filter(advertisers=10000, rounds=5, wanted=50):
+    '''
+    Advertisements per second through Adapter.scan_response_handler when a
+    host side ScanFilter (name prefix) only lets a few of the advertisers in.
+    '''
+    adapter = fake_dongle_adapter()
+    adapter.start_scan(blepython.ScanFilter(name_prefix='sensor')).result()
+    addresses = [struct.pack('<6B', i & 0xFF, (i >> 8) & 0xFF, i >> 16, 0x44, 0x55, 0xC6) for i in range(advertisers)]
+    data = b''.join(scan_response(-60, address, b'\x02\x01\x06\x07\x09' + (b'sensor' if i < wanted else b'phone_') + struct.pack('<H', i))
+                    for i, address in enumerate(addresses))
+
+    for round in range(rounds):
+        start = time.time()
+        adapter.bglib.feed(data)
+        elapsed = time.time() - start
+        print('scan filter round %d (%d devices kept): %d advertisements in %.3fs, %.0f advertisements/sec' % (
+            round, len(adapter.devices), advertisers, elapsed, advertisers / elapsed))
+    assert len(adapter.devices) == wanted
+
+
+def bench_device_eviction(batches=10, batch=20000, capacity=5000):
+    '''
+    A continuous stream of new random (rotating private) addresses through a
+    scan stream on an adapter limited to capacity devices: the number of
+    devices and the peak RSS must level off.
+    '''
+    adapter = fake_dongle_adapter(max_devices=capacity)
+    streamed = [0]
+    def callback(advertisement):
+        streamed[0] += 1
+    adapter.add_advertisement_callback(callback)
+    adv = b'\x02\x01\x1a\x0b\xff\x4c\x00\x10\x06\x19\x1e\x3a\x7d\x9a\x48'
+    rand = random.Random(1)
+
+    for n in range(batches):
+        data = b''.join(scan_response(-70, struct.pack('<5BB', *([rand.randrange(256) for i in range(5)] + [0x40 | rand.randrange(64)])), adv)
+                        for i in range(batch))
+        start = time.time()
+        adapter.bglib.feed(data)
+        elapsed = time.time() - start
+        print('eviction batch %d: %d advertisements in %.3fs, %.0f advertisements/sec, %d devices, %d evicted, max rss %d kB' % (
+            n, batch, elapsed, batch / elapsed, len(adapter.devices), adapter.devices.evicted,
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss))
+    assert len(adapter.devices) <= capacity
+    assert streamed[0] == batches * batch
+
+
+def bench_batch_scan(advertisers=10000, rounds=5):
+    '''
+    Advertisements per second in batch scan mode, straight from the receive
+    buffer into columnar ScanBatches, for the same stream as the scan
+    benchmark.
+    '''
+    adapter = fake_dongle_adapter()
+    rows = [0]
+    def consumer(batch):
+        rows[0] += batch.count
+    adapter.start_batch_scan(consumer).result()
+
+    adv = b'\x02\x01\x06\x05\x09tag\x00'
+    addresses = [struct.pack('<6B', i & 0xFF, (i >> 8) & 0xFF, i >> 16, 0x44, 0x55, 0xC6) for i in range(advertisers)]
+    data = b''.join(scan_response(-60, address, adv) for address in addresses)
+    chunks = [data[i:i + 4096] for i in range(0, len(data), 4096)]
+
+    for round in range(rounds):
+        start = time.time()
+        for chunk in chunks:
+            adapter.bglib.feed(chunk)
+        elapsed = time.time() - start
+        print('batch scan round %d: %d advertisements in %.3fs, %.0f advertisements/sec' % (
+            round, advertisers, elapsed, advertisers / elapsed))
+
+    adapter.stop_batch_scan().result()
+    time.sleep(0.1)
+    assert rows[0] == advertisers * rounds, rows[0]
+    assert len(adapter.devices) == 0
+
+
+def bench_connect_many(devices=50, maxconn=3):
+    '''
+    Connecting to and discovering many devices against a fake dongle with
+    maxconn slots: one after another with Device.connect, and with a
+    ConnectionManager keeping every slot busy.
+    '''
+    adapter = fake_gatt_adapter(devices, maxconn=maxconn)
+    start = time.time()
+    for d in adapter.devices:
+        d.connect()
+        d.disconnect()
+    elapsed = time.time() - start
+    print('connect %d devices sequentially: %.3fs, %.1f ms per device' % (devices, elapsed, elapsed / devices * 1000))
+
+    adapter = fake_gatt_adapter(devices, maxconn=maxconn)
+    start = time.time()
+    results = adapter.connect_all(list(adapter.devices), disconnect=True)
+    elapsed = time.time() - start
+    assert all(r.connected for r in results.values())
+    times = sorted(r.attempt_time for r in results.values())
+    print('connect %d devices with %d slots in parallel: %.3fs, %.1f ms per device, median attempt %.1f ms' % (
+        devices, maxconn, elapsed, elapsed / devices * 1000, times[len(times) // 2] * 1000))
+
+
+def bench_reconnect(reconnects=20):
+    '''
+    Reconnecting to the same device with full discovery every time, with a
+    GattCache, and with a GattCache checking a Database Hash
+    '''
+    for label, gatt_cache, database_hash in (('no cache', None, None),
+                                             ('GATT cache', blepython.GattCache(), None),
+                                             ('GATT cache + hash', blepython.GattCache(), b'\x01' * 16)):
+        adapter = fake_gatt_adapter(1, gatt_cache, database_hash=database_hash)
+        d = adapter.devices[0]
+        d.connect()
+        d.disconnect()
+        start = time.time()
+        for _ in range(reconnects):
+            d.connect()
+            assert d.find_service_by_handle(3).get_characteristic_by_handle(3)
+            d.disconnect()
+        elapsed = time.time() - start
+        print('reconnect %d times, %s: %.3fs, %.1f ms per connect' % (reconnects, label, elapsed, elapsed / reconnects * 1000))
+
+
+def bench_selective_discovery(services=20, characteristics=5, rounds=5):
+    '''
+    Time from connect to the first read of the battery level on a device
+    with a large GATT database, with full discovery and with selective
+    discovery of the Battery Service only.
+    '''
+    for label, selected in (('full discovery', None), ('selective discovery', [0x180F])):
+        adapter = fake_gatt_adapter(1, services=services, characteristics=characteristics)
+        d = adapter.devices[0]
+        start = time.time()
+        for _ in range(rounds):
+            d.connect(services=selected)
+            assert d.find_service([0x0F, 0x18]).get_battery_level() == [0x55]
+            d.disconnect()
+        elapsed = time.time() - start
+        print('%d services x %d characteristics, %s: %.1f ms to the first read' % (
+            services, characteristics, label, elapsed / rounds * 1000))
+
+
+def bench_characteristic_write(count=100):
+    '''
+    Writes to a characteristic that supports write without response: write
+    requests waiting for the peripheral's response, and Characteristic.write
+    picking the write command from the discovered properties.
+    '''
+    adapter = fake_gatt_adapter(1, services=2)
+    d = adapter.devices[0]
+    d.connect()
+    c = d.find_service([0x01, 0xFE]).get_characteristic_by_uuid([0x00, 0xFF])
+    completed = threading.Event()
+    adapter.bglib.ble_evt_attclient_procedure_completed += lambda sender, args: completed.set()
+
+    start = time.time()
+    for i in range(count):
+        completed.clear()
+        c.write([i & 0xFF], response=True).result()
+        completed.wait(1)
+    elapsed = time.time() - start
+    print('write requests: %d in %.3fs, %.0f writes/sec' % (count, elapsed, count / elapsed))
+
+    start = time.time()
+    for i in range(count):
+        c.write([i & 0xFF]).result()
+    elapsed = time.time() - start
+    print('write by properties (write command): %d in %.3fs, %.0f writes/sec' % (count, elapsed, count / elapsed))
+    d.disconnect()
+
+
+def bench_write_stream(size=4096, tx_buffers=8):
+    '''
+    Uploads size bytes to a characteristic in 20 byte chunks: write requests
+    waiting for the peripheral's response to each chunk, and
+    Characteristic.write_stream against a dongle with tx_buffers TX buffers
+    that drain four packets per 7.5 ms connection event.
+    '''
+    data = bytearray(i & 0xFF for i in range(size))
+    adapter = fake_gatt_adapter(1, services=2, tx_buffers=tx_buffers)
+    d = adapter.devices[0]
+    d.connect()
+    c = d.find_service([0x01, 0xFE]).get_characteristic_by_uuid([0x00, 0xFF])
+    completed = threading.Event()
+    adapter.bglib.ble_evt_attclient_procedure_completed += lambda sender, args: completed.set()
+
+    start = time.time()
+    for i in range(0, size, 20):
+        completed.clear()
+        c.write(data[i:i + 20], response=True).result()
+        completed.wait(1)
+    elapsed = time.time() - start
+    print('write requests: %d bytes in %.3fs, %.0f bytes/sec' % (size, elapsed, size / elapsed))
+
+    stream = c.write_stream(data)
+    print('write_stream: %d bytes in %.3fs, %.0f bytes/sec, %d retries' % (
+        stream.bytes_sent, stream.elapsed, stream.bytes_per_sec, stream.retries))
+
+    stream = c.write_stream(iter(data[i:i + 512] for i in range(0, size, 512)))
+    print('write_stream from 512 byte blocks: %d bytes in %.3fs, %.0f bytes/sec, %d retries' % (
+        stream.bytes_sent, stream.elapsed, stream.bytes_per_sec, stream.retries))
+    d.disconnect()
+
+
+def bench_long_values(size=200, count=5):
+    '''
+    Writes and reads back a size byte value, longer than one ATT PDU:
+    prepare writes chained by the application thread waiting for each
+    procedure_completed, Characteristic.write chaining them from the
+    listener thread, and Characteristic.read reassembling read_long
+    fragments versus a plain read_by_handle.
+    '''
+    data = bytearray((i * 7) & 0xFF for i in range(size))
+    adapter = fake_gatt_adapter(1, services=2)
+    lib = adapter.bglib
+    d = adapter.devices[0]
+    d.connect()
+    c = d.find_service([0x01, 0xFE]).get_characteristic_by_uuid([0x00, 0xFF])
+    completed = threading.Event()
+    lib.ble_evt_attclient_procedure_completed += lambda sender, args: completed.set()
+
+    start = time.time()
+    for _ in range(count):
+        for offset in range(0, size, 18):
+            completed.clear()
+            adapter.send(lib.ble_cmd_attclient_prepare_write(c.connection_handle, c.handle, offset, data[offset:offset + 18])).result()
+            completed.wait(1)
+        completed.clear()
+        adapter.send(lib.ble_cmd_attclient_execute_write(c.connection_handle, 1)).result()
+        completed.wait(1)
+    elapsed = (time.time() - start) / count
+    print('prepare writes from the application: %d bytes in %.3fs, %.0f bytes/sec' % (size, elapsed, size / elapsed))
+
+    start = time.time()
+    for _ in range(count):
+        c.write(data).result(5)
+    elapsed = (time.time() - start) / count
+    print('write (long): %d bytes in %.3fs, %.0f bytes/sec' % (size, elapsed, size / elapsed))
+
+    value = []
+    c.read_callbacks.append(value.append)
+    d.cmd_q.put(lib.ble_cmd_attclient_read_by_handle(c.connection_handle, c.handle))
+    time.sleep(0.2)
+    print('read_by_handle: %d of %d bytes' % (len(value[0]) if value else 0, size))
+
+    start = time.time()
+    for _ in range(count):
+        value = c.read()
+    elapsed = (time.time() - start) / count
+    print('read (long): %d bytes in %.3fs, %.0f bytes/sec, intact: %s' % (len(value), elapsed, len(value) / elapsed,
+                                                                         bytearray(value) == data))
+    d.disconnect()
+
+
+def bench_read_many(characteristics=6):
+    '''
+    Reads the battery level and characteristics one byte values one by one
+    with Characteristic.read, and with Device.read_many batching them into
+    read_multiple requests.  A variable-length value rides along last.
+    '''
+    adapter = fake_gatt_adapter(1, services=2, characteristics=characteristics)
+    d = adapter.devices[0]
+    d.connect()
+    chars = [d.find_service([0x0F, 0x18]).get_characteristic_by_uuid([0x19, 0x2A])]
+    custom = d.find_service([0x01, 0xFE]).characteristics
+    for c in custom[1:]:
+        c.value_length = 1
+    chars += custom
+    custom[0].write(b'variable').result()
+    time.sleep(0.1)
+
+    start = time.time()
+    sequential = [c.read() for c in chars]
+    elapsed = time.time() - start
+    print('read one by one: %d values in %.3fs' % (len(chars), elapsed))
+
+    start = time.time()
+    batched = d.read_many(chars)
+    elapsed = time.time() - start
+    print('read_many: %d values in %.3fs, %d read_multiple requests, same values: %s' % (
+        len(chars), elapsed, len([g for g in d.read_groups(chars) if len(g) > 1]), batched == sequential))
+    d.disconnect()
+
+
+def cpu_time():
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def bench_connected_idle(devices=8, idle=2.0, disconnect_delay=0.1):
+    '''
+    CPU use of the process while devices stay connected and idle, and while
+    disconnecting from them one by one (the link drops disconnect_delay
+    seconds after the command).
+    '''
+    adapter = fake_gatt_adapter(devices, maxconn=devices, disconnect_delay=disconnect_delay)
+    connected = list(adapter.devices)
+    for d in connected:
+        d.connect()
+
+    cpu = cpu_time()
+    time.sleep(idle)
+    cpu = cpu_time() - cpu
+    print('%d devices connected, idle for %.1fs: %.3fs CPU (%.1f%%)' % (devices, idle, cpu, cpu / idle * 100))
+
+    cpu = cpu_time()
+    start = time.time()
+    for d in connected:
+        d.disconnect()
+    elapsed = time.time() - start
+    cpu = cpu_time() - cpu
+    print('disconnect %d devices: %.3fs, %.3fs CPU (%.1f%%)' % (devices, elapsed, cpu, cpu / elapsed * 100))
+
+
+def bench_advertisement_stats(count=200000):
+    '''
+    AdvertisementStats.add calls per second and the memory of one ring
+    '''
+    stats = AdvertisementStats()
+    start = time.time()
+    for i in range(count):
+        stats.add(-40 - (i & 31), i & 4, i * 0.1)
+    elapsed = time.time() - start
+    size = sys.getsizeof(stats) + sum(sys.getsizeof(a) for a in (stats.timestamps, stats.rssis, stats.packet_types))
+    print('advertisement stats: %d adds in %.3fs, %.0f adds/sec, %d bytes per device' % (
+        count, elapsed, count / elapsed, size))
+
+
+BENCHMARKS = {
+    'ad': bench_ad_parse,
+    'adstats': bench_advertisement_stats,
+    'async': bench_async,
+    'batch': bench_batch_scan,
+    'cmd': bench_cmd_latency,
+    'connect': bench_connect_many,
+    'idle': bench_connected_idle,
+    'long': bench_long_values,
+    'readmany': bench_read_many,
+    'reconnect': bench_reconnect,
+    'write': bench_characteristic_write,
+    'selective': bench_selective_discovery,
+    'stream': bench_write_stream,
+    'decode': bench_decode,
+    'evict': bench_device_eviction,
+    'gatt': bench_gatt_routing,
+    'route': bench_notification_routing,
+    'rx': bench_rx_throughput,
+    'scan': bench_scan_ingest,
+    'scanfilter': bench_scan_filter,
+    'tx': bench_tx_encode,
+}
+
+if __name__ == '__main__':
+    # Debug logging would dominate the measurements
+    logging.disable(logging.DEBUG)
+    names = sys.argv[1:] or sorted(BENCHMARKS)
+    for name in names:
+        BENCHMARKS[name]()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+################################################################################
+#
+# @brief Tests for per-device advertisement statistics, run with pytest
+#
+# Runs entirely against in-memory fakes, no dongle required.
+#
+# @date Created 2026/10/17
+#
+# @copyright Copyright &copy 2026 Ashton Instruments
+################################################################################
+
+import os
+import pty
+import struct
+
+from blepython import Adapter
+from blepython.AdvertisementStats import AdvertisementStats, SCAN_RESPONSE
+from blepython.utils import monotonic
+import blepython_bench
+
+
+def test_ring_bounded():
+    stats = AdvertisementStats(size=4)
+    for i in range(10):
+        stats.add(-40 - i, 0, float(i))
+    assert len(stats) == 4 and stats.count == 10
+    assert stats.history() == [(6.0, -46, 0), (7.0, -47, 0), (8.0, -48, 0), (9.0, -49, 0)]
+    assert stats.mean_rssi == -47.5
+    assert stats.first_seen == 0.0 and stats.last_seen == 9.0 and stats.last_rssi == -49
+
+
+def test_moving_averages():
+    stats = AdvertisementStats(alpha=0.5)
+    assert stats.mean_rssi is None and stats.age() is None
+    stats.add(-40, 0, 0.0)
+    stats.add(-60, 0, 1.0)
+    stats.add(-60, 0, 4.0)
+    assert stats.rssi_ewma == -55.0
+    assert stats.interval == 2.0
+    assert stats.age(10.0) == 6.0
+
+
+def test_scan_responses_not_counted_for_interval():
+    stats = AdvertisementStats()
+    stats.add(-40, 0, 0.0)
+    stats.add(-40, SCAN_RESPONSE, 0.01)
+    stats.add(-40, 0, 1.0)
+    assert stats.interval == 1.0 and stats.last_seen == 1.0
+
+
+def test_monotonic():
+    first = monotonic()
+    assert monotonic() >= first
+
+
+def test_adapter_records_advertisements():
+    master, slave = pty.openpty()
+    adapter = Adapter(port=os.ttyname(slave), listener=False)
+    address = struct.pack('<6B', 1, 2, 3, 0x44, 0x55, 0xC6)
+    start = monotonic()
+    for rssi in (-50, -60, -70):
+        adapter.bglib.feed(blepython_bench.scan_response(rssi, address, b'\x02\x01\x06'))
+    stats = adapter.devices[0].advertisements
+    assert stats.count == 3 and stats.mean_rssi == -60
+    assert start <= stats.first_seen <= stats.last_seen <= monotonic()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+################################################################################
+#
+# @brief Tests for the advertising data parser, run with pytest
+#
+# Runs entirely against in-memory fakes, no dongle required.
+#
+# @date Created 2026/10/17
+#
+# @copyright Copyright &copy 2026 Ashton Instruments
+################################################################################
+
+import os
+import pty
+import struct
+import sys
+
+from blepython import Adapter
+from blepython.AdvertisingData import _parse, parse_advertising_data
+import blepython_bench
+
+
+def test_advertising_data():
+    record = _parse(b'\x02\x01\x06'
+                    b'\x05\x08BLEP'
+                    b'\x0a\x09BLEPython'
+                    b'\x05\x03\x0f\x18\x0a\x18'
+                    b'\x02\x0a\xf4'
+                    b'\x05\xff\x4c\x00\x02\x15'
+                    b'\x04\x16\x0f\x18\x64'
+                    b'\x03\x19\xc1\x03')
+    assert record.flags == 0x06
+    assert record.name == 'BLEPython' and record.name_complete
+    assert record.uuid16 == (0x180F, 0x180A) and record.uuids_complete
+    assert record.tx_power == -12
+    assert record.manufacturer_data == b'\x4c\x00\x02\x15' and record.company_id == 0x004C
+    assert record.service_data == {0x180F: b'\x64'}
+    assert record.appearance == 0x03C1
+
+
+def test_advertising_data_uuids_and_other():
+    uuid128 = bytes(bytearray(range(16)))
+    record = _parse(b'\x05\x04\x78\x56\x34\x12' + b'\x11\x06' + uuid128 + b'\x03\x2a\x01\x02')
+    assert record.uuid32 == (0x12345678,) and not record.uuids_complete
+    assert record.uuid128 == (uuid128,)
+    assert record.other == ((0x2a, b'\x01\x02'),)
+
+
+def test_advertising_data_truncated():
+    record = _parse(b'\x02\x01\x06\x03\x09AB\x00\x00\x05\x09CD')
+    assert record.flags == 0x06 and record.name == 'AB'
+    record = _parse(b'\x02\x01\x06\x09\x09BLE')
+    assert record.flags == 0x06 and record.name is None
+
+
+def test_parse_cached():
+    payload = b'\x02\x01\x06\x03\x09AB'
+    record = parse_advertising_data(payload)
+    assert parse_advertising_data(payload) is record
+    listed = parse_advertising_data(list(bytearray(payload)))
+    assert parse_advertising_data(list(bytearray(payload))) is listed
+    assert listed.name == record.name and listed.flags == record.flags
+
+
+def test_parse_cache_bounded(monkeypatch):
+    module = sys.modules[parse_advertising_data.__module__]
+    monkeypatch.setattr(module, 'AD_CACHE_SIZE', 4)
+    first = parse_advertising_data(b'\x02\x01\x07')
+    for i in range(4):
+        parse_advertising_data(b'\x02\x0a' + bytes(bytearray((i,))))
+    assert len(module._cache) <= 4
+    assert parse_advertising_data(b'\x02\x01\x07') is not first
+
+
+def test_device_keeps_latest_records():
+    master, slave = pty.openpty()
+    adapter = Adapter(port=os.ttyname(slave), listener=False)
+    address = struct.pack('<6B', 1, 2, 3, 0x44, 0x55, 0xC6)
+    adapter.bglib.feed(blepython_bench.scan_response(-60, address, b'\x02\x01\x06'))
+    # A scan response (packet type 4) with the name
+    adapter.bglib.feed(blepython_bench.packet(0x80, 6, 0, struct.pack('<bB6sBBB', -60, 4, address, 1, 0xFF, 5) +
+                                              b'\x04\x09BLE'))
+    d = adapter.devices[0]
+    assert d.advertising_data.flags == 0x06 and d.advertising_data.name is None
+    assert d.scan_response_data.name == 'BLE' and d.name == 'BLE'
@@ -0,0 +1,160 @@
+#!/usr/bin/env python
+################################################################################
+#
+# @brief Tests for the asyncio front-end, run with pytest
+#
+# Runs against the pty based fake dongle of blepython_bench.py, no dongle
+# required.
+#
+# @date Created 2026/10/17
+#
+# @copyright Copyright &copy 2026 Ashton Instruments
+################################################################################
+
+import os
+import pty
+import sys
+import threading
+
+import pytest
+
+if sys.version_info < (3, 6):
+    pytest.skip('the asyncio front-end needs Python 3.6+', allow_module_level=True)
+
+import asyncio
+from blepython import AsyncAdapter
+from blepython.Device import Device
+from blepython.utils import BGAPIError, NotConnected
+import blepython_bench
+
+
+@pytest.fixture
+def adapter():
+    loop = asyncio.new_event_loop()
+    master, slave = pty.openpty()
+    dongle = threading.Thread(name='FakeDongle', target=blepython_bench.fake_dongle, args=(master,))
+    dongle.daemon = True
+    dongle.start()
+    adapter = AsyncAdapter(os.ttyname(slave), loop=loop)
+    yield adapter
+    adapter.close()
+    loop.close()
+
+
+def connected_device(adapter):
+    '''
+    A device connected on handle 0 with a characteristic at 3 and its CCCD at 4
+    '''
+    d = Device(adapter.bglib, adapter.adapter.cmd_q, [1, 2, 3, 4, 5, 6])
+    d.connection_handle = 0
+    d.state = Device.READY
+    adapter.adapter.devices.add(d)
+    d.add_service([0x01, 0xFE], 1, 4)
+    # Read and notify
+    d.attribute_found_handler({'connection': 0, 'chrdecl': 2, 'value': 3, 'properties': 0x12, 'uuid': [0x00, 0xFF]})
+    d.get_characteristic_by_handle(3).add_descriptor([0x02, 0x29], 4)
+    return adapter.device(d), adapter.device(d).characteristic([0x00, 0xFF])
+
+
+def recorded_commands(adapter):
+    '''
+    Record the (class, command, payload) of every command sent from now on
+    '''
+    sent = []
+    cmd_q = adapter.adapter.cmd_q
+    send = cmd_q.send
+
+    def recording_send(cmd, timeout=None):
+        sent.append((bytearray(cmd)[2], bytearray(cmd)[3], bytearray(cmd[4:])))
+        return send(cmd, timeout)
+    cmd_q.send = recording_send
+    return sent
+
+
+def test_send(adapter):
+    response = adapter.loop.run_until_complete(adapter.send(adapter.bglib.ble_cmd_attclient_read_by_handle(0, 3)))
+    assert response == {'connection': 0, 'result': 0}
+
+
+def test_connect_when_connected(adapter):
+    d, c = connected_device(adapter)
+    sent = recorded_commands(adapter)
+    adapter.loop.run_until_complete(d.connect(timeout=0.1))
+    assert sent == [] and d.connected
+
+
+def test_read(adapter):
+    d, c = connected_device(adapter)
+
+    def value():
+        # read_long delivers the value once the procedure completes
+        c.characteristic.attclient_attribute_value_handler({'atthandle': 3, 'type': 0x00, 'value': [0x2a]})
+        d.device.procedure_complete_handler({'connection': 0, 'chrhandle': 3, 'result': 0})
+    adapter.loop.call_later(0.01, value)
+    assert adapter.loop.run_until_complete(c.read()) == [0x2a]
+    assert c.characteristic.read_callbacks == []
+
+
+def test_read_refused(adapter):
+    d, c = connected_device(adapter)
+
+    def refused():
+        d.device.procedure_complete_handler({'connection': 0, 'chrhandle': 3, 'result': 0x0402})
+    adapter.loop.call_later(0.01, refused)
+    with pytest.raises(BGAPIError) as e:
+        adapter.loop.run_until_complete(c.read())
+    assert e.value.result == 0x0402
+
+
+def test_read_not_connected(adapter):
+    d, c = connected_device(adapter)
+    d.device.connection_handle = None
+    with pytest.raises(NotConnected):
+        adapter.loop.run_until_complete(c.read())
+
+
+def test_notifications(adapter):
+    d, c = connected_device(adapter)
+    sent = recorded_commands(adapter)
+    previous = c.characteristic.notification_callback = lambda short_uuid, value: None
+
+    def notify(value):
+        c.characteristic.attclient_attribute_value_handler({'atthandle': 3, 'type': 0x01, 'value': value})
+    adapter.loop.call_later(0.01, notify, [1])
+    adapter.loop.call_later(0.02, notify, [2])
+    notifications = c.notifications()
+    assert adapter.loop.run_until_complete(notifications.__anext__()) == [1]
+    assert adapter.loop.run_until_complete(notifications.__anext__()) == [2]
+    adapter.loop.run_until_complete(notifications.aclose())
+    # Enabled through the CCCD, then disabled again once the iterator closed
+    assert sent == [(4, 5, bytearray(b'\x00\x04\x00\x02\x01\x00')), (4, 5, bytearray(b'\x00\x04\x00\x02\x00\x00'))]
+    assert c.characteristic.notification_callback is previous
+
+
+def test_write_stream(adapter):
+    d, c = connected_device(adapter)
+    with pytest.raises(ValueError):
+        adapter.loop.run_until_complete(c.write_stream(bytearray(50)))
+
+    # Write without response as well
+    c.characteristic.properties |= 0x04
+    sent = recorded_commands(adapter)
+    stream = adapter.loop.run_until_complete(c.write_stream(bytearray(range(50)), timeout=5))
+    assert stream.bytes_sent == 50 and stream.error is None
+    assert sent == [(4, 6, bytearray(b'\x00\x03\x00') + bytearray([len(chunk)]) + chunk)
+                    for chunk in (bytearray(range(20)), bytearray(range(20, 40)), bytearray(range(40, 50)))]
+
+
+def test_read_many(adapter):
+    d, c = connected_device(adapter)
+    d.device.add_service([0x02, 0xFE], 5, 6)
+    d.device.attribute_found_handler({'connection': 0, 'chrdecl': 5, 'value': 6, 'properties': 0x02, 'uuid': [0x01, 0xFF]})
+    other = d.characteristic([0x01, 0xFF])
+    c.characteristic.value_length = other.characteristic.value_length = 1
+    sent = recorded_commands(adapter)
+
+    def response():
+        d.device.read_multiple_response_handler({'connection': 0, 'handles': [0x2a, 0x2b]})
+    adapter.loop.call_later(0.01, response)
+    assert adapter.loop.run_until_complete(d.read_many([other, c, other])) == [[0x2a], [0x2b], [0x2a]]
+    assert sent == [(4, 11, bytearray(b'\x00\x04\x06\x00\x03\x00'))]
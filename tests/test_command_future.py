@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+################################################################################
+#
+# @brief Tests for command futures and response correlation, run with pytest
+#
+# Runs against in-memory fakes and the pty based fake dongle of
+# blepython_bench.py, no dongle required.
+#
+# @date Created 2026/10/17
+#
+# @copyright Copyright &copy 2026 Ashton Instruments
+################################################################################
+
+import os
+import pty
+
+import pytest
+
+from blepython import bglib, Adapter
+from blepython.CommandQueue import CommandFuture
+from blepython.utils import BGAPIError, CommandTimeout
+import blepython_bench
+
+
+def test_command_future_times_out():
+    future = CommandFuture(bglib.BGLib().ble_cmd_system_get_connections())
+    with pytest.raises(CommandTimeout):
+        future.result(0.01)
+    with pytest.raises(CommandTimeout):
+        future.exception(0.01)
+    assert not future.done()
+
+
+def test_command_future_response():
+    future = CommandFuture(bglib.BGLib().ble_cmd_attclient_read_long(0, 3))
+    assert future.matches(4, 8)
+    done = []
+    future.add_done_callback(done.append)
+    future.set_response({'connection': 0, 'result': 0})
+    assert future.result(0) == {'connection': 0, 'result': 0}
+    assert future.exception(0) is None
+    assert done == [future]
+
+
+def test_command_future_error_result():
+    future = CommandFuture(bglib.BGLib().ble_cmd_attclient_read_long(0, 3))
+    future.set_response({'connection': 0, 'result': 0x0181})
+    with pytest.raises(BGAPIError) as e:
+        future.result(0)
+    assert e.value.result == 0x0181
+    # Callbacks added once the future is done run straight away
+    done = []
+    future.add_done_callback(done.append)
+    assert done == [future]
+
+
+def test_command_future_exception():
+    future = CommandFuture(bglib.BGLib().ble_cmd_attclient_read_long(0, 3))
+    future.set_exception(CommandTimeout())
+    assert isinstance(future.exception(0), CommandTimeout)
+    with pytest.raises(CommandTimeout):
+        future.result(0)
+
+
+def test_adapter_send():
+    adapter = blepython_bench.fake_dongle_adapter()
+    futures = [adapter.send(adapter.bglib.ble_cmd_attclient_read_by_handle(0, handle)) for handle in range(10)]
+    futures.append(adapter.send(adapter.bglib.ble_cmd_connection_get_rssi(0)))
+    assert [f.result(1) for f in futures] == [{'connection': 0, 'result': 0}] * 10 + [{'connection': 0, 'rssi': 0}]
+
+
+def test_adapter_send_timeout():
+    # Nobody answers on the other side of the pty
+    master, slave = pty.openpty()
+    adapter = Adapter(port=os.ttyname(slave))
+    first = adapter.send(adapter.bglib.ble_cmd_attclient_read_by_handle(0, 3), timeout=0.05)
+    second = adapter.send(adapter.bglib.ble_cmd_attclient_read_by_handle(0, 4), timeout=0.05)
+    with pytest.raises(CommandTimeout):
+        first.result(1)
+    # The listener moved on to the next command
+    with pytest.raises(CommandTimeout):
+        second.result(1)
+    assert adapter.pending_cmd is None
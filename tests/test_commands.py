@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+################################################################################
+#
+# @brief Tests for the BGAPI command builders, run with pytest
+#
+# Runs entirely against in-memory fakes, no dongle required.
+#
+# @date Created 2026/10/17
+#
+# @copyright Copyright &copy 2026 Ashton Instruments
+################################################################################
+
+import binascii
+
+import pytest
+
+from blepython import bglib
+
+# Commands and the packet the original per-byte builders made for them
+ORIGINAL_COMMANDS = [
+    ('ble_cmd_system_whitelist_append', ([1, 2, 3, 4, 5, 6], 1), '0007000a01020304050601'),
+    ('ble_cmd_system_endpoint_tx', (2, [1, 2, 3]), '000500090203010203'),
+    ('ble_cmd_attributes_write', (16, 0, [170, 187]), '0006020010000002aabb'),
+    ('ble_cmd_attclient_attribute_write', (0, 3, [1, 2, 3, 4]), '000804050003000401020304'),
+    ('ble_cmd_attclient_write_command', (1, 16, list(range(20))),
+     '0018040601100014000102030405060708090a0b0c0d0e0f10111213'),
+    ('ble_cmd_attclient_prepare_write', (0, 3, 18, [9, 8, 7]), '00090409000300120003090807'),
+    ('ble_cmd_attclient_read_by_type', (0, 1, 65535, [3, 40]), '00080402000100ffff020328'),
+    ('ble_cmd_attclient_read_by_group_type', (0, 1, 65535, [0, 40]), '00080401000100ffff020028'),
+    ('ble_cmd_gap_connect_direct', ([1, 2, 3, 4, 5, 6], 0, 60, 76, 100, 0), '000f0603010203040506003c004c0064000000'),
+    ('ble_cmd_gap_set_adv_data', (0, [2, 1, 6]), '000506090003020106'),
+    ('ble_cmd_attclient_read_by_handle', (0, 3), '00030404000300'),
+    ('ble_cmd_attclient_read_long', (1, 32), '00030408012000'),
+    ('ble_cmd_connection_get_rssi', (2,), '0001030102'),
+]
+
+
+@pytest.mark.parametrize('name,args,packet', ORIGINAL_COMMANDS)
+def test_command_matches_original_builder(name, args, packet):
+    assert bytearray(getattr(bglib.BGLib(), name)(*args)) == bytearray(binascii.unhexlify(packet))
+
+
+def test_payload_types():
+    lib = bglib.BGLib()
+    data = list(range(20))
+    packet = lib.ble_cmd_attclient_write_command(1, 16, data)
+    assert lib.ble_cmd_attclient_write_command(1, 16, bytes(bytearray(data))) == packet
+    assert lib.ble_cmd_attclient_write_command(1, 16, bytearray(data)) == packet
+    assert lib.ble_cmd_attclient_write_command(1, 16, memoryview(bytearray(data))) == packet
+
+
+def test_cached_command():
+    lib = bglib.BGLib()
+    packet = lib.ble_cmd_attclient_read_by_handle(0, 3)
+    assert isinstance(packet, bytes)
+    assert bglib.BGLib().ble_cmd_attclient_read_by_handle(0, 3) is packet
+    assert lib.ble_cmd_attclient_read_by_handle(0, 4) != packet
+
+
+def test_cached_command_bounded():
+    lib = bglib.BGLib()
+    first = lib.ble_cmd_attclient_read_long(0, 0)
+    for handle in range(1, bglib.COMMAND_CACHE_SIZE + 1):
+        lib.ble_cmd_attclient_read_long(0, handle)
+    # The full cache was dropped, the packet is built again
+    packet = lib.ble_cmd_attclient_read_long(0, 0)
+    assert packet == first and packet is not first
@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+################################################################################
+#
+# @brief Tests for the connection manager, run with pytest
+#
+# Runs against the pty based fake GATT dongle of blepython_bench.py, no
+# dongle required.
+#
+# @date Created 2026/10/17
+#
+# @copyright Copyright &copy 2026 Ashton Instruments
+################################################################################
+
+from blepython.ConnectionManager import ConnectionManager, NoFreeSlot
+from blepython.utils import ConnectTimeout
+import blepython_bench
+
+
+def test_connect_all_with_disconnect():
+    adapter = blepython_bench.fake_gatt_adapter(6, maxconn=3)
+    seen = []
+    results = adapter.connect_all(list(adapter.devices), disconnect=True,
+                                  on_connected=lambda d: seen.append(len(d.services)))
+    assert all(r.connected and r.attempts == 1 for r in results.values())
+    assert seen == [1] * 6
+    assert all(r.time_to_connected >= r.attempt_time > 0 for r in results.values())
+
+
+def test_no_free_slot():
+    adapter = blepython_bench.fake_gatt_adapter(3, maxconn=2)
+    devices = list(adapter.devices)
+    results = ConnectionManager(adapter).connect_all(devices)
+    # The slot count is read from the dongle
+    assert [results[d].connected for d in devices] == [True, True, False]
+    assert isinstance(results[devices[2]].error, NoFreeSlot)
+    assert results[devices[2]].attempts == 0
+
+
+def test_already_connected():
+    adapter = blepython_bench.fake_gatt_adapter(2, maxconn=2)
+    devices = list(adapter.devices)
+    devices[0].connect()
+    results = adapter.connect_all(devices)
+    assert results[devices[0]].connected and results[devices[0]].attempts == 0
+    assert results[devices[1]].connected and results[devices[1]].attempts == 1
+
+
+def test_refused_connect_is_retried():
+    # The dongle has fewer slots than the manager thinks, the second connect
+    # is refused until the first device has disconnected
+    adapter = blepython_bench.fake_gatt_adapter(2, maxconn=1)
+    devices = list(adapter.devices)
+    results = adapter.connect_all(devices, max_connections=2, retries=5, backoff=0.05, disconnect=True)
+    assert results[devices[0]].connected and results[devices[0]].attempts == 1
+    assert results[devices[1]].connected and results[devices[1]].attempts > 1
+
+
+def test_attempts_time_out():
+    # Discovery takes longer than the attempt timeout, its late events must
+    # not disturb the retry
+    adapter = blepython_bench.fake_gatt_adapter(1, maxconn=1, procedure_delay=0.15)
+    device = adapter.devices[0]
+    results = adapter.connect_all([device], timeout=0.1, retries=1, backoff=0.01)
+    assert not results[device].connected
+    assert results[device].attempts == 2
+    assert isinstance(results[device].error, ConnectTimeout)
@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+################################################################################
+#
+# @brief Tests for connection parameter profiles, run with pytest
+#
+# Runs entirely against in-memory fakes, no dongle required.
+#
+# @date Created 2026/10/17
+#
+# @copyright Copyright &copy 2026 Ashton Instruments
+################################################################################
+
+import os
+import pty
+
+import pytest
+
+from blepython import Adapter
+from blepython.CommandQueue import CommandFuture
+from blepython.ConnectionParameters import ConnectionParameters, HIGH_THROUGHPUT, LOW_LATENCY, LOW_POWER,\
+    connection_profile
+from blepython.utils import NotConnected
+import blepython_bench
+
+ADDRESS = b'\x01\x00\x00\x00\x00\xc0'
+
+
+def idle_adapter():
+    '''
+    An adapter on a pty nobody answers with one scanned device, its commands
+    recorded
+    '''
+    master, slave = pty.openpty()
+    adapter = Adapter(port=os.ttyname(slave), listener=False)
+    adapter.sent = []
+    adapter.cmd_q.put = adapter.sent.append
+
+    def send(packet, timeout=None):
+        adapter.sent.append(packet)
+        return CommandFuture(packet)
+    adapter.cmd_q.send = send
+    adapter.bglib.feed(blepython_bench.scan_response(-60, ADDRESS, b'\x02\x01\x06'))
+    return adapter
+
+
+def test_units():
+    assert LOW_LATENCY.units() == (6, 12, 0, 100)
+    assert HIGH_THROUGHPUT.units() == (6, 8, 0, 200)
+    assert LOW_POWER.units() == (80, 100, 4, 400)
+
+
+@pytest.mark.parametrize('args', [
+    (5, 15),                # interval below 7.5 ms
+    (15, 7.5),              # min above max
+    (7.5, 5000),            # interval above 4 s
+    (7.5, 15, 501),         # latency
+    (7.5, 15, 0, 50),       # timeout below 100 ms
+    (7.5, 15, 0, 40000),    # timeout above 32 s
+    (100, 125, 4, 1000),    # timeout shorter than the skipped events
+])
+def test_invalid_parameters(args):
+    with pytest.raises(ValueError):
+        ConnectionParameters(*args)
+
+
+def test_profile_lookup():
+    assert connection_profile('low-power') is LOW_POWER
+    custom = ConnectionParameters(30, 50, 0, 2000)
+    assert connection_profile(custom) is custom
+    with pytest.raises(ValueError):
+        connection_profile('turbo')
+
+
+def test_connect_command():
+    adapter = idle_adapter()
+    lib = adapter.bglib
+    d = adapter.devices[0]
+    # The address type the device was seen with
+    assert d.connect_command() == lib.ble_cmd_gap_connect_direct(d.addr, 1, 6, 12, 100, 0)
+    d.connection_profile = 'high-throughput'
+    assert d.connect_command() == lib.ble_cmd_gap_connect_direct(d.addr, 1, 6, 8, 200, 0)
+    d.start_connect('low-power')
+    assert adapter.sent[-1] == lib.ble_cmd_gap_connect_direct(d.addr, 1, 80, 100, 400, 4)
+
+
+def test_update_connection():
+    adapter = idle_adapter()
+    d = adapter.devices[0]
+    with pytest.raises(NotConnected):
+        d.update_connection(LOW_POWER)
+    d.start_connect()
+    adapter.bglib.feed(blepython_bench.connection_status(0, ADDRESS))
+    assert (d.connection_interval, d.connection_latency, d.supervision_timeout) == (15, 0, 1000)
+    d.update_connection('low-power')
+    assert adapter.sent[-1] == adapter.bglib.ble_cmd_connection_update(0, 80, 100, 4, 400)
@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+################################################################################
+#
+# @brief Tests for discovery through characteristic declarations, run with
+# pytest
+#
+# Runs against the pty based fake GATT dongle of blepython_bench.py, no
+# dongle required.
+#
+# @date Created 2026/10/17
+#
+# @copyright Copyright &copy 2026 Ashton Instruments
+################################################################################
+
+from blepython import bglib
+from blepython.CommandQueue import CommandFuture
+from blepython.Service import Characteristic, CCCD_UUID
+import blepython_bench
+
+USER_DESCRIPTION_UUID = [0x01, 0x29]
+
+
+class RecordingQueue(object):
+    def __init__(self):
+        self.sent = []
+
+    def put(self, packet):
+        self.sent.append(packet)
+
+    def send(self, packet, timeout=None):
+        self.sent.append(packet)
+        return CommandFuture(packet)
+
+
+def characteristic(properties):
+    lib = bglib.BGLib()
+    c = Characteristic(lib, 0, RecordingQueue(), [0x00, 0xFF], 3, properties, 2)
+    c.add_descriptor(CCCD_UUID, 4)
+    return c
+
+
+def test_declarations():
+    adapter = blepython_bench.fake_gatt_adapter(1, services=2, characteristics=2, descriptions=True,
+                                                procedure_delay=0.001)
+    d = adapter.devices[0]
+    d.connect()
+    battery, other = d.services
+    # Services only hold characteristics, not declarations or descriptors
+    assert [c.handle for c in battery.characteristics] == [3, 6]
+    assert [c.handle for c in other.characteristics] == [11, 15]
+
+    c = d.get_characteristic_by_handle(3)
+    assert (c.declaration_handle, c.properties, c.cccd_handle) == (2, 0x12, 4)
+    assert c.descriptors == {4: CCCD_UUID}
+    c = d.get_characteristic_by_handle(11)
+    assert (c.declaration_handle, c.properties, c.cccd_handle) == (10, 0x1E, 12)
+    assert c.descriptors == {12: CCCD_UUID, 13: USER_DESCRIPTION_UUID}
+    assert d.get_characteristic_by_handle(2) is None and d.get_characteristic_by_handle(12) is None
+
+
+def test_write_picks_command_or_request():
+    lib = bglib.BGLib()
+    c = characteristic(Characteristic.WRITE | Characteristic.WRITE_NO_RESPONSE)
+    c.write([1])
+    assert c.cmd_q.sent[-1] == lib.ble_cmd_attclient_write_command(0, 3, [1])
+    c.write([1], response=True)
+    assert c.cmd_q.sent[-1] == lib.ble_cmd_attclient_attribute_write(0, 3, [1])
+
+    c = characteristic(Characteristic.WRITE)
+    c.write([1])
+    assert c.cmd_q.sent[-1] == lib.ble_cmd_attclient_attribute_write(0, 3, [1])
+    c.write([1], response=False)
+    assert c.cmd_q.sent[-1] == lib.ble_cmd_attclient_write_command(0, 3, [1])
+
+
+def test_set_notifications():
+    lib = bglib.BGLib()
+    c = characteristic(Characteristic.NOTIFY | Characteristic.INDICATE)
+    c.set_notifications()
+    assert c.cmd_q.sent[-1] == lib.ble_cmd_attclient_attribute_write(0, 4, [0x01, 0x00])
+    c.set_notifications(False)
+    assert c.cmd_q.sent[-1] == lib.ble_cmd_attclient_attribute_write(0, 4, [0x00, 0x00])
+
+    c = characteristic(Characteristic.INDICATE)
+    c.set_notifications()
+    assert c.cmd_q.sent[-1] == lib.ble_cmd_attclient_attribute_write(0, 4, [0x02, 0x00])
+
+    c = characteristic(Characteristic.READ)
+    c.cccd_handle = None
+    assert c.set_notifications() is None and c.cmd_q.sent == []
+
+
+def test_indications_confirmed():
+    lib = bglib.BGLib()
+    c = characteristic(Characteristic.INDICATE)
+    received = []
+    c.notification_callback = lambda uuid, value: received.append(value)
+    c.attclient_attribute_value_handler({'type': Characteristic.VALUE_NOTIFY, 'value': [1]})
+    assert c.cmd_q.sent == []
+    c.attclient_attribute_value_handler({'type': Characteristic.VALUE_INDICATE_RSP_REQ, 'value': [2]})
+    assert c.cmd_q.sent == [lib.ble_cmd_attclient_indicate_confirm(0)]
+    assert received == [[1], [2]]
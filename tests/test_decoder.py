@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+################################################################################
+#
+# @brief Tests for the table-driven BGAPI decoder, run with pytest
+#
+# Runs entirely against in-memory fakes, no dongle required.
+#
+# @date Created 2026/10/17
+#
+# @copyright Copyright &copy 2026 Ashton Instruments
+################################################################################
+
+import binascii
+
+import pytest
+
+from blepython import bglib
+
+
+def unhexlify(h):
+    return bytearray(binascii.unhexlify(h))
+
+
+# Packets and the event each one fires, with the arguments as decoded by the
+# original if/elif parser
+ORIGINAL_PARSER_EVENTS = [
+    ('800e0600c40001020304050601ff03020106', 'ble_evt_gap_scan_response',
+     {'sender': [1, 2, 3, 4, 5, 6], 'packet_type': 0, 'rssi': -60, 'address_type': 1, 'data': [2, 1, 6], 'bond': 255}),
+    ('801003000005010203040506010c0064000000ff', 'ble_evt_connection_status',
+     {'latency': 0, 'connection': 0, 'conn_interval': 12, 'flags': 5, 'timeout': 100, 'address': [1, 2, 3, 4, 5, 6],
+      'address_type': 1, 'bonding': 255}),
+    ('80030304011602', 'ble_evt_connection_disconnected',
+     {'connection': 1, 'reason': 534}),
+    ('800504010201041000', 'ble_evt_attclient_procedure_completed',
+     {'connection': 2, 'result': 1025, 'chrhandle': 16}),
+    ('800804020001000700020018', 'ble_evt_attclient_group_found',
+     {'start': 1, 'connection': 0, 'end': 7, 'uuid': [0, 24]}),
+    ('8009040300020003001202192a', 'ble_evt_attclient_attribute_found',
+     {'uuid': [25, 42], 'connection': 0, 'chrdecl': 2, 'value': 3, 'properties': 18}),
+    ('80060404000300020229', 'ble_evt_attclient_find_information_found',
+     {'connection': 0, 'uuid': [2, 41], 'chrhandle': 3}),
+    ('80090405031000010401020304', 'ble_evt_attclient_attribute_value',
+     {'connection': 3, 'type': 1, 'value': [1, 2, 3, 4], 'atthandle': 16}),
+    ('800504060003aabbcc', 'ble_evt_attclient_read_multiple_response',
+     {'connection': 0, 'handles': [170, 187, 204]}),
+    ('800c0000010003000200890006000102', 'ble_evt_system_boot',
+     {'major': 1, 'll_version': 6, 'hw': 2, 'patch': 2, 'build': 137, 'protocol_version': 1, 'minor': 3}),
+    ('0001000608', 'ble_rsp_system_get_connections',
+     {'maxconn': 8}),
+    ('00030405008101', 'ble_rsp_attclient_attribute_write',
+     {'connection': 0, 'result': 385}),
+    ('00030603000002', 'ble_rsp_gap_connect_direct',
+     {'connection_handle': 2, 'result': 0}),
+    ('00060002010203040506', 'ble_rsp_system_address_get',
+     {'address': [1, 2, 3, 4, 5, 6]}),
+]
+
+
+def recording_bglib():
+    lib = bglib.BGLib()
+    events = []
+    for name in dir(bglib.BGLib):
+        if name.startswith(('ble_rsp_', 'ble_evt_')):
+            getattr(lib, name).add(lambda sender, args, name=name: events.append((name, args)))
+    return lib, events
+
+
+@pytest.mark.parametrize('packet,name,args', ORIGINAL_PARSER_EVENTS)
+def test_decoder_matches_original_parser(packet, name, args):
+    lib, events = recording_bglib()
+    lib.feed(unhexlify(packet))
+    assert events == [(name, args)]
+
+
+def test_decoder_chunks_and_garbage():
+    lib, events = recording_bglib()
+    stream = bytearray(b'\x7f\x13') + bytearray().join(unhexlify(p) for p, _, _ in ORIGINAL_PARSER_EVENTS)
+    for i in range(0, len(stream), 3):
+        lib.feed(stream[i:i + 3])
+    assert events == [(name, args) for _, name, args in ORIGINAL_PARSER_EVENTS]
+    assert lib.framer.discarded == 2
+
+
+def test_decoder_short_payload_dropped():
+    lib, events = recording_bglib()
+    # get_connections without its maxconn byte, then a good one
+    lib.feed(unhexlify('00000006' '0001000608'))
+    assert events == [('ble_rsp_system_get_connections', {'maxconn': 8})]
+
+
+def test_decoder_reset_idles_once():
+    lib, events = recording_bglib()
+    idle = []
+    lib.on_idle.add(lambda sender, args: idle.append(args))
+    lib.busy = True
+    lib.feed(unhexlify('00000000'))
+    assert events == [('ble_rsp_system_reset', {})]
+    assert idle == [None] and not lib.busy
@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+################################################################################
+#
+# @brief Tests for the device registry, run with pytest
+#
+# Runs entirely against in-memory fakes, no dongle required.
+#
+# @date Created 2026/10/17
+#
+# @copyright Copyright &copy 2026 Ashton Instruments
+################################################################################
+
+import os
+import pty
+import struct
+
+from blepython import Adapter
+from blepython.Device import Device
+from blepython.DeviceRegistry import DeviceRegistry
+import blepython_bench
+
+ADDRESS = [1, 0, 0, 0, 0, 0xC0]
+
+
+def registry_device(i, address_type=1):
+    return Device(None, None, [i & 0xFF, i >> 8, 0, 0, 0, 0xC0], address_type)
+
+
+def seen_device(i, last_seen, address_type=1):
+    d = registry_device(i, address_type)
+    d.advertisements.add(-60, 0, last_seen)
+    return d
+
+
+def idle_adapter():
+    '''
+    An adapter on a pty nobody answers, fed events by the test
+    '''
+    master, slave = pty.openpty()
+    return Adapter(port=os.ttyname(slave), listener=False)
+
+
+def scan_response(address, address_type):
+    return blepython_bench.packet(0x80, 6, 0, struct.pack('<bB6sBBB', -60, 0, bytes(bytearray(address)),
+                                                          address_type, 0xFF, 3) + b'\x02\x01\x06')
+
+
+def connection_status(connection, address, address_type):
+    return blepython_bench.packet(0x80, 3, 0, struct.pack('<BB6sBHHHB', connection, 0x05, bytes(bytearray(address)),
+                                                          address_type, 12, 100, 0, 0xFF))
+
+
+def test_registry_lookup():
+    registry = DeviceRegistry()
+    d = registry_device(1)
+    registry.add(d)
+    assert registry.get(ADDRESS) is d
+    assert registry.get(bytearray(ADDRESS), 1) is d
+    assert registry.get(bytes(bytearray(ADDRESS)), 1) is d
+    assert registry.get(ADDRESS, 0) is None
+    assert registry.get([2, 0, 0, 0, 0, 0xC0]) is None
+    assert d in registry and registry_device(1) not in registry
+
+
+def test_registry_order_and_snapshot():
+    registry = DeviceRegistry()
+    devices = [registry_device(i) for i in range(5)]
+    for d in devices[:3]:
+        registry.add(d)
+    snapshot = registry.snapshot()
+    for d in devices[3:]:
+        registry.add(d)
+    # A snapshot taken earlier is not affected by later additions
+    assert list(snapshot) == devices[:3]
+    assert list(registry) == devices and len(registry) == 5
+    assert registry[0] is devices[0] and registry[-1] is devices[-1]
+
+
+def test_registry_remove():
+    registry = DeviceRegistry()
+    random, public = registry_device(1, 1), registry_device(1, 0)
+    registry.add(random)
+    registry.add(public)
+    registry.remove(random)
+    # Still found by address through the other address type
+    assert registry.get(ADDRESS) is public and registry.get(ADDRESS, 1) is None
+    registry.remove(public)
+    assert len(registry) == 0 and registry.get(ADDRESS) is None
+
+
+def test_registry_ttl():
+    registry = DeviceRegistry(ttl=10)
+    devices = [seen_device(i, i * 5) for i in range(5)]
+    for d in devices:
+        registry.add(d)
+    # Connecting, the connection_status needs the registry entry
+    devices[0].state = Device.CONNECTING
+    assert registry.expire(21) == 2
+    assert list(registry) == [devices[0]] + devices[3:]
+    assert registry.evicted == 2
+
+
+def test_registry_capacity():
+    registry = DeviceRegistry(capacity=10)
+    devices = [seen_device(i, i) for i in range(11)]
+    devices[0].state = Device.READY
+    for d in devices:
+        registry.add(d)
+    # Down to 90% of the capacity, least recently seen first, only idle devices
+    assert list(registry) == [devices[0]] + devices[3:]
+    assert registry.evicted == 2
+
+
+def test_adapter_adds_each_device_once():
+    adapter = idle_adapter()
+    for _ in range(3):
+        adapter.bglib.feed(scan_response(ADDRESS, 1))
+        adapter.bglib.feed(scan_response(ADDRESS, 0))
+    assert len(adapter.devices) == 2
+    assert adapter.find_device(ADDRESS, 1).address_type == 1
+    assert adapter.find_device(ADDRESS, 0).address_type == 0
+
+
+def test_connection_status_matches_address_type():
+    adapter = idle_adapter()
+    adapter.bglib.feed(scan_response(ADDRESS, 1))
+    adapter.bglib.feed(scan_response(ADDRESS, 0))
+    adapter.bglib.feed(connection_status(2, ADDRESS, 0))
+    assert adapter.find_device(ADDRESS, 0).connection_handle == 2
+    assert adapter.find_device(ADDRESS, 1).connection_handle is None
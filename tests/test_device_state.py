@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+################################################################################
+#
+# @brief Tests for the device connection state machine, run with pytest
+#
+# Runs entirely against in-memory fakes, no dongle required.
+#
+# @date Created 2026/10/17
+#
+# @copyright Copyright &copy 2026 Ashton Instruments
+################################################################################
+
+import os
+import pty
+import struct
+import threading
+
+import pytest
+
+from blepython import Adapter
+from blepython.CommandQueue import CommandFuture
+from blepython.Device import Device
+from blepython.utils import BGAPIError, ConnectTimeout
+import blepython_bench
+
+ADDRESS = b'\x01\x00\x00\x00\x00\xc0'
+
+
+def idle_adapter():
+    '''
+    An adapter on a pty nobody answers with one scanned device, its commands
+    recorded and answered by the test
+    '''
+    master, slave = pty.openpty()
+    adapter = Adapter(port=os.ttyname(slave), listener=False)
+    adapter.sent = []
+    adapter.futures = []
+    adapter.cmd_q.put = adapter.sent.append
+
+    def send(packet, timeout=None):
+        adapter.sent.append(packet)
+        adapter.futures.append(CommandFuture(packet))
+        return adapter.futures[-1]
+    adapter.cmd_q.send = send
+    adapter.bglib.feed(blepython_bench.scan_response(-60, ADDRESS, b'\x02\x01\x06'))
+    return adapter
+
+
+def disconnected(connection):
+    return blepython_bench.packet(0x80, 3, 4, struct.pack('<BH', connection, 0x0216))
+
+
+def discover(adapter, connection):
+    '''
+    Feed the link coming up and the three discovery procedures completing
+    '''
+    adapter.bglib.feed(blepython_bench.connection_status(connection, ADDRESS))
+    for _ in range(3):
+        adapter.bglib.feed(blepython_bench.procedure_completed(connection, 0))
+
+
+def test_connect_and_disconnect_states():
+    adapter = idle_adapter()
+    d = adapter.devices[0]
+    states = []
+    d.add_state_callback(lambda device, old, new: states.append(new))
+    assert d.state == Device.IDLE
+
+    d.start_connect()
+    assert adapter.sent[-1] == d.connect_command()
+    adapter.bglib.feed(blepython_bench.connection_status(0, ADDRESS))
+    assert d.state == Device.DISCOVERING and d.connection_handle == 0
+    for _ in range(3):
+        adapter.bglib.feed(blepython_bench.procedure_completed(0, 0))
+    assert d.state == Device.READY and d.connected
+
+    d.start_disconnect()
+    assert adapter.sent[-1] == adapter.bglib.ble_cmd_connection_disconnect(0)
+    assert d.state == Device.DISCONNECTING
+    adapter.bglib.feed(disconnected(0))
+    assert d.state == Device.IDLE and d.connection_handle is None
+    assert states == [Device.CONNECTING, Device.DISCOVERING, Device.READY, Device.DISCONNECTING, Device.IDLE]
+
+
+def test_connect_only_from_idle():
+    adapter = idle_adapter()
+    d = adapter.devices[0]
+    d.start_connect()
+    with pytest.raises(RuntimeError):
+        d.start_connect()
+    assert len(adapter.sent) == 1
+
+
+def test_refused_connect_goes_idle():
+    adapter = idle_adapter()
+    d = adapter.devices[0]
+    future = d.start_connect()
+    future.set_exception(BGAPIError(0x0181))
+    assert d.state == Device.IDLE
+
+
+def test_cancel_connect():
+    adapter = idle_adapter()
+    d = adapter.devices[0]
+    d.start_connect()
+    # No link yet, disconnecting cancels the attempt
+    assert d.start_disconnect() is None
+    assert d.state == Device.IDLE
+    assert adapter.sent[-1] == adapter.bglib.ble_cmd_gap_end_procedure()
+
+
+def test_connect_waits_for_connect_in_progress():
+    adapter = idle_adapter()
+    d = adapter.devices[0]
+    d.start_connect()
+    timer = threading.Timer(0.05, discover, (adapter, 0))
+    timer.start()
+    d.connect(timeout=5)
+    timer.join()
+    assert d.state == Device.READY
+    # No second gap_connect_direct
+    assert adapter.sent.count(d.connect_command()) == 1
+
+
+def test_connect_timeout_cancels():
+    adapter = idle_adapter()
+    d = adapter.devices[0]
+
+    def answer():
+        adapter.futures[0].set_response({'result': 0, 'connection_handle': 0})
+    threading.Timer(0.01, answer).start()
+    with pytest.raises(ConnectTimeout):
+        d.connect(timeout=0.1)
+    assert d.state == Device.IDLE
+    assert adapter.sent[-1] == adapter.bglib.ble_cmd_gap_end_procedure()
+
+
+def test_disconnect_during_discovery():
+    adapter = idle_adapter()
+    d = adapter.devices[0]
+
+    def answer():
+        adapter.futures[0].set_response({'result': 0, 'connection_handle': 0})
+        adapter.bglib.feed(blepython_bench.connection_status(0, ADDRESS))
+        adapter.bglib.feed(disconnected(0))
+    threading.Timer(0.01, answer).start()
+    with pytest.raises(ConnectTimeout):
+        d.connect(timeout=5)
+    assert d.state == Device.IDLE
+
+
+def test_wait_for_state():
+    d = Device(None, None, list(bytearray(ADDRESS)))
+    assert d.wait_for_state(Device.IDLE, 0)
+    assert not d.wait_for_state((Device.READY, Device.DISCOVERING), 0.01)
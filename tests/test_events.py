@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+################################################################################
+#
+# @brief Tests for BGAPI event dispatch, run with pytest
+#
+# Runs entirely against in-memory fakes, no dongle required.
+#
+# @date Created 2026/10/17
+#
+# @copyright Copyright &copy 2026 Ashton Instruments
+################################################################################
+
+import binascii
+
+from blepython import bglib
+
+SCAN_RESPONSE = bytearray(binascii.unhexlify('800e0600c40001020304050601ff03020106'))
+
+
+class CountingDecoder(object):
+    '''
+    Wraps a packet decoder and counts the payloads it decodes.
+    '''
+    def __init__(self, decoder):
+        self.decoder = decoder
+        self.event = decoder.event
+        self.idle = decoder.idle
+        self.decoded = 0
+
+    def decode(self, buf, start, end):
+        self.decoded += 1
+        return self.decoder.decode(buf, start, end)
+
+
+def test_handler_cached_per_instance():
+    lib, other = bglib.BGLib(), bglib.BGLib()
+    assert lib.ble_evt_gap_scan_response is lib.ble_evt_gap_scan_response
+    assert lib.ble_evt_gap_scan_response is not other.ble_evt_gap_scan_response
+
+
+def test_add_and_remove():
+    lib = bglib.BGLib()
+    fired = []
+    first = lambda sender, args: fired.append(('first', sender, args))
+    second = lambda sender, args: fired.append(('second', sender, args))
+    lib.ble_evt_gap_scan_response += first
+    lib.ble_evt_gap_scan_response.add(second)
+    lib.ble_evt_gap_scan_response({'rssi': -60})
+    assert fired == [('first', lib, {'rssi': -60}), ('second', lib, {'rssi': -60})]
+    del fired[:]
+    lib.ble_evt_gap_scan_response -= first
+    lib.ble_evt_gap_scan_response({'rssi': -61})
+    assert fired == [('second', lib, {'rssi': -61})]
+
+
+def test_remove_while_firing():
+    lib = bglib.BGLib()
+    fired = []
+
+    def once(sender, args):
+        fired.append('once')
+        lib.ble_evt_gap_scan_response.remove(once)
+    lib.ble_evt_gap_scan_response.add(once)
+    lib.ble_evt_gap_scan_response.add(lambda sender, args: fired.append('always'))
+    lib.ble_evt_gap_scan_response()
+    lib.ble_evt_gap_scan_response()
+    assert fired == ['once', 'always', 'always']
+
+
+def test_event_trace():
+    lib = bglib.BGLib()
+    traced = []
+    lib.event_trace = lambda name, args: traced.append((name, args['rssi']))
+    lib.feed(SCAN_RESPONSE)
+    assert traced == [('ble_evt_gap_scan_response', -60)]
+
+
+def test_unsubscribed_packets_not_decoded(monkeypatch):
+    lib = bglib.BGLib()
+    key = (0x80 << 16) | (6 << 8) | 0
+    decoder = CountingDecoder(lib.decoders[key])
+    monkeypatch.setitem(lib.decoders, key, decoder)
+    lib.feed(SCAN_RESPONSE)
+    assert decoder.decoded == 0
+    responses = []
+    lib.ble_evt_gap_scan_response.add(lambda sender, args: responses.append(args))
+    lib.feed(SCAN_RESPONSE)
+    assert decoder.decoded == 1 and responses[0]['sender'] == [1, 2, 3, 4, 5, 6]
@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+################################################################################
+#
+# @brief Tests for the buffer-based BGAPI framer, run with pytest
+#
+# Runs entirely against in-memory fakes, no dongle required.
+#
+# @date Created 2026/10/17
+#
+# @copyright Copyright &copy 2026 Ashton Instruments
+################################################################################
+
+import binascii
+
+from blepython import bglib
+
+SCAN_RESPONSE = bytearray(binascii.unhexlify('800e0600c40001020304050601ff03020106'))
+GET_CONNECTIONS = bytearray(binascii.unhexlify('0001000608'))
+
+
+def scan_responses(lib):
+    responses = []
+    lib.ble_evt_gap_scan_response.add(lambda sender, args: responses.append(args))
+    return responses
+
+
+class FakeSerial(object):
+    '''
+    Hands out the chunks it was given, one per read(), then times out.
+    '''
+    def __init__(self, *chunks):
+        self.chunks = list(chunks)
+        self.timeout = None
+
+    def inWaiting(self):
+        return len(self.chunks[0]) if self.chunks else 0
+
+    def read(self, size):
+        return self.chunks.pop(0) if self.chunks else b''
+
+
+def test_framer_packets():
+    framer = bglib.BGAPIFramer()
+    framer.feed(SCAN_RESPONSE + GET_CONNECTIONS)
+    assert framer.next_packet() == (0, len(SCAN_RESPONSE))
+    assert framer.next_packet() == (len(SCAN_RESPONSE), len(GET_CONNECTIONS))
+    assert framer.next_packet() is None
+
+
+def test_framer_partial_packet():
+    framer = bglib.BGAPIFramer()
+    framer.feed(SCAN_RESPONSE[:7])
+    assert framer.next_packet() is None
+    framer.feed(SCAN_RESPONSE[7:])
+    offset, length = framer.next_packet()
+    assert framer.buffer[offset:offset + length] == SCAN_RESPONSE
+
+
+def test_framer_resync():
+    framer = bglib.BGAPIFramer()
+    # Bytes with an unknown technology type cannot start a packet
+    framer.feed(bytearray(b'\x7f\x70\x10') + GET_CONNECTIONS)
+    offset, length = framer.next_packet()
+    assert framer.buffer[offset:offset + length] == GET_CONNECTIONS
+    assert framer.discarded == 3
+
+
+def test_feed_chunks():
+    lib = bglib.BGLib()
+    responses = scan_responses(lib)
+    stream = SCAN_RESPONSE * 3
+    for i in range(0, len(stream), 5):
+        lib.feed(stream[i:i + 5])
+    assert len(responses) == 3
+    assert responses[0]['sender'] == [1, 2, 3, 4, 5, 6] and responses[0]['data'] == [2, 1, 6]
+
+
+def test_parse_byte_at_a_time():
+    lib = bglib.BGLib()
+    responses = scan_responses(lib)
+    for b in SCAN_RESPONSE:
+        lib.parse(b)
+    assert len(responses) == 1 and responses[0]['rssi'] == -60
+
+
+def test_check_activity_reads_everything_waiting():
+    lib = bglib.BGLib()
+    responses = scan_responses(lib)
+    lib.check_activity(FakeSerial(bytes(SCAN_RESPONSE[:9]), bytes(SCAN_RESPONSE[9:] + SCAN_RESPONSE)))
+    assert len(responses) == 2
+
+
+def test_check_activity_timeout_drops_partial_packet():
+    lib = bglib.BGLib()
+    responses = scan_responses(lib)
+    lib.busy = True
+    lib.check_activity(FakeSerial(bytes(SCAN_RESPONSE[:9])), timeout=0.01)
+    assert not lib.busy
+    lib.feed(SCAN_RESPONSE)
+    assert len(responses) == 1
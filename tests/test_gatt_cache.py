@@ -0,0 +1,194 @@
+#!/usr/bin/env python
+################################################################################
+#
+# @brief Tests for the GATT layout cache, run with pytest
+#
+# Runs entirely against in-memory fakes, no dongle required.
+#
+# @date Created 2026/10/17
+#
+# @copyright Copyright &copy 2026 Ashton Instruments
+################################################################################
+
+import json
+import os
+import pty
+import struct
+
+from blepython import Adapter
+from blepython.CommandQueue import CommandFuture
+from blepython.Device import Device
+from blepython.GattCache import GattCache, LAYOUT_VERSION
+import blepython_bench
+
+ADDRESS = b'\x01\x00\x00\x00\x00\xc0'
+
+# Battery service at 1-4 with a CCCD, Generic Attribute service with the
+# Database Hash at 5-7
+SERVICES = [(1, 4, b'\x0f\x18'), (5, 7, b'\x01\x18')]
+CHARACTERISTICS = [(2, 3, 0x12, b'\x19\x2a'), (6, 7, 0x02, b'\x2a\x2b')]
+DESCRIPTORS = [(3, b'\x19\x2a'), (4, b'\x02\x29')]
+
+
+def idle_adapter(gatt_cache):
+    '''
+    An adapter on a pty nobody answers with one scanned device, its commands
+    recorded
+    '''
+    master, slave = pty.openpty()
+    adapter = Adapter(port=os.ttyname(slave), listener=False, gatt_cache=gatt_cache)
+    adapter.sent = []
+    adapter.cmd_q.put = adapter.sent.append
+
+    def send(packet, timeout=None):
+        adapter.sent.append(packet)
+        return CommandFuture(packet)
+    adapter.cmd_q.send = send
+    adapter.bglib.feed(blepython_bench.scan_response(-60, ADDRESS, b'\x02\x01\x06'))
+    return adapter
+
+
+def procedure_completed(result):
+    return blepython_bench.packet(0x80, 4, 1, struct.pack('<BHH', 0, result, 0))
+
+
+def read_value(value):
+    '''
+    Read response for the hash characteristic
+    '''
+    return blepython_bench.packet(0x80, 4, 5, struct.pack('<BHBB', 0, 7, 0, len(value)) + value)
+
+
+def discovery_commands(adapter):
+    return [p for p in adapter.sent if bytearray(p)[2:4] in (bytearray(b'\x04\x01'), bytearray(b'\x04\x03'))]
+
+
+def connect(adapter):
+    '''
+    Connect, answering discovery (when the device runs it) with SERVICES,
+    CHARACTERISTICS and DESCRIPTORS
+    '''
+    d = adapter.devices[0]
+    del adapter.sent[:]
+    d.start_connect()
+    adapter.bglib.feed(blepython_bench.connection_status(0, ADDRESS))
+    if d.current_procedure == Device.FINDING_PRIMARY_SERVICES:
+        for start, end, uuid in SERVICES:
+            adapter.bglib.feed(blepython_bench.group_found(0, start, end, uuid))
+        adapter.bglib.feed(blepython_bench.procedure_completed(0, 0))
+        adapter.bglib.feed(blepython_bench.procedure_completed(0, 0))
+        for declaration, value, properties, uuid in CHARACTERISTICS:
+            adapter.bglib.feed(blepython_bench.attribute_found(0, declaration, value, properties, uuid))
+        adapter.bglib.feed(blepython_bench.procedure_completed(0, 0))
+        if d.current_procedure == Device.FINDING_DESCRIPTORS:
+            for handle, uuid in DESCRIPTORS:
+                adapter.bglib.feed(blepython_bench.find_information_found(0, handle, uuid))
+            adapter.bglib.feed(blepython_bench.procedure_completed(0, 0))
+    return d
+
+
+def disconnect(adapter):
+    adapter.bglib.feed(blepython_bench.packet(0x80, 3, 4, struct.pack('<BH', 0, 0x0216)))
+
+
+def test_layout_without_hash():
+    cache = GattCache(hash_uuid=[0x12, 0x34])
+    adapter = idle_adapter(cache)
+    d = connect(adapter)
+    assert d.state == Device.READY and not d.from_cache
+    assert cache.get(d)['hash'] is None
+    disconnect(adapter)
+
+    d = connect(adapter)
+    # Restored without running discovery or reading anything
+    assert d.state == Device.READY and d.from_cache
+    assert discovery_commands(adapter) == []
+    assert adapter.sent == [d.connect_command()]
+    assert [s.start for s in d.services] == [1, 5]
+    c = d.get_characteristic_by_handle(3)
+    assert (c.properties, c.declaration_handle, c.cccd_handle) == (0x12, 2, 4)
+
+
+def test_hash_verified_on_reconnect():
+    cache = GattCache()
+    adapter = idle_adapter(cache)
+    d = connect(adapter)
+    # The hash is read once discovery has finished
+    assert d.current_procedure == Device.READING_HASH
+    assert adapter.sent[-1] == adapter.bglib.ble_cmd_attclient_read_by_handle(0, 7)
+    adapter.bglib.feed(read_value(b'\x01\x02'))
+    assert d.state == Device.READY and cache.get(d)['hash'] == [1, 2]
+    disconnect(adapter)
+
+    d = connect(adapter)
+    assert d.current_procedure == Device.VERIFYING_CACHE and d.state == Device.DISCOVERING
+    adapter.bglib.feed(read_value(b'\x01\x02'))
+    assert d.state == Device.READY and d.from_cache
+    assert discovery_commands(adapter) == []
+
+
+def test_changed_hash_rediscovers():
+    cache = GattCache()
+    adapter = idle_adapter(cache)
+    d = connect(adapter)
+    adapter.bglib.feed(read_value(b'\x01\x02'))
+    disconnect(adapter)
+
+    d = connect(adapter)
+    adapter.bglib.feed(read_value(b'\x03\x04'))
+    assert d.current_procedure == Device.FINDING_PRIMARY_SERVICES and not d.from_cache
+    assert cache.get(d) is None
+
+
+def test_failed_hash_read():
+    cache = GattCache()
+    adapter = idle_adapter(cache)
+    d = connect(adapter)
+    adapter.bglib.feed(procedure_completed(0x0402))
+    # Stored without a hash, and the read callback is gone
+    assert d.state == Device.READY and cache.get(d)['hash'] is None
+    assert d.get_characteristic_by_handle(7).read_callbacks == []
+
+
+def test_stale_handle_invalidates():
+    cache = GattCache(hash_uuid=[0x12, 0x34])
+    adapter = idle_adapter(cache)
+    connect(adapter)
+    disconnect(adapter)
+    d = connect(adapter)
+    assert d.from_cache
+    adapter.bglib.feed(procedure_completed(Device.ATT_INVALID_HANDLE))
+    assert cache.get(d) is None
+    assert d.state == Device.DISCOVERING and d.current_procedure == Device.FINDING_PRIMARY_SERVICES
+
+
+def test_persistent_cache(tmpdir):
+    path = str(tmpdir.join('gatt'))
+    cache = GattCache(path)
+    adapter = idle_adapter(cache)
+    d = connect(adapter)
+    adapter.bglib.feed(read_value(b'\x01\x02'))
+    assert os.listdir(path) == [GattCache.key(d) + '.json']
+
+    assert GattCache(path).get(d) == cache.get(d)
+    cache.invalidate(d)
+    assert os.listdir(path) == [] and GattCache(path).get(d) is None
+
+
+def test_corrupt_cache_file(tmpdir):
+    d = Device(None, None, list(bytearray(ADDRESS)), 1)
+    cache = GattCache(str(tmpdir))
+    with open(str(tmpdir.join(GattCache.key(d) + '.json')), 'w') as f:
+        f.write('{"services": ')
+    assert cache.get(d) is None
+    with open(str(tmpdir.join(GattCache.key(d) + '.json')), 'w') as f:
+        json.dump({'something': 'else'}, f)
+    assert cache.get(d) is None
+
+
+def test_old_layout_version_ignored(tmpdir):
+    d = Device(None, None, list(bytearray(ADDRESS)), 1)
+    cache = GattCache(str(tmpdir))
+    with open(str(tmpdir.join(GattCache.key(d) + '.json')), 'w') as f:
+        json.dump({'version': LAYOUT_VERSION - 1, 'services': [], 'hash': None}, f)
+    assert cache.get(d) is None
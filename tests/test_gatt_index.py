@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+################################################################################
+#
+# @brief Tests for the attribute handle and service range index, run with pytest
+#
+# Runs entirely against in-memory fakes, no dongle required.
+#
+# @date Created 2026/10/17
+#
+# @copyright Copyright &copy 2026 Ashton Instruments
+################################################################################
+
+from blepython.Device import Device
+
+
+def discovered_device():
+    '''
+    Services at 1-4, 10-12 and 20-25, added out of order, with the handles
+    of the first two discovered
+    '''
+    d = Device(None, None, [1, 2, 3, 4, 5, 6])
+    d.connection_handle = 0
+    d.add_service([0x02, 0xFE], 10, 12)
+    d.add_service([0x01, 0xFE], 1, 4)
+    d.add_service([0x03, 0xFE], 20, 25)
+    for handle in (2, 3, 4, 11, 12):
+        d.find_information_found_handler({'connection': 0, 'chrhandle': handle, 'uuid': [handle, 0x2a]})
+    return d
+
+
+def test_find_service_by_handle():
+    d = discovered_device()
+    assert d.find_service_by_handle(1).uuid == [0x01, 0xFE]
+    assert d.find_service_by_handle(4).uuid == [0x01, 0xFE]
+    assert d.find_service_by_handle(10).uuid == [0x02, 0xFE]
+    assert d.find_service_by_handle(25).uuid == [0x03, 0xFE]
+    for handle in (0, 5, 9, 13, 26):
+        assert d.find_service_by_handle(handle) is None
+
+
+def test_discovered_handles_indexed():
+    d = discovered_device()
+    assert sorted(d.handles) == [2, 3, 4, 11, 12]
+    c = d.get_characteristic_by_handle(11)
+    assert c.uuid == [11, 0x2a] and c in d.find_service([0x02, 0xFE]).characteristics
+    # Outside every service
+    d.find_information_found_handler({'connection': 0, 'chrhandle': 15, 'uuid': [0x00, 0x2a]})
+    assert d.get_characteristic_by_handle(15) is None
+
+
+def test_value_routed_by_handle():
+    d = discovered_device()
+    values = []
+    d.get_characteristic_by_handle(12).notification_callback = lambda short_uuid, value: values.append(value)
+    d.attclient_attribute_value_handler({'connection': 0, 'atthandle': 12, 'type': 0x01, 'value': [7]})
+    d.attclient_attribute_value_handler({'connection': 0, 'atthandle': 13, 'type': 0x01, 'value': [8]})
+    assert values == [[7]]
+
+
+def test_remove_service():
+    d = discovered_device()
+    d.remove_service([0x02, 0xFE])
+    assert sorted(d.handles) == [2, 3, 4]
+    assert d.find_service_by_handle(11) is None
+    assert d.find_service_by_handle(3).uuid == [0x01, 0xFE]
+    assert d.find_service_by_handle(22).uuid == [0x03, 0xFE]
@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+################################################################################
+#
+# @brief Tests for the event-driven listener thread, run with pytest
+#
+# Runs against the pty based fake dongle of blepython_bench.py, no dongle
+# required.
+#
+# @date Created 2026/10/17
+#
+# @copyright Copyright &copy 2026 Ashton Instruments
+################################################################################
+
+import select
+import threading
+
+import pytest
+
+from blepython import Adapter
+from blepython.CommandQueue import CommandQueue
+import blepython_bench
+
+
+def readable(fd):
+    return fd in select.select([fd], [], [], 0)[0]
+
+
+def test_command_queue_wakeup():
+    q = CommandQueue()
+    if q.fileno() is None:
+        pytest.skip('no wake up pipe on this platform')
+    assert not readable(q.fileno())
+    q.put(b'\x00\x00\x00\x06')
+    q.put(b'\x00\x00\x00\x06')
+    assert readable(q.fileno())
+    q.clear_wakeup()
+    assert not readable(q.fileno())
+    assert q.qsize() == 2
+
+
+def test_listener_wakes_on_commands_and_responses(monkeypatch):
+    # The select() path never sleeps, a poll interval this long would time out
+    monkeypatch.setattr(Adapter, 'POLL_INTERVAL', 5)
+    adapter = blepython_bench.fake_dongle_adapter()
+    answered = threading.Event()
+    handles = []
+
+    def handler(sender, args):
+        handles.append(args)
+        answered.set()
+    adapter.bglib.ble_rsp_attclient_read_by_handle += handler
+    for i in range(20):
+        answered.clear()
+        adapter.cmd_q.put(adapter.bglib.ble_cmd_attclient_read_by_handle(0, i))
+        assert answered.wait(1)
+    assert len(handles) == 20 and adapter.pending_cmd is None
@@ -0,0 +1,200 @@
+#!/usr/bin/env python
+################################################################################
+#
+# @brief Tests for long characteristic values, run with pytest
+#
+# Runs entirely against in-memory fakes, no dongle required.
+#
+# @date Created 2026/10/17
+#
+# @copyright Copyright &copy 2026 Ashton Instruments
+################################################################################
+
+import struct
+import time
+from collections import deque
+
+import pytest
+
+from blepython import bglib
+from blepython.CommandQueue import CommandFuture
+from blepython.Device import Device
+from blepython.Service import Characteristic
+from blepython.utils import BGAPIError, CommandTimeout, NotConnected
+
+
+class FakeDongle(object):
+    '''
+    Stands in for the command queue and a dongle connected to one
+    peripheral.  Commands are answered and their ATT procedures run as they
+    are sent, or, with autorun False, one step at a time by run().
+
+    Values are 0x55 until written, read_long returns them in 22 byte
+    fragments.  The peripheral refuses prepare writes at refuse_offset.
+    '''
+    def __init__(self):
+        self.bglib = bglib.BGLib()
+        self.device = None
+        self.values = {}
+        self.prepared = []
+        self.commands = []
+        self.refuse_offset = None
+        self.autorun = True
+        self._steps = deque()
+        self._running = False
+
+    def send(self, packet, timeout=None):
+        future = CommandFuture(packet, timeout)
+        self.commands.append(future.packet)
+        self._steps.append(lambda: self._answer(future))
+        if self.autorun:
+            self.run()
+        return future
+
+    def run(self, steps=None):
+        if self._running:
+            return
+        self._running = True
+        try:
+            while self._steps and steps != 0:
+                self._steps.popleft()()
+                steps = None if steps is None else steps - 1
+        finally:
+            self._running = False
+
+    def _answer(self, future):
+        payload = bytes(future.packet[4:])
+        command = (future.packet_class, future.packet_command)
+        future.set_response({'connection': 0, 'result': 0})
+        if command == (4, 9):
+            connection, handle, offset = struct.unpack('<BHH', payload[:5])
+            result = 0x0409 if offset == self.refuse_offset else 0
+            if not result:
+                self.prepared.append((handle, offset, payload[6:]))
+            self._completed(handle, result)
+        elif command == (4, 10):
+            commit = bytearray(payload)[1]
+            for handle, offset, data in self.prepared if commit else []:
+                self.values[handle] = self.values.get(handle, b'\x55')[:offset] + data
+            self.prepared = []
+            self._completed(0, 0)
+        elif command == (4, 8):
+            handle = struct.unpack('<H', payload[1:3])[0]
+            if handle not in self.device.handles:
+                self._completed(handle, 0x0401)
+                return
+            value = self.values.get(handle, b'\x55')
+            # A further read blob only when the previous fragment was full
+            for offset in range(0, len(value) + 1, 22):
+                if offset and offset == len(value):
+                    break
+                self._steps.append(lambda offset=offset: self.device.attclient_attribute_value_handler({
+                    'connection': 0, 'atthandle': handle, 'value': list(bytearray(value[offset:offset + 22])),
+                    'type': Characteristic.VALUE_READ_BLOB if offset else Characteristic.VALUE_READ}))
+            self._completed(handle, 0)
+
+    def _completed(self, handle, result):
+        self._steps.append(lambda: self.device.procedure_complete_handler(
+            {'connection': 0, 'chrhandle': handle, 'result': result}))
+
+
+def connected_characteristic():
+    dongle = FakeDongle()
+    d = dongle.device = Device(dongle.bglib, dongle, [1, 2, 3, 4, 5, 6])
+    d.connection_handle = 0
+    d.state = Device.READY
+    s = d.add_service([0x01, 0xFE], 1, 3)
+    c = d.handles[3] = s.add_characteristic([0x00, 0xFF], 3, Characteristic.READ | Characteristic.WRITE, 2)
+    return dongle, d, c
+
+
+def test_write_long_and_read_long():
+    dongle, d, c = connected_characteristic()
+    data = bytes(bytearray(range(100)))
+    assert c.write(data).result(0)['result'] == 0
+    assert dongle.values[3] == data
+    # 18 bytes per prepare write, then the execute write
+    assert [bytearray(p)[3] for p in dongle.commands] == [9] * 6 + [10]
+    assert c.read(0) == list(bytearray(data))
+    assert c.procedure_callback is None
+
+
+def test_read_long_short_value():
+    dongle, d, c = connected_characteristic()
+    assert c.read(0) == [0x55]
+    dongle.values[3] = b'\xaa' * 22
+    assert c.read(0) == [0xaa] * 22
+
+
+def test_read_long_refused():
+    dongle, d, c = connected_characteristic()
+    c.handle = 4
+    with pytest.raises(BGAPIError) as e:
+        c.read(0)
+    assert e.value.result == 0x0401
+
+
+def test_write_long_refused():
+    dongle, d, c = connected_characteristic()
+    dongle.refuse_offset = 36
+    with pytest.raises(BGAPIError) as e:
+        c.write_long(bytes(bytearray(100))).result(0)
+    assert e.value.result == 0x0409
+    # The parts already queued are cancelled
+    assert bytearray(dongle.commands[-1]) == bytearray(dongle.bglib.ble_cmd_attclient_execute_write(0, 0))
+    assert 3 not in dongle.values and c.procedure_callback is None
+
+
+def test_write_long_disconnected():
+    dongle, d, c = connected_characteristic()
+    dongle.autorun = False
+    written = c.write_long(bytes(bytearray(100)))
+    dongle.run(5)
+    d.connection_disconnected_handler({'connection': 0, 'reason': 0x0208})
+    assert isinstance(written.exception(0), NotConnected)
+    assert c.procedure_callback is None
+
+
+def test_read_long_disconnected():
+    dongle, d, c = connected_characteristic()
+    dongle.autorun = False
+    values = []
+    c.read_callbacks.append(values.append)
+    c.start_read()
+    d.connection_disconnected_handler({'connection': 0, 'reason': 0x0208})
+    assert len(values) == 1 and isinstance(values[0], NotConnected)
+    assert c.procedure_callback is None and not c.read_callbacks
+
+
+def test_write_long_timeout():
+    dongle, d, c = connected_characteristic()
+    dongle.autorun = False
+    written = c.write_long(bytes(bytearray(100)), timeout=0.01)
+    dongle.run(3)
+    assert isinstance(written.exception(1), CommandTimeout)
+    time.sleep(0.01)
+    dongle.run()
+    # The rest of the value is not sent, the queued parts are cancelled
+    assert bytearray(dongle.commands[-1]) == bytearray(dongle.bglib.ble_cmd_attclient_execute_write(0, 0))
+    assert 3 not in dongle.values and c.procedure_callback is None
+
+
+def test_read_long_timeout():
+    dongle, d, c = connected_characteristic()
+    dongle.autorun = False
+    with pytest.raises(CommandTimeout):
+        c.read(0.01)
+    assert c.procedure_callback is None and c._long_value is None
+    # The late value of the read that timed out is not returned by the next
+    dongle.run()
+    dongle.values[3] = b'\xaa'
+    dongle.autorun = True
+    assert c.read(0) == [0xaa]
+
+
+
+def test_write_long_response_false():
+    dongle, d, c = connected_characteristic()
+    with pytest.raises(ValueError):
+        c.write(bytes(bytearray(100)), response=False)
+    assert dongle.commands == []
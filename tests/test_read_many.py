@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+################################################################################
+#
+# @brief Tests for batching reads with read_multiple, run with pytest
+#
+# Runs against in-memory fakes and the pty based fake GATT dongle of
+# blepython_bench.py, no dongle required.
+#
+# @date Created 2026/10/17
+#
+# @copyright Copyright &copy 2026 Ashton Instruments
+################################################################################
+
+import pytest
+
+from blepython.Device import Device
+from blepython.Service import Characteristic, READ_VALUE_MAX
+from blepython.utils import BGAPIError, NotConnected
+import blepython_bench
+
+
+def characteristic(handle, value_length=None, properties=Characteristic.READ, uuid=None):
+    c = Characteristic(None, 0, None, uuid or [0x00, 0xFF], handle, properties, handle - 1)
+    c.value_length = value_length
+    return c
+
+
+def recorded_commands(adapter, packet_class, packet_command):
+    '''
+    Record the commands of the given class and ID sent from now on
+    '''
+    sent = []
+    send = adapter.cmd_q.send
+
+    def recording_send(packet, timeout=None):
+        if bytearray(packet)[2:4] == bytearray([packet_class, packet_command]):
+            sent.append(packet)
+        return send(packet, timeout)
+    adapter.cmd_q.send = recording_send
+    return sent
+
+
+def test_fixed_value_lengths():
+    assert characteristic(3, uuid=[0x19, 0x2a]).value_length is None
+    assert Characteristic(None, 0, None, [0x19, 0x2a], 3).value_length == 1
+    assert Characteristic(None, 0, None, [0x50, 0x2a], 3).value_length == 7
+    assert Characteristic(None, 0, None, [0x00, 0xFF], 3).value_length is None
+
+
+def test_read_groups():
+    a, b, c = characteristic(3, 8), characteristic(6, 8), characteristic(9, 8)
+    variable = characteristic(12)
+    unreadable = characteristic(15, 1, Characteristic.WRITE)
+    too_long = characteristic(18, READ_VALUE_MAX + 1)
+    groups = Device.read_groups([a, variable, b, unreadable, c, too_long])
+    # Known lengths fill a response, the variable-length value goes last
+    # where the most room is left
+    assert groups == [[a, b], [unreadable], [too_long], [c, variable]]
+
+
+def test_variable_values_alone():
+    first, second = characteristic(3), characteristic(6)
+    assert Device.read_groups([first, second]) == [[first], [second]]
+
+
+def test_split_read_multiple():
+    a, b, variable = characteristic(3, 1), characteristic(6, 2), characteristic(9)
+    assert Device.split_read_multiple([a, b], [1, 2, 3]) == {a: [1], b: [2, 3]}
+    assert Device.split_read_multiple([a, b, variable], [1, 2, 3, 4, 5]) == {a: [1], b: [2, 3], variable: [4, 5]}
+    # The lengths do not add up
+    assert Device.split_read_multiple([a, b], [1, 2]) is None
+    assert Device.split_read_multiple([a, b], [1, 2, 3, 4]) is None
+    # A full response may have cut the variable-length value off
+    value = list(range(READ_VALUE_MAX))
+    assert Device.split_read_multiple([a, b, variable], value) == {a: [0], b: [1, 2]}
+
+
+def test_read_many():
+    adapter = blepython_bench.fake_gatt_adapter(1, services=2, characteristics=4, procedure_delay=0.001)
+    d = adapter.devices[0]
+    d.connect()
+    battery = d.find_service([0x0F, 0x18]).get_characteristic_by_uuid([0x19, 0x2a])
+    custom = d.find_service([0x01, 0xFE]).characteristics
+    for c in custom[1:]:
+        c.value_length = 1
+    custom[0].write(b'variable').result(1)
+    chars = [battery] + custom + [battery]
+
+    sent = recorded_commands(adapter, 4, 11)
+    reads = recorded_commands(adapter, 4, 8)
+    values = d.read_many(chars)
+    assert values == [[0x55], list(bytearray(b'variable')), [0x55], [0x55], [0x55], [0x55]]
+    # One request for all of them, the battery level is read once
+    assert len(sent) == 1 and reads == []
+    assert values == [c.read() for c in chars]
+    d.disconnect()
+
+
+def test_read_many_falls_back():
+    adapter = blepython_bench.fake_gatt_adapter(1, services=2, characteristics=3, procedure_delay=0.001)
+    d = adapter.devices[0]
+    d.connect()
+    custom = d.find_service([0x01, 0xFE]).characteristics
+    # Wrong lengths, the response does not add up
+    for c in custom:
+        c.value_length = 2
+    sent = recorded_commands(adapter, 4, 11)
+    reads = recorded_commands(adapter, 4, 8)
+    assert d.read_many(custom) == [[0x55]] * 3
+    assert len(sent) == 1 and len(reads) == 3
+
+    # A handle the peripheral does not have fails the request
+    del sent[:], reads[:]
+    for c in custom:
+        c.value_length = 1
+    custom[2].handle = 0x0100
+    with pytest.raises(BGAPIError) as e:
+        d.read_many(custom, timeout=1)
+    # Read one by one after the request failed
+    assert e.value.result == 0x0401
+    assert len(sent) == 1 and len(reads) == 3 and d._read_multiple_callback is None
+    d.disconnect()
+
+
+def test_read_many_not_connected():
+    d = Device(None, None, [1, 2, 3, 4, 5, 6])
+    with pytest.raises(NotConnected):
+        d.read_many([characteristic(3, 1), characteristic(6, 1)])
+
+
+def test_service_read_many():
+    adapter = blepython_bench.fake_gatt_adapter(1, procedure_delay=0.001)
+    d = adapter.devices[0]
+    d.connect()
+    sent = recorded_commands(adapter, 4, 11)
+    s = d.find_service([0x0F, 0x18])
+    battery = s.get_characteristic_by_uuid([0x19, 0x2a])
+    assert s.read_many([battery]) == [[0x55]]
+    # Nothing to batch a single value with
+    assert sent == []
+    d.disconnect()
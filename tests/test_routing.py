@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+################################################################################
+#
+# @brief Tests for routing connection and attclient events, run with pytest
+#
+# Runs entirely against in-memory fakes, no dongle required.
+#
+# @date Created 2026/10/17
+#
+# @copyright Copyright &copy 2026 Ashton Instruments
+################################################################################
+
+import os
+import pty
+import struct
+
+from blepython import Adapter
+import blepython_bench
+from blepython_bench import attribute_value, connection_status, procedure_completed, scan_response
+
+
+def address(i):
+    return struct.pack('<6B', i, 0, 0, 0x44, 0x55, 0xC6)
+
+
+def routed_adapter(devices=3):
+    '''
+    An adapter on a pty nobody answers that knows devices 0..devices-1 and
+    records the events each one is handed
+    '''
+    master, slave = pty.openpty()
+    adapter = Adapter(port=os.ttyname(slave), listener=False)
+    routed = []
+    for i in range(devices):
+        adapter.bglib.feed(scan_response(-60, address(i), b'\x02\x01\x06'))
+        d = adapter.devices[i]
+        for handler in ('procedure_complete_handler', 'attclient_attribute_value_handler',
+                        'find_information_found_handler'):
+            setattr(d, handler, lambda args, i=i, handler=handler: routed.append((i, handler, args['connection'])))
+    return adapter, routed
+
+
+def test_events_routed_by_connection():
+    adapter, routed = routed_adapter()
+    adapter.bglib.feed(connection_status(3, address(1)))
+    adapter.bglib.feed(connection_status(4, address(2)))
+    assert adapter.connections == {3: adapter.devices[1], 4: adapter.devices[2]}
+    assert adapter.devices[1].connection_handle == 3
+
+    adapter.bglib.feed(attribute_value(4, 0x10, b'\x01'))
+    adapter.bglib.feed(procedure_completed(3, 0x10))
+    adapter.bglib.feed(blepython_bench.find_information_found(3, 0x11, b'\x02\x29'))
+    # Nobody is connected on 5
+    adapter.bglib.feed(attribute_value(5, 0x10, b'\x01'))
+    assert routed == [(2, 'attclient_attribute_value_handler', 4),
+                      (1, 'procedure_complete_handler', 3),
+                      (1, 'find_information_found_handler', 3)]
+
+
+def test_disconnect_removes_route():
+    adapter, routed = routed_adapter()
+    adapter.bglib.feed(connection_status(3, address(1)))
+    adapter.bglib.feed(blepython_bench.packet(0x80, 3, 4, struct.pack('<BH', 3, 0x0213)))
+    assert adapter.connections == {}
+    assert adapter.devices[1].connection_handle is None
+    adapter.bglib.feed(attribute_value(3, 0x10, b'\x01'))
+    assert routed == []
+
+
+def test_group_found_adds_service():
+    adapter, routed = routed_adapter()
+    adapter.bglib.feed(connection_status(3, address(0)))
+    adapter.bglib.feed(blepython_bench.group_found(3, 1, 5, b'\x0f\x18'))
+    assert [s.uuid for s in adapter.devices[0].services] == [[0x0f, 0x18]]
+    assert adapter.devices[1].services == []
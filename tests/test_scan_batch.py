@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+################################################################################
+#
+# @brief Tests for the columnar batch scan mode, run with pytest
+#
+# Runs entirely against in-memory fakes, no dongle required.
+#
+# @date Created 2026/10/17
+#
+# @copyright Copyright &copy 2026 Ashton Instruments
+################################################################################
+
+import os
+import pty
+
+import pytest
+
+from blepython import Adapter, bglib
+from blepython.CommandQueue import CommandFuture
+from blepython.ScanBatch import ScanBatch, ScanBatchCollector
+import blepython_bench
+
+
+def idle_adapter():
+    '''
+    An adapter on a pty nobody answers, its stop commands answered by the
+    test
+    '''
+    master, slave = pty.openpty()
+    adapter = Adapter(port=os.ttyname(slave), listener=False)
+    adapter.sent = []
+    adapter.cmd_q.put = adapter.sent.append
+
+    def send(packet):
+        adapter.sent.append(packet)
+        adapter.future = CommandFuture(packet)
+        return adapter.future
+    adapter.cmd_q.send = send
+    return adapter
+
+
+def address(i):
+    return bytes(bytearray([i, 0, 0, 0, 0, 0xC0]))
+
+
+def test_collector_rows():
+    batches = []
+    collector = ScanBatchCollector(batches.append, batch_size=2)
+    lib = bglib.BGLib()
+    lib.set_raw_handler('ble_evt_gap_scan_response', collector.packet)
+    lib.feed(blepython_bench.scan_response(-60, address(1), b'\x02\x01\x06'))
+    assert batches == []
+    lib.feed(blepython_bench.scan_response(-100, address(2), b''))
+    lib.feed(blepython_bench.scan_response(-70, address(3), b'\x03\x09AB'))
+    assert len(batches) == 1 and len(batches[0]) == 2 and batches[0].full()
+    batch = batches[0]
+    assert batch.row(0)[1:] == (address(1), 1, -60, 0, b'\x02\x01\x06')
+    assert batch.row(1)[1:] == (address(2), 1, -100, 0, b'')
+    assert batch.timestamps[0] <= batch.timestamps[1]
+
+    collector.flush()
+    assert len(batches) == 2 and batches[1].row(0)[1:] == (address(3), 1, -70, 0, b'\x03\x09AB')
+    # Nothing left to flush
+    collector.flush()
+    assert len(batches) == 2
+
+
+def test_collector_drops_malformed():
+    collector = ScanBatchCollector(None)
+    packet = bytearray(blepython_bench.scan_response(-60, address(1), b'\x02\x01\x06'))
+    # Claims more data than the packet holds
+    packet[14] = 10
+    collector.packet(packet, 0, len(packet))
+    assert collector.dropped == 1 and len(collector.batch) == 0
+
+
+def test_batch_clear():
+    batch = ScanBatch(4)
+    batch.count, batch.payload_used = 3, 20
+    batch.clear()
+    assert len(batch) == 0 and batch.payload_used == 0 and not batch.full()
+
+
+def test_raw_handler_unknown_packet():
+    with pytest.raises(ValueError):
+        bglib.BGLib().set_raw_handler('ble_evt_no_such_event', None)
+
+
+def test_batch_scan():
+    adapter = idle_adapter()
+    batches = []
+    adapter.start_batch_scan(batches.append, batch_size=4)
+    assert adapter.sent[-1] == adapter.bglib.ble_cmd_gap_discover(1)
+    for i in range(5):
+        adapter.bglib.feed(blepython_bench.scan_response(-60, address(i), b'\x02\x01\x06'))
+    # Devices are not registered in batch mode
+    assert len(adapter.devices) == 0
+    assert [len(b) for b in batches] == [4]
+
+    future = adapter.stop_batch_scan()
+    assert adapter.sent[-1] == adapter.bglib.ble_cmd_gap_end_procedure()
+    # Still collecting until the dongle confirms the scan stopped
+    adapter.bglib.feed(blepython_bench.scan_response(-60, address(5), b'\x02\x01\x06'))
+    future.set_response({'result': 0})
+    assert [len(b) for b in batches] == [4, 2]
+    assert adapter.batch_collector is None
+
+    # Back to normal decoding
+    adapter.bglib.feed(blepython_bench.scan_response(-60, address(1), b'\x02\x01\x06'))
+    assert len(adapter.devices) == 1
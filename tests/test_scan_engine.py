@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+################################################################################
+#
+# @brief Tests for the scan engine, run with pytest
+#
+# Runs entirely against in-memory fakes, no dongle required.
+#
+# @date Created 2026/10/17
+#
+# @copyright Copyright &copy 2026 Ashton Instruments
+################################################################################
+
+import os
+import pty
+
+import pytest
+
+from blepython import Adapter
+from blepython.ScanEngine import DISCOVER_OBSERVATION, ScanEngine, ms2units
+from blepython.ScanFilter import SCAN_POLICY_ALL
+import blepython_bench
+
+
+def idle_adapter():
+    '''
+    An adapter on a pty nobody answers, its queued commands recorded
+    '''
+    master, slave = pty.openpty()
+    adapter = Adapter(port=os.ttyname(slave), listener=False)
+    adapter.sent = []
+    adapter.cmd_q.put = adapter.sent.append
+    adapter.cmd_q.send = adapter.sent.append
+    return adapter
+
+
+def test_ms2units():
+    assert ms2units(100) == 160
+    assert ms2units(2.5) == 4
+    assert ms2units(10240) == 16384
+    with pytest.raises(ValueError):
+        ms2units(2)
+    with pytest.raises(ValueError):
+        ScanEngine(idle_adapter(), interval=20000)
+
+
+def test_start_and_stop():
+    adapter = idle_adapter()
+    lib = adapter.bglib
+    engine = ScanEngine(adapter, interval=100, window=200, active=False, mode=DISCOVER_OBSERVATION)
+    engine.start()
+    # The window is capped at the interval
+    assert adapter.sent == [
+        lib.ble_cmd_gap_set_scan_parameters(160, 160, 0),
+        lib.ble_cmd_gap_set_filtering(SCAN_POLICY_ALL, 0, 0),
+        lib.ble_cmd_gap_discover(DISCOVER_OBSERVATION),
+    ]
+    assert adapter.scan_engine is engine and engine.duty_cycle == 1.0
+    engine.stop()
+    assert adapter.sent[-1] == lib.ble_cmd_gap_end_procedure()
+    assert adapter.scan_engine is None and not engine.scanning
+
+
+def test_adaptive_window():
+    adapter = idle_adapter()
+    lib = adapter.bglib
+    engine = ScanEngine(adapter, interval=100, window=20, adaptive=True, min_window=10,
+                        period=1.0, stable_periods=2)
+    engine.start()
+    start = engine.started
+    del adapter.sent[:]
+
+    # A new device in the period doubles the window and restarts the scan
+    engine.advertisement(True, start + 0.5)
+    engine.advertisement(False, start + 1.0)
+    assert engine.window == 40 and engine.restarts == 1
+    assert adapter.sent == [
+        lib.ble_cmd_gap_end_procedure(),
+        lib.ble_cmd_gap_set_scan_parameters(160, 64, 1),
+        lib.ble_cmd_gap_discover(1),
+    ]
+    assert engine.advertisements_per_sec == 2.0
+
+    # Halved only after stable_periods quiet periods
+    engine.tick(start + 2.0)
+    assert engine.window == 40
+    engine.tick(start + 3.0)
+    assert engine.window == 20 and engine.restarts == 2
+    # A period that has not elapsed changes nothing
+    engine.tick(start + 3.5)
+    assert engine.restarts == 2
+
+    metrics = engine.metrics(start + 4.0)
+    assert metrics['devices_discovered'] == 1 and metrics['advertisements'] == 2
+    assert metrics['mean_discovery_latency'] == 0.5 and metrics['max_discovery_latency'] == 0.5
+    assert metrics['window_ms'] == 20 and metrics['restarts'] == 2
+
+
+def test_fixed_window():
+    adapter = idle_adapter()
+    engine = ScanEngine(adapter, window=50, period=1.0)
+    engine.start()
+    engine.advertisement(True, engine.started + 1.0)
+    assert engine.window == 50 and engine.restarts == 0
+    assert engine.metrics()['devices_discovered'] == 1
+
+
+def test_adapter_reports_advertisements():
+    adapter = idle_adapter()
+    engine = ScanEngine(adapter, period=60.0)
+    engine.start()
+    for i in range(3):
+        adapter.bglib.feed(blepython_bench.scan_response(-60, b'\x01\x00\x00\x00\x00\xc0', b'\x02\x01\x06'))
+    assert engine.advertisements == 3 and engine.discovered == 1
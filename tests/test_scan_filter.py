@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+################################################################################
+#
+# @brief Tests for the scan filter, run with pytest
+#
+# Runs entirely against in-memory fakes, no dongle required.
+#
+# @date Created 2026/10/17
+#
+# @copyright Copyright &copy 2026 Ashton Instruments
+################################################################################
+
+import os
+import pty
+
+from blepython import Adapter
+from blepython.AdvertisingData import _parse
+from blepython.ScanFilter import SCAN_POLICY_ALL, SCAN_POLICY_WHITELIST, ScanFilter
+import blepython_bench
+
+ADDRESS = [1, 0, 0, 0, 0, 0xC0]
+OTHER = [2, 0, 0, 0, 0, 0xC0]
+AD_DATA = (b'\x02\x01\x06'
+           b'\x08\x09Sensor1'
+           b'\x03\x03\x0f\x18')
+
+
+def idle_adapter():
+    '''
+    An adapter on a pty nobody answers, its queued commands recorded
+    '''
+    master, slave = pty.openpty()
+    adapter = Adapter(port=os.ttyname(slave), listener=False)
+    adapter.sent = []
+    adapter.cmd_q.put = adapter.sent.append
+    adapter.cmd_q.send = adapter.sent.append
+    return adapter
+
+
+def advertise(adapter, rssi, address, data):
+    adapter.bglib.feed(blepython_bench.scan_response(rssi, bytes(bytearray(address)), data))
+
+
+def test_matches_rssi_and_name():
+    ad_data = _parse(AD_DATA)
+    assert ScanFilter().matches(-90, ad_data)
+    assert ScanFilter(min_rssi=-70).matches(-70, ad_data)
+    assert not ScanFilter(min_rssi=-70).matches(-71, ad_data)
+    assert ScanFilter(name_prefix='Sensor').matches(-60, ad_data)
+    assert not ScanFilter(name_prefix='Beacon').matches(-60, ad_data)
+    assert not ScanFilter(name_prefix='Sensor').matches(-60, _parse(b'\x02\x01\x06'))
+
+
+def test_matches_service_uuids():
+    ad_data = _parse(AD_DATA)
+    assert ScanFilter(service_uuids=[0x180F]).matches(-60, ad_data)
+    assert ScanFilter(service_uuids=[[0x0F, 0x18]]).matches(-60, ad_data)
+    assert not ScanFilter(service_uuids=[0x180A]).matches(-60, ad_data)
+    # Service data counts as advertising the service
+    assert ScanFilter(service_uuids=[0x180A]).matches(-60, _parse(b'\x04\x16\x0a\x18\x01'))
+    uuid128 = bytes(bytearray(range(16)))
+    assert ScanFilter(service_uuids=[uuid128]).matches(-60, _parse(b'\x11\x07' + uuid128))
+    assert not ScanFilter(service_uuids=[uuid128]).matches(-60, ad_data)
+
+
+def test_addresses_normalized():
+    scan_filter = ScanFilter(addresses=[ADDRESS, (bytearray(OTHER), 1)])
+    assert scan_filter.addresses == [(bytes(bytearray(ADDRESS)), 0), (bytes(bytearray(OTHER)), 1)]
+    assert not scan_filter.host_filtering
+    assert ScanFilter(min_rssi=-70).host_filtering
+
+
+def test_start_scan_programs_whitelist():
+    adapter = idle_adapter()
+    lib = adapter.bglib
+    adapter.start_scan(ScanFilter(addresses=[ADDRESS, (OTHER, 1)]), filter_duplicates=True)
+    assert adapter.sent == [
+        lib.ble_cmd_system_whitelist_clear(),
+        lib.ble_cmd_system_whitelist_append(bytes(bytearray(ADDRESS)), 0),
+        lib.ble_cmd_system_whitelist_append(bytes(bytearray(OTHER)), 1),
+        lib.ble_cmd_gap_set_filtering(SCAN_POLICY_WHITELIST, 0, 1),
+        lib.ble_cmd_gap_discover(1),
+    ]
+
+
+def test_start_scan_without_whitelist():
+    adapter = idle_adapter()
+    lib = adapter.bglib
+    adapter.start_scan(ScanFilter(min_rssi=-70))
+    assert adapter.sent == [lib.ble_cmd_gap_set_filtering(SCAN_POLICY_ALL, 0, 0), lib.ble_cmd_gap_discover(1)]
+
+
+def test_new_devices_filtered_on_host():
+    adapter = idle_adapter()
+    adapter.start_scan(ScanFilter(name_prefix='Sensor', min_rssi=-70))
+    advertise(adapter, -80, ADDRESS, AD_DATA)
+    advertise(adapter, -60, OTHER, b'\x02\x01\x06')
+    assert len(adapter.devices) == 0
+    advertise(adapter, -60, ADDRESS, AD_DATA)
+    assert [d.name for d in adapter.devices] == ['Sensor1']
+    # Devices already known are not filtered again
+    advertise(adapter, -90, ADDRESS, AD_DATA)
+    assert adapter.find_device(ADDRESS, 1).advertisements.count == 2
+
+
+def test_callbacks_only_for_matches():
+    adapter = idle_adapter()
+    received = []
+    adapter.add_advertisement_callback(received.append)
+    adapter.start_scan(ScanFilter(min_rssi=-70))
+    advertise(adapter, -60, ADDRESS, AD_DATA)
+    advertise(adapter, -90, ADDRESS, AD_DATA)
+    assert [a.rssi for a in received] == [-60]
+    assert adapter.find_device(ADDRESS, 1).advertisements.count == 2
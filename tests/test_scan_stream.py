@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+################################################################################
+#
+# @brief Tests for scan result streaming, run with pytest
+#
+# Runs entirely against in-memory fakes, no dongle required.
+#
+# @date Created 2026/10/17
+#
+# @copyright Copyright &copy 2026 Ashton Instruments
+################################################################################
+
+import os
+import pty
+import threading
+
+from blepython import Adapter
+import blepython_bench
+
+
+def idle_adapter(**kwargs):
+    '''
+    An adapter on a pty nobody answers, its queued commands recorded
+    '''
+    master, slave = pty.openpty()
+    adapter = Adapter(port=os.ttyname(slave), listener=False, **kwargs)
+    adapter.sent = []
+    adapter.cmd_q.put = adapter.sent.append
+    adapter.cmd_q.send = adapter.sent.append
+    return adapter
+
+
+def advertise(adapter, rssi, i, data=b'\x02\x01\x06'):
+    address = bytes(bytearray([i & 0xFF, i >> 8, 0, 0, 0, 0xC0]))
+    adapter.bglib.feed(blepython_bench.scan_response(rssi, address, data))
+
+
+def test_advertisement_callbacks():
+    adapter = idle_adapter()
+    first, second = [], []
+    adapter.add_advertisement_callback(first.append)
+    adapter.add_advertisement_callback(second.append)
+    advertise(adapter, -60, 1, b'\x04\x09Foo')
+    adapter.remove_advertisement_callback(first.append)
+    advertise(adapter, -70, 1)
+    assert len(first) == 1 and len(second) == 2
+    advertisement = first[0]
+    assert advertisement.device is adapter.find_device([1, 0, 0, 0, 0, 0xC0], 1)
+    assert advertisement.rssi == -60 and advertisement.packet_type == 0
+    assert advertisement.data.name == 'Foo' and advertisement.address_type == 1
+
+
+def test_scan_stream():
+    adapter = idle_adapter()
+    lib = adapter.bglib
+
+    def feed():
+        for i in range(3):
+            advertise(adapter, -60 - i, i)
+    timer = threading.Timer(0.05, feed)
+    timer.start()
+    stream = adapter.scan_stream(timeout=5)
+    received = [next(stream) for _ in range(3)]
+    stream.close()
+    timer.join()
+    assert [a.rssi for a in received] == [-60, -61, -62]
+    assert adapter.sent[-2] == lib.ble_cmd_gap_discover(1)
+    assert adapter.sent[-1] == lib.ble_cmd_gap_end_procedure()
+    assert adapter.advertisement_callbacks == []
+
+
+def test_scan_stream_timeout():
+    adapter = idle_adapter()
+    assert list(adapter.scan_stream(timeout=0.05)) == []
+    assert adapter.sent[-1] == adapter.bglib.ble_cmd_gap_end_procedure()
+
+
+def test_scan_stream_drops_when_full(monkeypatch, caplog):
+    monkeypatch.setattr(Adapter, 'SCAN_STREAM_QUEUE_SIZE', 2)
+    adapter = idle_adapter()
+    timer = threading.Timer(0.05, advertise, (adapter, -60, 0))
+    timer.start()
+    stream = adapter.scan_stream(timeout=0.5)
+    received = [next(stream)]
+    timer.join()
+    # Delivered while nothing is consumed, two are queued and the rest dropped
+    for i in range(1, 5):
+        advertise(adapter, -60, i)
+    received.extend(stream)
+    assert [bytearray(a.device.addr)[0] for a in received] == [0, 1, 2]
+    assert 'dropped 2 advertisements' in caplog.text
@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+################################################################################
+#
+# @brief Tests for selective, on-demand GATT discovery, run with pytest
+#
+# Runs against the pty based fake GATT dongle of blepython_bench.py, no
+# dongle required.
+#
+# @date Created 2026/10/17
+#
+# @copyright Copyright &copy 2026 Ashton Instruments
+################################################################################
+
+import threading
+
+from blepython.Device import Device
+from blepython.GattCache import GattCache
+import blepython_bench
+
+BATTERY_SERVICE = [0x0F, 0x18]
+
+
+def test_full_discovery():
+    adapter = blepython_bench.fake_gatt_adapter(1, services=3, characteristics=2, procedure_delay=0.001)
+    d = adapter.devices[0]
+    d.connect()
+    assert [s.uuid for s in d.services] == [BATTERY_SERVICE, [0x01, 0xFE], [0x02, 0xFE]]
+    assert all(s.discovered for s in d.services)
+
+
+def test_selected_services_only():
+    adapter = blepython_bench.fake_gatt_adapter(1, services=3, characteristics=2, procedure_delay=0.001)
+    d = adapter.devices[0]
+    d.connect(services=[0x180F, [0x02, 0xFE]])
+    assert [s.uuid for s in d.services] == [BATTERY_SERVICE, [0x02, 0xFE]]
+    assert not any(s.discovered for s in d.services)
+    # Nothing was searched beyond the selected services
+    assert d.get_characteristic_by_handle(3) is None
+
+    # Discovered on first use
+    s = d.find_service(BATTERY_SERVICE)
+    assert s.get_battery_level() == [0x55]
+    assert s.discovered and not d.find_service([0x02, 0xFE]).discovered
+    assert len(d.find_service([0x02, 0xFE]).characteristics) == 2
+
+
+def test_missing_service():
+    adapter = blepython_bench.fake_gatt_adapter(1, procedure_delay=0.001)
+    d = adapter.devices[0]
+    d.connect(services=[0x1234, 0x180F])
+    assert d.state == Device.READY
+    assert [s.uuid for s in d.services] == [BATTERY_SERVICE]
+
+
+def test_start_service_discovery():
+    adapter = blepython_bench.fake_gatt_adapter(1, services=3, procedure_delay=0.001)
+    d = adapter.devices[0]
+    d.connect(services=[[0x01, 0xFE], [0x02, 0xFE]])
+    done = []
+    finished = threading.Event()
+
+    def callback(service):
+        done.append(service.uuid)
+        if len(done) == 3:
+            finished.set()
+    first, second = d.services
+    # Queued behind each other, the first callback is not called twice
+    d.start_service_discovery(first, callback)
+    d.start_service_discovery(second, callback)
+    d.start_service_discovery(first, callback)
+    assert finished.wait(5)
+    assert done == [[0x01, 0xFE], [0x01, 0xFE], [0x02, 0xFE]]
+    assert first.discovered and second.discovered
+
+    # Already discovered, called right away
+    d.start_service_discovery(first, done.append)
+    assert done[-1] is first
+
+
+def test_partial_layout_not_cached():
+    cache = GattCache()
+    adapter = blepython_bench.fake_gatt_adapter(1, gatt_cache=cache, procedure_delay=0.001)
+    d = adapter.devices[0]
+    d.connect(services=[0x180F])
+    assert cache.get(d) is None
+    d.disconnect()
+    d.connect()
+    assert cache.get(d) is not None
@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+################################################################################
+#
+# @brief Tests for streaming writes without response, run with pytest
+#
+# Runs against in-memory fakes and the pty based fake GATT dongle of
+# blepython_bench.py, no dongle required.
+#
+# @date Created 2026/10/17
+#
+# @copyright Copyright &copy 2026 Ashton Instruments
+################################################################################
+
+import pytest
+
+from blepython import bglib
+from blepython.CommandQueue import CommandFuture
+from blepython.Service import Characteristic
+from blepython.WriteStream import WriteStream, chunks, OUT_OF_MEMORY
+from blepython.utils import BGAPIError, CommandTimeout
+import blepython_bench
+
+
+class PendingQueue(object):
+    '''
+    Keeps the futures of sent commands for the test to answer
+    '''
+    def __init__(self):
+        self.futures = []
+
+    def send(self, packet, timeout=None):
+        self.futures.append(CommandFuture(packet))
+        return self.futures[-1]
+
+
+def characteristic(properties=Characteristic.WRITE_NO_RESPONSE):
+    return Characteristic(bglib.BGLib(), 0, PendingQueue(), [0x00, 0xFF], 3, properties, 2)
+
+
+def test_chunks():
+    assert list(chunks(b'abcde', 2)) == [b'ab', b'cd', b'e']
+    assert list(chunks([1, 2, 3], 2)) == [bytearray([1, 2]), bytearray([3])]
+    # Blocks are joined so only the last chunk is short
+    assert list(chunks(iter([b'abc', b'de', b'fgh']), 3)) == [b'abc', b'def', b'gh']
+    assert list(chunks(b'')) == []
+    with pytest.raises(ValueError):
+        list(chunks(b'abc', 0))
+
+
+def test_chunks_sent_in_order():
+    c = characteristic()
+    states = []
+    stream = WriteStream(c, b'abcde', 2, state_callback=lambda s: states.append(s.state))
+    stream.start()
+    futures = c.cmd_q.futures
+    # Only one write command is outstanding
+    assert len(futures) == 1
+    futures[0].set_response({'result': 0})
+    assert len(futures) == 2
+    futures[1].set_response({'result': 0})
+    futures[2].set_response({'result': 0})
+    assert [f.packet for f in futures] == [c.bglib.ble_cmd_attclient_write_command(0, 3, data)
+                                           for data in (b'ab', b'cd', b'e')]
+    assert stream.state == WriteStream.DONE and states == [WriteStream.DONE]
+    assert (stream.bytes_sent, stream.chunks_sent, stream.retries, stream.error) == (5, 3, 0, None)
+
+
+def test_out_of_memory_stalls():
+    c = characteristic()
+    states = []
+    stream = WriteStream(c, b'abcd', 2, state_callback=lambda s: states.append(s.state))
+    stream.start()
+    futures = c.cmd_q.futures
+    futures[0].set_exception(BGAPIError(OUT_OF_MEMORY))
+    assert stream.state == WriteStream.STALLED and states == [WriteStream.STALLED]
+    assert (stream.bytes_sent, stream.retries) == (0, 1)
+
+    # The refused chunk goes out again
+    stream.resume()
+    assert futures[1].packet == futures[0].packet
+    futures[1].set_response({'result': 0})
+    futures[2].set_response({'result': 0})
+    assert stream.state == WriteStream.DONE and stream.bytes_sent == 4
+
+
+def test_error_ends_stream():
+    c = characteristic()
+    stream = WriteStream(c, b'abcd', 2)
+    stream.start()
+    error = BGAPIError(0x0186)
+    c.cmd_q.futures[0].set_exception(error)
+    assert stream.state == WriteStream.DONE and stream.error is error
+    assert len(c.cmd_q.futures) == 1
+
+
+def test_cancel():
+    c = characteristic()
+    stream = WriteStream(c, b'abcdef', 2)
+    stream.start()
+    stream.cancel()
+    # The outstanding write completes, nothing more is sent
+    c.cmd_q.futures[0].set_response({'result': 0})
+    assert stream.state == WriteStream.DONE and stream.bytes_sent == 2
+    assert len(c.cmd_q.futures) == 1
+
+    stream = WriteStream(c, b'abcdef', 2)
+    stream.start()
+    c.cmd_q.futures[-1].set_exception(BGAPIError(OUT_OF_MEMORY))
+    stream.cancel()
+    assert stream.state == WriteStream.DONE and stream.bytes_sent == 0
+
+
+def test_run_timeout():
+    c = characteristic()
+    with pytest.raises(CommandTimeout):
+        WriteStream(c, b'abcd', 2).run(timeout=0.05)
+
+
+def test_needs_write_without_response():
+    with pytest.raises(ValueError):
+        characteristic(Characteristic.WRITE).write_stream(b'abcd')
+
+
+def test_write_stream():
+    adapter = blepython_bench.fake_gatt_adapter(1, services=2, tx_buffers=2, procedure_delay=0.001)
+    d = adapter.devices[0]
+    d.connect()
+    c = d.find_service([0x01, 0xFE]).get_characteristic_by_uuid([0x00, 0xFF])
+    stream = c.write_stream(bytearray(200), timeout=5)
+    assert (stream.state, stream.error, stream.bytes_sent, stream.chunks_sent) == (WriteStream.DONE, None, 200, 10)
+    assert stream.bytes_per_sec > 0
+    d.disconnect()